@@ -1,24 +1,370 @@
-from flask import Flask
+from flask import Flask, jsonify, request, send_file
 from flask_cors import CORS
-from flask_socketio import SocketIO
+from flask_socketio import SocketIO, emit, join_room
+import json
 import os
+import shutil
+import tempfile
+import uuid
 from dotenv import load_dotenv
 
+from services.audio_processor import AudioProcessor
+from services.job_queue import JobQueue, QueueFullError
+from services.model_pool import ModelPool
+from services.share_transfer import ShareStore
+from services.silentcipher_service import SilentCipherService
+from services.watermark_registry import PayloadCollisionError, WatermarkRegistry
+from utils.message_converter import MessageConverter
+from utils.payload_codec import PayloadCodec
+
 load_dotenv()
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key')
+# Larger uploads are refused before they are read, with some room for the form fields
+app.config['MAX_CONTENT_LENGTH'] = AudioProcessor.MAX_FILE_SIZE + (1 << 20)
 
 # Configure CORS
 CORS(app, origins=os.getenv('CORS_ORIGINS', 'http://localhost:5173').split(','))
 
-# Configure SocketIO
-socketio = SocketIO(app, cors_allowed_origins=os.getenv('CORS_ORIGINS', 'http://localhost:5173').split(','))
+# Files shared between devices are sent over SocketIO as binary chunks, see services/share_transfer.py
+share_store = ShareStore(
+    os.getenv('SHARE_DIR') or tempfile.mkdtemp(prefix='watermark-shares-'),
+    # An Engine.IO polling request holds at most 16 packets, two per binary chunk
+    window=min(int(os.getenv('SHARE_WINDOW', 8)), 8),
+    max_bytes=AudioProcessor.MAX_FILE_SIZE,
+    ttl=float(os.getenv('SHARE_TTL', 3600))
+)
+
+# Configure SocketIO. A polling request may carry a full window of chunks. Audio
+# barely compresses, gzipping polling responses only cost CPU time
+socketio = SocketIO(
+    app,
+    cors_allowed_origins=os.getenv('CORS_ORIGINS', 'http://localhost:5173').split(','),
+    max_http_buffer_size=share_store.window * (share_store.chunk_size + 1024) + (1 << 20),
+    http_compression=False
+)
+
+# Models of every provider share one memory budget, idle ones are unloaded
+# after MODEL_IDLE_TTL seconds and reloaded on the next request
+model_pool = ModelPool(
+    memory_budget_bytes=int(os.getenv('MODEL_POOL_BUDGET_MB')) << 20 if os.getenv('MODEL_POOL_BUDGET_MB') else None,
+    idle_ttl=float(os.getenv('MODEL_IDLE_TTL')) if os.getenv('MODEL_IDLE_TTL') else None,
+    reaper_interval=60.0 if os.getenv('MODEL_IDLE_TTL') else None
+)
+
+# Shared by all requests, the 44.1kHz model starts loading in the background
+# right away unless PRELOAD_MODELS=false. PAYLOAD_PARITY protects embedded
+# payloads with an error-correcting code, WATERMARK_REGISTRY records them.
+PRELOAD_MODELS = os.getenv('PRELOAD_MODELS', 'true').lower() != 'false'
+silentcipher_service = SilentCipherService(
+    preload=PRELOAD_MODELS,
+    model_pool=model_pool,
+    registry=WatermarkRegistry(os.getenv('WATERMARK_REGISTRY')) if os.getenv('WATERMARK_REGISTRY') else None,
+    codec=PayloadCodec(int(os.getenv('PAYLOAD_PARITY'))) if int(os.getenv('PAYLOAD_PARITY') or 0) else None
+)
+
+audio_processor = AudioProcessor()
+message_converter = MessageConverter()
+
+# Minimum duration SilentCipher needs for reliable watermarking
+MIN_ENCODE_SECONDS = 3.0
+
+# Uploads and results of each job live in their own directory until the job expires
+JOB_DIR = os.getenv('JOB_DIR') or tempfile.mkdtemp(prefix='watermark-jobs-')
+
+def job_path(job_id, name):
+    return os.path.join(JOB_DIR, job_id, name)
+
+def run_encode_job(job_id, payload):
+    """Watermark the uploaded file and save the result next to it."""
+    probe = audio_processor.probe_and_load(payload['input'], sample_rates=None)
+    if not probe['valid']:
+        raise ValueError('; '.join(probe['errors']))
+    watermarked, sdr = silentcipher_service.encode_audio(probe['audio'], probe['sample_rate'], payload['message'],
+                                                         asset=payload['asset'], recipient=payload['recipient'])
+    audio_processor.save_audio(watermarked, probe['sample_rate'], job_path(job_id, 'watermarked.wav'))
+    return {'sdr': float(sdr), 'message': payload['message'], 'audio_url': f'/api/jobs/{job_id}/audio',
+            'input_sha256': payload['input_sha256']}
+
+def run_decode_job(job_id, payload):
+    """Decode the watermark of the uploaded file, or of the window of it given by offset and duration."""
+    probe = audio_processor.probe_and_load(payload['input'], sample_rates=None, offset=payload['offset'],
+                                           duration=payload['duration'])
+    if not probe['valid']:
+        raise ValueError('; '.join(probe['errors']))
+    result = silentcipher_service.decode_audio(probe['audio'], probe['sample_rate'], payload['phase_shift_decoding'])
+    message = [int(value) for value in result['message']] if result['detected'] else None
+    response = {
+        'status': 'detected' if result['detected'] else 'not_detected',
+        'message': message,
+        'confidence': float(result['confidence']) if result['confidence'] is not None else None,
+        'input_sha256': payload['input_sha256'],
+    }
+    if 'corrected' in result:
+        # Nibbles fixed by the payload codec, None when the payload failed verification
+        response['corrected'] = result['corrected']
+    if silentcipher_service.registry is not None and message is not None:
+        # Who the decoded payload was issued to
+        response['issued'] = silentcipher_service.registry.lookup(result.get('payload') or message, limit=10)
+    return response
+
+def push_job_update(job):
+    """Push status changes to the SocketIO clients subscribed to the job."""
+    socketio.emit('job_update', job, to=job['id'])
+
+def discard_job_files(job_id):
+    shutil.rmtree(os.path.join(JOB_DIR, job_id), ignore_errors=True)
+
+# Inference runs on JOB_WORKERS threads sharing silentcipher_service, request
+# workers only store the upload and queue the job
+jobs = JobQueue(
+    {'encode': run_encode_job, 'decode': run_decode_job},
+    workers=int(os.getenv('JOB_WORKERS', 2)),
+    job_timeout=float(os.getenv('JOB_TIMEOUT', 300)) or None,
+    max_queued=int(os.getenv('JOB_QUEUE_SIZE', 100)),
+    result_ttl=float(os.getenv('JOB_RESULT_TTL', 3600)),
+    on_update=push_job_update,
+    on_discard=discard_job_files
+)
+
+def error_response(message, status):
+    return jsonify({'success': False, 'error': message}), status
+
+def save_upload(job_id, min_duration=None):
+    """
+    Stream the uploaded audio_file of a job to disk in chunks, hashing it on the
+    way, then check its header.
+    
+    Returns:
+        Tuple of (upload details as AudioProcessor.ingest_stream or None, error message or None)
+    """
+    upload = request.files.get('audio_file')
+    if upload is None or not upload.filename:
+        return None, 'No audio_file uploaded'
+    ext = os.path.splitext(upload.filename)[1].lower()
+    os.makedirs(os.path.join(JOB_DIR, job_id))
+    try:
+        saved = audio_processor.ingest_stream(upload.stream, job_path(job_id, f'input{ext}'))
+    except ValueError as e:
+        discard_job_files(job_id)
+        return None, str(e)
+    probe = audio_processor.probe_and_load(saved['path'], read='none', sample_rates=None, min_duration=min_duration)
+    if not probe['valid']:
+        discard_job_files(job_id)
+        return None, '; '.join(probe['errors'])
+    return saved, None
+
+def parse_message(field):
+    """
+    Convert the message form field, {"format": "text"|"numeric"|"binary", "value": ...}, to the message
+    integers (5, fewer with a payload codec).
+    """
+    try:
+        message = json.loads(field or '')
+        format_type, value = message['format'], message['value']
+    except (ValueError, TypeError, KeyError):
+        raise ValueError('message must be a JSON object with "format" and "value"')
+    size = silentcipher_service.message_bytes
+    valid, error = message_converter.validate_message(value, format_type, size)
+    if not valid:
+        raise ValueError(error)
+    if format_type == 'text':
+        return message_converter.text_to_numeric(value, size)
+    if format_type == 'binary':
+        return message_converter.binary_to_numeric(value, size)
+    return value
+
+def parse_window(form):
+    """
+    Read the offset and duration form fields (seconds) of a decode request, only that part of the file is
+    read and decoded.
+    
+    Returns:
+        Tuple of (offset, duration), duration None to decode to the end of the file
+    """
+    try:
+        offset = float(form.get('offset') or 0.0)
+        duration = float(form['duration']) if form.get('duration') else None
+    except ValueError:
+        raise ValueError('offset and duration must be numbers of seconds')
+    if offset < 0 or (duration is not None and duration <= 0):
+        raise ValueError('offset must be at least 0 and duration greater than 0')
+    return offset, duration
+
+def queue_job(op, job_id, payload):
+    try:
+        jobs.submit(op, payload, job_id=job_id)
+    except QueueFullError as e:
+        discard_job_files(job_id)
+        response = jsonify({'success': False, 'error': str(e)})
+        response.headers['Retry-After'] = '10'
+        return response, 503
+    return jsonify({'success': True, 'job_id': job_id, 'status': 'queued', 'status_url': f'/api/jobs/{job_id}'}), 202
+
+@app.route('/api/encode', methods=['POST'])
+def submit_encode():
+    """Queue an encode job, poll status_url or subscribe over SocketIO for the result."""
+    try:
+        message = parse_message(request.form.get('message'))
+    except ValueError as e:
+        return error_response(str(e), 400)
+    audio_file = request.files.get('audio_file')
+    asset = request.form.get('asset') or (audio_file.filename if audio_file else None)
+    recipient = request.form.get('recipient') or None
+    if silentcipher_service.registry is not None:
+        try:
+            silentcipher_service.registry.check_available(silentcipher_service.embedded_payload(message), asset,
+                                                          recipient)
+        except PayloadCollisionError as e:
+            return error_response(str(e), 409)
+    job_id = uuid.uuid4().hex
+    upload, error = save_upload(job_id, min_duration=MIN_ENCODE_SECONDS)
+    if error:
+        return error_response(error, 400)
+    return queue_job('encode', job_id, {'input': upload['path'], 'input_sha256': upload['sha256'], 'message': message,
+                                        'asset': asset, 'recipient': recipient})
+
+@app.route('/api/decode', methods=['POST'])
+def submit_decode():
+    """Queue a decode job, poll status_url or subscribe over SocketIO for the result."""
+    try:
+        offset, duration = parse_window(request.form)
+    except ValueError as e:
+        return error_response(str(e), 400)
+    job_id = uuid.uuid4().hex
+    upload, error = save_upload(job_id)
+    if error:
+        return error_response(error, 400)
+    phase_shift = request.form.get('phase_shift_decoding', 'false').lower() in ('1', 'true', 'yes')
+    return queue_job('decode', job_id, {'input': upload['path'], 'input_sha256': upload['sha256'],
+                                        'phase_shift_decoding': phase_shift, 'offset': offset,
+                                        'duration': duration})
+
+@app.route('/api/jobs/<job_id>')
+def job_status(job_id):
+    """Status of a job, with its result once it succeeded."""
+    job = jobs.get(job_id)
+    if job is None:
+        return error_response('Unknown or expired job', 404)
+    return jsonify(job), 200
+
+@app.route('/api/jobs/<job_id>/audio')
+def job_audio(job_id):
+    """Watermarked audio of a finished encode job."""
+    job = jobs.get(job_id)
+    if job is None or job['op'] != 'encode':
+        return error_response('Unknown or expired encode job', 404)
+    if job['status'] != 'succeeded':
+        return error_response(f"Job is {job['status']}", 409)
+    return send_file(job_path(job_id, 'watermarked.wav'), mimetype='audio/wav', as_attachment=True,
+                     download_name='watermarked.wav')
+
+@socketio.on('subscribe_job')
+def subscribe_job(data):
+    """Join the room of a job to receive its job_update events, starting with its current state."""
+    job_id = (data or {}).get('job_id')
+    job = jobs.get(job_id) if job_id else None
+    if job is None:
+        emit('job_error', {'job_id': job_id, 'error': 'Unknown or expired job'})
+        return
+    join_room(job_id)
+    emit('job_update', job)
+
+def share_call(action, *args):
+    """Run a share store action for a SocketIO event, errors are acknowledged as {'error': message}."""
+    try:
+        return action(*args)
+    except KeyError as e:
+        return {'error': e.args[0]}
+    except (ValueError, TypeError) as e:
+        return {'error': str(e)}
+
+@socketio.on('share_start')
+def share_start(data):
+    """Start or resume uploading a share, the sender joins its room."""
+    data = data or {}
+    share = share_call(share_store.start, data.get('size', 0), data.get('sha256', ''), data.get('filename'),
+                       data.get('share_id'))
+    if 'share_id' in share:
+        join_room(share['share_id'])
+    return share
+
+@socketio.on('share_chunk')
+def share_chunk(data):
+    """Store one binary chunk of a share, acknowledging it releases a slot of the sender's window."""
+    data = data or {}
+    received = share_call(lambda: share_store.write_chunk(data.get('share_id'), int(data.get('index')),
+                                                          data.get('data') or b''))
+    return received if isinstance(received, dict) else {'received': received}
+
+@socketio.on('share_complete')
+def share_complete(data):
+    """Verify an uploaded share, subscribers are told once it can be downloaded."""
+    share_id = (data or {}).get('share_id')
+    status = share_call(share_store.complete, share_id)
+    if isinstance(status, dict):
+        return status
+    if status == 'complete':
+        socketio.emit('share_update', share_store.info(share_id), to=share_id)
+    return {'status': status}
+
+@socketio.on('share_info')
+def share_info(data):
+    """Details of a share, the receiver joins its room to be told when it is complete."""
+    share_id = (data or {}).get('share_id')
+    info = share_call(share_store.info, share_id)
+    if 'share_id' in info:
+        join_room(share_id)
+    return info
+
+@socketio.on('share_fetch')
+def share_fetch(data):
+    """Send one binary chunk of a complete share."""
+    data = data or {}
+    chunk = share_call(lambda: share_store.read_chunk(data.get('share_id'), int(data.get('index'))))
+    return chunk if isinstance(chunk, dict) else {'data': chunk}
+
+@socketio.on('share_job')
+def share_job(data):
+    """Share the watermarked audio of a succeeded encode job."""
+    job_id = (data or {}).get('job_id')
+    job = jobs.get(job_id) if job_id else None
+    if job is None or job['op'] != 'encode' or job['status'] != 'succeeded':
+        return {'error': 'Unknown, expired or unfinished encode job'}
+    return share_store.add_file(job_path(job_id, 'watermarked.wav'), 'watermarked.wav')
+
+@app.route('/metrics/jobs')
+def job_metrics():
+    """Queue depth, running jobs and job outcomes."""
+    return jobs.metrics(), 200
 
 @app.route('/health')
 def health():
+    """
+    Readiness: 503 until the preloaded model is loaded, so no traffic is routed to a cold instance.
+    With PRELOAD_MODELS=false the first request loads the model, so the instance is ready until a load fails.
+    """
+    readiness = silentcipher_service.readiness(on_demand=not PRELOAD_MODELS)
+    states = set(readiness['models'].values())
+    if readiness['ready']:
+        status = 'ok'
+    elif states & {'unavailable', 'failed'}:
+        status = 'unavailable'
+    else:
+        status = 'starting'
+    return dict(readiness, status=status), 200 if readiness['ready'] else 503
+
+@app.route('/health/live')
+def liveness():
+    """Liveness: the process is up, whether or not the model is loaded."""
     return {'status': 'ok'}, 200
 
+@app.route('/metrics/models')
+def model_metrics():
+    """Residency, loads and evictions of the pooled models."""
+    return model_pool.metrics(), 200
+
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     socketio.run(app, debug=True, host='0.0.0.0', port=port)
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Archive Scanner
+
+Walks a directory tree, decodes the watermark of every new or changed audio
+file in a pool of worker processes that each keep a model loaded, and stores
+the results in a persistent index that can be queried by message, path and
+confidence.
+
+Files whose size and modification time are unchanged since the last scan are
+skipped without being read. Changed files are hashed first, and content that
+was already decoded (a touched, renamed or copied file) is not decoded again.
+Every result is committed as soon as it is decoded, a scan that was
+interrupted continues where it stopped when started again.
+
+Usage:
+    # Scan an archive (again), 4 worker processes
+    python archive_scanner.py scan /data/archive --index archive.db --workers 4
+
+    # Files carrying a message
+    python archive_scanner.py query --index archive.db --text Hello --min-confidence 0.8
+    python archive_scanner.py query --index archive.db --message 72,101,108,108,111 --path '/data/archive/2024/*'
+
+    # Archive watermarked with a payload codec (PAYLOAD_PARITY=4), queried by its 3 byte messages
+    python archive_scanner.py scan /data/archive --index archive.db --parity 4
+    python archive_scanner.py query --index archive.db --parity 4 --text Hi!
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Add parent directory to path to import backend modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.audio_processor import AudioProcessor
+from services.process_pool import load_service, run_in_processes
+from services.scan_index import ScanIndex
+from utils.message_converter import MessageConverter
+from utils.payload_codec import PayloadCodec
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Hashed files recorded per transaction
+RECORD_BATCH = 256
+
+
+def find_files(root: str) -> List[Tuple[str, int, int]]:
+    """
+    List the audio files below a directory (recursively), sorted.
+
+    Returns:
+        One (absolute path, size, mtime_ns) tuple per file
+    """
+    files = []
+    for directory, _, names in os.walk(os.path.abspath(root)):
+        for name in names:
+            if os.path.splitext(name)[1].lower() not in AudioProcessor.SUPPORTED_FORMATS:
+                continue
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Removed while walking
+                continue
+            files.append((path, stat.st_size, stat.st_mtime_ns))
+    return sorted(files)
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file's content, as hex."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def decode_settings(options: Dict[str, Any]) -> str:
+    """Settings a result depends on, results decoded with other settings are decoded again."""
+    return json.dumps({'phase_shift': options['phase_shift'], 'duration': options['duration'], 'parity': options['parity']},
+                      sort_keys=True)
+
+
+def decode_file(path: str, service: Any, audio_processor: AudioProcessor,
+                phase_shift_decoding: bool = False, duration: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Decode the watermark of one file.
+
+    Args:
+        path: Audio file
+        service: SilentCipherService (or an object with its decode_audio)
+        audio_processor: AudioProcessor to load the file
+        phase_shift_decoding: Use phase shift decoding
+        duration: Only decode this many seconds from the start (None for the whole file)
+
+    Returns:
+        Dictionary with 'detected', 'message', the embedded 'payload' (the
+        message itself without a payload codec), 'confidence' and the 'error'
+        that prevented decoding the file (None if it was decoded)
+    """
+    probe = audio_processor.probe_and_load(path, sample_rates=None, max_bytes=None, duration=duration)
+    if not probe['valid']:
+        return {'detected': False, 'message': None, 'payload': None, 'confidence': None,
+                'error': '; '.join(probe['errors'])}
+    result = service.decode_audio(probe['audio'], probe['sample_rate'], phase_shift_decoding)
+    message = [int(value) for value in result['message']] if result['detected'] else None
+    return {
+        'detected': bool(result['detected']),
+        'message': message,
+        'payload': [int(value) for value in result.get('payload') or message] if result['detected'] else None,
+        'confidence': float(result['confidence']) if result['confidence'] is not None else None,
+        'error': None,
+    }
+
+
+# State of each worker process, set up once by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(options: Dict[str, Any]) -> None:
+    """Load the model once per worker process."""
+    # Every content hash is decoded once, memoization would only hold memory
+    codec = PayloadCodec(options['parity']) if options['parity'] else None
+    service = load_service(options, decode_cache_entries=0, codec=codec)
+    _worker.update(options, service=service, audio_processor=AudioProcessor())
+
+
+def _decode_in_worker(job: Tuple[str, str]) -> Tuple[str, str, Dict[str, Any]]:
+    content_hash, path = job
+    try:
+        result = decode_file(path, _worker['service'], _worker['audio_processor'],
+                             _worker['phase_shift'], _worker['duration'])
+    except Exception as e:
+        result = {'detected': False, 'message': None, 'payload': None, 'confidence': None, 'error': str(e)}
+    return content_hash, path, result
+
+
+def run(jobs: List[Tuple[str, str]], options: Dict[str, Any], workers: int) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    """
+    Decode files in a process pool, yielding results as they finish.
+
+    Args:
+        jobs: (content hash, path) of each file to decode
+        options: Worker options (phase_shift, duration, parity, device, threads)
+        workers: Number of worker processes, 0 to decode in this process
+
+    Yields:
+        (content hash, path, result) tuples
+    """
+    return run_in_processes(_decode_in_worker, jobs, _init_worker, options, workers)
+
+
+def hash_changed(index: ScanIndex, files: List[Tuple[str, int, int]], hash_workers: int) -> Dict[str, str]:
+    """
+    Hash files on a thread pool, recording them in the index in batches as they finish.
+
+    Returns:
+        Dictionary of path to hex content hash (files that vanished are left out)
+    """
+    hashes: Dict[str, str] = {}
+    batch = []
+    with ThreadPoolExecutor(max_workers=hash_workers) as pool:
+        futures = {pool.submit(file_hash, path): (path, size, mtime_ns) for path, size, mtime_ns in files}
+        for future in as_completed(futures):
+            path, size, mtime_ns = futures[future]
+            try:
+                hashes[path] = future.result()
+            except OSError:
+                continue
+            batch.append((path, size, mtime_ns, hashes[path]))
+            if len(batch) >= RECORD_BATCH:
+                index.record_files(batch)
+                batch = []
+    if batch:
+        index.record_files(batch)
+    return hashes
+
+
+def scan(
+    root: str,
+    index: ScanIndex,
+    options: Dict[str, Any],
+    workers: int,
+    hash_workers: int = 4,
+    retry_errors: bool = False,
+    prune: bool = False,
+    on_result: Optional[Callable[[int, int, str, Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    Bring the index up to date with a directory tree.
+
+    Args:
+        root: Directory to scan
+        index: Index to update
+        options: Worker options, as in run
+        workers: Number of worker processes, 0 to decode in this process
+        hash_workers: Threads hashing changed files
+        retry_errors: Decode files that failed to decode in an earlier scan again
+        prune: Remove the files that are no longer in the tree from the index
+        on_result: Called with (count, total, path, result) after each decoded file
+
+    Returns:
+        Dictionary with the numbers of files found, unchanged, hashed, decoded
+        and failed, the files pruned and the decode time
+    """
+    files = find_files(root)
+    known = index.files_under(root)
+    hashes = {}
+    changed = []
+    for path, size, mtime_ns in files:
+        previous = known.get(path)
+        if previous is not None and previous[:2] == (size, mtime_ns):
+            hashes[path] = previous[2]
+        else:
+            changed.append((path, size, mtime_ns))
+    hashes.update(hash_changed(index, changed, hash_workers))
+
+    # One decode per content, the first path of each hash stands for its copies
+    settings = decode_settings(options)
+    decoded = index.decoded_hashes(settings, include_errors=not retry_errors)
+    jobs = {}
+    for path, _, _ in files:
+        content_hash = hashes.get(path)
+        if content_hash is not None and content_hash not in decoded:
+            jobs.setdefault(content_hash, path)
+
+    summary = {'files': len(files), 'unchanged': len(files) - len(changed), 'hashed': len(changed),
+               'decoded': 0, 'errors': 0, 'pruned': 0}
+    start = time.perf_counter()
+    for count, (content_hash, path, result) in enumerate(run(list(jobs.items()), options, workers), 1):
+        index.record_result(content_hash, settings, result)
+        summary['decoded'] += 1
+        summary['errors'] += result['error'] is not None
+        if on_result is not None:
+            on_result(count, len(jobs), path, result)
+    summary['decode_seconds'] = time.perf_counter() - start
+    if prune:
+        summary['pruned'] = index.prune(root, hashes)
+    return summary
+
+
+def parse_message(value: str) -> List[int]:
+    """Parse a message given as up to 5 comma separated integers."""
+    try:
+        message = [int(part) for part in value.split(',')]
+    except ValueError:
+        message = []
+    if not 1 <= len(message) <= 5 or not all(0 <= part <= 255 for part in message):
+        raise argparse.ArgumentTypeError(f"Expected up to 5 comma separated integers (0-255), got {value!r}")
+    return message
+
+
+def print_progress(start: float) -> Callable[[int, int, str, Dict[str, Any]], None]:
+    """Progress callback for scan printing one line per decoded file."""
+    def progress(count: int, total: int, path: str, result: Dict[str, Any]) -> None:
+        elapsed = time.perf_counter() - start
+        eta = elapsed / count * (total - count)
+        if result['error'] is not None:
+            status = f"error: {result['error']}"
+        elif result['detected']:
+            status = f"{result['message']}" + (f" ({result['confidence']:.3f})" if result['confidence'] is not None else "")
+        else:
+            status = 'no watermark'
+        print(f"[{count}/{total}] {path}: {status} (ETA {eta / 60:.0f} min)", flush=True)
+    return progress
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    scan_parser = commands.add_parser('scan', help='Decode the new and changed files of a directory tree')
+    scan_parser.add_argument('root', help='Directory to scan (recursively)')
+    scan_parser.add_argument('--index', required=True, help='SQLite index, created if it does not exist')
+    scan_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                             help='Worker processes, 0 runs in this process')
+    scan_parser.add_argument('--threads', type=int, default=None, help='Torch threads per worker (default: cores / workers)')
+    scan_parser.add_argument('--hash-workers', type=int, default=4, help='Threads hashing changed files')
+    scan_parser.add_argument('--phase-shift', action='store_true', help='Use phase shift decoding')
+    scan_parser.add_argument('--duration', type=float, default=None,
+                             help='Only decode this many seconds from the start of each file')
+    scan_parser.add_argument('--parity', type=int, choices=[0, 2, 4, 6], default=0,
+                             help='Parity nibbles of the payload codec the archive was watermarked with (0 for none)')
+    scan_parser.add_argument('--device', default='cpu')
+    scan_parser.add_argument('--retry-errors', action='store_true', help='Decode files that failed before again')
+    scan_parser.add_argument('--prune', action='store_true', help='Remove files no longer in the tree from the index')
+
+    query_parser = commands.add_parser('query', help='Find scanned files')
+    query_parser.add_argument('--index', required=True, help='SQLite index written by scan')
+    message = query_parser.add_mutually_exclusive_group()
+    message.add_argument('--message', type=parse_message, default=None,
+                         help='Comma separated integers, 5 or the message bytes of the codec')
+    message.add_argument('--text', default=None, help='Message as text (up to 5 ASCII characters, fewer with a codec)')
+    query_parser.add_argument('--parity', type=int, choices=[0, 2, 4, 6], default=0,
+                              help='Parity nibbles of the payload codec, the message is encoded to its payload')
+    query_parser.add_argument('--path', default=None, help="Glob pattern of the paths, e.g. '/archive/2024/*'")
+    query_parser.add_argument('--min-confidence', type=float, default=None)
+    detected = query_parser.add_mutually_exclusive_group()
+    detected.add_argument('--detected', dest='detected', action='store_true', default=None,
+                          help='Only files with a watermark')
+    detected.add_argument('--not-detected', dest='detected', action='store_false', help='Only files without one')
+    query_parser.add_argument('--limit', type=int, default=1000)
+    query_parser.add_argument('--json', action='store_true', help='Print JSON lines')
+    args = parser.parse_args(argv)
+
+    index = ScanIndex(args.index)
+    try:
+        if args.command == 'scan':
+            options = {
+                'phase_shift': args.phase_shift, 'duration': args.duration, 'parity': args.parity, 'device': args.device,
+                'threads': args.threads or max(1, (os.cpu_count() or 1) // max(args.workers, 1)),
+            }
+            summary = scan(args.root, index, options, args.workers, args.hash_workers, args.retry_errors,
+                           args.prune, on_result=print_progress(time.perf_counter()))
+            print(f"\n{summary['files']} files: {summary['unchanged']} unchanged, {summary['hashed']} hashed, "
+                  f"{summary['decoded']} decoded ({summary['errors']} failed) in {summary['decode_seconds']:.0f}s"
+                  + (f", {summary['pruned']} pruned" if args.prune else ""))
+            totals = index.stats()
+            print(f"Index: {totals['files']} files, {totals['detected']} with a watermark, "
+                  f"{totals['messages']} distinct messages")
+        else:
+            codec = PayloadCodec(args.parity) if args.parity else None
+            size = codec.message_bytes if codec is not None else 5
+            message = MessageConverter.text_to_numeric(args.text, size) if args.text is not None else args.message
+            if message is not None:
+                # The index holds the embedded payloads
+                if len(message) != size:
+                    parser.error(f"--message needs {size} integers")
+                message = codec.encode(message) if codec is not None else message
+            rows = index.query(message=message, path=args.path, min_confidence=args.min_confidence,
+                               detected=args.detected, limit=args.limit)
+            for row in rows:
+                if args.json:
+                    print(json.dumps(row))
+                elif row['detected']:
+                    confidence = f"{row['confidence']:.3f}" if row['confidence'] is not None else '-'
+                    print(f"{row['path']}\t{row['message']}\t{confidence}")
+                else:
+                    print(f"{row['path']}\t{row['error'] or '-'}")
+    finally:
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
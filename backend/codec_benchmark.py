@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Payload Codec Benchmark
+
+Measures how much audio the decoder needs with and without the error-correcting
+payload codec (utils/payload_codec.py). Every file of a corpus is encoded once
+with a protected payload, distorted with the selected attacks and decoded from
+its first N seconds for each N. The raw decoded payloads are then checked as the
+plain decoder would (all 40 bits exact) and as the codec would with every
+allowed number of corrections.
+
+Reports, per attack and excerpt length, the rate of exactly decoded payloads
+without the codec and, with it, the rate of verified correct messages and of
+verified wrong ones, plus the shortest excerpt reaching the target success rate.
+
+Usage:
+    # Clean and noisy audio, 4 worker processes
+    python codec_benchmark.py --corpus /data/corpus --workers 4 --attacks none noise --report codec.json
+
+    # Other excerpt lengths and a stronger code
+    python codec_benchmark.py --corpus clip1.wav --seconds 0.5 1 2 4 --parity 6
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Add parent directory to path to import backend modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from robustness_benchmark import ATTACKS, MIN_SECONDS, build_grid, file_seed, find_corpus, read_results
+from services.audio_processor import AudioProcessor
+from services.process_pool import load_service, run_in_processes
+from utils.payload_codec import PayloadCodec
+
+DEFAULT_SECONDS = [0.5, 1.0, 1.5, 2.0, 3.0, 5.0]
+
+
+def evaluate_file(
+    path: str,
+    grid: List[Tuple[str, Any, List[Dict[str, Any]]]],
+    seconds: List[float],
+    codec: PayloadCodec,
+    service: Any,
+    audio_processor: AudioProcessor,
+    seed: int = 0,
+    batch_size: int = 16
+) -> Dict[str, Any]:
+    """
+    Encode one file with a protected payload and decode excerpts of every distorted variant.
+
+    Args:
+        path: Audio file
+        grid: Grid from robustness_benchmark.build_grid
+        seconds: Excerpt lengths, decoded from the start of each variant
+        codec: Codec protecting the payload
+        service: SilentCipherService without a codec (or an object with its
+                 encode_audio and decode_audio_batch), decoding raw payloads
+        audio_processor: AudioProcessor to load the file and distort it
+        seed: Base seed of the message and the random distortions
+        batch_size: Excerpts decoded per batch
+
+    Returns:
+        Dictionary with the file, its duration, the message, the embedded
+        payload and one result per (grid cell, excerpt length) with the raw
+        decoded payload, or the 'error' that prevented evaluating the file
+    """
+    rng = np.random.default_rng(file_seed(path, seed))
+    probe = audio_processor.probe_and_load(path, sample_rates=None, max_bytes=None, min_duration=MIN_SECONDS)
+    if not probe['valid']:
+        return {'file': path, 'error': '; '.join(probe['errors'])}
+    audio_data, sample_rate = probe['audio'], probe['sample_rate']
+
+    message = [int(value) for value in rng.integers(0, 256, codec.message_bytes)]
+    payload = codec.encode(message)
+    watermarked, _ = service.encode_audio(audio_data, sample_rate, payload)
+    variants = audio_processor.generate_variants(watermarked, sample_rate, [chain for _, _, chain in grid], seed=rng)
+
+    # Excerpts longer than the variant are left out
+    excerpts = []
+    for (attack, strength, _), (audio, rate) in zip(grid, variants):
+        samples = audio.shape[-1]
+        for length in seconds:
+            if int(length * rate) <= samples:
+                excerpts.append((attack, strength, length, audio[..., :int(length * rate)], rate))
+
+    results = []
+    for i in range(0, len(excerpts), batch_size):
+        batch = excerpts[i:i + batch_size]
+        for rate in dict.fromkeys(rate for *_, rate in batch):
+            selected = [excerpt for excerpt in batch if excerpt[4] == rate]
+            decoded = service.decode_audio_batch([excerpt[3] for excerpt in selected], rate)
+            for (attack, strength, length, _, _), result in zip(selected, decoded):
+                results.append({
+                    'attack': attack,
+                    'strength': strength,
+                    'seconds': length,
+                    'decoded': [int(value) for value in result['message']] if result['detected'] else None,
+                })
+    return {
+        'file': path,
+        'duration': probe['metadata']['duration'],
+        'parity': codec.parity,
+        'message': message,
+        'payload': payload,
+        'results': results,
+    }
+
+
+def summarize(file_results: List[Dict[str, Any]], parity: int, target: float = 0.95) -> Dict[str, Any]:
+    """
+    Check the decoded payloads without the codec and with each number of corrections.
+
+    Args:
+        file_results: Results of evaluate_file
+        parity: Parity nibbles of the codec the payloads were protected with
+        target: Success rate an excerpt length must reach to count as enough
+
+    Returns:
+        Dictionary with one 'matrix' row per (attack, strength, seconds) and,
+        per (attack, strength), the shortest excerpt reaching the target
+        without and with the codec ('seconds_needed', None when none does)
+    """
+    codecs = {corrections: PayloadCodec(parity, corrections) for corrections in range(parity // 2 + 1)}
+    cells: Dict[Tuple[str, Any, float], Dict[str, Any]] = {}
+    evaluated = [result for result in file_results if 'error' not in result]
+    for file_result in evaluated:
+        for result in file_result['results']:
+            cell = cells.setdefault((result['attack'], result['strength'], result['seconds']), {
+                'excerpts': 0, 'detected': 0, 'exact': 0,
+                'codec': {corrections: {'correct': 0, 'wrong': 0} for corrections in codecs},
+            })
+            cell['excerpts'] += 1
+            decoded = result['decoded']
+            if decoded is None or len(decoded) != 5:
+                continue
+            cell['detected'] += 1
+            cell['exact'] += decoded == file_result['payload']
+            for corrections, codec in codecs.items():
+                checked = codec.decode(decoded)
+                if checked is not None:
+                    cell['codec'][corrections]['correct' if checked['message'] == file_result['message'] else 'wrong'] += 1
+
+    matrix = []
+    for (attack, strength, seconds), cell in sorted(cells.items(), key=lambda item: (
+            item[0][0], item[0][1] is not None, item[0][1] or 0, item[0][2])):
+        count = cell['excerpts']
+        matrix.append({
+            'attack': attack,
+            'strength': strength,
+            'seconds': seconds,
+            'excerpts': count,
+            'detection_rate': cell['detected'] / count,
+            'exact_rate': cell['exact'] / count,
+            'codec': {corrections: {'success_rate': outcome['correct'] / count, 'false_rate': outcome['wrong'] / count}
+                      for corrections, outcome in cell['codec'].items()},
+        })
+
+    seconds_needed = []
+    for attack, strength in dict.fromkeys((row['attack'], row['strength']) for row in matrix):
+        rows = [row for row in matrix if (row['attack'], row['strength']) == (attack, strength)]
+        needed = {'attack': attack, 'strength': strength,
+                  'raw': next((row['seconds'] for row in rows if row['exact_rate'] >= target), None)}
+        for corrections in codecs:
+            needed[f'codec_{corrections}'] = next(
+                (row['seconds'] for row in rows if row['codec'][corrections]['success_rate'] >= target), None)
+        seconds_needed.append(needed)
+
+    return {
+        'files': len(evaluated),
+        'failed_files': [{'file': result['file'], 'error': result['error']} for result in file_results if 'error' in result],
+        'parity': parity,
+        'target': target,
+        'matrix': matrix,
+        'seconds_needed': seconds_needed,
+    }
+
+
+# State of each worker process, set up once by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(options: Dict[str, Any]) -> None:
+    """Load the model once per worker process."""
+    # Raw payloads are needed, the codec is applied by summarize
+    _worker.update(options, service=load_service(options, decode_cache_entries=0), audio_processor=AudioProcessor(),
+                   codec=PayloadCodec(options['parity']))
+
+
+def _evaluate_in_worker(path: str) -> Dict[str, Any]:
+    try:
+        return evaluate_file(path, _worker['grid'], _worker['seconds'], _worker['codec'], _worker['service'],
+                             _worker['audio_processor'], _worker['seed'], _worker['batch_size'])
+    except Exception as e:
+        return {'file': path, 'error': str(e)}
+
+
+def run(files: List[str], options: Dict[str, Any], workers: int) -> Iterator[Dict[str, Any]]:
+    """
+    Evaluate files in a process pool, yielding results as they finish.
+
+    Args:
+        files: Audio files to evaluate
+        options: Worker options (grid, seconds, parity, seed, batch_size, device, threads)
+        workers: Number of worker processes, 0 to evaluate in this process
+    """
+    return run_in_processes(_evaluate_in_worker, files, _init_worker, options, workers)
+
+
+def print_summary(summary: Dict[str, Any]) -> None:
+    """Print the success rates and the audio needed without and with the codec."""
+    corrections = range(summary['parity'] // 2 + 1)
+    print("\n" + "=" * 72)
+    print(f"Payload codec: {summary['files']} files, {summary['parity']} parity nibbles, "
+          f"success = verified correct message, false = verified wrong message")
+    print("=" * 72)
+    header = f"{'attack':>12} {'strength':>9} {'seconds':>8} {'raw':>7}"
+    header += ''.join(f" {f'fix {t} ok':>9} {'false':>6}" for t in corrections)
+    print(header)
+    for row in summary['matrix']:
+        strength = '-' if row['strength'] is None else f"{row['strength']:g}"
+        line = f"{row['attack']:>12} {strength:>9} {row['seconds']:>8g} {row['exact_rate']:>7.1%}"
+        line += ''.join(f" {row['codec'][t]['success_rate']:>9.1%} {row['codec'][t]['false_rate']:>6.1%}"
+                        for t in corrections)
+        print(line)
+
+    longest = max((row['seconds'] for row in summary['matrix']), default=0)
+    print(f"\nSeconds of audio for {summary['target']:.0%} success:")
+    for needed in summary['seconds_needed']:
+        strength = '' if needed['strength'] is None else f" {needed['strength']:g}"
+        values = [('raw', needed['raw'])] + [(f'fix {t}', needed[f'codec_{t}']) for t in corrections]
+        print(f"  {needed['attack']}{strength}: " + ', '.join(
+            f"{label} {value:g}s" if value is not None else f"{label} >{longest:g}s" for label, value in values))
+    if summary['failed_files']:
+        print(f"\n{len(summary['failed_files'])} file(s) could not be evaluated, see the report")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', nargs='+', required=True, help='Audio files and/or directories (searched recursively)')
+    parser.add_argument('--attacks', nargs='+', default=['none'], choices=list(ATTACKS), help='Attacks to run (default: none)')
+    parser.add_argument('--seconds', nargs='+', type=float, default=DEFAULT_SECONDS, help='Excerpt lengths to decode')
+    parser.add_argument('--parity', type=int, default=4, choices=[2, 4, 6], help='Parity nibbles of the codec')
+    parser.add_argument('--target', type=float, default=0.95, help='Success rate an excerpt length must reach')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes, 0 runs in this process')
+    parser.add_argument('--threads', type=int, default=None, help='Torch threads per worker (default: cores / workers)')
+    parser.add_argument('--batch-size', type=int, default=16, help='Excerpts decoded per batch')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the messages and random distortions')
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--limit', type=int, default=None, help='Only evaluate the first N files')
+    parser.add_argument('--results', default=None, help='JSON lines file of per-file results, resumed if it exists')
+    parser.add_argument('--report', default=None, help='Write the summary as JSON')
+    args = parser.parse_args(argv)
+
+    grid = build_grid(args.attacks)
+    seconds = sorted(set(args.seconds))
+    files = find_corpus(args.corpus)[:args.limit]
+    # Payloads protected with another parity cannot be checked with this one
+    previous = [result for result in read_results(args.results) if result.get('parity', args.parity) == args.parity]
+    done = {result['file'] for result in previous}
+    pending = [path for path in files if path not in done]
+    print(f"{len(files)} files, {len(grid) * len(seconds)} excerpts each, {len(pending)} to evaluate")
+
+    options = {
+        'grid': grid, 'seconds': seconds, 'parity': args.parity, 'seed': args.seed, 'batch_size': args.batch_size,
+        'device': args.device, 'threads': args.threads or max(1, (os.cpu_count() or 1) // max(args.workers, 1)),
+    }
+    corpus = set(files)
+    results = [result for result in previous if result['file'] in corpus]
+    start = time.perf_counter()
+    output = open(args.results, 'a') if args.results else None
+    try:
+        for count, result in enumerate(run(pending, options, args.workers), 1):
+            results.append(result)
+            if output is not None:
+                output.write(json.dumps(result) + '\n')
+                output.flush()
+            elapsed = time.perf_counter() - start
+            eta = elapsed / count * (len(pending) - count)
+            status = f"error: {result['error']}" if 'error' in result else f"{len(result['results'])} excerpts"
+            print(f"[{count}/{len(pending)}] {result['file']}: {status} (ETA {eta / 60:.0f} min)", flush=True)
+    finally:
+        if output is not None:
+            output.close()
+
+    summary = summarize(results, args.parity, args.target)
+    print_summary(summary)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
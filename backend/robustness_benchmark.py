@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Robustness Matrix Benchmark
+
+Encodes every file of a corpus once, applies the full grid of distortions
+(attack x strength) to the watermarked audio and decodes all variants in
+batches, spread over a pool of worker processes that each keep a model loaded.
+Reports the bit error rate, detection rate and confidence of every
+(attack, strength) pair, plus the throughput.
+
+Per-file results are appended to a JSON lines file as they finish, an
+interrupted run continues where it stopped when started again with the same
+--results file.
+
+Usage:
+    # Full grid over a corpus, 4 worker processes
+    python robustness_benchmark.py --corpus /data/corpus --workers 4 --results run.jsonl --report report.json
+
+    # Only some attacks
+    python robustness_benchmark.py --corpus clip1.wav clip2.flac --attacks noise compression
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Add parent directory to path to import backend modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from services.audio_processor import AudioProcessor
+from services.process_pool import load_service, run_in_processes
+
+# Strengths of each attack and the distortion chain they stand for
+ATTACKS = {
+    'none': ([None], lambda strength: []),
+    'noise': ([-40.0, -30.0, -20.0], lambda level_db: [{'type': 'noise', 'level_db': level_db}]),
+    'compression': ([256, 128, 64], lambda bitrate: [{'type': 'compression', 'bitrate': bitrate}]),
+    'lowpass': ([8000, 4000], lambda cutoff_hz: [{'type': 'lowpass', 'cutoff_hz': cutoff_hz}]),
+    'resample': ([22050, 16000, 8000], lambda rate: [{'type': 'resample', 'sample_rate': rate}]),
+    'amplitude': ([-12.0, -6.0, 6.0], lambda gain_db: [{'type': 'amplitude', 'gain_db': gain_db}]),
+    'crop': ([0.5, 1.0, 2.0], lambda seconds: [{'type': 'crop', 'start': seconds}]),
+}
+
+# Minimum duration SilentCipher needs for reliable watermarking
+MIN_SECONDS = 3.0
+
+
+def build_grid(attacks: Optional[List[str]] = None) -> List[Tuple[str, Any, List[Dict[str, Any]]]]:
+    """
+    Build the (attack, strength, distortion chain) grid.
+
+    Args:
+        attacks: Names of the attacks to include, None for all of them
+
+    Returns:
+        One (attack, strength, operations) tuple per grid cell
+
+    Raises:
+        ValueError: If an attack is unknown
+    """
+    attacks = list(ATTACKS) if attacks is None else attacks
+    unknown = [attack for attack in attacks if attack not in ATTACKS]
+    if unknown:
+        raise ValueError(f"Unknown attacks: {', '.join(unknown)}. Supported: {', '.join(ATTACKS)}")
+    grid = []
+    for attack in attacks:
+        strengths, chain = ATTACKS[attack]
+        grid.extend((attack, strength, chain(strength)) for strength in strengths)
+    return grid
+
+
+def bit_error_rate(sent: List[int], decoded: List[int]) -> float:
+    """
+    Fraction of differing bits between two 5 byte messages.
+    """
+    bits = np.unpackbits(np.array(sent, dtype=np.uint8) ^ np.array(decoded, dtype=np.uint8))
+    return float(bits.mean())
+
+
+def file_seed(path: str, seed: int) -> int:
+    """Seed of one file, independent of the worker order and of where the corpus is mounted."""
+    return zlib.crc32(os.path.basename(path).encode()) ^ seed
+
+
+def evaluate_file(
+    path: str,
+    grid: List[Tuple[str, Any, List[Dict[str, Any]]]],
+    service: Any,
+    audio_processor: AudioProcessor,
+    seed: int = 0,
+    batch_size: int = 16,
+    phase_shift_decoding: bool = False
+) -> Dict[str, Any]:
+    """
+    Encode one file once and decode every distorted variant of it.
+
+    Args:
+        path: Audio file
+        grid: Grid from build_grid
+        service: SilentCipherService (or an object with its encode_audio and decode_audio_batch)
+        audio_processor: AudioProcessor to load the file and distort it
+        seed: Base seed of the message and the random distortions
+        batch_size: Variants decoded per batch
+        phase_shift_decoding: Use phase shift decoding
+
+    Returns:
+        Dictionary with the file, its duration, the SDR, the encode and decode
+        times and one result per grid cell, or the 'error' that prevented
+        evaluating the file
+    """
+    rng = np.random.default_rng(file_seed(path, seed))
+    probe = audio_processor.probe_and_load(path, sample_rates=None, max_bytes=None, min_duration=MIN_SECONDS)
+    if not probe['valid']:
+        return {'file': path, 'error': '; '.join(probe['errors'])}
+    audio_data, sample_rate = probe['audio'], probe['sample_rate']
+
+    message = [int(value) for value in rng.integers(0, 256, 5)]
+    start = time.perf_counter()
+    watermarked, sdr = service.encode_audio(audio_data, sample_rate, message)
+    encode_seconds = time.perf_counter() - start
+
+    variants = audio_processor.generate_variants(watermarked, sample_rate, [chain for _, _, chain in grid], seed=rng)
+
+    start = time.perf_counter()
+    decoded = []
+    for i in range(0, len(variants), batch_size):
+        # Non round trip resampling changes the rate, batches are decoded per rate
+        batch = variants[i:i + batch_size]
+        for rate in dict.fromkeys(rate for _, rate in batch):
+            indices = [j for j, (_, r) in enumerate(batch) if r == rate]
+            results = service.decode_audio_batch([batch[j][0] for j in indices], rate, phase_shift_decoding)
+            decoded.extend(zip([i + j for j in indices], results))
+    decode_seconds = time.perf_counter() - start
+
+    results = []
+    for index, result in sorted(decoded, key=lambda item: item[0]):
+        attack, strength, _ = grid[index]
+        results.append({
+            'attack': attack,
+            'strength': strength,
+            'detected': bool(result['detected']),
+            'ber': bit_error_rate(message, result['message']) if result['detected'] else None,
+            'confidence': float(result['confidence']) if result['confidence'] is not None else None,
+        })
+    return {
+        'file': path,
+        'duration': probe['metadata']['duration'],
+        'sdr': float(sdr),
+        'encode_seconds': encode_seconds,
+        'decode_seconds': decode_seconds,
+        'results': results,
+    }
+
+
+def summarize(file_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggregate per-file results into the robustness matrix.
+
+    Args:
+        file_results: Results of evaluate_file
+
+    Returns:
+        Dictionary with one 'matrix' row per (attack, strength) pair, holding the
+        mean BER of the detected variants, the detection rate, the exact message
+        rate and the mean confidence, plus the totals
+    """
+    cells: Dict[Tuple[str, Any], List[Dict[str, Any]]] = {}
+    evaluated = [result for result in file_results if 'error' not in result]
+    for file_result in evaluated:
+        for result in file_result['results']:
+            cells.setdefault((result['attack'], result['strength']), []).append(result)
+
+    matrix = []
+    for (attack, strength), results in cells.items():
+        detected = [result for result in results if result['detected']]
+        confidences = [result['confidence'] for result in detected if result['confidence'] is not None]
+        matrix.append({
+            'attack': attack,
+            'strength': strength,
+            'variants': len(results),
+            'detection_rate': len(detected) / len(results),
+            'exact_rate': sum(result['ber'] == 0 for result in detected) / len(results),
+            'ber': float(np.mean([result['ber'] for result in detected])) if detected else None,
+            'confidence': float(np.mean(confidences)) if confidences else None,
+        })
+
+    return {
+        'files': len(evaluated),
+        'failed_files': [{'file': result['file'], 'error': result['error']} for result in file_results if 'error' in result],
+        'variants': sum(len(result['results']) for result in evaluated),
+        'audio_seconds': sum(result['duration'] for result in evaluated),
+        'mean_sdr': float(np.mean([result['sdr'] for result in evaluated])) if evaluated else None,
+        'encode_seconds': sum(result['encode_seconds'] for result in evaluated),
+        'decode_seconds': sum(result['decode_seconds'] for result in evaluated),
+        'matrix': matrix,
+    }
+
+
+def throughput(file_results: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, float]:
+    """
+    Throughput of a run that evaluated file_results in wall_seconds.
+
+    Returns:
+        Files, variants and decoded audio seconds per wall clock second
+    """
+    evaluated = [result for result in file_results if 'error' not in result]
+    return {
+        'wall_seconds': wall_seconds,
+        'files_per_second': len(evaluated) / wall_seconds,
+        'variants_per_second': sum(len(result['results']) for result in evaluated) / wall_seconds,
+        # Seconds of distorted audio decoded per second
+        'realtime_factor': sum(result['duration'] * len(result['results']) for result in evaluated) / wall_seconds,
+    }
+
+
+def find_corpus(paths: List[str]) -> List[str]:
+    """
+    List the WAV and FLAC files of the given files and directories (recursively), sorted.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names
+                             if os.path.splitext(name)[1].lower() in AudioProcessor.SUPPORTED_FORMATS)
+        else:
+            files.append(path)
+    return sorted(files)
+
+
+def read_results(path: Optional[str]) -> List[Dict[str, Any]]:
+    """Results of an earlier run, skipping a last line cut off by an interruption."""
+    if not path or not os.path.exists(path):
+        return []
+    results = []
+    with open(path) as f:
+        for line in f:
+            try:
+                results.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return results
+
+
+# State of each worker process, set up once by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(options: Dict[str, Any]) -> None:
+    """Load the model once per worker process."""
+    # No decode memoization, every variant is decoded
+    _worker.update(options, service=load_service(options, decode_cache_entries=0), audio_processor=AudioProcessor())
+
+
+def _evaluate_in_worker(path: str) -> Dict[str, Any]:
+    try:
+        return evaluate_file(path, _worker['grid'], _worker['service'], _worker['audio_processor'],
+                             _worker['seed'], _worker['batch_size'], _worker['phase_shift'])
+    except Exception as e:
+        return {'file': path, 'error': str(e)}
+
+
+def run(files: List[str], options: Dict[str, Any], workers: int) -> Iterator[Dict[str, Any]]:
+    """
+    Evaluate files in a process pool, yielding results as they finish.
+
+    Args:
+        files: Audio files to evaluate
+        options: Worker options (grid, seed, batch_size, phase_shift, device, threads)
+        workers: Number of worker processes, 0 to evaluate in this process
+    """
+    return run_in_processes(_evaluate_in_worker, files, _init_worker, options, workers)
+
+
+def print_matrix(summary: Dict[str, Any]) -> None:
+    """Print the robustness matrix and throughput."""
+    print("\n" + "=" * 72)
+    print(f"Robustness matrix: {summary['files']} files, {summary['variants']} variants"
+          + (f", mean SDR {summary['mean_sdr']:.2f} dB" if summary['mean_sdr'] is not None else ""))
+    print("=" * 72)
+    print(f"{'attack':>12} {'strength':>9} {'detected':>9} {'exact':>7} {'BER':>7} {'confidence':>11}")
+    for row in summary['matrix']:
+        ber = f"{row['ber']:.4f}" if row['ber'] is not None else '-'
+        confidence = f"{row['confidence']:.4f}" if row['confidence'] is not None else '-'
+        strength = '-' if row['strength'] is None else f"{row['strength']:g}"
+        print(f"{row['attack']:>12} {strength:>9} {row['detection_rate']:>9.1%} {row['exact_rate']:>7.1%} {ber:>7} {confidence:>11}")
+    if 'throughput' in summary:
+        rates = summary['throughput']
+        print(f"\nThroughput: {rates['files_per_second']:.3f} files/s, {rates['variants_per_second']:.2f} variants/s, "
+              f"{rates['realtime_factor']:.1f}x realtime ({rates['wall_seconds']:.0f}s wall)")
+    if summary['failed_files']:
+        print(f"\n{len(summary['failed_files'])} file(s) could not be evaluated, see the report")
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', nargs='+', required=True, help='Audio files and/or directories (searched recursively)')
+    parser.add_argument('--attacks', nargs='+', default=None, choices=list(ATTACKS), help='Attacks to run (default: all)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes, 0 runs in this process')
+    parser.add_argument('--threads', type=int, default=None, help='Torch threads per worker (default: cores / workers)')
+    parser.add_argument('--batch-size', type=int, default=16, help='Variants decoded per batch')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the messages and random distortions')
+    parser.add_argument('--phase-shift', action='store_true', help='Use phase shift decoding')
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--limit', type=int, default=None, help='Only evaluate the first N files')
+    parser.add_argument('--results', default=None, help='JSON lines file of per-file results, resumed if it exists')
+    parser.add_argument('--report', default=None, help='Write the summary as JSON')
+    args = parser.parse_args(argv)
+
+    grid = build_grid(args.attacks)
+    files = find_corpus(args.corpus)[:args.limit]
+    previous = read_results(args.results)
+    done = {result['file'] for result in previous}
+    pending = [path for path in files if path not in done]
+    print(f"{len(files)} files, {len(grid)} variants each, {len(pending)} to evaluate")
+
+    options = {
+        'grid': grid, 'seed': args.seed, 'batch_size': args.batch_size, 'phase_shift': args.phase_shift,
+        'device': args.device, 'threads': args.threads or max(1, (os.cpu_count() or 1) // max(args.workers, 1)),
+    }
+    corpus = set(files)
+    results = [result for result in previous if result['file'] in corpus]
+    new_results = []
+    start = time.perf_counter()
+    output = open(args.results, 'a') if args.results else None
+    try:
+        for count, result in enumerate(run(pending, options, args.workers), 1):
+            results.append(result)
+            new_results.append(result)
+            if output is not None:
+                output.write(json.dumps(result) + '\n')
+                output.flush()
+            elapsed = time.perf_counter() - start
+            eta = elapsed / count * (len(pending) - count)
+            status = f"error: {result['error']}" if 'error' in result else f"SDR {result['sdr']:.1f} dB"
+            print(f"[{count}/{len(pending)}] {result['file']}: {status} (ETA {eta / 60:.0f} min)", flush=True)
+    finally:
+        if output is not None:
+            output.close()
+
+    summary = summarize(results)
+    if new_results:
+        summary['throughput'] = throughput(new_results, time.perf_counter() - start)
+    print_matrix(summary)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,8 +4,12 @@ Audio processing service for loading, saving, validating, and manipulating audio
 import librosa
 import soundfile as sf
 import numpy as np
-from typing import Tuple, Dict, Optional
+from functools import lru_cache
+from scipy import signal
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple, Union
+import hashlib
 import os
+import struct
 
 
 class AudioProcessor:
@@ -14,37 +18,197 @@ class AudioProcessor:
     SUPPORTED_FORMATS = ['.wav', '.flac']
     SUPPORTED_SAMPLE_RATES = [16000, 44100]
     MAX_FILE_SIZE = 50 * 1024 * 1024  # 50MB
+    UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
     
-    def load_audio(self, file_path: str, sr: Optional[int] = None) -> Tuple[np.ndarray, int]:
+    def load_audio(
+        self,
+        file_path: str,
+        sr: Optional[int] = None,
+        offset: float = 0.0,
+        duration: Optional[float] = None,
+        dtype: str = 'float32'
+    ) -> Tuple[np.ndarray, int]:
         """
-        Load audio file using librosa.
+        Load audio file using soundfile, optionally only part of it.
         
         Args:
             file_path: Path to the audio file
             sr: Target sample rate (None to preserve original)
+            offset: Start reading this many seconds into the file
+            duration: Only read this many seconds (None to read to the end)
+            dtype: Sample type, 'float32' or 'float64' (scaled to [-1, 1]),
+                   or 'int16' or 'int32' (no resampling)
             
         Returns:
-            Tuple of (audio_data, sample_rate)
+            Tuple of (audio_data, sample_rate), audio_data is (channels, samples)
             
         Raises:
             FileNotFoundError: If file doesn't exist
-            ValueError: If file format is invalid
+            ValueError: If file format is invalid or the offset is past the end
         """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Audio file not found: {file_path}")
         
+        if sr is not None and not dtype.startswith('float'):
+            raise ValueError(f"Resampling requires a float dtype, got {dtype}")
+        
         try:
-            # Load audio with librosa
-            audio_data, sample_rate = librosa.load(file_path, sr=sr, mono=False)
+            try:
+                with sf.SoundFile(file_path) as f:
+                    sample_rate = f.samplerate
+                    start, stop = self._frame_range(f.frames, sample_rate, offset, duration)
+                    f.seek(start)
+                    audio_data = f.read(stop - start, dtype=dtype, always_2d=True)
+                # soundfile reads (samples, channels), the transpose is a view like librosa returned
+                audio_data = audio_data.T
+            except sf.LibsndfileError:
+                # Formats libsndfile cannot read (e.g. MP3 with older releases)
+                audio_data, sample_rate = librosa.load(
+                    file_path, sr=None, mono=False, offset=offset, duration=duration,
+                    dtype=np.dtype(dtype)
+                )
+                if audio_data.ndim == 1:
+                    audio_data = audio_data.reshape(1, -1)
             
-            # Ensure audio is 2D (channels, samples)
-            if audio_data.ndim == 1:
-                audio_data = audio_data.reshape(1, -1)
+            if sr is not None and sr != sample_rate:
+                audio_data = self.resample_audio(audio_data, sample_rate, sr).astype(dtype, copy=False)
+                sample_rate = sr
             
             return audio_data, sample_rate
         except Exception as e:
             raise ValueError(f"Failed to load audio file: {str(e)}")
     
+    def iter_blocks(
+        self,
+        file_path: str,
+        block_seconds: float,
+        overlap_seconds: float = 0.0,
+        offset: float = 0.0,
+        duration: Optional[float] = None,
+        dtype: str = 'float32'
+    ) -> Iterator[np.ndarray]:
+        """
+        Read an audio file block by block without loading all of it.
+        
+        Args:
+            file_path: Path to the audio file
+            block_seconds: Length of each block in seconds
+            overlap_seconds: Seconds each block shares with the previous one
+            offset: Start reading this many seconds into the file
+            duration: Only read this many seconds (None to read to the end)
+            dtype: Sample type, as in load_audio
+            
+        Yields:
+            Blocks of shape (channels, samples), the last one may be shorter
+            
+        Raises:
+            FileNotFoundError: If file doesn't exist
+            ValueError: If the block or overlap length is invalid
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"Audio file not found: {file_path}")
+        
+        info = sf.info(file_path)
+        blocksize = int(round(block_seconds * info.samplerate))
+        overlap = int(round(overlap_seconds * info.samplerate))
+        if blocksize <= 0 or not 0 <= overlap < blocksize:
+            raise ValueError(
+                f"Invalid block ({block_seconds}s) or overlap ({overlap_seconds}s): "
+                f"the overlap must be shorter than the block"
+            )
+        
+        start, stop = self._frame_range(info.frames, info.samplerate, offset, duration)
+        for block in sf.blocks(file_path, blocksize=blocksize, overlap=overlap, start=start, stop=stop,
+                               dtype=dtype, always_2d=True):
+            yield block.T
+    
+    def memmap_wav(self, file_path: str) -> Tuple[np.ndarray, int]:
+        """
+        Map the samples of a PCM or float WAV file into memory without reading them.
+        
+        Slicing the result only reads the pages it touches, which makes random
+        access to long recordings cheap. The samples keep their stored type:
+        uint8, int16 or int32 for PCM, float32 or float64 for float files.
+        
+        Args:
+            file_path: Path to the WAV file
+            
+        Returns:
+            Tuple of (audio_data, sample_rate), audio_data is a read-only
+            (channels, samples) view
+            
+        Raises:
+            FileNotFoundError: If file doesn't exist
+            ValueError: If the file is not a WAV file with a memory-mappable sample type
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"Audio file not found: {file_path}")
+        
+        fmt, data_offset, data_size = self._wav_layout(file_path)
+        audio_format, channels, sample_rate, bits = fmt
+        sample_types = {(1, 8): 'u1', (1, 16): '<i2', (1, 32): '<i4', (3, 32): '<f4', (3, 64): '<f8'}
+        if (audio_format, bits) not in sample_types:
+            raise ValueError(f"Cannot memory-map {bits}-bit WAV samples of format {audio_format}")
+        
+        dtype = np.dtype(sample_types[(audio_format, bits)])
+        frames = data_size // (dtype.itemsize * channels)
+        if frames == 0:
+            raise ValueError("WAV file has no samples")
+        audio_data = np.memmap(file_path, dtype=dtype, mode='r', offset=data_offset, shape=(frames, channels))
+        return audio_data.T, sample_rate
+    
+    @staticmethod
+    def _frame_range(frames: int, sample_rate: int, offset: float, duration: Optional[float]) -> Tuple[int, int]:
+        """Convert an offset and duration in seconds to a frame range within the file."""
+        if offset < 0 or (duration is not None and duration <= 0):
+            raise ValueError(f"Invalid offset ({offset}s) or duration ({duration}s)")
+        start = int(round(offset * sample_rate))
+        if start >= frames:
+            raise ValueError(f"Offset {offset}s is past the end of the audio ({frames / sample_rate:.2f}s)")
+        stop = frames if duration is None else min(frames, start + int(round(duration * sample_rate)))
+        return start, stop
+    
+    @staticmethod
+    def _wav_layout(file_path: str) -> Tuple[Tuple[int, int, int, int], int, int]:
+        """
+        Find the format and the data chunk of a RIFF WAV file.
+        
+        Returns:
+            Tuple of ((audio_format, channels, sample_rate, bits), data_offset, data_size),
+            WAVE_FORMAT_EXTENSIBLE files report the format of their sub-format
+        """
+        with open(file_path, 'rb') as f:
+            header = f.read(12)
+            if len(header) < 12 or header[:4] != b'RIFF' or header[8:12] != b'WAVE':
+                raise ValueError("Not a RIFF WAV file")
+            fmt = None
+            while True:
+                chunk = f.read(8)
+                if len(chunk) < 8:
+                    raise ValueError("WAV file has no data chunk")
+                chunk_id, size = chunk[:4], struct.unpack('<I', chunk[4:])[0]
+                if chunk_id == b'fmt ':
+                    body = f.read(size)
+                    audio_format, channels, sample_rate = struct.unpack('<HHI', body[:8])
+                    bits = struct.unpack('<H', body[14:16])[0]
+                    if audio_format == 0xFFFE and len(body) >= 26:
+                        audio_format = struct.unpack('<H', body[24:26])[0]
+                    fmt = (audio_format, channels, sample_rate, bits)
+                elif chunk_id == b'data':
+                    if fmt is None:
+                        raise ValueError("WAV data chunk precedes its fmt chunk")
+                    data_offset = f.tell()
+                    # Streaming writers leave the size at 0 or 0xFFFFFFFF, the data runs to the end
+                    file_size = os.path.getsize(file_path)
+                    if size in (0, 0xFFFFFFFF) or data_offset + size > file_size:
+                        size = file_size - data_offset
+                    return fmt, data_offset, size
+                else:
+                    f.seek(size, os.SEEK_CUR)
+                # Chunks are word aligned
+                if size % 2:
+                    f.seek(1, os.SEEK_CUR)
+    
     def save_audio(self, audio_data: np.ndarray, sample_rate: int, file_path: str) -> None:
         """
         Save audio data to a WAV file.
@@ -92,52 +256,189 @@ class AudioProcessor:
                 'errors': list
             }
         """
-        errors = []
+        result = self.probe_and_load(file_path, read='none')
+        return {key: result[key] for key in ('valid', 'format', 'sample_rate', 'errors')}
+    
+    def ingest_stream(
+        self,
+        stream: BinaryIO,
+        file_path: str,
+        max_bytes: Optional[int] = MAX_FILE_SIZE,
+        chunk_size: int = UPLOAD_CHUNK_SIZE
+    ) -> Dict[str, any]:
+        """
+        Copy an upload stream to a file in fixed-size chunks, hashing it on the way.
         
-        # Check file exists
-        if not os.path.exists(file_path):
-            return {
-                'valid': False,
-                'format': None,
-                'sample_rate': None,
-                'errors': ['File does not exist']
+        Only one chunk is held in memory at a time. The container is recognised
+        from the first chunk and the size limit is checked after every chunk, so
+        non-audio or oversized uploads are rejected without reading them to the end.
+        
+        Args:
+            stream: Binary stream to read, e.g. the stream of an uploaded file
+            file_path: Where to store the upload
+            max_bytes: Maximum upload size (None for no limit)
+            chunk_size: Bytes read and written at a time
+            
+        Returns:
+            Dictionary with the upload details:
+            {
+                'path': str,
+                'size': int,
+                'sha256': str (hex digest of the file content),
+                'format': str (container recognised from the header, e.g. '.wav')
             }
+            
+        Raises:
+            ValueError: If the upload is empty, too large or not a supported audio
+                        container, the partially written file is removed
+        """
+        digest = hashlib.sha256()
+        size = 0
+        container = None
+        try:
+            with open(file_path, 'wb') as f:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    if container is None:
+                        container = _sniff_container(chunk)
+                        if container is None:
+                            raise ValueError('Not a recognised audio file')
+                        if container not in self.SUPPORTED_FORMATS:
+                            raise ValueError(
+                                f'Unsupported format: {container}. '
+                                f'Supported formats: {", ".join(self.SUPPORTED_FORMATS)}'
+                            )
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise ValueError(f'File size exceeds maximum ({max_bytes} bytes)')
+                    digest.update(chunk)
+                    f.write(chunk)
+            if size == 0:
+                raise ValueError('Uploaded file is empty')
+        except BaseException:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            raise
+        return {'path': file_path, 'size': size, 'sha256': digest.hexdigest(), 'format': container}
+    
+    def probe_and_load(
+        self,
+        source: Union[str, BinaryIO],
+        read: str = 'all',
+        sample_rates: Optional[List[int]] = SUPPORTED_SAMPLE_RATES,
+        max_bytes: Optional[int] = MAX_FILE_SIZE,
+        min_duration: Optional[float] = None,
+        offset: float = 0.0,
+        duration: Optional[float] = None,
+        dtype: str = 'float32'
+    ) -> Dict[str, any]:
+        """
+        Validate an audio file from its header and load it, opening it once.
         
-        # Check file size
-        file_size = os.path.getsize(file_path)
-        if file_size > self.MAX_FILE_SIZE:
-            errors.append(f'File size ({file_size} bytes) exceeds maximum ({self.MAX_FILE_SIZE} bytes)')
+        The size, format, sample rate and duration are checked before any
+        sample is decoded, invalid files are rejected without reading them.
+        
+        Args:
+            source: Path to the audio file, or an open binary file (e.g. an upload stream)
+            read: 'all' to load the samples, 'lazy' to return the open file
+                  instead, 'none' to only validate
+            sample_rates: Accepted sample rates (None accepts any)
+            max_bytes: Maximum file size (None for no limit)
+            min_duration: Minimum duration in seconds (None for no minimum)
+            offset: Start reading this many seconds into the file
+            duration: Only read this many seconds (None to read to the end)
+            dtype: Sample type, as in load_audio
+            
+        Returns:
+            Dictionary with the validate_format results plus:
+            {
+                'metadata': dict (as get_metadata, for the whole file) or None,
+                'audio': np.ndarray (channels, samples) or None,
+                'reader': soundfile.SoundFile positioned at the offset or None,
+                          the caller closes it
+            }
+            Only valid files get 'audio' or 'reader'.
+        """
+        if read not in ('all', 'lazy', 'none'):
+            raise ValueError(f"Invalid read mode: {read}")
+        
+        name = source if isinstance(source, str) else getattr(source, 'name', None)
+        ext = os.path.splitext(name)[1].lower() if isinstance(name, str) else ''
+        result = {'valid': False, 'format': ext or None, 'sample_rate': None, 'errors': [],
+                  'metadata': None, 'audio': None, 'reader': None}
+        errors = result['errors']
+        
+        # Check file exists and its size, neither needs the file to be parsed
+        if isinstance(source, str):
+            if not os.path.exists(source):
+                errors.append('File does not exist')
+                return result
+            file_size = os.path.getsize(source)
+        else:
+            position = source.tell()
+            file_size = source.seek(0, os.SEEK_END) - position
+            source.seek(position)
+        if max_bytes is not None and file_size > max_bytes:
+            errors.append(f'File size ({file_size} bytes) exceeds maximum ({max_bytes} bytes)')
         
         # Check file extension
-        _, ext = os.path.splitext(file_path)
-        if ext.lower() not in self.SUPPORTED_FORMATS:
+        if ext and ext not in self.SUPPORTED_FORMATS:
             errors.append(f'Unsupported format: {ext}. Supported formats: {", ".join(self.SUPPORTED_FORMATS)}')
         
-        # Try to load and check sample rate
         try:
-            info = sf.info(file_path)
-            sample_rate = info.samplerate
+            handle = sf.SoundFile(source)
+        except Exception as e:
+            errors.append(f'Failed to read audio file: {str(e)}')
+            return result
+        
+        try:
+            # The header has already been parsed by opening the file
+            container = '.' + ('wav' if handle.format in ('WAV', 'WAVEX', 'RF64') else handle.format.lower())
+            result['format'] = result['format'] or container
+            if container not in self.SUPPORTED_FORMATS and not any(err.startswith('Unsupported format') for err in errors):
+                errors.append(f'Unsupported format: {handle.format}. Supported formats: {", ".join(self.SUPPORTED_FORMATS)}')
             
-            if sample_rate not in self.SUPPORTED_SAMPLE_RATES:
+            sample_rate = handle.samplerate
+            result['sample_rate'] = sample_rate
+            if sample_rates is not None and sample_rate not in sample_rates:
                 errors.append(
                     f'Unsupported sample rate: {sample_rate}Hz. '
-                    f'Supported rates: {", ".join(map(str, self.SUPPORTED_SAMPLE_RATES))}Hz'
+                    f'Supported rates: {", ".join(map(str, sample_rates))}Hz'
                 )
             
-            return {
-                'valid': len(errors) == 0,
-                'format': ext.lower(),
+            result['metadata'] = {
+                'duration': handle.frames / sample_rate,
                 'sample_rate': sample_rate,
-                'errors': errors
+                'channels': handle.channels,
+                'samples': handle.frames
             }
+            if min_duration is not None and result['metadata']['duration'] < min_duration:
+                errors.append(
+                    f"Audio too short ({result['metadata']['duration']:.2f}s). "
+                    f"At least {min_duration:g} seconds of audio are required."
+                )
+            
+            result['valid'] = len(errors) == 0
+            if not result['valid'] or read == 'none':
+                return result
+            
+            start, stop = self._frame_range(handle.frames, sample_rate, offset, duration)
+            handle.seek(start)
+            if read == 'lazy':
+                result['reader'], handle = handle, None
+            else:
+                # soundfile reads (samples, channels)
+                result['audio'] = handle.read(stop - start, dtype=dtype, always_2d=True).T
+            return result
         except Exception as e:
             errors.append(f'Failed to read audio file: {str(e)}')
-            return {
-                'valid': False,
-                'format': ext.lower() if ext else None,
-                'sample_rate': None,
-                'errors': errors
-            }
+            result['valid'] = False
+            return result
+        finally:
+            if handle is not None:
+                handle.close()
     
     def get_metadata(self, audio_data: np.ndarray, sample_rate: int) -> Dict[str, any]:
         """
@@ -222,33 +523,14 @@ class AudioProcessor:
         
         # Determine cutoff frequency based on bitrate
         # Lower bitrate = lower cutoff frequency
-        if bitrate <= 64:
-            cutoff_freq = 8000
-        elif bitrate <= 128:
-            cutoff_freq = 12000
-        else:
-            cutoff_freq = 16000
-        
-        # Apply low-pass filter to simulate compression
-        from scipy import signal
-        
-        # Design butterworth low-pass filter
-        nyquist = sample_rate / 2
-        normalized_cutoff = cutoff_freq / nyquist
+        cutoff_freq = _codec_cutoff(bitrate)
         
         # Ensure cutoff is valid
-        if normalized_cutoff >= 1.0:
+        if cutoff_freq >= sample_rate / 2:
             return audio_data
         
-        b, a = signal.butter(4, normalized_cutoff, btype='low')
-        
-        # Apply filter to each channel
-        if audio_data.ndim == 1:
-            compressed = signal.filtfilt(b, a, audio_data)
-        else:
-            compressed = np.zeros_like(audio_data)
-            for i in range(audio_data.shape[0]):
-                compressed[i] = signal.filtfilt(b, a, audio_data[i])
+        # Apply low-pass filter to simulate compression, all channels at once
+        compressed = signal.sosfiltfilt(_lowpass_sos(cutoff_freq, sample_rate, 4), audio_data, axis=-1)
         
         # Add slight quantization noise to simulate lossy encoding
         quantization_noise = np.random.normal(0, 0.001, audio_data.shape)
@@ -261,12 +543,160 @@ class AudioProcessor:
         
         return compressed
     
+    def apply_distortion_chain(
+        self,
+        audio_data: np.ndarray,
+        sample_rate: int,
+        operations: List[Dict[str, any]],
+        seed: Optional[Union[int, np.random.Generator]] = None
+    ) -> Tuple[np.ndarray, int]:
+        """
+        Apply an ordered list of distortions to audio.
+        
+        Every operation is a dictionary with a 'type' and its parameters:
+            {'type': 'noise', 'level_db': -20.0}        Gaussian noise relative to the signal power
+            {'type': 'lowpass', 'cutoff_hz': 8000, 'order': 4}
+            {'type': 'compression', 'bitrate': 128}     Codec simulation as apply_compression
+            {'type': 'resample', 'sample_rate': 16000, 'round_trip': True}
+                                                        Resample, and back to the current rate
+                                                        unless round_trip is False
+            {'type': 'amplitude', 'gain_db': -6.0}
+            {'type': 'crop', 'start': 0.5, 'duration': 2.0}   In seconds, duration None keeps the rest
+        
+        All channels are processed at once in float32, low-pass filters are
+        designed once per cutoff, and noise comes from a seeded generator.
+        
+        Args:
+            audio_data: Audio data array (channels, samples) or (samples,)
+            sample_rate: Sample rate in Hz
+            operations: Distortions in the order they are applied
+            seed: Seed or numpy Generator for the random operations (None for fresh entropy)
+            
+        Returns:
+            Tuple of (distorted_audio, sample_rate), the sample rate changes only
+            with a resample that is not a round trip
+            
+        Raises:
+            ValueError: If an operation is unknown or its parameters are invalid
+        """
+        return self.generate_variants(audio_data, sample_rate, [operations], seed)[0]
+    
+    def generate_variants(
+        self,
+        audio_data: np.ndarray,
+        sample_rate: int,
+        chains: List[List[Dict[str, any]]],
+        seed: Optional[Union[int, np.random.Generator]] = None
+    ) -> List[Tuple[np.ndarray, int]]:
+        """
+        Apply several distortion chains to one clip in a single batched call.
+        
+        Chains sharing leading deterministic operations compute them once, and
+        each operation runs once over the stacked audio of all the chains that
+        apply it next. Random operations draw independent noise per chain, so
+        repeating a chain gives that many different noisy variants.
+        
+        Args:
+            audio_data: Audio data array (channels, samples) or (samples,)
+            sample_rate: Sample rate in Hz
+            chains: Operation lists, as in apply_distortion_chain
+            seed: Seed or numpy Generator for the random operations
+            
+        Returns:
+            One (distorted_audio, sample_rate) tuple per chain, in order
+            
+        Raises:
+            ValueError: If an operation is unknown or its parameters are invalid
+        """
+        if audio_data is None or audio_data.size == 0:
+            raise ValueError("Audio data is empty")
+        for operations in chains:
+            for operation in operations:
+                _validate_operation(operation)
+        
+        audio = np.asarray(audio_data, dtype=np.float32)
+        mono = audio.ndim == 1
+        # Batches are (variants, channels, samples)
+        rows = (audio[None] if mono else audio)[None]
+        rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+        
+        results: List[Optional[Tuple[np.ndarray, int]]] = [None] * len(chains)
+        self._run_chains(rows, sample_rate, [list(range(len(chains)))], 0, chains, rng, results)
+        return [(audio[0] if mono else audio, rate) for audio, rate in results]
+    
+    def _run_chains(self, rows, sample_rate, owners, step, chains, rng, results):
+        """
+        Apply operation `step` of the chains, rows[i] is the audio of the chains in owners[i].
+        """
+        groups: Dict[str, List[Tuple[int, int]]] = {}
+        for row, members in enumerate(owners):
+            for chain in members:
+                if step == len(chains[chain]):
+                    results[chain] = (rows[row], sample_rate)
+                else:
+                    groups.setdefault(repr(sorted(chains[chain][step].items())), []).append((row, chain))
+        
+        for members in groups.values():
+            operation = chains[members[0][1]][step]
+            if operation['type'] in _RANDOM_OPERATIONS:
+                # One row per chain, each gets its own noise
+                selected = [row for row, _ in members]
+                next_owners = [[chain] for _, chain in members]
+            else:
+                # Chains that still share their audio share the result
+                selected = list(dict.fromkeys(row for row, _ in members))
+                next_owners = [[chain for r, chain in members if r == row] for row in selected]
+            out, out_rate = self._apply_operation(rows[selected], sample_rate, operation, rng)
+            self._run_chains(out, out_rate, next_owners, step + 1, chains, rng, results)
+    
+    def _apply_operation(self, rows, sample_rate, operation, rng):
+        """Apply one operation to a (variants, channels, samples) float32 batch."""
+        kind = operation['type']
+        if kind == 'amplitude':
+            return rows * np.float32(10 ** (operation.get('gain_db', 0.0) / 20)), sample_rate
+        
+        if kind == 'crop':
+            start = int(round(operation.get('start', 0.0) * sample_rate))
+            duration = operation.get('duration')
+            stop = rows.shape[-1] if duration is None else start + int(round(duration * sample_rate))
+            if start >= rows.shape[-1]:
+                raise ValueError(f"Crop start {operation.get('start')}s is past the end of the audio")
+            return rows[..., start:stop], sample_rate
+        
+        if kind == 'resample':
+            target_rate = operation['sample_rate']
+            out = self.resample_audio(rows, sample_rate, target_rate)
+            if not operation.get('round_trip', True):
+                return out.astype(np.float32, copy=False), target_rate
+            out = self.resample_audio(out, target_rate, sample_rate)
+            # Keep the length, the round trip can be off by a sample
+            length = rows.shape[-1]
+            out = out[..., :length] if out.shape[-1] >= length else np.pad(out, [(0, 0), (0, 0), (0, length - out.shape[-1])])
+            return out.astype(np.float32, copy=False), sample_rate
+        
+        if kind == 'noise':
+            power = np.mean(rows ** 2, axis=(1, 2), keepdims=True)
+            scale = np.sqrt(power * 10 ** (operation.get('level_db', -20.0) / 10)).astype(np.float32)
+            return _normalize_peaks(rows + scale * rng.standard_normal(rows.shape, dtype=np.float32)), sample_rate
+        
+        # Low-pass filter, on its own or as the codec simulation of apply_compression
+        if kind == 'lowpass':
+            cutoff, order = operation['cutoff_hz'], operation.get('order', 4)
+        else:
+            cutoff, order = _codec_cutoff(operation.get('bitrate', 128)), 4
+        out = rows
+        if cutoff < sample_rate / 2:
+            out = signal.sosfiltfilt(_lowpass_sos(cutoff, sample_rate, order).astype(np.float32), rows, axis=-1)
+        if kind == 'compression':
+            out = _normalize_peaks(out + np.float32(0.001) * rng.standard_normal(out.shape, dtype=np.float32))
+        return out.astype(np.float32, copy=False), sample_rate
+    
     def resample_audio(self, audio_data: np.ndarray, source_rate: int, target_rate: int) -> np.ndarray:
         """
         Resample audio to a different sample rate.
         
         Args:
-            audio_data: Audio data array
+            audio_data: Audio data array (samples,) or (channels, samples)
             source_rate: Original sample rate in Hz
             target_rate: Target sample rate in Hz
             
@@ -276,13 +706,68 @@ class AudioProcessor:
         if source_rate == target_rate:
             return audio_data
         
-        # Use librosa for resampling
-        if audio_data.ndim == 1:
-            resampled = librosa.resample(audio_data, orig_sr=source_rate, target_sr=target_rate)
-        else:
-            resampled = np.zeros((audio_data.shape[0], 
-                                 int(audio_data.shape[1] * target_rate / source_rate)))
-            for i in range(audio_data.shape[0]):
-                resampled[i] = librosa.resample(audio_data[i], orig_sr=source_rate, target_sr=target_rate)
+        # All channels are resampled in one soxr pass along the sample axis
+        resampled = librosa.resample(audio_data, orig_sr=source_rate, target_sr=target_rate, axis=-1)
         
         return resampled
+
+
+# Parameters each distortion chain operation accepts
+_OPERATIONS = {
+    'noise': {'level_db'},
+    'lowpass': {'cutoff_hz', 'order'},
+    'compression': {'bitrate'},
+    'resample': {'sample_rate', 'round_trip'},
+    'amplitude': {'gain_db'},
+    'crop': {'start', 'duration'},
+}
+_RANDOM_OPERATIONS = {'noise', 'compression'}
+
+
+def _sniff_container(header: bytes) -> Optional[str]:
+    """Recognise the container of an audio file from its first bytes."""
+    if header[:4] in (b'RIFF', b'RF64') and header[8:12] == b'WAVE':
+        return '.wav'
+    if header[:4] == b'fLaC':
+        return '.flac'
+    if header[:4] == b'OggS':
+        return '.ogg'
+    if header[:4] == b'FORM' and header[8:12] in (b'AIFF', b'AIFC'):
+        return '.aiff'
+    if header[:3] == b'ID3' or (len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        return '.mp3'
+    return None
+
+
+def _validate_operation(operation: Dict[str, any]) -> None:
+    kind = operation.get('type')
+    if kind not in _OPERATIONS:
+        raise ValueError(f"Unknown distortion: {kind}. Supported: {', '.join(_OPERATIONS)}")
+    unknown = set(operation) - _OPERATIONS[kind] - {'type'}
+    if unknown:
+        raise ValueError(f"Unknown parameters for {kind}: {', '.join(sorted(unknown))}")
+    if kind == 'lowpass' and 'cutoff_hz' not in operation:
+        raise ValueError("lowpass requires cutoff_hz")
+    if kind == 'resample' and 'sample_rate' not in operation:
+        raise ValueError("resample requires sample_rate")
+
+
+def _codec_cutoff(bitrate: int) -> int:
+    """Low-pass cutoff approximating a lossy codec at the given bitrate in kbps."""
+    if bitrate <= 64:
+        return 8000
+    if bitrate <= 128:
+        return 12000
+    return 16000
+
+
+@lru_cache(maxsize=64)
+def _lowpass_sos(cutoff_hz: float, sample_rate: int, order: int) -> np.ndarray:
+    """Butterworth low-pass design as second-order sections, designed once per cutoff."""
+    return signal.butter(order, cutoff_hz / (sample_rate / 2), btype='low', output='sos')
+
+
+def _normalize_peaks(rows: np.ndarray) -> np.ndarray:
+    """Scale down each variant of a (variants, channels, samples) batch whose peak exceeds 1."""
+    peaks = np.max(np.abs(rows), axis=(1, 2), keepdims=True)
+    return rows / np.maximum(peaks, 1.0).astype(rows.dtype)
@@ -0,0 +1,238 @@
+"""
+Job Queue
+
+Runs encode/decode jobs on a fixed number of worker threads so that API
+requests only submit work and return right away. Jobs and their results are
+kept in memory for a while after they finish, for polling; status changes
+are also passed to an on_update callback (the Flask app pushes them over
+SocketIO).
+
+    jobs = JobQueue({'decode': decode_handler}, workers=2, job_timeout=300)
+    job_id = jobs.submit('decode', {'path': '/tmp/upload.wav'})
+    jobs.get(job_id)['status']  # 'queued', 'running', 'succeeded', 'failed' or 'timed_out'
+
+Worker threads share the services of the handlers, e.g. one SilentCipherService
+whose model pool keeps a single copy of the model.
+
+A thread running a handler cannot be interrupted, so job_timeout only bounds
+how long a client waits for an answer: a job over the limit is reported as
+timed out, but its worker stays busy until the handler returns, and its
+result is then discarded. No replacement worker is started, a hung handler
+takes one worker out of the pool (reported as 'stuck_workers' in metrics)
+rather than letting the number of threads grow without bound.
+"""
+
+import logging
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+FINISHED = ('succeeded', 'failed', 'timed_out')
+
+
+class QueueFullError(RuntimeError):
+    """Raised by JobQueue.submit when the queue holds its maximum number of jobs."""
+
+
+class JobQueue:
+    """Bounded job queue processed by a pool of worker threads."""
+
+    def __init__(self, handlers: Dict[str, Callable[[str, Dict[str, Any]], Dict[str, Any]]], workers: int = 2,
+                 job_timeout: Optional[float] = 300.0, max_queued: int = 100, result_ttl: float = 3600.0,
+                 on_update: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 on_discard: Optional[Callable[[str], None]] = None):
+        """
+        Args:
+            handlers: Function per operation, called with the job id and payload,
+                      returning the JSON serializable result
+            workers: Number of jobs run at the same time
+            job_timeout: Seconds a job may run before it is reported as timed out
+                         (None for no limit). The handler keeps running until it
+                         returns, and its worker only takes a new job afterwards.
+            max_queued: Jobs waiting to run above which submit is refused
+            result_ttl: Seconds finished jobs are kept for polling
+            on_update: Called with a snapshot of a job whenever its status changes
+            on_discard: Called with the id of a finished job removed from the store,
+                        to delete its files
+        """
+        self.handlers = handlers
+        self.workers = workers
+        self.job_timeout = job_timeout
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self.on_update = on_update
+        self.on_discard = on_discard
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queued)
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._counts = {'submitted': 0, 'rejected': 0, 'succeeded': 0, 'failed': 0, 'timed_out': 0}
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+        # Workers still running a job that timed out
+        self._stuck = 0
+        self._logger = logging.getLogger(__name__)
+
+        self._threads: List[threading.Thread] = []
+        for _ in range(workers):
+            self._start_worker()
+        if job_timeout:
+            threading.Thread(target=self._watchdog, name='job-watchdog', daemon=True).start()
+
+    def submit(self, op: str, payload: Dict[str, Any], job_id: Optional[str] = None) -> str:
+        """
+        Queue a job.
+
+        Args:
+            op: Operation, one of the handler names
+            payload: Parameters passed to the handler
+            job_id: Id to use, e.g. to name files prepared for the job (a new one by default)
+
+        Returns:
+            The job id
+
+        Raises:
+            ValueError: If the operation is unknown
+            QueueFullError: If max_queued jobs are already waiting
+        """
+        if op not in self.handlers:
+            raise ValueError(f"Unknown operation: {op}")
+        self._expire()
+
+        job = {'id': job_id or uuid.uuid4().hex, 'op': op, 'status': 'queued', 'created_at': time.time(),
+               'started_at': None, 'finished_at': None, 'result': None, 'error': None}
+        with self._lock:
+            try:
+                self._queue.put_nowait((job, payload))
+            except queue.Full:
+                self._counts['rejected'] += 1
+                raise QueueFullError(f"Job queue is full ({self.max_queued} jobs waiting)") from None
+            self._jobs[job['id']] = job
+            self._counts['submitted'] += 1
+        self._notify(job)
+        return job['id']
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the current state of a job.
+
+        Returns:
+            Snapshot with the id, op, status, timestamps, result and error of the
+            job, None if it is unknown or has expired
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Get queue depth and job statistics.
+
+        Returns:
+            Dictionary with the queued and running job counts, the worker and
+            capacity settings, job totals per outcome and the mean wait and run times
+        """
+        with self._lock:
+            finished = self._counts['succeeded'] + self._counts['failed']
+            return {
+                'queue_depth': self._queue.qsize(),
+                'running': sum(job['status'] == 'running' for job in self._jobs.values()),
+                'workers': self.workers,
+                'stuck_workers': self._stuck,
+                'max_queued': self.max_queued,
+                'job_timeout': self.job_timeout,
+                **self._counts,
+                'mean_wait_seconds': round(self._wait_seconds / finished, 3) if finished else None,
+                'mean_run_seconds': round(self._run_seconds / finished, 3) if finished else None,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the workers after their current job, queued jobs are not run."""
+        self._stop.set()
+        for _ in self._threads:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        if wait:
+            for thread in self._threads:
+                thread.join(timeout=5)
+
+    def _start_worker(self) -> None:
+        thread = threading.Thread(target=self._work, name=f'job-worker-{len(self._threads)}', daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def _work(self) -> None:
+        while not self._stop.is_set():
+            item = self._queue.get()
+            if item is None:
+                return
+            job, payload = item
+            with self._lock:
+                job['status'] = 'running'
+                job['started_at'] = time.time()
+            self._notify(job)
+
+            try:
+                result, error = self.handlers[job['op']](job['id'], payload), None
+            except Exception as e:
+                self._logger.error(f"Job {job['id']} ({job['op']}) failed: {e}")
+                result, error = None, str(e)
+
+            with self._lock:
+                if job['status'] == 'timed_out':
+                    # The watchdog already reported this job, the worker is free again
+                    self._stuck -= 1
+                    continue
+                job['status'] = 'failed' if error is not None else 'succeeded'
+                job['result'], job['error'] = result, error
+                job['finished_at'] = time.time()
+                self._counts[job['status']] += 1
+                self._wait_seconds += job['started_at'] - job['created_at']
+                self._run_seconds += job['finished_at'] - job['started_at']
+            self._notify(job)
+
+    def _watchdog(self) -> None:
+        interval = min(1.0, self.job_timeout / 10)
+        while not self._stop.wait(interval):
+            now = time.time()
+            expired = []
+            with self._lock:
+                for job in self._jobs.values():
+                    if job['status'] == 'running' and now - job['started_at'] > self.job_timeout:
+                        job['status'] = 'timed_out'
+                        job['error'] = f"Job exceeded the {self.job_timeout:g}s timeout"
+                        job['finished_at'] = now
+                        self._counts['timed_out'] += 1
+                        self._stuck += 1
+                        expired.append(job)
+            for job in expired:
+                # A running handler cannot be interrupted, its worker picks up the next
+                # job once the call returns
+                self._logger.warning(f"Job {job['id']} ({job['op']}) timed out, its worker is busy until it returns")
+                self._notify(job)
+
+    def _expire(self) -> None:
+        """Remove finished jobs older than result_ttl."""
+        now = time.time()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job['status'] in FINISHED and now - job['finished_at'] > self.result_ttl]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if self.on_discard is not None:
+            for job_id in expired:
+                self.on_discard(job_id)
+
+    def _notify(self, job: Dict[str, Any]) -> None:
+        if self.on_update is None:
+            return
+        with self._lock:
+            snapshot = dict(job)
+        try:
+            self.on_update(snapshot)
+        except Exception as e:
+            self._logger.error(f"Job update callback failed: {e}")
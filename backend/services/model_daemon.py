@@ -0,0 +1,323 @@
+"""
+Model Daemon
+
+Keeps the SilentCipher models loaded in a long-running local process and serves
+encode/decode requests over a Unix domain socket, so the standalone CLI and GUI
+do not pay for importing torch and loading the model on every start.
+
+The protocol is one JSON object per line in each direction. A request names an
+operation and its parameters, the response carries either the result or an error:
+
+    {"op": "encode", "input": "/abs/in.wav", "output": "/abs/out.wav", "message": [1, 2, 3, 4, 5]}
+    {"ok": true, "result": {"sdr": 47.2, "metadata": {...}}}
+
+Audio travels as file paths, the daemon runs as the same user and reads and
+writes the files itself. The socket is only accessible to that user: it is
+created with mode 0600, by default in a 0700 directory of the user, and
+clients refuse to talk to a socket owned by someone else. This module only imports the standard library at the
+top level: clients stay fast to start, the heavy imports happen in the daemon.
+"""
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional
+
+# Minimum duration SilentCipher needs for reliable watermarking (same check as the CLI and GUI)
+MIN_ENCODE_SECONDS = 3.0
+
+
+def default_socket_path() -> str:
+    """
+    Socket path shared by the daemon and its clients.
+
+    Returns:
+        The WATERMARK_DAEMON_SOCKET environment variable, otherwise a socket in
+        a per-user directory of XDG_RUNTIME_DIR or the temp directory
+    """
+    path = os.getenv('WATERMARK_DAEMON_SOCKET')
+    if path:
+        return path
+    return os.path.join(_default_socket_dir(), 'daemon.sock')
+
+
+def _default_socket_dir() -> str:
+    runtime_dir = os.getenv('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(runtime_dir, f"audio-watermark-{os.getuid()}")
+
+
+def _make_private_dir(path: str) -> None:
+    """
+    Create a directory only the current user can access, or check an existing one.
+
+    Raises:
+        RuntimeError: If the directory belongs to another user or others can access it
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise RuntimeError(f"{path} must be a directory owned by the current user and private to it (mode 0700)")
+
+
+class DaemonError(RuntimeError):
+    """Raised by DaemonClient when the daemon reports a failed request."""
+
+
+def _json_default(value: Any) -> Any:
+    """Convert numpy scalars and arrays found in results to JSON types."""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class DaemonClient:
+    """Client of a running WatermarkDaemon, each request uses its own connection."""
+
+    def __init__(self, socket_path: Optional[str] = None, timeout: Optional[float] = None):
+        """
+        Args:
+            socket_path: Socket of the daemon (defaults to default_socket_path())
+            timeout: Seconds to wait for a response, None waits for long encodes
+        """
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+
+    @classmethod
+    def connect(cls, socket_path: Optional[str] = None, timeout: Optional[float] = None) -> Optional['DaemonClient']:
+        """
+        Connect to the daemon if one is running.
+
+        Returns:
+            A client, or None when no daemon answers on the socket
+        """
+        client = cls(socket_path, timeout)
+        try:
+            client.request('ping', timeout=1.0)
+        except (OSError, DaemonError, ValueError):
+            return None
+        return client
+
+    def request(self, op: str, timeout: Optional[float] = None, **params: Any) -> Any:
+        """
+        Send one request and wait for its response.
+
+        Args:
+            op: Operation name ('ping', 'encode', 'decode', 'shutdown')
+            timeout: Overrides the client timeout for this request
+            **params: JSON serializable parameters of the operation
+
+        Returns:
+            The result of the operation
+
+        Raises:
+            OSError: If the daemon cannot be reached
+            DaemonError: If the daemon reports an error
+        """
+        # A socket of another user could be a daemon reading or writing any of our files
+        if os.stat(self.socket_path).st_uid != os.getuid():
+            raise DaemonError(f"{self.socket_path} belongs to another user")
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout if timeout is not None else self.timeout)
+            sock.connect(self.socket_path)
+            sock.sendall(json.dumps(dict(params, op=op)).encode() + b'\n')
+            with sock.makefile('rb') as stream:
+                line = stream.readline()
+        if not line:
+            raise DaemonError("Daemon closed the connection without a response")
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise DaemonError(response.get('error', 'Unknown daemon error'))
+        return response.get('result')
+
+    def ping(self) -> Dict[str, Any]:
+        """Get the daemon status (pid, socket, requests served, message size)."""
+        return self.request('ping')
+
+    def message_bytes(self) -> int:
+        """Bytes of the message the daemon embeds, fewer than 5 when its service uses a payload codec."""
+        return self.ping().get('message_bytes', 5)
+
+    def encode(self, input_path: str, output_path: str, message: List[int]) -> Dict[str, Any]:
+        """
+        Encode a watermark from file to file.
+
+        Returns:
+            Dictionary with the 'sdr' and the input 'metadata'
+        """
+        return self.request('encode', input=os.path.abspath(input_path), output=os.path.abspath(output_path), message=list(message))
+
+    def decode(self, input_path: str, phase_shift_decoding: bool = False, offset: float = 0.0,
+               duration: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Decode the watermark of a file, or of the part starting offset seconds in and lasting duration seconds.
+
+        Returns:
+            The decode_audio result plus the 'metadata' of the decoded audio
+        """
+        return self.request('decode', input=os.path.abspath(input_path), phase_shift_decoding=bool(phase_shift_decoding),
+                            offset=offset, duration=duration)
+
+    def shutdown(self) -> None:
+        """Ask the daemon to exit."""
+        self.request('shutdown', timeout=5.0)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                response = {'ok': True, 'result': self.server.daemon.handle_request(request)}
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            self.wfile.write(json.dumps(response, default=_json_default).encode() + b'\n')
+            self.wfile.flush()
+            if response['ok'] and request.get('op') == 'shutdown':
+                # shutdown() waits for serve_forever, which runs in another thread
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class WatermarkDaemon:
+    """Local server holding a loaded SilentCipherService between CLI/GUI invocations."""
+
+    def __init__(self, socket_path: Optional[str] = None, service: Optional[Any] = None, audio_processor: Optional[Any] = None,
+                 preload_rates: Optional[List[int]] = None):
+        """
+        Args:
+            socket_path: Socket to listen on (defaults to default_socket_path())
+            service: SilentCipherService to use, created if not given
+            audio_processor: AudioProcessor to load and save files, created if not given
+            preload_rates: Sample rates whose models are loaded before serving (defaults to [44100])
+        """
+        self.socket_path = socket_path or default_socket_path()
+        if service is None:
+            from .silentcipher_service import SilentCipherService
+            service = SilentCipherService()
+        if audio_processor is None:
+            from .audio_processor import AudioProcessor
+            audio_processor = AudioProcessor()
+        self.service = service
+        self.audio_processor = audio_processor
+        self.preload_rates = [44100] if preload_rates is None else preload_rates
+        self.requests_served = 0
+        # The model is not shared between concurrent requests, they run one at a time
+        self._lock = threading.Lock()
+        self._server: Optional[_UnixServer] = None
+        self._logger = logging.getLogger(__name__)
+
+    def start(self) -> None:
+        """
+        Load the models and bind the socket.
+
+        Raises:
+            RuntimeError: If another daemon already serves the socket, or the
+                          default socket directory is not private
+        """
+        if os.path.dirname(self.socket_path) == _default_socket_dir():
+            _make_private_dir(_default_socket_dir())
+        if os.path.exists(self.socket_path):
+            if DaemonClient.connect(self.socket_path) is not None:
+                raise RuntimeError(f"A daemon is already running on {self.socket_path}")
+            # Left over by a daemon that did not exit cleanly
+            os.unlink(self.socket_path)
+
+        for rate in self.preload_rates:
+            self._logger.info(f"Preloading the {rate}Hz model...")
+            self.service.get_model(rate)
+
+        # The socket is created 0600, a chmod after bind would leave it open to others in between
+        umask = os.umask(0o177)
+        try:
+            self._server = _UnixServer(self.socket_path, _RequestHandler)
+        finally:
+            os.umask(umask)
+        self._server.daemon = self
+        self._logger.info(f"Watermark daemon listening on {self.socket_path}")
+
+    def serve_forever(self) -> None:
+        """Serve requests until a shutdown request, then remove the socket."""
+        if self._server is None:
+            self.start()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def handle_request(self, request: Dict[str, Any]) -> Any:
+        """
+        Run one request.
+
+        Args:
+            request: Decoded request with its 'op' and parameters
+
+        Returns:
+            JSON serializable result
+
+        Raises:
+            ValueError: If the operation is unknown or its input is invalid
+        """
+        op = request.get('op')
+        if op == 'ping':
+            return {'pid': os.getpid(), 'socket': self.socket_path, 'requests_served': self.requests_served,
+                    'available': self.service.is_available(), 'message_bytes': self.service.message_bytes}
+        if op == 'shutdown':
+            return {'pid': os.getpid()}
+        if op not in ('encode', 'decode'):
+            raise ValueError(f"Unknown operation: {op}")
+
+        with self._lock:
+            # Any sample rate is resampled by the service. Short inputs are rejected from the
+            # header, and decoding only reads the part of the file it examines.
+            probe = self.audio_processor.probe_and_load(
+                request['input'], sample_rates=None, max_bytes=None,
+                min_duration=MIN_ENCODE_SECONDS if op == 'encode' else None,
+                offset=(request.get('offset') or 0.0) if op == 'decode' else 0.0,
+                duration=request.get('duration') if op == 'decode' else None)
+            if not probe['valid']:
+                raise ValueError('; '.join(probe['errors']))
+            audio_data, sample_rate = probe['audio'], probe['sample_rate']
+            metadata = self.audio_processor.get_metadata(audio_data, sample_rate)
+            if op == 'encode':
+                result = self._encode(request, audio_data, sample_rate)
+            else:
+                result = self.service.decode_audio(audio_data, sample_rate, phase_shift_decoding=bool(request.get('phase_shift_decoding')))
+            self.requests_served += 1
+        return dict(result, metadata=metadata)
+
+    def _encode(self, request: Dict[str, Any], audio_data: Any, sample_rate: int) -> Dict[str, Any]:
+        watermarked_audio, sdr = self.service.encode_audio(audio_data, sample_rate, request['message'])
+        self.audio_processor.save_audio(watermarked_audio, sample_rate, request['output'])
+        return {'sdr': float(sdr)}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run a daemon in the foreground: python -m services.model_daemon [--socket PATH] [--parity N]"""
+    import argparse
+    parser = argparse.ArgumentParser(description='Serve SilentCipher encode/decode requests from a warm model')
+    parser.add_argument('--socket', default=None, help='Unix socket path (default: WATERMARK_DAEMON_SOCKET or a per-user runtime path)')
+    parser.add_argument('--parity', type=int, choices=[0, 2, 4, 6], default=0,
+                        help='Parity nibbles of the payload codec, as PAYLOAD_PARITY of the web app (0 for none)')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s', stream=sys.stderr)
+    from utils.payload_codec import PayloadCodec
+    from .silentcipher_service import SilentCipherService
+    service = SilentCipherService(codec=PayloadCodec(args.parity) if args.parity else None)
+    WatermarkDaemon(args.socket, service=service).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+"""
+Model Pool
+
+Keeps loaded models resident within a memory budget. Providers (SilentCipherService,
+and e.g. WavMark or IDEAW wrappers) register a loader per model. The pool loads
+each model on first use, evicts the least recently used idle models when the
+budget is exceeded or a model has been idle longer than its TTL, and reloads
+evicted models on demand.
+
+    pool = ModelPool(memory_budget_bytes=2 << 30, idle_ttl=600)
+    pool.register('wavmark', lambda: wavmark.load_model().eval())
+    with pool.use('wavmark') as model:
+        ...
+"""
+
+import gc
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+
+def estimate_model_bytes(model: Any) -> int:
+    """
+    Estimate the memory held by a model from its torch parameters and buffers.
+
+    Looks at the model itself if it is a torch module, otherwise at the modules
+    among its attributes (e.g. the encoder and decoders of a SilentCipher Model).
+
+    Args:
+        model: Loaded model
+
+    Returns:
+        Size in bytes, 0 if no torch modules were found
+    """
+    if hasattr(model, 'parameters'):
+        modules = [model]
+    else:
+        modules = [value for value in getattr(model, '__dict__', {}).values() if hasattr(value, 'parameters')]
+
+    seen = set()
+    total = 0
+    for module in modules:
+        tensors = list(module.parameters())
+        if hasattr(module, 'buffers'):
+            tensors += list(module.buffers())
+        for tensor in tensors:
+            if id(tensor) not in seen:
+                seen.add(id(tensor))
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class _Entry:
+    """State of one registered model."""
+
+    def __init__(self, name: str, loader: Callable[[], Any], size_bytes: Optional[int], idle_ttl: Optional[float]):
+        self.name = name
+        self.loader = loader
+        self.declared_bytes = size_bytes
+        self.idle_ttl = idle_ttl
+        self.model: Any = None
+        self.size_bytes = 0
+        self.last_used = 0.0
+        self.in_use = 0
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+        self.error: Optional[str] = None
+        # Held while the model loads, so that concurrent users share one load
+        self.load_lock = threading.Lock()
+
+
+class ModelPool:
+    """Memory-budgeted, LRU-evicting store of lazily loaded models."""
+
+    def __init__(self, memory_budget_bytes: Optional[int] = None, idle_ttl: Optional[float] = None,
+                 reaper_interval: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            memory_budget_bytes: Resident size above which idle models are evicted
+                                 (None for no limit)
+            idle_ttl: Seconds after which an unused model is evicted (None to keep
+                      idle models until the budget needs their memory)
+            reaper_interval: Seconds between background checks for expired models.
+                             Without it they are checked on every use of the pool.
+            clock: Monotonic time source, replaceable in tests
+        """
+        self.memory_budget_bytes = memory_budget_bytes
+        self.idle_ttl = idle_ttl
+        self._clock = clock
+        self._entries: Dict[str, _Entry] = {}
+        # Guards the bookkeeping of all entries, never held while a model loads
+        self._lock = threading.RLock()
+        self._logger = logging.getLogger(__name__)
+        self._reaper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        if reaper_interval:
+            self._reaper = threading.Thread(target=self._reap, args=(reaper_interval,), name='model-pool-reaper', daemon=True)
+            self._reaper.start()
+
+    def register(self, name: str, loader: Callable[[], Any], size_bytes: Optional[int] = None,
+                 idle_ttl: Optional[float] = None) -> None:
+        """
+        Register a model the pool can load.
+
+        Args:
+            name: Unique model name
+            loader: Builds and returns the model
+            size_bytes: Memory the model holds, estimated from its torch tensors if not given
+            idle_ttl: Overrides the pool idle TTL for this model
+        """
+        with self._lock:
+            if name in self._entries:
+                raise ValueError(f"Model already registered: {name}")
+            self._entries[name] = _Entry(name, loader, size_bytes, idle_ttl)
+
+    def is_registered(self, name: str) -> bool:
+        return name in self._entries
+
+    def get(self, name: str) -> Any:
+        """
+        Get a model, loading it if it is not resident.
+
+        The model may be evicted once returned; use use() to keep it resident while working with it.
+
+        Raises:
+            KeyError: If the model is not registered
+            Exception: Whatever the loader raises
+        """
+        with self.use(name) as model:
+            return model
+
+    @contextmanager
+    def use(self, name: str) -> Iterator[Any]:
+        """
+        Context manager giving a model that is not evicted until the block exits.
+
+        Raises:
+            KeyError: If the model is not registered
+            Exception: Whatever the loader raises
+        """
+        entry = self._entry(name)
+        self.evict_expired()
+        with self._lock:
+            entry.in_use += 1
+        try:
+            model = self._resident(entry)
+            yield model
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = self._clock()
+                # Loads while every model was in use may have left the pool over budget
+                self._enforce_budget()
+
+    def peek(self, name: str) -> Any:
+        """Get a model only if it is resident, without loading it or marking it used."""
+        return self._entry(name).model
+
+    def state(self, name: str) -> str:
+        """
+        Returns:
+            'loaded', 'loading', 'failed', 'evicted' (reloaded on next use) or 'not_loaded'
+        """
+        entry = self._entry(name)
+        if entry.model is not None:
+            return 'loaded'
+        if entry.load_lock.locked():
+            return 'loading'
+        if entry.error is not None:
+            return 'failed'
+        if entry.evictions:
+            return 'evicted'
+        return 'not_loaded'
+
+    def error(self, name: str) -> Optional[str]:
+        """Error of the last failed load of a model, None after a successful one."""
+        return self._entry(name).error
+
+    def evict(self, name: str) -> bool:
+        """
+        Evict a model now, unless it is in use.
+
+        Returns:
+            True if the model was resident and got evicted
+        """
+        with self._lock:
+            entry = self._entry(name)
+            if entry.model is None or entry.in_use:
+                return False
+            self._unload(entry, 'requested')
+        gc.collect()
+        return True
+
+    def evict_expired(self) -> int:
+        """
+        Evict the idle models whose TTL has passed.
+
+        Returns:
+            Number of evicted models
+        """
+        now = self._clock()
+        evicted = 0
+        with self._lock:
+            for entry in self._entries.values():
+                ttl = entry.idle_ttl if entry.idle_ttl is not None else self.idle_ttl
+                if entry.model is not None and not entry.in_use and ttl is not None and now - entry.last_used >= ttl:
+                    self._unload(entry, f'idle for {now - entry.last_used:.0f}s')
+                    evicted += 1
+        if evicted:
+            gc.collect()
+        return evicted
+
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.size_bytes for entry in self._entries.values() if entry.model is not None)
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Get residency, load and eviction statistics.
+
+        Returns:
+            Dictionary with the pool totals and one entry per registered model
+        """
+        now = self._clock()
+        with self._lock:
+            models = {
+                entry.name: {
+                    'resident': entry.model is not None,
+                    'state': self.state(entry.name),
+                    'bytes': entry.size_bytes if entry.model is not None else 0,
+                    'in_use': entry.in_use,
+                    'loads': entry.loads,
+                    'hits': entry.hits,
+                    'evictions': entry.evictions,
+                    'load_seconds': round(entry.load_seconds, 3),
+                    'idle_seconds': round(now - entry.last_used, 1) if entry.model is not None and not entry.in_use else 0.0,
+                }
+                for entry in self._entries.values()
+            }
+            return {
+                'memory_budget_bytes': self.memory_budget_bytes,
+                'resident_bytes': self.resident_bytes(),
+                'resident_models': sum(model['resident'] for model in models.values()),
+                'loads': sum(model['loads'] for model in models.values()),
+                'evictions': sum(model['evictions'] for model in models.values()),
+                'models': models,
+            }
+
+    def close(self) -> None:
+        """Stop the background reaper."""
+        self._stop.set()
+
+    def _entry(self, name: str) -> _Entry:
+        try:
+            return self._entries[name]
+        except KeyError:
+            raise KeyError(f"Model not registered: {name}") from None
+
+    def _resident(self, entry: _Entry) -> Any:
+        model = entry.model
+        if model is not None:
+            with self._lock:
+                entry.hits += 1
+            return model
+
+        with entry.load_lock:
+            # Another user may have loaded it while this one waited
+            if entry.model is not None:
+                with self._lock:
+                    entry.hits += 1
+                return entry.model
+
+            start = time.perf_counter()
+            try:
+                model = entry.loader()
+            except Exception as e:
+                entry.error = str(e)
+                raise
+            with self._lock:
+                entry.error = None
+                entry.model = model
+                entry.size_bytes = entry.declared_bytes if entry.declared_bytes is not None else estimate_model_bytes(model)
+                entry.loads += 1
+                entry.load_seconds += time.perf_counter() - start
+                entry.last_used = self._clock()
+                self._logger.info(f"Loaded model {entry.name} ({entry.size_bytes / 2**20:.0f} MB)")
+                self._enforce_budget()
+            return model
+
+    def _enforce_budget(self) -> None:
+        if self.memory_budget_bytes is None:
+            return
+        evicted = False
+        while self.resident_bytes() > self.memory_budget_bytes:
+            idle = [entry for entry in self._entries.values() if entry.model is not None and not entry.in_use]
+            if not idle:
+                # Everything resident is in use, the budget is exceeded until a model is released
+                self._logger.warning(f"Model pool over budget ({self.resident_bytes()} > {self.memory_budget_bytes} bytes) with every model in use")
+                break
+            self._unload(min(idle, key=lambda entry: entry.last_used), 'memory budget')
+            evicted = True
+        if evicted:
+            gc.collect()
+
+    def _unload(self, entry: _Entry, reason: str) -> None:
+        entry.model = None
+        entry.evictions += 1
+        self._logger.info(f"Evicted model {entry.name} ({reason})")
+
+    def _reap(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.evict_expired()
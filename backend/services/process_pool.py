@@ -0,0 +1,68 @@
+"""
+Process Pool
+
+Runs a function over many items in worker processes that each load the model
+once, for the batch tools (robustness_benchmark, codec_benchmark,
+archive_scanner). Each tool keeps its per-process state in a module level dict
+filled by its own initializer:
+
+    _worker = {}
+
+    def _init_worker(options):
+        _worker.update(options, service=load_service(options, decode_cache_entries=0))
+
+    def _work(item):
+        return _worker['service'].decode_audio(...)
+
+    results = run_in_processes(_work, items, _init_worker, options, workers=4)
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, Iterable, Iterator
+
+
+def load_service(options: Dict[str, Any], **kwargs: Any) -> Any:
+    """
+    Load a SilentCipherService with its 44.1kHz model, in a worker process.
+
+    Args:
+        options: Worker options, 'device' and 'threads' (torch threads, None
+                 for the torch default) are used
+        **kwargs: Other SilentCipherService arguments, e.g. decode_cache_entries or codec
+
+    Returns:
+        The service
+    """
+    if options.get('threads'):
+        import torch
+        torch.set_num_threads(options['threads'])
+    from .silentcipher_service import SilentCipherService
+    service = SilentCipherService(device=options['device'], **kwargs)
+    service.get_model(44100)
+    return service
+
+
+def run_in_processes(fn: Callable[[Any], Any], items: Iterable[Any], initializer: Callable[[Dict[str, Any]], None],
+                     options: Dict[str, Any], workers: int) -> Iterator[Any]:
+    """
+    Call fn on every item in a process pool, yielding results as they finish.
+
+    Args:
+        fn: Module level function run in the workers
+        items: Arguments of fn
+        initializer: Module level function called with options once per worker process
+        options: Picklable worker options
+        workers: Number of worker processes, 0 to run in this process (in order)
+
+    Yields:
+        The result of fn for each item
+    """
+    if workers == 0:
+        initializer(options)
+        for item in items:
+            yield fn(item)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=(options,)) as pool:
+        futures = [pool.submit(fn, item) for item in items]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,200 @@
+"""
+Scan Index
+
+Persistent SQLite index of the watermarks decoded from an audio archive. Files
+are tracked by path with their size, modification time and content hash;
+decode results are stored per content hash, so copies and renamed files are
+never decoded twice.
+
+    index = ScanIndex('archive.db')
+    index.query(message=[72, 101, 108, 108, 111], min_confidence=0.8)
+    index.query(path='/archive/2024/*', detected=True)
+
+Every file is committed as soon as it is decoded, an interrupted scan loses at
+most the files that were being decoded.
+"""
+
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .sqlite_store import SQLiteStore
+from .watermark_registry import Payload, pack_payload, unpack_payload
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash BLOB NOT NULL,
+    scanned_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_content_hash ON files (content_hash);
+CREATE TABLE IF NOT EXISTS results (
+    content_hash BLOB PRIMARY KEY,
+    settings TEXT NOT NULL,
+    detected INTEGER NOT NULL,
+    payload INTEGER,
+    confidence REAL,
+    error TEXT,
+    decoded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_payload ON results (payload);
+CREATE INDEX IF NOT EXISTS results_confidence ON results (confidence);
+"""
+
+
+class ScanIndex(SQLiteStore):
+    """SQLite index of scanned files and their decode results, safe to share between threads."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Database file, created if it does not exist
+        """
+        super().__init__(path, SCHEMA)
+
+    def files_under(self, root: str) -> Dict[str, Tuple[int, int, str]]:
+        """
+        Get the indexed files below a directory.
+
+        Returns:
+            Dictionary of path to (size, mtime_ns, content hash)
+        """
+        low, high = _prefix_range(root)
+        rows = self._connection().execute(
+            'SELECT path, size, mtime_ns, content_hash FROM files WHERE path >= ? AND path < ?', (low, high))
+        return {path: (size, mtime_ns, content_hash.hex()) for path, size, mtime_ns, content_hash in rows}
+
+    def decoded_hashes(self, settings: str, include_errors: bool = True) -> set:
+        """
+        Get the content hashes already decoded with the given settings.
+
+        Args:
+            settings: Decode settings the results must have been produced with
+            include_errors: Count failed decodes as decoded
+
+        Returns:
+            Set of hex content hashes
+        """
+        query = 'SELECT content_hash FROM results WHERE settings = ?'
+        if not include_errors:
+            query += ' AND error IS NULL'
+        return {row[0].hex() for row in self._connection().execute(query, (settings,))}
+
+    def record_files(self, files: Iterable[Tuple[str, int, int, str]]) -> None:
+        """
+        Add or update files, e.g. once they are hashed, in one transaction.
+
+        Args:
+            files: (path, size, mtime_ns, hex content hash) tuples
+        """
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN')
+            connection.executemany(
+                'INSERT OR REPLACE INTO files (path, size, mtime_ns, content_hash, scanned_at) VALUES (?, ?, ?, ?, ?)',
+                [(path, size, mtime_ns, bytes.fromhex(content_hash), now) for path, size, mtime_ns, content_hash in files]
+            )
+
+    def record_result(self, content_hash: str, settings: str, result: Dict[str, Any]) -> None:
+        """
+        Store the decode result of some content.
+
+        Args:
+            content_hash: Hex content hash
+            settings: Decode settings the result was produced with
+            result: Dictionary with 'detected', 'message', 'confidence' and 'error', and the
+                    embedded 'payload' when a payload codec shortened the message
+        """
+        payload = (result.get('payload') or result.get('message')) if result.get('detected') else None
+        self._connection().execute(
+            'INSERT OR REPLACE INTO results (content_hash, settings, detected, payload, confidence, error, decoded_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (bytes.fromhex(content_hash), settings, int(bool(result.get('detected'))),
+             pack_payload(payload) if payload is not None else None, result.get('confidence'), result.get('error'),
+             time.time())
+        )
+
+    def prune(self, root: str, keep: Iterable[str]) -> int:
+        """
+        Remove files below root that are not in keep, e.g. deleted since the last scan.
+
+        Results are kept, the same content may show up again elsewhere.
+
+        Returns:
+            Number of files removed
+        """
+        gone = set(self.files_under(root)) - set(keep)
+        connection = self._connection()
+        with connection:
+            connection.execute('BEGIN')
+            connection.executemany('DELETE FROM files WHERE path = ?', [(path,) for path in gone])
+        return len(gone)
+
+    def query(self, message: Optional[Payload] = None, path: Optional[str] = None,
+              min_confidence: Optional[float] = None, detected: Optional[bool] = None,
+              limit: Optional[int] = 1000) -> List[Dict[str, Any]]:
+        """
+        Find scanned files by decoded message, path and confidence.
+
+        Args:
+            message: Decoded payload as 5 integers or 10 hex digits
+            path: Glob pattern of the paths, e.g. '/archive/2024/*'
+            min_confidence: Lowest decode confidence
+            detected: Only files with (True) or without (False) a detected watermark
+            limit: Maximum number of files returned (None for all)
+
+        Returns:
+            One dictionary per file, ordered by path, with its size, content
+            hash and decode result (None fields for files not decoded yet)
+        """
+        conditions, params = [], []
+        if message is not None:
+            conditions.append('r.payload = ?')
+            params.append(pack_payload(message))
+        if path is not None:
+            conditions.append('f.path GLOB ?')
+            params.append(path)
+        if min_confidence is not None:
+            conditions.append('r.confidence >= ?')
+            params.append(min_confidence)
+        if detected is not None:
+            conditions.append('r.detected = ?')
+            params.append(int(detected))
+        query = ('SELECT f.path, f.size, f.content_hash, f.scanned_at, r.detected, r.payload, r.confidence, r.error '
+                 'FROM files f LEFT JOIN results r ON r.content_hash = f.content_hash')
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        query += ' ORDER BY f.path'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        return [{
+            'path': path, 'size': size, 'content_hash': content_hash.hex(), 'scanned_at': scanned_at,
+            'detected': bool(found) if found is not None else None,
+            'message': unpack_payload(payload) if payload is not None else None,
+            'confidence': confidence, 'error': error,
+        } for path, size, content_hash, scanned_at, found, payload, confidence, error
+            in self._connection().execute(query, params)]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get index totals.
+
+        Returns:
+            Dictionary with the numbers of files, files with a detected
+            watermark, files that failed to decode and distinct messages
+        """
+        row = self._connection().execute(
+            'SELECT COUNT(*), COALESCE(SUM(r.detected), 0), COUNT(r.error), COUNT(DISTINCT r.payload) '
+            'FROM files f LEFT JOIN results r ON r.content_hash = f.content_hash'
+        ).fetchone()
+        return {'files': row[0], 'detected': row[1], 'errors': row[2], 'messages': row[3]}
+
+
+def _prefix_range(root: str) -> Tuple[str, str]:
+    """Range of the paths below a directory, usable with the primary key index."""
+    prefix = os.path.join(os.path.abspath(root), '')
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
@@ -0,0 +1,374 @@
+"""
+Share Transfer
+
+Chunked binary transfer of audio files between devices over SocketIO. A file
+is sent as fixed-size binary chunks (no base64), each acknowledged by the
+server. The sender keeps at most `window` unacknowledged chunks in flight, so
+neither side buffers more than window * chunk_size bytes. Chunks go straight
+to disk on the server; receivers pull them back the same way.
+
+Protocol (every event is answered through its acknowledgement):
+
+    share_start    {size, sha256, filename?, share_id?}  -> {share_id, chunk_size, window, missing}
+    share_chunk    {share_id, index, data: bytes}        -> {received}
+    share_complete {share_id}                            -> {status}
+    share_info     {share_id}                            -> {share_id, size, sha256, chunk_size, chunks, status, ...}
+    share_fetch    {share_id, index}                     -> {data: bytes}
+
+Errors are acknowledged as {'error': message}. Transfers are resumable:
+share_start with the id of an unfinished share returns the chunks still
+missing, and downloads can restart at any chunk.
+
+    store = ShareStore('/tmp/shares')
+    share = store.start(size, sha256)
+    store.write_chunk(share['share_id'], 0, data)
+"""
+
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_CHUNK_SIZE = 256 * 1024
+DEFAULT_WINDOW = 8
+
+
+class ShareStore:
+    """Disk-backed store of shared files, written and read one chunk at a time."""
+
+    def __init__(self, directory: str, chunk_size: int = DEFAULT_CHUNK_SIZE, window: int = DEFAULT_WINDOW,
+                 max_bytes: Optional[int] = None, ttl: float = 3600.0):
+        """
+        Args:
+            directory: Where shared files are stored
+            chunk_size: Bytes per chunk
+            window: Unacknowledged chunks a client may have in flight
+            max_bytes: Maximum size of a shared file (None for no limit)
+            ttl: Seconds a share is kept after its last activity
+        """
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.window = window
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._shares: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self, size: int, sha256: str, filename: Optional[str] = None,
+              share_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Create a share to upload, or resume an unfinished one.
+
+        Args:
+            size: File size in bytes
+            sha256: Hex SHA-256 of the file, checked once every chunk arrived
+            filename: Name shown to receivers
+            share_id: Id of the share to resume (a new share by default)
+
+        Returns:
+            Dictionary with the share_id, chunk_size, window and the indices
+            of the chunks still missing
+
+        Raises:
+            ValueError: If the size or id is invalid, or the share to resume is for another file
+        """
+        if size <= 0 or (self.max_bytes is not None and size > self.max_bytes):
+            raise ValueError(f"Invalid share size: {size} bytes (maximum {self.max_bytes} bytes)")
+        if share_id is not None and not (share_id.isalnum() and len(share_id) <= 64):
+            # The id names the file on disk
+            raise ValueError(f"Invalid share id: {share_id!r}")
+        sha256 = sha256.lower()
+        self.expire()
+        with self._lock:
+            share = self._shares.get(share_id) if share_id else None
+            if share is not None:
+                if share['size'] != size or share['sha256'] != sha256:
+                    raise ValueError(f"Share {share_id} is for a different file")
+            else:
+                share = {
+                    'share_id': share_id or uuid.uuid4().hex, 'filename': filename, 'size': size,
+                    'sha256': sha256, 'chunk_size': self.chunk_size,
+                    'chunks': -(-size // self.chunk_size), 'received': set(), 'status': 'uploading',
+                    'lock': threading.Lock(), 'touched': time.time(),
+                }
+                with open(self._path(share['share_id']), 'wb') as f:
+                    f.truncate(size)
+                self._shares[share['share_id']] = share
+            share['touched'] = time.time()
+            missing = [index for index in range(share['chunks']) if index not in share['received']]
+        return {'share_id': share['share_id'], 'chunk_size': share['chunk_size'], 'window': self.window,
+                'missing': missing}
+
+    def add_file(self, file_path: str, filename: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Share a file that is already on the server, e.g. the result of an encode job.
+
+        Returns:
+            The share as info()
+        """
+        share_id = uuid.uuid4().hex
+        shutil.copyfile(file_path, self._path(share_id))
+        size = os.path.getsize(file_path)
+        with self._lock:
+            self._shares[share_id] = {
+                'share_id': share_id, 'filename': filename or os.path.basename(file_path), 'size': size,
+                'sha256': _file_sha256(self._path(share_id), self.chunk_size), 'chunk_size': self.chunk_size,
+                'chunks': -(-size // self.chunk_size), 'received': set(), 'status': 'complete',
+                'lock': threading.Lock(), 'touched': time.time(),
+            }
+        return self.info(share_id)
+
+    def write_chunk(self, share_id: str, index: int, data: bytes) -> int:
+        """
+        Store one chunk at its place in the file.
+
+        Returns:
+            Number of chunks received so far
+
+        Raises:
+            KeyError: If the share is unknown or has expired
+            ValueError: If the share is complete, or the index or chunk length is wrong
+        """
+        share = self._get(share_id)
+        if share['status'] != 'uploading':
+            raise ValueError(f"Share {share_id} is {share['status']}")
+        if not 0 <= index < share['chunks']:
+            raise ValueError(f"Chunk index {index} out of range (0-{share['chunks'] - 1})")
+        expected = min(share['chunk_size'], share['size'] - index * share['chunk_size'])
+        if len(data) != expected:
+            raise ValueError(f"Chunk {index} has {len(data)} bytes, expected {expected}")
+        with share['lock']:
+            with open(self._path(share_id), 'r+b') as f:
+                f.seek(index * share['chunk_size'])
+                f.write(data)
+            share['received'].add(index)
+            share['touched'] = time.time()
+            return len(share['received'])
+
+    def complete(self, share_id: str) -> str:
+        """
+        Check that every chunk arrived and the content matches its SHA-256.
+
+        Returns:
+            'complete', or 'uploading' if chunks are still missing
+
+        Raises:
+            KeyError: If the share is unknown or has expired
+            ValueError: If the content does not match its hash, the chunks are
+                        discarded so the upload can be resumed from scratch
+        """
+        share = self._get(share_id)
+        with share['lock']:
+            if share['status'] == 'complete' or len(share['received']) < share['chunks']:
+                return share['status']
+            if _file_sha256(self._path(share_id), share['chunk_size']) != share['sha256']:
+                share['received'].clear()
+                raise ValueError(f"Share {share_id} does not match its SHA-256, upload it again")
+            share['status'] = 'complete'
+            return share['status']
+
+    def read_chunk(self, share_id: str, index: int) -> bytes:
+        """
+        Read one chunk of a complete share.
+
+        Raises:
+            KeyError: If the share is unknown or has expired
+            ValueError: If the share is not complete or the index is out of range
+        """
+        share = self._get(share_id)
+        if share['status'] != 'complete':
+            raise ValueError(f"Share {share_id} is still {share['status']}")
+        if not 0 <= index < share['chunks']:
+            raise ValueError(f"Chunk index {index} out of range (0-{share['chunks'] - 1})")
+        share['touched'] = time.time()
+        with open(self._path(share_id), 'rb') as f:
+            f.seek(index * share['chunk_size'])
+            return f.read(share['chunk_size'])
+
+    def info(self, share_id: str) -> Dict[str, Any]:
+        """
+        Get the details of a share.
+
+        Returns:
+            Dictionary with the share_id, filename, size, sha256, chunk_size,
+            number of chunks and received chunks, status and window
+
+        Raises:
+            KeyError: If the share is unknown or has expired
+        """
+        share = self._get(share_id)
+        info = {key: share[key] for key in ('share_id', 'filename', 'size', 'sha256', 'chunk_size', 'chunks', 'status')}
+        info['received_chunks'] = share['chunks'] if share['status'] == 'complete' else len(share['received'])
+        info['window'] = self.window
+        return info
+
+    def expire(self) -> int:
+        """
+        Remove shares idle for longer than the ttl, with their files.
+
+        Returns:
+            Number of shares removed
+        """
+        now = time.time()
+        with self._lock:
+            expired = [share_id for share_id, share in self._shares.items() if now - share['touched'] > self.ttl]
+            for share_id in expired:
+                del self._shares[share_id]
+        for share_id in expired:
+            if os.path.exists(self._path(share_id)):
+                os.remove(self._path(share_id))
+        return len(expired)
+
+    def _get(self, share_id: str) -> Dict[str, Any]:
+        with self._lock:
+            share = self._shares.get(share_id)
+        if share is None:
+            raise KeyError(f"Unknown or expired share: {share_id}")
+        return share
+
+    def _path(self, share_id: str) -> str:
+        return os.path.join(self.directory, f'{share_id}.part')
+
+
+class ShareClient:
+    """
+    Sends and receives shares over a connected python-socketio Client.
+
+    Acknowledgements drive the flow control: a new chunk is only sent (or
+    requested) when fewer than `window` chunks are waiting for theirs.
+    """
+
+    def __init__(self, client: Any, timeout: float = 60.0):
+        """
+        Args:
+            client: Connected client with socketio.Client's call and emit methods
+            timeout: Seconds to wait for an acknowledgement
+        """
+        self.client = client
+        self.timeout = timeout
+
+    def upload(self, file_path: str, share_id: Optional[str] = None,
+               on_progress: Optional[Callable[[int, int], None]] = None) -> str:
+        """
+        Upload a file as a share, resuming share_id if given.
+
+        Args:
+            file_path: File to send
+            share_id: Unfinished share to resume
+            on_progress: Called with the acknowledged and total chunk counts
+
+        Returns:
+            The share id
+
+        Raises:
+            RuntimeError: If the server refuses the share or a chunk
+        """
+        with open(file_path, 'rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            sha256 = _file_sha256(file_path, DEFAULT_CHUNK_SIZE)
+            share = self._call('share_start', {'size': size, 'sha256': sha256, 'filename': os.path.basename(file_path),
+                                               'share_id': share_id})
+            share_id, chunk_size, missing = share['share_id'], share['chunk_size'], share['missing']
+            total = -(-size // chunk_size)
+
+            def send(index: int, ack: Callable[[Any], None]) -> None:
+                f.seek(index * chunk_size)
+                self.client.emit('share_chunk', {'share_id': share_id, 'index': index, 'data': f.read(chunk_size)},
+                                 callback=ack)
+
+            self._windowed(missing, send, share['window'], lambda response: None,
+                           lambda done: on_progress(total - len(missing) + done, total) if on_progress else None)
+        status = self._call('share_complete', {'share_id': share_id})['status']
+        if status != 'complete':
+            raise RuntimeError(f"Share {share_id} is {status} after the upload")
+        return share_id
+
+    def download(self, share_id: str, file_path: str, start: int = 0,
+                 on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+        """
+        Download a complete share, checking its SHA-256.
+
+        Args:
+            share_id: Share to fetch
+            file_path: Where to write it
+            start: First chunk to fetch, to resume into an existing partial file
+            on_progress: Called with the received and total chunk counts
+
+        Returns:
+            The share info
+
+        Raises:
+            RuntimeError: If the server refuses a chunk or the file does not match its hash
+        """
+        info = self._call('share_info', {'share_id': share_id})
+        chunk_size, total = info['chunk_size'], info['chunks']
+        mode = 'r+b' if start and os.path.exists(file_path) else 'wb'
+        with open(file_path, mode) as f:
+            f.truncate(info['size'])
+            lock = threading.Lock()
+
+            def fetch(index: int, ack: Callable[[Any], None]) -> None:
+                self.client.emit('share_fetch', {'share_id': share_id, 'index': index},
+                                 callback=lambda response: ack(dict(response, index=index)))
+
+            def store(response: Dict[str, Any]) -> None:
+                with lock:
+                    f.seek(response['index'] * chunk_size)
+                    f.write(response['data'])
+
+            self._windowed(list(range(start, total)), fetch, info['window'], store,
+                           lambda done: on_progress(start + done, total) if on_progress else None)
+        if _file_sha256(file_path, chunk_size) != info['sha256']:
+            raise RuntimeError(f"Downloaded share {share_id} does not match its SHA-256")
+        return info
+
+    def _windowed(self, indices: List[int], request: Callable[[int, Callable[[Any], None]], None], window: int,
+                  on_response: Callable[[Dict[str, Any]], None], on_done: Callable[[int], None]) -> None:
+        """Issue one request per index, with at most `window` waiting for their acknowledgement."""
+        slots = threading.Semaphore(window)
+        finished = threading.Event()
+        errors: List[str] = []
+        state = {'done': 0}
+        state_lock = threading.Lock()
+
+        def ack(response: Any) -> None:
+            if not isinstance(response, dict) or 'error' in response:
+                errors.append(response.get('error') if isinstance(response, dict) else f"Bad response: {response!r}")
+            else:
+                on_response(response)
+            with state_lock:
+                state['done'] += 1
+                done = state['done']
+            on_done(done)
+            slots.release()
+            if done == len(indices):
+                finished.set()
+
+        for index in indices:
+            if not slots.acquire(timeout=self.timeout):
+                raise RuntimeError(f"No acknowledgement within {self.timeout:g}s")
+            if errors:
+                break
+            request(index, ack)
+        if not errors and indices and not finished.wait(self.timeout):
+            raise RuntimeError(f"No acknowledgement within {self.timeout:g}s")
+        if errors:
+            raise RuntimeError(errors[0])
+
+    def _call(self, event: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        response = self.client.call(event, data, timeout=self.timeout)
+        if not isinstance(response, dict) or 'error' in response:
+            raise RuntimeError(response.get('error') if isinstance(response, dict) else f"Bad response: {response!r}")
+        return response
+
+
+def _file_sha256(file_path: str, chunk_size: int) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -6,35 +6,181 @@ Handles model loading, encoding, and decoding operations.
 """
 
 import numpy as np
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, Union
 import logging
+import os
+import threading
+from contextlib import ExitStack, contextmanager
+
+from .watermark_registry import WatermarkRegistry
+from .model_pool import ModelPool
+from utils.payload_codec import PayloadCodec
 
 try:
     import silentcipher
+    from silentcipher.cache import EncodeCache, DecodeCache, audio_fingerprint
     SILENTCIPHER_AVAILABLE = True
 except ImportError:
     SILENTCIPHER_AVAILABLE = False
     silentcipher = None
+    EncodeCache = DecodeCache = audio_fingerprint = None
     logging.warning("SilentCipher library not available. Install with: pip install silentcipher")
 
 
 class SilentCipherService:
     """Service for encoding and decoding audio watermarks using SilentCipher."""
     
-    def __init__(self, device: str = 'cpu'):
+    # Model type for each supported sample rate
+    MODELS = {16000: '16k', 44100: '44.1k'}
+    
+    def __init__(
+        self,
+        device: str = 'cpu',
+        cache_dir: Optional[str] = None,
+        cache_max_bytes: int = 1 << 30,
+        decode_cache_entries: int = 256,
+        dtype: Optional[str] = None,
+        preload: Union[bool, List[int]] = False,
+        model_pool: Optional[ModelPool] = None,
+        registry: Optional[WatermarkRegistry] = None,
+        codec: Optional[PayloadCodec] = None
+    ):
         """
         Initialize the SilentCipher service with model caching.
         
         Args:
             device: Device to run models on ('cpu' or 'cuda')
+            cache_dir: Directory for cached encode and decode results. Defaults to
+                      the WATERMARK_CACHE_DIR environment variable, encode caching
+                      is disabled when neither is set.
+            cache_max_bytes: Maximum size of the encode cache on disk
+            decode_cache_entries: Number of decode results memoized in memory
+                                  (0 disables decode memoization). Both caches
+                                  are silentcipher's EncodeCache and DecodeCache,
+                                  used by the models themselves
+            dtype: Precision of the SilentCipher networks, 'float32' or 'bfloat16'
+                   (faster on CPUs with bf16 matrix instructions). Defaults to the
+                   SILENTCIPHER_DTYPE environment variable, float32 when unset.
+            preload: Load models in a background thread right away, True for the
+                     44.1kHz model or a list of sample rates. Use readiness() to
+                     find out when they are loaded.
+            model_pool: ModelPool holding the loaded models, shared with other
+                        providers to keep them within one memory budget. Defaults
+                        to a private pool that keeps every loaded model resident.
+            registry: Registry recording every issued payload, checked for
+                      collisions before encoding. None records nothing.
+            codec: Error-correcting code protecting the embedded payload, messages
+                   then have codec.message_bytes integers. None embeds messages
+                   as they are.
         """
-        self._model_16k: Optional[Any] = None
-        self._model_44k: Optional[Any] = None
+        self._preload_rates: List[int] = []
+        self._preload_thread: Optional[threading.Thread] = None
         self._device = device
+        self._dtype = dtype or os.getenv('SILENTCIPHER_DTYPE', 'float32')
         self._logger = logging.getLogger(__name__)
         
+        # The pool loads each model once even under concurrent first requests,
+        # and reloads it on demand after an eviction
+        self._pool = model_pool if model_pool is not None else ModelPool()
+        for sample_rate in self.MODELS:
+            name = self._model_name(sample_rate)
+            if not self._pool.is_registered(name):
+                self._pool.register(name, lambda sample_rate=sample_rate: self._load_model(sample_rate))
+        
+        # Handed to the models as the pool loads them, a reload after an eviction gets the same caches
+        cache_dir = cache_dir or os.getenv('WATERMARK_CACHE_DIR')
+        self._encode_cache = None
+        if cache_dir and EncodeCache is not None:
+            self._encode_cache = EncodeCache(os.path.join(cache_dir, 'encode'), cache_max_bytes)
+        
+        self._decode_cache = None
+        if decode_cache_entries > 0 and DecodeCache is not None:
+            # Decode results are small, the disk tier only shares them between processes
+            self._decode_cache = DecodeCache(decode_cache_entries,
+                                             cache_dir=os.path.join(cache_dir, 'decode') if cache_dir else None)
+        
+        self._registry = registry
+        
+        self._codec = codec
+        
         if not SILENTCIPHER_AVAILABLE:
             self._logger.error("SilentCipher library is not installed")
+        elif preload:
+            self.preload([44100] if preload is True else list(preload))
+    
+    def preload(self, sample_rates: List[int]) -> threading.Thread:
+        """
+        Load models in a background thread.
+        
+        Requests arriving during the preload wait for it instead of loading
+        the model a second time.
+        
+        Args:
+            sample_rates: Sample rates of the models to load (16000 and/or 44100)
+            
+        Returns:
+            The loading thread
+        """
+        for rate in sample_rates:
+            if rate not in self.MODELS:
+                raise ValueError(f"Unsupported sample rate: {rate}Hz")
+        self._preload_rates = list(sample_rates)
+        
+        def load():
+            for rate in sample_rates:
+                try:
+                    self.get_model(rate)
+                except Exception:
+                    pass  # Recorded by the model pool and reported by readiness()
+        
+        self._preload_thread = threading.Thread(target=load, name='silentcipher-preload', daemon=True)
+        self._preload_thread.start()
+        return self._preload_thread
+    
+    def readiness(self, sample_rates: Optional[List[int]] = None, on_demand: bool = False) -> Dict[str, Any]:
+        """
+        Report whether the models needed to serve requests are loaded.
+        
+        Args:
+            sample_rates: Sample rates that must be loaded, defaults to the
+                          preloaded ones or the 44.1kHz model used by encode/decode
+            on_demand: Models are loaded by the first request that needs them
+                       (no preload), so models not loaded yet or loading
+                       count as ready
+            
+        Returns:
+            Dictionary with 'ready' and the state of each model
+            ('loaded', 'loading', 'not_loaded', 'failed', 'unavailable' or
+            'evicted'). Evicted models were idle and are reloaded on the next
+            request, they still count as ready.
+        """
+        sample_rates = sample_rates or self._preload_rates or [44100]
+        models = {}
+        errors = {}
+        for rate in sample_rates:
+            model_type = self.MODELS[rate]
+            if not SILENTCIPHER_AVAILABLE:
+                models[model_type] = 'unavailable'
+                continue
+            models[model_type] = self._pool.state(self._model_name(rate))
+            if models[model_type] == 'failed':
+                errors[model_type] = self._pool.error(self._model_name(rate))
+        
+        ready_states = ('loaded', 'evicted', 'not_loaded', 'loading') if on_demand else ('loaded', 'evicted')
+        readiness = {'ready': all(state in ready_states for state in models.values()), 'models': models}
+        if errors:
+            readiness['errors'] = errors
+        return readiness
+    
+    @property
+    def _model_16k(self) -> Optional[Any]:
+        """The 16kHz model if it is resident."""
+        return self._pool.peek(self._model_name(16000))
+    
+    @property
+    def _model_44k(self) -> Optional[Any]:
+        """The 44.1kHz model if it is resident."""
+        return self._pool.peek(self._model_name(44100))
     
     def get_model(self, sample_rate: int) -> Any:
         """
@@ -50,52 +196,69 @@ class SilentCipherService:
             ValueError: If sample rate is not supported
             RuntimeError: If SilentCipher is not available or model loading fails
         """
+        with self._use_model(sample_rate) as model:
+            return model
+    
+    @contextmanager
+    def _use_model(self, sample_rate: int):
+        """
+        Like get_model, but the pool does not evict the model before the block exits.
+        """
         if not SILENTCIPHER_AVAILABLE:
             raise RuntimeError(
                 "SilentCipher library is not installed. "
                 "Install with: pip install silentcipher"
             )
         
-        # Determine which model to use
-        if sample_rate == 16000:
-            if self._model_16k is None:
-                self._logger.info("Loading SilentCipher 16kHz model...")
-                try:
-                    self._model_16k = silentcipher.get_model(
-                        model_type='16k',
-                        device=self._device
-                    )
-                    self._logger.info("16kHz model loaded successfully")
-                except Exception as e:
-                    self._logger.error(f"Failed to load 16kHz model: {e}")
-                    raise RuntimeError(f"Failed to load SilentCipher 16kHz model: {e}")
-            return self._model_16k
-        
-        elif sample_rate == 44100:
-            if self._model_44k is None:
-                self._logger.info("Loading SilentCipher 44.1kHz model...")
-                try:
-                    self._model_44k = silentcipher.get_model(
-                        model_type='44.1k',
-                        device=self._device
-                    )
-                    self._logger.info("44.1kHz model loaded successfully")
-                except Exception as e:
-                    self._logger.error(f"Failed to load 44.1kHz model: {e}")
-                    raise RuntimeError(f"Failed to load SilentCipher 44.1kHz model: {e}")
-            return self._model_44k
-        
-        else:
+        if sample_rate not in self.MODELS:
             raise ValueError(
                 f"Unsupported sample rate: {sample_rate}Hz. "
                 f"Supported rates: 16000Hz, 44100Hz"
             )
+        
+        label = f"{self.MODELS[sample_rate][:-1]}Hz"
+        with ExitStack() as stack:
+            try:
+                model = stack.enter_context(self._pool.use(self._model_name(sample_rate)))
+            except Exception as e:
+                self._logger.error(f"Failed to load {label} model: {e}")
+                raise RuntimeError(f"Failed to load SilentCipher {label} model: {e}")
+            yield model
+    
+    def _load_model(self, sample_rate: int) -> Any:
+        """Loader registered with the model pool."""
+        label = f"{self.MODELS[sample_rate][:-1]}Hz"
+        self._logger.info(f"Loading SilentCipher {label} model...")
+        caches = {}
+        if self._encode_cache is not None:
+            caches['encode_cache'] = self._encode_cache
+        if self._decode_cache is not None:
+            caches['decode_cache'] = self._decode_cache
+        model = silentcipher.get_model(
+            model_type=self.MODELS[sample_rate],
+            device=self._device,
+            **self._model_kwargs(),
+            **caches
+        )
+        self._logger.info(f"{label} model loaded successfully")
+        return model
+    
+    def _model_name(self, sample_rate: int) -> str:
+        """Name of a model in the pool, the dtype keeps bfloat16 and float32 models apart."""
+        name = f"silentcipher-{self.MODELS[sample_rate]}"
+        if self._model_kwargs():
+            name += f"-{self._dtype}"
+        return name
     
     def encode_audio(
         self,
         audio_data: np.ndarray,
         sample_rate: int,
-        message: List[int]
+        message: List[int],
+        message_sdr: Optional[float] = None,
+        asset: Optional[str] = None,
+        recipient: Optional[str] = None,
+        allow_reuse: bool = False
     ) -> Tuple[np.ndarray, float]:
         """
         Embed watermark into audio using SilentCipher.
@@ -103,7 +266,13 @@ class SilentCipherService:
         Args:
             audio_data: Audio data array (channels, samples) or (samples,)
             sample_rate: Sample rate in Hz (any rate - will be resampled to 44.1kHz internally)
-            message: Message payload as list of 5 integers (0-255)
+            message: Message payload as list of 5 integers (0-255), message_bytes
+                     integers with a codec
+            message_sdr: Message SDR in dB, None uses the model default
+            asset: What is being watermarked, recorded in the registry
+            recipient: Who the watermarked copy is for, recorded in the registry
+            allow_reuse: Issue the message even if the registry has it for
+                         another asset or recipient
             
         Returns:
             Tuple of (watermarked_audio, sdr_value)
@@ -113,36 +282,43 @@ class SilentCipherService:
         Note:
             Audio will be automatically resampled to 44.1kHz for watermarking,
             then resampled back to the original sample rate.
+            When the encode cache is enabled, a request identical to an earlier
+            one (same samples, message, SDR and model) is served from disk.
+            With a registry, every successful encode (cached or not) is
+            recorded with the fingerprint of the input audio. With a codec
+            the message is embedded with its parity, the registry records
+            the embedded payload.
             
         Raises:
             ValueError: If inputs are invalid
+            PayloadCollisionError: If the registry has the message issued to
+                                   another asset or recipient
             RuntimeError: If encoding fails
         """
         # Validate message
-        if not isinstance(message, list) or len(message) != 5:
-            raise ValueError("Message must be a list of 5 integers")
+        if not isinstance(message, list) or len(message) != self.message_bytes:
+            raise ValueError(f"Message must be a list of {self.message_bytes} integers")
         
         if not all(isinstance(x, int) and 0 <= x <= 255 for x in message):
             raise ValueError("All message values must be integers between 0 and 255")
+        message = self.embedded_payload(message)
         
         # Validate audio data
         if audio_data is None or len(audio_data) == 0:
             raise ValueError("Audio data is empty")
         
-        # Always use 44.1kHz model (it will handle resampling internally)
-        model = self.get_model(44100)
+        # Refuse a colliding payload before spending time on the model
+        if self._registry is not None and not allow_reuse:
+            self._registry.check_available(message, asset, recipient)
+        
+        # Always use 44.1kHz model (it will handle resampling internally),
+        # the pool keeps it resident until the request is done
+        pinned = ExitStack()
+        model = pinned.enter_context(self._use_model(44100))
         
         try:
-            # Ensure audio is in the correct format for SilentCipher
-            # SilentCipher expects (samples,) for mono
-            if audio_data.ndim == 2:
-                # Convert from (channels, samples) to (samples,) - use first channel
-                if audio_data.shape[0] < audio_data.shape[1]:
-                    audio_input = audio_data[0]
-                else:
-                    audio_input = audio_data[:, 0]
-            else:
-                audio_input = audio_data
+            # SilentCipher expects (samples,) for mono, use the first channel
+            audio_input = self._first_channel(audio_data)
             
             # Ensure minimum length for SilentCipher (pad if needed)
             # SilentCipher needs at least 3 seconds at the target sample rate
@@ -160,7 +336,12 @@ class SilentCipherService:
             
             # Encode the watermark using encode_wav
             self._logger.info(f"Encoding watermark with message: {message}")
-            watermarked_audio, sdr = model.encode_wav(audio_input, sample_rate, message)
+            if message_sdr is not None:
+                watermarked_audio, sdr = model.encode_wav(
+                    audio_input, sample_rate, message, message_sdr=message_sdr
+                )
+            else:
+                watermarked_audio, sdr = model.encode_wav(audio_input, sample_rate, message)
             
             # Trim back to original length if we padded
             if original_length < min_samples and len(watermarked_audio) > original_length:
@@ -173,8 +354,6 @@ class SilentCipherService:
                 watermarked_audio = np.stack([watermarked_audio, watermarked_audio], axis=0)
             
             self._logger.info(f"Encoding successful. SDR: {sdr:.2f} dB")
-            return watermarked_audio, float(sdr)
-            
         except Exception as e:
             self._logger.error(f"Encoding failed: {e}")
             error_msg = str(e)
@@ -185,6 +364,19 @@ class SilentCipherService:
                     f"Original error: {e}"
                 )
             raise RuntimeError(f"Failed to encode watermark: {e}")
+        finally:
+            pinned.close()
+        
+        self._register(message, asset, recipient, audio_data, sample_rate, model, float(sdr), allow_reuse)
+        return watermarked_audio, float(sdr)
+    
+    def _register(self, message: List[int], asset: Optional[str], recipient: Optional[str], audio_data: np.ndarray,
+                  sample_rate: int, model: Any, sdr: float, allow_reuse: bool) -> None:
+        """Record an issued payload in the registry, if there is one."""
+        if self._registry is not None:
+            self._registry.register(message, asset=asset, recipient=recipient,
+                                    content_hash=audio_fingerprint(audio_data, sample_rate),
+                                    sdr=sdr, model=self._model_id(model), allow_reuse=allow_reuse)
     
     def decode_audio(
         self,
@@ -209,9 +401,15 @@ class SilentCipherService:
                 'message': List[int] or None,
                 'confidence': float or None
             }
+            With a codec, the message is the corrected one and the result
+            also has the embedded 'payload' and the number of nibbles
+            'corrected'. A payload that fails verification is reported as
+            not detected, with 'corrected' None.
             
         Note:
             Audio will be automatically resampled to 44.1kHz for decoding.
+            Results are memoized, decoding the same samples with the same
+            options again returns the earlier result.
             
         Raises:
             ValueError: If inputs are invalid
@@ -221,59 +419,119 @@ class SilentCipherService:
         if audio_data is None or len(audio_data) == 0:
             raise ValueError("Audio data is empty")
         
-        # Always use 44.1kHz model (it will handle resampling internally)
-        model = self.get_model(44100)
+        # Always use 44.1kHz model (it will handle resampling internally),
+        # the pool keeps it resident until the request is done
+        pinned = ExitStack()
+        model = pinned.enter_context(self._use_model(44100))
         
         try:
-            # Ensure audio is in the correct format for SilentCipher
-            # SilentCipher expects (samples,) for mono
-            if audio_data.ndim == 2:
-                # Convert from (channels, samples) to (samples,) - use first channel
-                if audio_data.shape[0] < audio_data.shape[1]:
-                    audio_input = audio_data[0]
-                else:
-                    audio_input = audio_data[:, 0]
-            else:
-                audio_input = audio_data
-            
-            # Decode the watermark using decode_wav
+            # Decode the watermark using decode_wav, which memoizes the raw result in the decode cache
             self._logger.info("Decoding watermark from audio...")
-            result = model.decode_wav(audio_input, sample_rate, phase_shift_decoding)
-            
-            # Parse the result - decode_wav returns a dict with 'status', 'messages', 'confidences'
-            if not result.get('status', False):
-                self._logger.info("No watermark detected")
-                return {
-                    'detected': False,
-                    'message': None,
-                    'confidence': None
-                }
-            
-            # Get the first message (index 0) from the messages list
-            messages = result.get('messages', [])
-            confidences = result.get('confidences', [])
+            result = model.decode_wav(self._first_channel(audio_data), sample_rate, phase_shift_decoding)
+            return self._apply_codec(self._parse_decode_result(result))
             
-            if not messages or len(messages) == 0:
-                self._logger.info("No watermark detected")
-                return {
-                    'detected': False,
-                    'message': None,
-                    'confidence': None
-                }
+        except Exception as e:
+            self._logger.error(f"Decoding failed: {e}")
+            raise RuntimeError(f"Failed to decode watermark: {e}")
+        finally:
+            pinned.close()
+    
+    def decode_audio_batch(
+        self,
+        audio_list: List[np.ndarray],
+        sample_rate: int,
+        phase_shift_decoding: bool = False
+    ) -> List[Dict[str, any]]:
+        """
+        Extract watermarks from several clips in one batched forward pass.
+        
+        Results are not memoized, every clip is decoded.
+        
+        Args:
+            audio_list: Audio data arrays, as in decode_audio
+            sample_rate: Sample rate of all clips in Hz
+            phase_shift_decoding: Whether to use phase shift decoding, as in decode_audio
             
-            message = messages[0]
-            confidence = confidences[0] if confidences else None
+        Returns:
+            One decode_audio result dictionary per clip
             
-            self._logger.info(f"Watermark detected. Message: {message}")
+        Raises:
+            ValueError: If a clip is empty
+            RuntimeError: If decoding fails
+        """
+        if any(audio_data is None or len(audio_data) == 0 for audio_data in audio_list):
+            raise ValueError("Audio data is empty")
+        if not audio_list:
+            return []
+        
+        with self._use_model(44100) as model:
+            try:
+                audio_inputs = [self._first_channel(audio_data) for audio_data in audio_list]
+                if hasattr(model, 'decode_wav_batch'):
+                    results = model.decode_wav_batch(audio_inputs, sample_rate, phase_shift_decoding)
+                else:
+                    # SilentCipher releases without batched decoding
+                    results = [model.decode_wav(audio_input, sample_rate, phase_shift_decoding) for audio_input in audio_inputs]
+                return [self._apply_codec(self._parse_decode_result(result)) for result in results]
+            except Exception as e:
+                self._logger.error(f"Batch decoding failed: {e}")
+                raise RuntimeError(f"Failed to decode watermarks: {e}")
+    
+    def _first_channel(self, audio_data: np.ndarray) -> np.ndarray:
+        """
+        Ensure audio is in the correct format for SilentCipher, which expects (samples,).
+        """
+        if audio_data.ndim == 2:
+            # Convert from (channels, samples) to (samples,) - use first channel
+            if audio_data.shape[0] < audio_data.shape[1]:
+                return audio_data[0]
+            return audio_data[:, 0]
+        return audio_data
+    
+    def _parse_decode_result(self, result: Dict[str, Any]) -> Dict[str, any]:
+        """
+        Convert a decode_wav result, a dict with 'status', 'messages' and 'confidences',
+        to the decode_audio result format.
+        """
+        messages = result.get('messages', []) if result.get('status', False) else []
+        confidences = result.get('confidences', [])
+        
+        if not messages or len(messages) == 0:
+            self._logger.info("No watermark detected")
             return {
-                'detected': True,
-                'message': message,
-                'confidence': confidence
+                'detected': False,
+                'message': None,
+                'confidence': None
             }
-            
-        except Exception as e:
-            self._logger.error(f"Decoding failed: {e}")
-            raise RuntimeError(f"Failed to decode watermark: {e}")
+        
+        # Get the first message (index 0) from the messages list
+        message = messages[0]
+        confidence = confidences[0] if confidences else None
+        
+        self._logger.info(f"Watermark detected. Message: {message}")
+        return {
+            'detected': True,
+            'message': message,
+            'confidence': confidence
+        }
+    
+    def _apply_codec(self, decoded: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Correct and verify the payload of a decode_audio result with the codec.
+        
+        Applied after the decode cache, which keeps the raw payloads.
+        """
+        if self._codec is None:
+            return decoded
+        checked = None
+        if decoded['detected'] and len(decoded['message']) == 5:
+            checked = self._codec.decode([int(value) for value in decoded['message']])
+        if checked is None:
+            if decoded['detected']:
+                self._logger.info("Decoded payload failed verification")
+            return {'detected': False, 'message': None, 'confidence': None, 'payload': None, 'corrected': None}
+        return {'detected': True, 'message': checked['message'], 'confidence': decoded['confidence'],
+                'payload': checked['payload'], 'corrected': checked['corrected']}
     
     def _calculate_sdr(self, original: np.ndarray, watermarked: np.ndarray) -> float:
         """
@@ -309,6 +567,85 @@ class SilentCipherService:
         
         return float(sdr)
     
+    def _model_id(self, model: Any) -> str:
+        """
+        Identify the model version results were produced with.
+        
+        Args:
+            model: Loaded SilentCipher model
+            
+        Returns:
+            silentcipher.cache.model_fingerprint of its weights, configuration
+            and precision, as memoized by the model and used to key its caches
+        """
+        return model.model_version
+    
+    def _model_kwargs(self) -> Dict[str, Any]:
+        """
+        Extra get_model arguments, only passed when they differ from the defaults
+        so that SilentCipher releases without a dtype option keep working.
+        """
+        if self._dtype in ('float32', 'fp32'):
+            return {}
+        return {'dtype': self._dtype}
+    
+    def get_cache_metrics(self) -> Dict[str, Any]:
+        """
+        Get result cache statistics.
+        
+        Returns:
+            Dictionary with 'encode' and 'decode' entries, each with 'enabled'
+            and, when enabled, the hits, misses, hit_ratio, evictions and
+            entries (plus bytes_saved and size_bytes for the encode cache)
+        """
+        metrics: Dict[str, Any] = {'encode': {'enabled': False}, 'decode': {'enabled': False}}
+        if self._encode_cache is not None:
+            metrics['encode'] = {'enabled': True, **self._encode_cache.metrics()}
+        if self._decode_cache is not None:
+            metrics['decode'] = {'enabled': True, **self._decode_cache.metrics()}
+        return metrics
+    
+    def get_model_pool_metrics(self) -> Dict[str, Any]:
+        """
+        Get model residency statistics.
+        
+        Returns:
+            ModelPool.metrics() of the pool holding the models, including the
+            models other providers registered with a shared pool
+        """
+        return self._pool.metrics()
+    
+    @property
+    def model_pool(self) -> ModelPool:
+        """Pool holding the loaded models."""
+        return self._pool
+    
+    @property
+    def registry(self) -> Optional[WatermarkRegistry]:
+        """Registry of issued payloads, None when disabled."""
+        return self._registry
+    
+    @property
+    def codec(self) -> Optional[PayloadCodec]:
+        """Error-correcting code of the embedded payload, None when disabled."""
+        return self._codec
+    
+    @property
+    def message_bytes(self) -> int:
+        """Number of integers in a message, fewer than 5 with a codec."""
+        return self._codec.message_bytes if self._codec is not None else 5
+    
+    def embedded_payload(self, message: List[int]) -> List[int]:
+        """
+        The 5 integers embedded for a message, e.g. to check the registry.
+        
+        Raises:
+            ValueError: If the message is not valid
+        """
+        if self._codec is not None:
+            return self._codec.encode(message)
+        return message
+    
     def is_available(self) -> bool:
         """
         Check if SilentCipher library is available.
@@ -0,0 +1,53 @@
+"""
+SQLite Store
+
+Base class of the SQLite databases of the backend (WatermarkRegistry,
+ScanIndex). sqlite3 connections cannot be shared between threads, so every
+thread gets its own connection to the database file, and close() closes the
+connections of all threads.
+
+Connections are in autocommit mode, transactions are started explicitly with
+BEGIN. WAL lets reads run while another thread or process writes.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import List
+
+
+class SQLiteStore:
+    """SQLite database file with one connection per thread, safe to share between threads."""
+
+    def __init__(self, path: str, schema: str):
+        """
+        Args:
+            path: Database file, created with its directory if it does not exist
+            schema: SQL script creating the tables and indexes if they do not exist
+        """
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(schema)
+
+    def close(self) -> None:
+        """Close the connections of every thread."""
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Connection of the calling thread."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
@@ -0,0 +1,315 @@
+"""
+Watermark Registry
+
+Records which asset and recipient every watermark payload was issued to, in a
+local SQLite database. A payload (the 5 integers of MessageConverter's numeric
+form) is stored as one 40-bit integer with a B-tree index, so finding who a
+decoded message was issued to takes O(log n) even with tens of millions of rows.
+
+    registry = WatermarkRegistry('watermarks.db')
+    registry.register([72, 101, 108, 108, 111], asset='song.wav', recipient='alice')
+    registry.lookup([72, 101, 108, 108, 111])  # [{'payload': [72, ...], 'recipient': 'alice', ...}]
+
+Issuing a payload that is already registered for another asset or recipient
+raises PayloadCollisionError, new_payload() picks one that is still free.
+"""
+
+import csv
+import json
+import random
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from .sqlite_store import SQLiteStore
+
+Payload = Union[List[int], str]
+
+COLUMNS = ('payload', 'asset', 'recipient', 'content_hash', 'issued_at', 'sdr', 'model')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watermarks (
+    id INTEGER PRIMARY KEY,
+    payload INTEGER NOT NULL,
+    asset TEXT,
+    recipient TEXT,
+    content_hash BLOB,
+    issued_at REAL NOT NULL,
+    sdr REAL,
+    model TEXT
+);
+CREATE INDEX IF NOT EXISTS watermarks_payload ON watermarks (payload);
+CREATE INDEX IF NOT EXISTS watermarks_content_hash ON watermarks (content_hash);
+CREATE INDEX IF NOT EXISTS watermarks_recipient ON watermarks (recipient, issued_at);
+CREATE INDEX IF NOT EXISTS watermarks_issued_at ON watermarks (issued_at);
+"""
+INDEXES = ('watermarks_payload', 'watermarks_content_hash', 'watermarks_recipient', 'watermarks_issued_at')
+
+
+class PayloadCollisionError(ValueError):
+    """Raised when a payload is already issued to another asset or recipient."""
+
+
+def pack_payload(payload: Payload) -> int:
+    """
+    Convert a payload to the integer it is stored as.
+
+    Args:
+        payload: List of 5 integers (0-255), or the same 5 bytes as 10 hex digits
+
+    Returns:
+        The 5 bytes as a big-endian integer
+
+    Raises:
+        ValueError: If the payload is not 5 bytes
+    """
+    if isinstance(payload, str):
+        if len(payload) != 10:
+            raise ValueError(f"Payload must be 10 hex digits, got {payload!r}")
+        return int(payload, 16)
+    if len(payload) != 5 or not all(isinstance(x, int) and 0 <= x <= 255 for x in payload):
+        raise ValueError("Payload must be a list of 5 integers between 0 and 255")
+    return int.from_bytes(bytes(payload), 'big')
+
+
+def unpack_payload(value: int) -> List[int]:
+    """Convert a stored payload back to its list of 5 integers."""
+    return list(value.to_bytes(5, 'big'))
+
+
+class WatermarkRegistry(SQLiteStore):
+    """SQLite registry of issued watermark payloads, safe to share between threads."""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Database file, created if it does not exist
+        """
+        super().__init__(path, SCHEMA)
+
+    def register(self, payload: Payload, asset: Optional[str] = None, recipient: Optional[str] = None,
+                 content_hash: Optional[str] = None, sdr: Optional[float] = None, model: Optional[str] = None,
+                 issued_at: Optional[float] = None, allow_reuse: bool = False) -> int:
+        """
+        Record that a payload was issued.
+
+        Issuing the same payload again for the same asset and recipient is
+        recorded as another issue, not a collision.
+
+        Args:
+            payload: Message as 5 integers
+            asset: What was watermarked, e.g. a file name or catalogue id
+            recipient: Who the watermarked copy was issued to
+            content_hash: Hex hash of the audio that was watermarked
+            sdr: SDR of the watermarked audio in dB
+            model: Model that embedded the watermark
+            issued_at: Unix time of the issue (now by default)
+            allow_reuse: Record the issue even if the payload belongs to another
+                         asset or recipient
+
+        Returns:
+            Id of the new record
+
+        Raises:
+            PayloadCollisionError: If the payload is issued to another asset or recipient
+        """
+        value = pack_payload(payload)
+        connection = self._connection()
+        # BEGIN IMMEDIATE takes the write lock first, so two writers cannot both
+        # find a payload free and then both issue it
+        with connection:
+            connection.execute('BEGIN IMMEDIATE')
+            if not allow_reuse:
+                self._check_free(connection, value, asset, recipient)
+            cursor = connection.execute(
+                'INSERT INTO watermarks (payload, asset, recipient, content_hash, issued_at, sdr, model) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (value, asset, recipient, _hash_bytes(content_hash),
+                 time.time() if issued_at is None else issued_at, sdr, model)
+            )
+            return cursor.lastrowid
+
+    def check_available(self, payload: Payload, asset: Optional[str] = None, recipient: Optional[str] = None) -> None:
+        """
+        Check a payload can be issued to an asset and recipient, e.g. before spending time on encoding.
+
+        Raises:
+            PayloadCollisionError: If the payload is issued to another asset or recipient
+        """
+        self._check_free(self._connection(), pack_payload(payload), asset, recipient)
+
+    def new_payload(self, attempts: int = 100, rng: Optional[random.Random] = None) -> List[int]:
+        """
+        Pick a random payload that has not been issued yet.
+
+        Raises:
+            RuntimeError: If no free payload was found in the given number of attempts
+        """
+        rng = rng or random.SystemRandom()
+        connection = self._connection()
+        for _ in range(attempts):
+            value = rng.getrandbits(40)
+            if connection.execute('SELECT 1 FROM watermarks WHERE payload = ? LIMIT 1', (value,)).fetchone() is None:
+                return unpack_payload(value)
+        raise RuntimeError(f"No free payload found in {attempts} attempts")
+
+    def lookup(self, payload: Payload, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Find who a (decoded) payload was issued to.
+
+        Returns:
+            Records of the payload, most recent first
+        """
+        return self._query('WHERE payload = ? ORDER BY issued_at DESC LIMIT ?', (pack_payload(payload), limit))
+
+    def lookup_content(self, content_hash: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Find the payloads issued for the audio with the given hash.
+
+        Returns:
+            Records of the content, most recent first
+        """
+        return self._query('WHERE content_hash = ? ORDER BY issued_at DESC LIMIT ?',
+                           (_hash_bytes(content_hash), limit))
+
+    def issued_to(self, recipient: str, since: Optional[float] = None, until: Optional[float] = None,
+                  limit: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Find the payloads issued to a recipient, optionally within a time range.
+
+        Returns:
+            Records of the recipient, most recent first
+        """
+        return self._query(
+            'WHERE recipient = ? AND issued_at >= ? AND issued_at < ? ORDER BY issued_at DESC LIMIT ?',
+            (recipient, since if since is not None else float('-inf'), until if until is not None else float('inf'),
+             limit)
+        )
+
+    def count(self) -> int:
+        """Number of issue records."""
+        return self._connection().execute('SELECT COUNT(*) FROM watermarks').fetchone()[0]
+
+    def import_rows(self, rows: Iterable[Dict[str, Any]], batch_size: int = 50000,
+                    rebuild_indexes: bool = True) -> int:
+        """
+        Add issue records in bulk, e.g. from another registry's export.
+
+        Rows are inserted as they are, without collision checks, in
+        transactions of batch_size rows.
+
+        Args:
+            rows: Dictionaries with the export columns, payload as 5 integers or 10 hex digits
+            batch_size: Rows inserted per transaction
+            rebuild_indexes: Drop the indexes during the import and build them
+                             again afterwards, about 3x faster for millions of
+                             rows. Lookups scan the whole table until it is done.
+
+        Returns:
+            Number of rows imported
+        """
+        connection = self._connection()
+        if rebuild_indexes:
+            for name in INDEXES:
+                connection.execute(f'DROP INDEX IF EXISTS {name}')
+        batch = []
+        total = 0
+        try:
+            for row in rows:
+                batch.append((
+                    pack_payload(row['payload']), row.get('asset') or None, row.get('recipient') or None,
+                    _hash_bytes(row.get('content_hash') or None), float(row.get('issued_at') or time.time()),
+                    float(row['sdr']) if row.get('sdr') not in (None, '') else None, row.get('model') or None
+                ))
+                if len(batch) >= batch_size:
+                    total += self._insert_many(connection, batch)
+                    batch = []
+            if batch:
+                total += self._insert_many(connection, batch)
+        finally:
+            if rebuild_indexes:
+                connection.executescript(SCHEMA)
+        return total
+
+    def import_file(self, path: str, batch_size: int = 50000) -> int:
+        """
+        Import an export file, CSV or JSON lines (by extension).
+
+        Returns:
+            Number of rows imported
+        """
+        with open(path, newline='') as f:
+            if path.endswith('.csv'):
+                return self.import_rows(csv.DictReader(f), batch_size)
+            return self.import_rows((json.loads(line) for line in f if line.strip()), batch_size)
+
+    def export(self, path: str) -> int:
+        """
+        Write every record to a CSV or JSON lines file (by extension), payloads as 10 hex digits.
+
+        Returns:
+            Number of rows exported
+        """
+        total = 0
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS) if path.endswith('.csv') else None
+            if writer is not None:
+                writer.writeheader()
+            for row in self.iter_rows():
+                row['payload'] = bytes(row['payload']).hex()
+                if writer is not None:
+                    writer.writerow(row)
+                else:
+                    f.write(json.dumps(row) + '\n')
+                total += 1
+        return total
+
+    def iter_rows(self, batch_size: int = 10000) -> Iterator[Dict[str, Any]]:
+        """Iterate over every record in insertion order, reading batch_size rows at a time."""
+        last_id = 0
+        while True:
+            rows = self._connection().execute(
+                f'SELECT id, {", ".join(COLUMNS)} FROM watermarks WHERE id > ? ORDER BY id LIMIT ?',
+                (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            for row in rows:
+                yield _record(row[1:])
+
+    def _check_free(self, connection: sqlite3.Connection, value: int, asset: Optional[str],
+                    recipient: Optional[str]) -> None:
+        row = connection.execute(
+            'SELECT asset, recipient FROM watermarks WHERE payload = ? AND (asset IS NOT ? OR recipient IS NOT ?) '
+            'LIMIT 1', (value, asset, recipient)
+        ).fetchone()
+        if row is not None:
+            raise PayloadCollisionError(
+                f"Payload {unpack_payload(value)} is already issued to asset {row[0]!r}, recipient {row[1]!r}"
+            )
+
+    def _insert_many(self, connection: sqlite3.Connection, rows: List[tuple]) -> int:
+        with connection:
+            connection.execute('BEGIN')
+            connection.executemany(
+                'INSERT INTO watermarks (payload, asset, recipient, content_hash, issued_at, sdr, model) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)', rows
+            )
+        return len(rows)
+
+    def _query(self, where: str, params: tuple) -> List[Dict[str, Any]]:
+        rows = self._connection().execute(f'SELECT {", ".join(COLUMNS)} FROM watermarks {where}', params).fetchall()
+        return [_record(row) for row in rows]
+
+
+def _hash_bytes(content_hash: Optional[str]) -> Optional[bytes]:
+    """Hex hashes are stored as bytes, half the size in the table and its index."""
+    return bytes.fromhex(content_hash) if content_hash else None
+
+
+def _record(row: tuple) -> Dict[str, Any]:
+    record = dict(zip(COLUMNS, row))
+    record['payload'] = unpack_payload(record['payload'])
+    record['content_hash'] = record['content_hash'].hex() if record['content_hash'] is not None else None
+    return record
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Share Transfer Benchmark
+
+Starts the backend SocketIO server on a local port and moves a file between
+two clients with the chunked share protocol: one client uploads it, the other
+downloads it. Reports the upload and download throughput for each window
+size, and the peak Python memory of a transfer (server and both clients run
+in this process), next to what sending the file as one base64 JSON event
+would take.
+
+Usage:
+    # 20MB WAV file, windows of 1, 4 and 8 chunks
+    python share_benchmark.py
+
+    # A given file, more repeats
+    python share_benchmark.py --input watermarked.wav --windows 2 8 --repeat 5 --report share.json
+"""
+
+import argparse
+import base64
+import json
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import soundfile as sf
+
+# Add parent directory to path to import backend modules
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('PRELOAD_MODELS', 'false')
+
+import socketio
+from werkzeug.serving import make_server
+
+from services.share_transfer import ShareClient
+
+
+def make_test_file(path: str, size_mb: float, sample_rate: int = 44100) -> None:
+    """Write a 16-bit stereo WAV file of noise of about size_mb megabytes."""
+    frames = int(size_mb * (1 << 20) / 4)
+    rng = np.random.default_rng(0)
+    sf.write(path, rng.integers(-8000, 8000, size=(frames, 2), dtype=np.int16), sample_rate, subtype='PCM_16')
+
+
+def start_server(app_module: Any) -> Any:
+    """Serve the Flask app on a free local port, returns the server and its URL."""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    server = make_server('127.0.0.1', port, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{port}'
+
+
+def transfer(url: str, path: str, output: str) -> Dict[str, float]:
+    """Upload path from one client and download it to output from another, timing both."""
+    sender, receiver = socketio.Client(), socketio.Client()
+    # websocket-client is optional, polling is what every install can use
+    sender.connect(url, transports=['polling'])
+    receiver.connect(url, transports=['polling'])
+    try:
+        start = time.perf_counter()
+        share_id = ShareClient(sender).upload(path)
+        uploaded = time.perf_counter()
+        ShareClient(receiver).download(share_id, output)
+        downloaded = time.perf_counter()
+    finally:
+        sender.disconnect()
+        receiver.disconnect()
+    return {'upload_seconds': uploaded - start, 'download_seconds': downloaded - uploaded}
+
+
+def measure(url: str, path: str, output: str, repeat: int) -> Dict[str, Any]:
+    """Median throughput over repeat transfers, then the peak memory of one traced transfer."""
+    size_mb = os.path.getsize(path) / (1 << 20)
+    runs = [transfer(url, path, output) for _ in range(repeat)]
+    tracemalloc.start()
+    try:
+        transfer(url, path, output)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'upload_mb_per_s': round(size_mb / statistics.median(run['upload_seconds'] for run in runs), 1),
+        'download_mb_per_s': round(size_mb / statistics.median(run['download_seconds'] for run in runs), 1),
+        'peak_memory_mb': round(peak / (1 << 20), 2),
+    }
+
+
+def single_event_cost(path: str) -> Dict[str, float]:
+    """Size and peak memory of encoding the whole file as one base64 JSON event."""
+    tracemalloc.start()
+    try:
+        with open(path, 'rb') as f:
+            payload = json.dumps({'data': base64.b64encode(f.read()).decode('ascii')})
+        size, peak = len(payload), tracemalloc.get_traced_memory()[1]
+        del payload
+    finally:
+        tracemalloc.stop()
+    return {'payload_mb': round(size / (1 << 20), 2), 'peak_memory_mb': round(peak / (1 << 20), 2)}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--input', default=None, help='File to transfer (default: a generated WAV file)')
+    parser.add_argument('--size-mb', type=float, default=20.0, help='Size of the generated file')
+    parser.add_argument('--windows', nargs='+', type=int, default=[1, 4, 8], help='Window sizes to compare')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed transfers per window size')
+    parser.add_argument('--report', default=None, help='Write the results as JSON')
+    args = parser.parse_args(argv)
+    if not all(1 <= window <= 8 for window in args.windows):
+        parser.error('windows must be between 1 and 8 chunks, a polling request holds at most 8')
+
+    import app as app_module
+    store = app_module.share_store
+    server, url = start_server(app_module)
+    workdir = tempfile.mkdtemp(prefix='share-benchmark-')
+    path = args.input
+    if path is None:
+        path = os.path.join(workdir, 'input.wav')
+        make_test_file(path, args.size_mb)
+    output = os.path.join(workdir, 'received' + os.path.splitext(path)[1])
+
+    size_mb = os.path.getsize(path) / (1 << 20)
+    print(f"{size_mb:.1f}MB file, {store.chunk_size >> 10}KB chunks")
+    report = {'file_mb': round(size_mb, 2), 'chunk_kb': store.chunk_size >> 10, 'windows': {}}
+    try:
+        for window in args.windows:
+            store.window = window
+            # A polling request may carry the whole window
+            app_module.socketio.server.eio.max_http_buffer_size = window * (store.chunk_size + 1024) + (1 << 20)
+            result = measure(url, path, output, args.repeat)
+            report['windows'][window] = result
+            print(f"window {window:3d}: upload {result['upload_mb_per_s']:6.1f} MB/s, "
+                  f"download {result['download_mb_per_s']:6.1f} MB/s, peak memory {result['peak_memory_mb']:.2f} MB")
+    finally:
+        server.shutdown()
+
+    report['single_event'] = single_event_cost(path)
+    print(f"one base64 JSON event: {report['single_event']['payload_mb']:.1f} MB payload, "
+          f"peak memory {report['single_event']['peak_memory_mb']:.2f} MB to build")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
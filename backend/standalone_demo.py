@@ -21,6 +21,11 @@ Usage:
 
     # Encode and play (optional feature)
     python standalone_demo.py encode --input audio.wav --output watermarked.wav --message "Test" --format text --play
+
+    # Keep the model loaded in a background daemon, later encode/decode runs use it
+    python standalone_demo.py daemon &
+    python standalone_demo.py daemon --status
+    python standalone_demo.py daemon --stop
 """
 
 import argparse
@@ -31,10 +36,12 @@ from typing import List, Optional
 # Add parent directory to path to import backend modules
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from services.audio_processor import AudioProcessor
-from services.silentcipher_service import SilentCipherService
+from services.model_daemon import DaemonClient, WatermarkDaemon, default_socket_path
 from utils.message_converter import MessageConverter
 
+# AudioProcessor and SilentCipherService import librosa and torch, they are only
+# imported when no daemon is running so that daemon clients start instantly
+
 
 def parse_arguments():
     """
@@ -96,6 +103,7 @@ Examples:
         action='store_true',
         help='Play the encoded audio after encoding (requires pygame)'
     )
+    add_daemon_arguments(encode_parser)
     
     # Decode subcommand
     decode_parser = subparsers.add_parser('decode', help='Decode a watermark from an audio file')
@@ -115,10 +123,83 @@ Examples:
         action='store_true',
         help='Use phase shift decoding for robustness (slower but more robust to audio crops)'
     )
+    decode_parser.add_argument(
+        '--offset',
+        type=float,
+        default=0.0,
+        help='Start decoding this many seconds into the file (default: 0)'
+    )
+    decode_parser.add_argument(
+        '--duration',
+        type=float,
+        default=None,
+        help='Only load and decode this many seconds, the watermark repeats throughout the audio (default: whole file)'
+    )
+    add_daemon_arguments(decode_parser)
+    
+    # Daemon subcommand
+    daemon_parser = subparsers.add_parser('daemon', help='Run a daemon keeping the model loaded for later commands')
+    daemon_parser.add_argument(
+        '--socket',
+        default=None,
+        help='Unix socket of the daemon (default: WATERMARK_DAEMON_SOCKET or a per-user runtime path)'
+    )
+    daemon_action = daemon_parser.add_mutually_exclusive_group()
+    daemon_action.add_argument(
+        '--stop',
+        action='store_true',
+        help='Stop the running daemon'
+    )
+    daemon_action.add_argument(
+        '--status',
+        action='store_true',
+        help='Show whether a daemon is running'
+    )
+    daemon_parser.add_argument(
+        '--parity',
+        type=int,
+        choices=[0, 2, 4, 6],
+        default=0,
+        help='Parity nibbles of the payload codec, as PAYLOAD_PARITY of the web app (default: 0, none)'
+    )
     
     return parser.parse_args()
 
 
+def add_daemon_arguments(parser):
+    """
+    Add the options selecting how encode/decode reach the model.
+    
+    Args:
+        parser: Subcommand parser
+    """
+    parser.add_argument(
+        '--socket',
+        default=None,
+        help='Unix socket of the model daemon (default: WATERMARK_DAEMON_SOCKET or a per-user runtime path)'
+    )
+    parser.add_argument(
+        '--no-daemon',
+        action='store_true',
+        help='Load the model in this process even if a daemon is running'
+    )
+
+
+def connect_daemon(args) -> Optional[DaemonClient]:
+    """
+    Connect to the model daemon unless disabled.
+    
+    Args:
+        args: Parsed command-line arguments
+        
+    Returns:
+        Client of the running daemon, or None to load the model locally
+    """
+    if args.no_daemon:
+        return None
+    return DaemonClient.connect(args.socket)
+
+
 def validate_arguments(args):
     """
     Validate parsed command-line arguments.
@@ -129,6 +210,9 @@ def validate_arguments(args):
     Raises:
         ValueError: If arguments are invalid
     """
+    if args.command == 'daemon':
+        return
+    
     # Validate input file exists
     if not os.path.exists(args.input):
         raise ValueError(f"Input file does not exist: {args.input}")
@@ -190,6 +274,8 @@ def main():
             run_encode(args)
         elif args.command == 'decode':
             run_decode(args)
+        elif args.command == 'daemon':
+            run_daemon(args)
         else:
             print(f"Unknown command: {args.command}", file=sys.stderr)
             sys.exit(1)
@@ -202,21 +288,21 @@ def main():
         sys.exit(1)
 
 
-def run_encode(args):
+def load_local_services():
     """
-    Execute the encoding workflow.
+    Create the services that run the model in this process.
     
-    Args:
-        args: Parsed command-line arguments
+    Returns:
+        Tuple of (AudioProcessor, SilentCipherService)
+        
+    Raises:
+        RuntimeError: If SilentCipher is not installed
     """
-    print("=" * 60)
-    print("Audio Watermarking - Encode")
-    print("=" * 60)
+    from services.audio_processor import AudioProcessor
+    from services.silentcipher_service import SilentCipherService
     
-    # Initialize services
     audio_processor = AudioProcessor()
     silentcipher_service = SilentCipherService()
-    message_converter = MessageConverter()
     
     # Check if SilentCipher is available
     if not silentcipher_service.is_available():
@@ -224,33 +310,28 @@ def run_encode(args):
             "SilentCipher library is not installed. "
             "Install with: pip install silentcipher"
         )
+    return audio_processor, silentcipher_service
+
+
+def print_metadata(metadata):
+    """Print the properties of the loaded input audio."""
+    print(f"    - Duration: {metadata['duration']:.2f} seconds")
+    print(f"    - Sample rate: {metadata['sample_rate']} Hz")
+    print(f"    - Channels: {metadata['channels']}")
+
+
+def convert_message(args, message_converter, size: int = 5) -> List[int]:
+    """
+    Convert the --message argument to numeric format.
     
-    # Step 1: Load input audio
-    print(f"\n[1/5] Loading input audio: {args.input}")
-    try:
-        audio_data, sample_rate = audio_processor.load_audio(args.input)
-        metadata = audio_processor.get_metadata(audio_data, sample_rate)
-        print(f"  ✓ Loaded successfully")
-        print(f"    - Duration: {metadata['duration']:.2f} seconds")
-        print(f"    - Sample rate: {metadata['sample_rate']} Hz")
-        print(f"    - Channels: {metadata['channels']}")
-        
-        # Validate audio
-        if metadata['duration'] < 3.0:
-            raise RuntimeError(
-                f"Audio too short ({metadata['duration']:.2f}s). "
-                f"SilentCipher requires at least 3 seconds of audio for reliable watermarking."
-            )
+    Args:
+        args: Parsed command-line arguments
+        message_converter: MessageConverter instance
+        size: Number of integers, fewer than 5 with a payload codec
         
-        if sample_rate not in [16000, 44100]:
-            print(f"  ⚠ Warning: Sample rate is {sample_rate}Hz.")
-            print(f"    SilentCipher works best with 16kHz or 44.1kHz.")
-            print(f"    Audio will be resampled automatically.")
-    except Exception as e:
-        raise RuntimeError(f"Failed to load audio: {e}")
-    
-    # Step 2: Convert message to numeric format
-    print(f"\n[2/5] Converting message to numeric format")
+    Returns:
+        List of 5 integers (0-255)
+    """
     print(f"  Format: {args.format}")
     print(f"  Input: {args.message}")
     
@@ -260,39 +341,36 @@ def run_encode(args):
             message_values = [int(p.strip()) for p in args.message.split(',')]
         elif args.format == 'text':
             # Convert text to numeric
-            message_values = message_converter.text_to_numeric(args.message)
+            message_values = message_converter.text_to_numeric(args.message, size)
         elif args.format == 'binary':
             # Convert binary to numeric
-            message_values = message_converter.binary_to_numeric(args.message)
+            message_values = message_converter.binary_to_numeric(args.message, size)
         else:
             raise ValueError(f"Unknown format: {args.format}")
         
         print(f"  ✓ Converted to numeric: {message_values}")
     except Exception as e:
         raise RuntimeError(f"Failed to convert message: {e}")
+    return message_values
+
+
+def run_encode(args):
+    """
+    Execute the encoding workflow.
     
-    # Step 3: Encode watermark
-    print(f"\n[3/5] Encoding watermark using SilentCipher ({args.model} model)")
-    print(f"  This may take a moment...")
-    
-    try:
-        watermarked_audio, sdr = silentcipher_service.encode_audio(
-            audio_data,
-            sample_rate,
-            message_values
-        )
-        print(f"  ✓ Encoding successful")
-        print(f"    - SDR: {sdr:.2f} dB")
-    except Exception as e:
-        raise RuntimeError(f"Failed to encode watermark: {e}")
+    Args:
+        args: Parsed command-line arguments
+    """
+    print("=" * 60)
+    print("Audio Watermarking - Encode")
+    print("=" * 60)
     
-    # Step 4: Save watermarked audio
-    print(f"\n[4/5] Saving watermarked audio: {args.output}")
-    try:
-        audio_processor.save_audio(watermarked_audio, sample_rate, args.output)
-        print(f"  ✓ Saved successfully")
-    except Exception as e:
-        raise RuntimeError(f"Failed to save audio: {e}")
+    message_converter = MessageConverter()
+    daemon = connect_daemon(args)
+    if daemon is not None:
+        sdr, message_values = encode_with_daemon(args, daemon, message_converter)
+    else:
+        sdr, message_values = encode_locally(args, message_converter)
     
     # Step 5: Optional playback
     if args.play:
@@ -319,6 +397,93 @@ def run_encode(args):
     print("=" * 60)
 
 
+def encode_locally(args, message_converter):
+    """
+    Steps 1-4 of the encoding workflow, loading the model in this process.
+    
+    Returns:
+        Tuple of (SDR, numeric message)
+    """
+    audio_processor, silentcipher_service = load_local_services()
+    
+    # Step 1: Load input audio
+    print(f"\n[1/5] Loading input audio: {args.input}")
+    try:
+        # Too short audio is rejected from the header, before decoding any sample
+        probe = audio_processor.probe_and_load(args.input, sample_rates=None, max_bytes=None, min_duration=3.0)
+        if not probe['valid']:
+            raise RuntimeError('; '.join(probe['errors']))
+        audio_data, sample_rate = probe['audio'], probe['sample_rate']
+        metadata = probe['metadata']
+        print(f"  ✓ Loaded successfully")
+        print_metadata(metadata)
+        
+        if sample_rate not in [16000, 44100]:
+            print(f"  ⚠ Warning: Sample rate is {sample_rate}Hz.")
+            print(f"    SilentCipher works best with 16kHz or 44.1kHz.")
+            print(f"    Audio will be resampled automatically.")
+    except Exception as e:
+        raise RuntimeError(f"Failed to load audio: {e}")
+    
+    # Step 2: Convert message to numeric format
+    print(f"\n[2/5] Converting message to numeric format")
+    message_values = convert_message(args, message_converter, silentcipher_service.message_bytes)
+    
+    # Step 3: Encode watermark
+    print(f"\n[3/5] Encoding watermark using SilentCipher ({args.model} model)")
+    print(f"  This may take a moment...")
+    
+    try:
+        watermarked_audio, sdr = silentcipher_service.encode_audio(
+            audio_data,
+            sample_rate,
+            message_values
+        )
+        print(f"  ✓ Encoding successful")
+        print(f"    - SDR: {sdr:.2f} dB")
+    except Exception as e:
+        raise RuntimeError(f"Failed to encode watermark: {e}")
+    
+    # Step 4: Save watermarked audio
+    print(f"\n[4/5] Saving watermarked audio: {args.output}")
+    try:
+        audio_processor.save_audio(watermarked_audio, sample_rate, args.output)
+        print(f"  ✓ Saved successfully")
+    except Exception as e:
+        raise RuntimeError(f"Failed to save audio: {e}")
+    
+    return sdr, message_values
+
+
+def encode_with_daemon(args, daemon, message_converter):
+    """
+    Steps 1-4 of the encoding workflow, run by the model daemon.
+    
+    Returns:
+        Tuple of (SDR, numeric message)
+    """
+    print(f"\n[1/5] Using the model daemon on {daemon.socket_path}")
+    
+    # Step 2: Convert message to numeric format
+    print(f"\n[2/5] Converting message to numeric format")
+    message_values = convert_message(args, message_converter, daemon.message_bytes())
+    
+    # Step 3: Encode watermark (the daemon loads, encodes and saves)
+    print(f"\n[3/5] Encoding watermark using SilentCipher ({args.model} model)")
+    try:
+        result = daemon.encode(args.input, args.output, message_values)
+    except Exception as e:
+        raise RuntimeError(f"Failed to encode watermark: {e}")
+    sdr = result['sdr']
+    print(f"  ✓ Encoding successful")
+    print_metadata(result['metadata'])
+    print(f"    - SDR: {sdr:.2f} dB")
+    
+    # Step 4: Save watermarked audio
+    print(f"\n[4/5] Saved watermarked audio: {args.output}")
+    return sdr, message_values
+
+
 def run_decode(args):
     """
     Execute the decoding workflow.
@@ -330,29 +495,25 @@ def run_decode(args):
     print("Audio Watermarking - Decode")
     print("=" * 60)
     
-    # Initialize services
-    audio_processor = AudioProcessor()
-    silentcipher_service = SilentCipherService()
     message_converter = MessageConverter()
-    
-    # Check if SilentCipher is available
-    if not silentcipher_service.is_available():
-        raise RuntimeError(
-            "SilentCipher library is not installed. "
-            "Install with: pip install silentcipher"
-        )
+    daemon = connect_daemon(args)
+    offset, duration = args.offset, args.duration
     
     # Step 1: Load input audio
     print(f"\n[1/3] Loading input audio: {args.input}")
-    try:
-        audio_data, sample_rate = audio_processor.load_audio(args.input)
-        metadata = audio_processor.get_metadata(audio_data, sample_rate)
-        print(f"  ✓ Loaded successfully")
-        print(f"    - Duration: {metadata['duration']:.2f} seconds")
-        print(f"    - Sample rate: {metadata['sample_rate']} Hz")
-        print(f"    - Channels: {metadata['channels']}")
-    except Exception as e:
-        raise RuntimeError(f"Failed to load audio: {e}")
+    if duration is not None or offset:
+        print(f"  Reading {f'{duration:g}s' if duration is not None else 'the rest'} from {offset:g}s")
+    if daemon is not None:
+        print(f"  Using the model daemon on {daemon.socket_path}")
+    else:
+        audio_processor, silentcipher_service = load_local_services()
+        try:
+            audio_data, sample_rate = audio_processor.load_audio(args.input, offset=offset, duration=duration)
+            metadata = audio_processor.get_metadata(audio_data, sample_rate)
+            print(f"  ✓ Loaded successfully")
+            print_metadata(metadata)
+        except Exception as e:
+            raise RuntimeError(f"Failed to load audio: {e}")
     
     # Step 2: Decode watermark
     print(f"\n[2/3] Decoding watermark using SilentCipher ({args.model} model)")
@@ -361,11 +522,15 @@ def run_decode(args):
     print(f"  This may take a moment...")
     
     try:
-        result = silentcipher_service.decode_audio(
-            audio_data,
-            sample_rate,
-            phase_shift_decoding=args.phase_shift
-        )
+        if daemon is not None:
+            result = daemon.decode(args.input, phase_shift_decoding=args.phase_shift, offset=offset, duration=duration)
+            print_metadata(result['metadata'])
+        else:
+            result = silentcipher_service.decode_audio(
+                audio_data,
+                sample_rate,
+                phase_shift_decoding=args.phase_shift
+            )
         
         if not result['detected']:
             print(f"  ✗ No watermark detected")
@@ -393,8 +558,8 @@ def run_decode(args):
     
     # Convert to other formats
     try:
-        text_message = message_converter.numeric_to_text(message_values)
-        binary_message = message_converter.numeric_to_binary(message_values)
+        text_message = message_converter.numeric_to_text(message_values, len(message_values))
+        binary_message = message_converter.numeric_to_binary(message_values, len(message_values))
     except Exception as e:
         print(f"  ⚠ Warning: Could not convert to all formats: {e}")
         text_message = "(conversion failed)"
@@ -427,6 +592,39 @@ def run_decode(args):
     print("=" * 60)
 
 
+def run_daemon(args):
+    """
+    Run, stop or query the model daemon.
+    
+    Args:
+        args: Parsed command-line arguments
+    """
+    socket_path = args.socket or default_socket_path()
+    daemon = DaemonClient.connect(socket_path)
+    
+    if args.status:
+        if daemon is None:
+            print(f"No daemon running on {socket_path}")
+        else:
+            status = daemon.ping()
+            print(f"Daemon running on {socket_path} (pid {status['pid']}, {status['requests_served']} requests served)")
+        return
+    
+    if args.stop:
+        if daemon is None:
+            print(f"No daemon running on {socket_path}")
+        else:
+            daemon.shutdown()
+            print(f"Daemon on {socket_path} stopped")
+        return
+    
+    print(f"Loading the model and listening on {socket_path} (stop with Ctrl+C or 'daemon --stop')")
+    from services.silentcipher_service import SilentCipherService
+    from utils.payload_codec import PayloadCodec
+    service = SilentCipherService(codec=PayloadCodec(args.parity) if args.parity else None)
+    WatermarkDaemon(socket_path, service=service).serve_forever()
+
+
 def play_audio(file_path: str):
     """
     Play audio file using pygame (optional feature).
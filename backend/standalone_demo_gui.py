@@ -7,6 +7,9 @@ functionality. This provides a graphical alternative to the CLI interface.
 
 Usage:
     python standalone_demo_gui.py
+
+When a model daemon is running (python standalone_demo.py daemon), the GUI
+sends its requests there instead of loading the model itself.
 """
 
 import tkinter as tk
@@ -18,8 +21,7 @@ import threading
 # Add parent directory to path to import backend modules
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from services.audio_processor import AudioProcessor
-from services.silentcipher_service import SilentCipherService
+from services.model_daemon import DaemonClient
 from utils.message_converter import MessageConverter
 
 
@@ -37,10 +39,20 @@ class WatermarkingGUI:
         self.root.title("Audio Watermarking Demo")
         self.root.geometry("700x600")
         
-        # Initialize services
+        # Initialize services, the model daemon holds the loaded model when it is running
+        self.message_converter = MessageConverter()
+        self.daemon = DaemonClient.connect()
+        self.audio_processor = None
+        self.silentcipher_service = None
+        if self.daemon is not None:
+            self.root.title(f"Audio Watermarking Demo (daemon: {self.daemon.socket_path})")
+            self.create_widgets()
+            return
+        
+        from services.audio_processor import AudioProcessor
+        from services.silentcipher_service import SilentCipherService
         self.audio_processor = AudioProcessor()
         self.silentcipher_service = SilentCipherService()
-        self.message_converter = MessageConverter()
         
         # Check if SilentCipher is available
         if not self.silentcipher_service.is_available():
@@ -220,49 +232,49 @@ class WatermarkingGUI:
     def _encode_thread(self, input_file, output_file, message, format_type):
         """Execute encoding in a separate thread."""
         try:
-            # Load audio
-            self._update_results(self.encode_results, "Loading audio...\n")
-            audio_data, sample_rate = self.audio_processor.load_audio(input_file)
-            
-            # Validate audio
-            metadata = self.audio_processor.get_metadata(audio_data, sample_rate)
-            
-            # Check duration
-            if metadata['duration'] < 3.0:
-                raise ValueError(
-                    f"Audio too short ({metadata['duration']:.2f}s). "
-                    f"SilentCipher requires at least 3 seconds of audio for reliable watermarking."
-                )
-            
-            # Check sample rate
-            if sample_rate not in [16000, 44100]:
-                self._update_results(
-                    self.encode_results,
-                    f"⚠ Warning: Sample rate is {sample_rate}Hz. "
-                    f"SilentCipher works best with 16kHz or 44.1kHz.\n"
-                    f"Audio will be resampled automatically.\n"
-                )
+            if self.daemon is None:
+                # Load audio
+                self._update_results(self.encode_results, "Loading audio...\n")
+                # Too short audio is rejected from the header, before decoding any sample
+                probe = self.audio_processor.probe_and_load(input_file, sample_rates=None, max_bytes=None, min_duration=3.0)
+                if not probe['valid']:
+                    raise ValueError('; '.join(probe['errors']))
+                audio_data, sample_rate = probe['audio'], probe['sample_rate']
+                
+                # Check sample rate
+                if sample_rate not in [16000, 44100]:
+                    self._update_results(
+                        self.encode_results,
+                        f"⚠ Warning: Sample rate is {sample_rate}Hz. "
+                        f"SilentCipher works best with 16kHz or 44.1kHz.\n"
+                        f"Audio will be resampled automatically.\n"
+                    )
             
             # Convert message
             self._update_results(self.encode_results, f"Converting message (format: {format_type})...\n")
+            message_bytes = self.daemon.message_bytes() if self.daemon is not None else self.silentcipher_service.message_bytes
             if format_type == 'numeric':
                 message_values = [int(p.strip()) for p in message.split(',')]
             elif format_type == 'text':
-                message_values = self.message_converter.text_to_numeric(message)
+                message_values = self.message_converter.text_to_numeric(message, message_bytes)
             elif format_type == 'binary':
-                message_values = self.message_converter.binary_to_numeric(message)
+                message_values = self.message_converter.binary_to_numeric(message, message_bytes)
             
             self._update_results(self.encode_results, f"Message (numeric): {message_values}\n")
             
             # Encode watermark
             self._update_results(self.encode_results, "Encoding watermark...\n")
-            watermarked_audio, sdr = self.silentcipher_service.encode_audio(
-                audio_data, sample_rate, message_values
-            )
-            
-            # Save audio
-            self._update_results(self.encode_results, "Saving watermarked audio...\n")
-            self.audio_processor.save_audio(watermarked_audio, sample_rate, output_file)
+            if self.daemon is not None:
+                # The daemon loads, encodes and saves the file
+                sdr = self.daemon.encode(input_file, output_file, message_values)['sdr']
+            else:
+                watermarked_audio, sdr = self.silentcipher_service.encode_audio(
+                    audio_data, sample_rate, message_values
+                )
+                
+                # Save audio
+                self._update_results(self.encode_results, "Saving watermarked audio...\n")
+                self.audio_processor.save_audio(watermarked_audio, sample_rate, output_file)
             
             # Display results
             self._update_results(
@@ -311,13 +323,17 @@ class WatermarkingGUI:
     def _decode_thread(self, input_file):
         """Execute decoding in a separate thread."""
         try:
-            # Load audio
-            self._update_results(self.decode_results, "Loading audio...\n")
-            audio_data, sample_rate = self.audio_processor.load_audio(input_file)
-            
-            # Decode watermark
-            self._update_results(self.decode_results, "Decoding watermark...\n")
-            result = self.silentcipher_service.decode_audio(audio_data, sample_rate)
+            if self.daemon is not None:
+                self._update_results(self.decode_results, "Decoding watermark...\n")
+                result = self.daemon.decode(input_file)
+            else:
+                # Load audio
+                self._update_results(self.decode_results, "Loading audio...\n")
+                audio_data, sample_rate = self.audio_processor.load_audio(input_file)
+                
+                # Decode watermark
+                self._update_results(self.decode_results, "Decoding watermark...\n")
+                result = self.silentcipher_service.decode_audio(audio_data, sample_rate)
             
             if not result['detected']:
                 self._update_results(
@@ -332,8 +348,8 @@ class WatermarkingGUI:
             
             # Convert message to other formats
             message_values = result['message']
-            text_message = self.message_converter.numeric_to_text(message_values)
-            binary_message = self.message_converter.numeric_to_binary(message_values)
+            text_message = self.message_converter.numeric_to_text(message_values, len(message_values))
+            binary_message = self.message_converter.numeric_to_binary(message_values, len(message_values))
             
             # Display results
             confidence = result.get('confidence', 'N/A')
@@ -0,0 +1,180 @@
+"""
+Tests for the incremental archive scanner and its index
+"""
+
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import archive_scanner
+from archive_scanner import scan
+from services.scan_index import ScanIndex
+from utils.payload_codec import PayloadCodec
+
+
+class FakeService:
+    """Detects a message holding the peak amplitude in percent, nothing in silence"""
+
+    def __init__(self):
+        self.decoded = 0
+        self.fail_after = None
+        self.codec = None
+
+    def decode_audio(self, audio_data, sample_rate, phase_shift_decoding=False):
+        if self.fail_after is not None and self.decoded >= self.fail_after:
+            raise KeyboardInterrupt
+        self.decoded += 1
+        peak = float(np.abs(audio_data).max())
+        if peak < 0.01:
+            return {'detected': False, 'message': None, 'confidence': None}
+        if self.codec is not None:
+            message = [0, 0, round(peak * 100)]
+            return {'detected': True, 'message': message, 'confidence': peak, 'payload': self.codec.encode(message),
+                    'corrected': 0}
+        return {'detected': True, 'message': [0, 0, 0, 0, round(peak * 100)], 'confidence': peak}
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = FakeService()
+
+    def init_worker(options):
+        archive_scanner._worker.update(options, service=service, audio_processor=archive_scanner.AudioProcessor())
+
+    monkeypatch.setattr(archive_scanner, '_init_worker', init_worker)
+    return service
+
+
+def write_clip(path, amplitude):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    sf.write(path, amplitude * np.sin(2 * np.pi * 440 * np.arange(16000) / 16000), 16000)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    root = tmp_path / 'archive'
+    write_clip(str(root / 'a.wav'), 0.5)
+    write_clip(str(root / '2024' / 'b.wav'), 0.3)
+    write_clip(str(root / '2024' / 'silence.wav'), 0.0)
+    shutil.copy(root / 'a.wav', root / '2024' / 'a-copy.wav')
+    (root / 'notes.txt').write_text('not audio')
+    (root / 'broken.wav').write_bytes(b'RIFF' + b'\0' * 64)
+    return root
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = ScanIndex(str(tmp_path / 'index.db'))
+    yield index
+    index.close()
+
+
+OPTIONS = {'phase_shift': False, 'duration': None, 'parity': 0, 'device': 'cpu', 'threads': None}
+
+
+class TestScan:
+    """Tests for incremental scans"""
+
+    def test_first_scan_decodes_each_content_once(self, archive, index, service):
+        summary = scan(str(archive), index, OPTIONS, workers=0)
+
+        assert summary['files'] == 5
+        assert summary['hashed'] == 5
+        # The copy of a.wav shares its result
+        assert summary['decoded'] == 4 and service.decoded == 3
+        assert summary['errors'] == 1
+        assert index.stats() == {'files': 5, 'detected': 3, 'errors': 1, 'messages': 2}
+
+    def test_rescan_only_touches_changes(self, archive, index, service):
+        scan(str(archive), index, OPTIONS, workers=0)
+        summary = scan(str(archive), index, OPTIONS, workers=0)
+        assert (summary['unchanged'], summary['hashed'], summary['decoded']) == (5, 0, 0)
+
+        # A touched file is hashed again but not decoded, a modified one is decoded
+        os.utime(archive / 'a.wav', ns=(0, 10 ** 9))
+        write_clip(str(archive / '2024' / 'b.wav'), 0.2)
+        shutil.copy(archive / 'a.wav', archive / 'moved.wav')
+        summary = scan(str(archive), index, OPTIONS, workers=0)
+        assert (summary['hashed'], summary['decoded']) == (3, 1)
+        assert index.query(path=str(archive / '2024' / 'b.wav'))[0]['message'] == [0, 0, 0, 0, 20]
+        assert index.query(path='*/moved.wav')[0]['message'] == [0, 0, 0, 0, 50]
+
+        # Other decode settings decode everything again, failed files only on request
+        options = dict(OPTIONS, duration=0.5)
+        assert scan(str(archive), index, options, workers=0)['decoded'] == 4
+        assert scan(str(archive), index, options, workers=0)['decoded'] == 0
+        assert scan(str(archive), index, options, workers=0, retry_errors=True)['decoded'] == 1
+
+    def test_interrupted_scan_resumes(self, archive, index, service):
+        service.fail_after = 2
+        with pytest.raises(KeyboardInterrupt):
+            scan(str(archive), index, OPTIONS, workers=0)
+        # a.wav and its copy, and b.wav
+        assert len(index.query(detected=True)) == 3
+
+        service.fail_after = None
+        summary = scan(str(archive), index, OPTIONS, workers=0)
+        # Hashes survived the interruption, only the missing results are decoded
+        assert (summary['hashed'], summary['decoded']) == (0, 2)
+        assert service.decoded == 3
+
+    def test_codec_payloads(self, archive, index, service, capsys, tmp_path):
+        service.codec = PayloadCodec(4)
+        options = dict(OPTIONS, parity=4)
+        summary = scan(str(archive), index, options, workers=0)
+        assert (summary['decoded'], summary['errors']) == (4, 1)
+        # The index holds the embedded payloads
+        payload = service.codec.encode([0, 0, 50])
+        assert [os.path.basename(row['path']) for row in index.query(message=payload)] == ['a-copy.wav', 'a.wav']
+        # Results decoded without the codec are decoded again
+        assert scan(str(archive), index, OPTIONS, workers=0)['decoded'] == 4
+
+        database = str(tmp_path / 'codec.db')
+        archive_scanner.main(['scan', str(archive), '--index', database, '--workers', '0', '--parity', '4'])
+        capsys.readouterr()
+        archive_scanner.main(['query', '--index', database, '--parity', '4', '--message', '0,0,30', '--json'])
+        [row] = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert row['path'] == str(archive / '2024' / 'b.wav')
+        with pytest.raises(SystemExit):
+            archive_scanner.main(['query', '--index', database, '--parity', '4', '--message', '0,0,0,0,30'])
+
+    def test_prune(self, archive, index, service):
+        scan(str(archive), index, OPTIONS, workers=0)
+        os.remove(archive / '2024' / 'a-copy.wav')
+        assert scan(str(archive), index, OPTIONS, workers=0, prune=True)['pruned'] == 1
+        assert index.stats()['files'] == 4
+
+
+class TestQuery:
+    """Tests for querying the index"""
+
+    def test_query(self, archive, index, service):
+        scan(str(archive), index, OPTIONS, workers=0)
+
+        assert [os.path.basename(row['path']) for row in index.query(message=[0, 0, 0, 0, 50])] == [
+            'a-copy.wav', 'a.wav']
+        assert [os.path.basename(row['path']) for row in index.query(min_confidence=0.4)] == ['a-copy.wav', 'a.wav']
+        assert [os.path.basename(row['path']) for row in index.query(path=str(archive / '2024' / '*'),
+                                                                     detected=False)] == ['silence.wav']
+        [broken] = index.query(path='*/broken.wav')
+        assert broken['detected'] is False and broken['error']
+        assert len(index.query(limit=2)) == 2
+
+    def test_command_line(self, archive, tmp_path, service, capsys):
+        database = str(tmp_path / 'cli.db')
+        archive_scanner.main(['scan', str(archive), '--index', database, '--workers', '0'])
+        assert '5 files: 0 unchanged, 5 hashed, 4 decoded (1 failed)' in capsys.readouterr().out
+
+        archive_scanner.main(['query', '--index', database, '--message', '0,0,0,0,30', '--json'])
+        [row] = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+        assert row['path'] == str(archive / '2024' / 'b.wav') and row['confidence'] == pytest.approx(0.3, abs=1e-3)
+
+        with pytest.raises(SystemExit):
+            archive_scanner.main(['query', '--index', database, '--message', '1,2,3'])
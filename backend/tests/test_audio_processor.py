@@ -81,6 +81,92 @@ class TestLoadAudio:
         assert sample_rate == 44100
         assert audio_data is not None
 
+    
+    def test_load_partial(self, audio_processor, temp_wav_file, sample_audio_mono):
+        """Test reading only part of the file"""
+        audio, sample_rate = sample_audio_mono
+        audio_data, _ = audio_processor.load_audio(temp_wav_file, offset=0.25, duration=0.5)
+        
+        assert audio_data.shape == (1, 8000)
+        np.testing.assert_allclose(audio_data[0], audio[4000:12000], atol=1e-4)
+        
+        # The duration is clipped at the end of the file
+        audio_data, _ = audio_processor.load_audio(temp_wav_file, offset=0.75, duration=10)
+        assert audio_data.shape == (1, 4000)
+    
+    def test_load_offset_past_end(self, audio_processor, temp_wav_file):
+        """Test an offset past the end raises error"""
+        with pytest.raises(ValueError, match="past the end"):
+            audio_processor.load_audio(temp_wav_file, offset=5.0)
+    
+    def test_load_dtype(self, audio_processor, temp_wav_file, sample_audio_mono):
+        """Test the sample type of loaded audio"""
+        audio, _ = sample_audio_mono
+        assert audio_processor.load_audio(temp_wav_file)[0].dtype == np.float32
+        assert audio_processor.load_audio(temp_wav_file, dtype='float64')[0].dtype == np.float64
+        
+        pcm, _ = audio_processor.load_audio(temp_wav_file, dtype='int16')
+        assert pcm.dtype == np.int16
+        assert abs(int(pcm[0, 100]) - round(audio[100] * 32767)) <= 1
+        
+        with pytest.raises(ValueError, match="float dtype"):
+            audio_processor.load_audio(temp_wav_file, sr=44100, dtype='int16')
+    
+    def test_load_stereo_layout(self, audio_processor, sample_audio_stereo):
+        """Test stereo audio loads as (channels, samples)"""
+        import soundfile as sf
+        audio, sample_rate = sample_audio_stereo
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'stereo.flac')
+            sf.write(path, audio.T, sample_rate)
+            audio_data, _ = audio_processor.load_audio(path, duration=0.5)
+        
+        assert audio_data.shape == (2, 22050)
+        np.testing.assert_allclose(audio_data[1], audio[1, :22050], atol=1e-4)
+
+
+class TestPartialReads:
+    """Tests for block iteration and memory-mapped WAV access"""
+    
+    def test_iter_blocks(self, audio_processor, temp_wav_file, sample_audio_mono):
+        """Test blocks cover the file with the requested overlap"""
+        audio, _ = sample_audio_mono
+        blocks = list(audio_processor.iter_blocks(temp_wav_file, block_seconds=0.3, overlap_seconds=0.1))
+        
+        assert all(block.shape[0] == 1 for block in blocks)
+        assert [block.shape[1] for block in blocks[:-1]] == [4800] * (len(blocks) - 1)
+        np.testing.assert_allclose(blocks[1][0], audio[3200:8000], atol=1e-4)
+        
+        with pytest.raises(ValueError, match="overlap"):
+            next(audio_processor.iter_blocks(temp_wav_file, block_seconds=0.1, overlap_seconds=0.1))
+    
+    def test_memmap_wav(self, audio_processor, sample_audio_stereo):
+        """Test mapping PCM and float WAV files"""
+        import soundfile as sf
+        audio, sample_rate = sample_audio_stereo
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for subtype, dtype in [('PCM_16', np.int16), ('FLOAT', np.float32)]:
+                path = os.path.join(temp_dir, f'{subtype}.wav')
+                sf.write(path, audio.T, sample_rate, subtype=subtype)
+                mapped, mapped_rate = audio_processor.memmap_wav(path)
+                
+                assert mapped_rate == sample_rate
+                assert mapped.shape == audio.shape
+                assert mapped.dtype == dtype
+                expected, _ = audio_processor.load_audio(path, dtype=np.dtype(dtype).name)
+                np.testing.assert_array_equal(mapped[:, 1000:2000], expected[:, 1000:2000])
+                del mapped
+            
+            path = os.path.join(temp_dir, 'pcm24.wav')
+            sf.write(path, audio.T, sample_rate, subtype='PCM_24')
+            with pytest.raises(ValueError, match="24-bit"):
+                audio_processor.memmap_wav(path)
+            
+            path = os.path.join(temp_dir, 'audio.flac')
+            sf.write(path, audio.T, sample_rate)
+            with pytest.raises(ValueError, match="Not a RIFF WAV"):
+                audio_processor.memmap_wav(path)
+
 
 class TestSaveAudio:
     """Tests for save_audio method"""
@@ -189,6 +275,113 @@ class TestValidateFormat:
                 os.remove(temp_path)
 
 
+class TestProbeAndLoad:
+    """Tests for probe_and_load method"""
+    
+    def test_probe_and_load(self, audio_processor, temp_wav_file, sample_audio_mono):
+        """Test validation and loading from one open"""
+        audio, sample_rate = sample_audio_mono
+        result = audio_processor.probe_and_load(temp_wav_file, offset=0.5)
+        
+        assert result['valid'] is True
+        assert result['format'] == '.wav'
+        assert result['metadata'] == {'duration': 1.0, 'sample_rate': 16000, 'channels': 1, 'samples': 16000}
+        assert result['audio'].shape == (1, 8000)
+        np.testing.assert_allclose(result['audio'][0], audio[8000:], atol=1e-4)
+    
+    def test_invalid_files_are_not_decoded(self, audio_processor, temp_wav_file, monkeypatch):
+        """Test rejected files are validated from the header only"""
+        import soundfile as sf
+        
+        def read(*args, **kwargs):
+            raise AssertionError("samples were decoded")
+        monkeypatch.setattr(sf.SoundFile, 'read', read)
+        
+        result = audio_processor.probe_and_load(temp_wav_file, min_duration=3.0, max_bytes=1000)
+        assert result['valid'] is False
+        assert result['audio'] is None
+        assert any('too short' in err for err in result['errors'])
+        assert any('exceeds maximum' in err for err in result['errors'])
+        
+        result = audio_processor.probe_and_load(temp_wav_file, sample_rates=[44100])
+        assert any('Unsupported sample rate' in err for err in result['errors'])
+    
+    def test_file_object_and_lazy_reader(self, audio_processor, temp_wav_file):
+        """Test probing an open upload stream and reading it lazily"""
+        import io
+        with open(temp_wav_file, 'rb') as f:
+            upload = io.BytesIO(f.read())
+        
+        result = audio_processor.probe_and_load(upload, read='lazy', offset=0.25)
+        assert result['valid'] is True
+        assert result['format'] == '.wav'
+        assert result['audio'] is None
+        with result['reader'] as reader:
+            assert reader.tell() == 4000
+            assert reader.read(100).shape == (100,)
+    
+    def test_unreadable_file(self, audio_processor):
+        """Test a file that is not audio"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'audio.wav')
+            with open(path, 'wb') as f:
+                f.write(b'not audio' * 100)
+            result = audio_processor.probe_and_load(path)
+        
+        assert result['valid'] is False
+        assert result['format'] == '.wav'
+        assert any('Failed to read audio file' in err for err in result['errors'])
+
+
+
+class TestIngestStream:
+    """Test cases for streaming uploads to disk"""
+    
+    def test_ingest_stream(self, audio_processor, temp_wav_file):
+        """Test the upload is copied in chunks and hashed"""
+        import hashlib
+        import io
+        with open(temp_wav_file, 'rb') as f:
+            content = f.read()
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'upload.wav')
+            result = audio_processor.ingest_stream(io.BytesIO(content), path, chunk_size=1000)
+            with open(path, 'rb') as f:
+                assert f.read() == content
+        
+        assert result == {'path': path, 'size': len(content), 'sha256': hashlib.sha256(content).hexdigest(),
+                          'format': '.wav'}
+    
+    def test_rejected_uploads_are_removed(self, audio_processor, temp_wav_file):
+        """Test oversized and non-audio uploads stop early and leave no file behind"""
+        import io
+        
+        class Upload(io.BytesIO):
+            def read(self, size=-1):
+                self.reads = getattr(self, 'reads', 0) + 1
+                return super().read(size)
+        
+        with open(temp_wav_file, 'rb') as f:
+            content = f.read()
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'upload.wav')
+            upload = Upload(content)
+            with pytest.raises(ValueError, match='exceeds maximum'):
+                audio_processor.ingest_stream(upload, path, max_bytes=2500, chunk_size=1000)
+            # The rest of the stream is not read once the limit is exceeded
+            assert upload.reads == 3
+            assert not os.path.exists(path)
+            
+            with pytest.raises(ValueError, match='Not a recognised audio file'):
+                audio_processor.ingest_stream(io.BytesIO(b'not audio' * 100), path)
+            with pytest.raises(ValueError, match='Unsupported format: .mp3'):
+                audio_processor.ingest_stream(io.BytesIO(b'ID3' + bytes(100)), path)
+            with pytest.raises(ValueError, match='empty'):
+                audio_processor.ingest_stream(io.BytesIO(), path)
+            assert not os.path.exists(path)
+
 class TestGetMetadata:
     """Tests for get_metadata method"""
     
@@ -292,6 +485,19 @@ class TestResampleAudio:
         expected_length = int(len(audio) * target_rate / sample_rate)
         assert abs(len(resampled) - expected_length) <= 1
     
+    def test_resample_multichannel(self, audio_processor):
+        """Test resampling every channel of (channels, samples) audio"""
+        sample_rate = 16000
+        target_rate = 44100
+        t = np.arange(sample_rate) / sample_rate
+        audio = np.stack([0.5 * np.sin(2 * np.pi * 440 * t), 0.3 * np.sin(2 * np.pi * 880 * t)])
+        
+        resampled = audio_processor.resample_audio(audio, sample_rate, target_rate)
+        
+        assert resampled.shape[0] == 2
+        assert abs(resampled.shape[1] - len(t) * target_rate / sample_rate) <= 1
+        assert np.allclose(resampled[1], audio_processor.resample_audio(audio[1], sample_rate, target_rate))
+    
     def test_resample_same_rate(self, audio_processor, sample_audio_mono):
         """Test resampling to same rate returns unchanged"""
         audio, sample_rate = sample_audio_mono
@@ -299,3 +505,79 @@ class TestResampleAudio:
         resampled = audio_processor.resample_audio(audio, sample_rate, sample_rate)
         
         assert np.array_equal(resampled, audio)
+
+
+class TestDistortionChain:
+    """Tests for apply_distortion_chain and generate_variants methods"""
+    
+    CHAIN = [
+        {'type': 'amplitude', 'gain_db': -3.0},
+        {'type': 'resample', 'sample_rate': 16000},
+        {'type': 'compression', 'bitrate': 64},
+        {'type': 'noise', 'level_db': -25.0},
+    ]
+    
+    def test_chain_is_reproducible(self, audio_processor, sample_audio_stereo):
+        """Test the same seed gives the same float32 output"""
+        audio, sample_rate = sample_audio_stereo
+        
+        first, rate = audio_processor.apply_distortion_chain(audio, sample_rate, self.CHAIN, seed=7)
+        second, _ = audio_processor.apply_distortion_chain(audio, sample_rate, self.CHAIN, seed=7)
+        other, _ = audio_processor.apply_distortion_chain(audio, sample_rate, self.CHAIN, seed=8)
+        
+        assert rate == sample_rate
+        assert first.shape == audio.shape
+        assert first.dtype == np.float32
+        assert np.array_equal(first, second)
+        assert not np.array_equal(first, other)
+    
+    def test_deterministic_operations(self, audio_processor, sample_audio_mono):
+        """Test amplitude, crop, low-pass and resampling"""
+        audio, sample_rate = sample_audio_mono
+        
+        out, rate = audio_processor.apply_distortion_chain(audio, sample_rate, [
+            {'type': 'crop', 'start': 0.25, 'duration': 0.5},
+            {'type': 'amplitude', 'gain_db': -6.0},
+        ])
+        assert rate == sample_rate
+        assert out.shape == (8000,)
+        np.testing.assert_allclose(out, audio[4000:12000] * 10 ** (-6 / 20), atol=1e-6)
+        
+        out, rate = audio_processor.apply_distortion_chain(audio, sample_rate, [
+            {'type': 'resample', 'sample_rate': 8000, 'round_trip': False}
+        ])
+        assert rate == 8000
+        assert abs(len(out) - 8000) <= 1
+        
+        # A 440 Hz tone passes a 2 kHz low-pass, a 6 kHz one does not
+        t = np.arange(sample_rate) / sample_rate
+        tones = np.stack([np.sin(2 * np.pi * 440 * t), np.sin(2 * np.pi * 6000 * t)])
+        out, _ = audio_processor.apply_distortion_chain(tones, sample_rate, [{'type': 'lowpass', 'cutoff_hz': 2000}])
+        assert np.std(out[0]) > 0.99 * np.std(tones[0])
+        assert np.std(out[1]) < 0.01 * np.std(tones[1])
+    
+    def test_invalid_operations(self, audio_processor, sample_audio_mono):
+        """Test invalid operations are rejected before any processing"""
+        audio, sample_rate = sample_audio_mono
+        with pytest.raises(ValueError, match="Unknown distortion"):
+            audio_processor.apply_distortion_chain(audio, sample_rate, [{'type': 'reverb'}])
+        with pytest.raises(ValueError, match="Unknown parameters"):
+            audio_processor.apply_distortion_chain(audio, sample_rate, [{'type': 'noise', 'snr': 10}])
+        with pytest.raises(ValueError, match="requires cutoff_hz"):
+            audio_processor.apply_distortion_chain(audio, sample_rate, [{'type': 'lowpass'}])
+    
+    def test_variants(self, audio_processor, sample_audio_stereo):
+        """Test batched variants match individual chains and get independent noise"""
+        audio, sample_rate = sample_audio_stereo
+        deterministic = self.CHAIN[:2] + [{'type': 'lowpass', 'cutoff_hz': 4000}]
+        
+        variants = audio_processor.generate_variants(
+            audio, sample_rate, [self.CHAIN, self.CHAIN, deterministic, self.CHAIN[:2]], seed=0)
+        
+        assert len(variants) == 4
+        assert all(out.shape == audio.shape and rate == sample_rate for out, rate in variants)
+        assert not np.allclose(variants[0][0], variants[1][0])
+        expected, _ = audio_processor.apply_distortion_chain(audio, sample_rate, deterministic)
+        np.testing.assert_allclose(variants[2][0], expected, atol=1e-6)
+        expected, _ = audio_processor.apply_distortion_chain(audio, sample_rate, self.CHAIN[:2])
+        np.testing.assert_allclose(variants[3][0], expected, atol=1e-6)
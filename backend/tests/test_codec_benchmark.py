@@ -0,0 +1,85 @@
+"""
+Tests for the payload codec benchmark
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import codec_benchmark
+from codec_benchmark import evaluate_file, summarize
+from robustness_benchmark import build_grid
+from services.audio_processor import AudioProcessor
+from utils.payload_codec import PayloadCodec
+
+
+class FakeService:
+    """Decodes the last payload with one wrong nibble per second of audio missing below 3 seconds"""
+
+    def encode_audio(self, audio_data, sample_rate, message):
+        self.payload = list(message)
+        return audio_data, 40.0
+
+    def decode_audio_batch(self, audio_list, sample_rate, phase_shift_decoding=False):
+        results = []
+        for audio in audio_list:
+            seconds = audio.shape[-1] / sample_rate
+            if seconds < 0.75:
+                results.append({'detected': False, 'message': None, 'confidence': None})
+                continue
+            decoded = list(self.payload)
+            for position in range(max(0, int(np.ceil(3 - seconds)))):
+                decoded[position] ^= 0x01
+            results.append({'detected': True, 'message': decoded, 'confidence': 0.5})
+        return results
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    t = np.arange(4 * 16000) / 16000
+    sf.write(str(tmp_path / 'clip.wav'), 0.3 * np.sin(2 * np.pi * 440 * t), 16000)
+    sf.write(str(tmp_path / 'short.wav'), np.zeros(8000), 16000)
+    return tmp_path
+
+
+class TestCodecBenchmark:
+    """Tests for evaluating excerpts and the success rates"""
+
+    def test_evaluate_and_summarize(self, corpus):
+        grid = build_grid(['none'])
+        seconds = [0.5, 1.0, 2.0, 3.0, 8.0]
+        result = evaluate_file(str(corpus / 'clip.wav'), grid, seconds, PayloadCodec(6), FakeService(),
+                               AudioProcessor(), batch_size=2)
+        # The 8 second excerpt is longer than the clip
+        assert [r['seconds'] for r in result['results']] == [0.5, 1.0, 2.0, 3.0]
+        summary = summarize([result, {'file': 'short.wav', 'error': 'too short'}], parity=6, target=1.0)
+
+        rows = {row['seconds']: row for row in summary['matrix']}
+        assert rows[0.5]['detection_rate'] == 0.0
+        assert [rows[s]['exact_rate'] for s in (1.0, 2.0, 3.0)] == [0.0, 0.0, 1.0]
+        # 2 wrong nibbles at 1 second, 1 at 2 seconds
+        assert [rows[s]['codec'][2]['success_rate'] for s in (1.0, 2.0, 3.0)] == [1.0, 1.0, 1.0]
+        assert [rows[s]['codec'][1]['success_rate'] for s in (1.0, 2.0, 3.0)] == [0.0, 1.0, 1.0]
+        assert rows[1.0]['codec'][1]['false_rate'] == 0.0
+        assert summary['seconds_needed'] == [{'attack': 'none', 'strength': None, 'raw': 3.0, 'codec_0': 3.0,
+                                              'codec_1': 2.0, 'codec_2': 1.0, 'codec_3': 1.0}]
+        assert summary['failed_files'] == [{'file': 'short.wav', 'error': 'too short'}]
+
+    def test_command_line(self, corpus, monkeypatch, capsys):
+        def init_worker(options):
+            codec_benchmark._worker.update(options, service=FakeService(), audio_processor=AudioProcessor(),
+                                           codec=PayloadCodec(options['parity']))
+        monkeypatch.setattr(codec_benchmark, '_init_worker', init_worker)
+        report = str(corpus / 'report.json')
+        codec_benchmark.main(['--corpus', str(corpus), '--workers', '0', '--seconds', '1', '2',
+                              '--report', report])
+
+        assert 'none: raw >2s, fix 0 >2s, fix 1 2s, fix 2 1s' in capsys.readouterr().out
+        with open(report) as f:
+            assert json.load(f)['files'] == 1
@@ -0,0 +1,279 @@
+"""
+Tests for the job queue and the job-based encode/decode API
+"""
+
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.job_queue import JobQueue, QueueFullError
+
+
+def wait_for(jobs, job_id, statuses=('succeeded', 'failed', 'timed_out'), timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = jobs.get(job_id)
+        if job['status'] in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} is still {jobs.get(job_id)['status']}")
+
+
+class TestJobQueue:
+    """Tests for JobQueue"""
+
+    def test_job_lifecycle(self):
+        updates = []
+        jobs = JobQueue({'double': lambda job_id, payload: {'value': payload['value'] * 2}},
+                        workers=1, on_update=lambda job: updates.append(job['status']))
+        try:
+            job_id = jobs.submit('double', {'value': 21})
+            job = wait_for(jobs, job_id)
+            assert job['status'] == 'succeeded'
+            assert job['result'] == {'value': 42}
+            assert job['started_at'] >= job['created_at']
+            assert updates == ['queued', 'running', 'succeeded']
+            assert jobs.get('missing') is None
+            with pytest.raises(ValueError, match="Unknown operation"):
+                jobs.submit('triple', {})
+        finally:
+            jobs.shutdown()
+
+    def test_failed_job(self):
+        def fail(job_id, payload):
+            raise RuntimeError('model exploded')
+        jobs = JobQueue({'fail': fail}, workers=1)
+        try:
+            job = wait_for(jobs, jobs.submit('fail', {}))
+            assert job['status'] == 'failed'
+            assert job['error'] == 'model exploded'
+            assert jobs.metrics()['failed'] == 1
+        finally:
+            jobs.shutdown()
+
+    def test_concurrency_and_queue_limit(self):
+        release = threading.Event()
+        running = []
+
+        def block(job_id, payload):
+            running.append(job_id)
+            release.wait(5)
+            return {}
+
+        jobs = JobQueue({'block': block}, workers=2, max_queued=2)
+        try:
+            ids = [jobs.submit('block', {}) for _ in range(2)]
+            for _ in range(100):
+                if len(running) == 2:
+                    break
+                time.sleep(0.01)
+            # Both workers are busy, two more jobs fit in the queue
+            ids += [jobs.submit('block', {}) for _ in range(2)]
+            with pytest.raises(QueueFullError):
+                jobs.submit('block', {})
+
+            metrics = jobs.metrics()
+            assert metrics['running'] == 2
+            assert metrics['queue_depth'] == 2
+            assert metrics['rejected'] == 1
+
+            release.set()
+            for job_id in ids:
+                assert wait_for(jobs, job_id)['status'] == 'succeeded'
+            assert jobs.metrics()['succeeded'] == 4
+        finally:
+            release.set()
+            jobs.shutdown()
+
+    def test_timeout_does_not_add_workers(self):
+        release = threading.Event()
+
+        def work(job_id, payload):
+            if payload.get('hang'):
+                release.wait(5)
+            return {'done': True}
+
+        jobs = JobQueue({'work': work}, workers=1, job_timeout=0.1)
+        try:
+            hung = jobs.submit('work', {'hang': True})
+            job = wait_for(jobs, hung)
+            assert job['status'] == 'timed_out'
+            assert 'timeout' in job['error']
+            assert jobs.metrics()['stuck_workers'] == 1
+            # No replacement worker, the next job waits for the hung one to return
+            queued = jobs.submit('work', {'hang': True})
+            time.sleep(0.2)
+            assert jobs.get(queued)['status'] == 'queued'
+            release.set()
+            assert wait_for(jobs, queued)['status'] == 'succeeded'
+            # The late result of the timed out job is discarded
+            assert jobs.get(hung)['status'] == 'timed_out'
+            assert jobs.metrics()['timed_out'] == 1 and jobs.metrics()['stuck_workers'] == 0
+            assert len(jobs._threads) == 1
+        finally:
+            release.set()
+            jobs.shutdown()
+
+    def test_finished_jobs_expire(self):
+        discarded = []
+        jobs = JobQueue({'noop': lambda job_id, payload: {}}, workers=1, result_ttl=0.0,
+                        on_discard=discarded.append)
+        try:
+            job_id = jobs.submit('noop', {})
+            wait_for(jobs, job_id)
+            time.sleep(0.01)
+            jobs.submit('noop', {})
+            assert jobs.get(job_id) is None
+            assert discarded == [job_id]
+        finally:
+            jobs.shutdown()
+
+
+class FakeService:
+    """Stands in for SilentCipherService, the API plumbing does not depend on the model"""
+
+    registry = None
+    message_bytes = 5
+
+    def embedded_payload(self, message):
+        return message
+
+    def encode_audio(self, audio_data, sample_rate, message, **registry_fields):
+        self.message = message
+        return audio_data * 0.5, np.float32(41.5)
+
+    def decode_audio(self, audio_data, sample_rate, phase_shift_decoding=False):
+        self.decoded_samples = audio_data.shape[-1]
+        return {'detected': True, 'message': [np.int64(v) for v in self.message], 'confidence': np.float32(0.75)}
+
+
+@pytest.fixture
+def api(monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, 'silentcipher_service', FakeService())
+    app_module.app.config['TESTING'] = True
+    return app_module
+
+
+def wav_upload(seconds=4.0, sample_rate=16000):
+    buffer = io.BytesIO()
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    sf.write(buffer, 0.3 * np.sin(2 * np.pi * 440 * t), sample_rate, format='WAV')
+    buffer.seek(0)
+    return buffer
+
+
+class TestJobApi:
+    """Tests for the job endpoints of the Flask app"""
+
+    def test_encode_then_decode(self, api):
+        client = api.app.test_client()
+        response = client.post('/api/encode', data={
+            'audio_file': (wav_upload(), 'input.wav'),
+            'message': json.dumps({'format': 'text', 'value': 'Hello'}),
+        })
+        assert response.status_code == 202
+        job_id = response.get_json()['job_id']
+
+        job = wait_for(api.jobs, job_id)
+        assert job['status'] == 'succeeded', job['error']
+        assert job['result']['sdr'] == pytest.approx(41.5)
+        assert job['result']['message'] == [72, 101, 108, 108, 111]
+        assert len(job['result']['input_sha256']) == 64
+        assert client.get(f'/api/jobs/{job_id}').get_json()['status'] == 'succeeded'
+
+        audio = client.get(job['result']['audio_url'])
+        assert audio.status_code == 200
+        decoded_upload = io.BytesIO(audio.data)
+
+        response = client.post('/api/decode', data={'audio_file': (decoded_upload, 'watermarked.wav')})
+        job = wait_for(api.jobs, response.get_json()['job_id'])
+        assert job['result'] == {'status': 'detected', 'message': [72, 101, 108, 108, 111], 'confidence': 0.75,
+                                 'input_sha256': hashlib.sha256(audio.data).hexdigest()}
+
+    def test_decode_window(self, api):
+        client = api.app.test_client()
+        api.silentcipher_service.message = [1, 2, 3, 4, 5]
+        response = client.post('/api/decode', data={'audio_file': (wav_upload(), 'long.wav'),
+                                                    'offset': '1.5', 'duration': '2'})
+        job = wait_for(api.jobs, response.get_json()['job_id'])
+        assert job['status'] == 'succeeded', job['error']
+        assert api.silentcipher_service.decoded_samples == 2 * 16000
+
+        response = client.post('/api/decode', data={'audio_file': (wav_upload(), 'long.wav'), 'offset': '3'})
+        wait_for(api.jobs, response.get_json()['job_id'])
+        assert api.silentcipher_service.decoded_samples == 16000
+
+        response = client.post('/api/decode', data={'audio_file': (wav_upload(), 'long.wav'), 'offset': '10'})
+        job = wait_for(api.jobs, response.get_json()['job_id'])
+        assert job['status'] == 'failed' and 'past the end' in job['error']
+
+        for window in [{'offset': '-1'}, {'duration': '0'}, {'offset': 'soon'}]:
+            response = client.post('/api/decode', data={'audio_file': (wav_upload(), 'long.wav'), **window})
+            assert response.status_code == 400
+
+    def test_invalid_requests(self, api):
+        client = api.app.test_client()
+        message = json.dumps({'format': 'numeric', 'value': [1, 2, 3, 4, 5]})
+
+        response = client.post('/api/encode', data={'audio_file': (wav_upload(1.0), 'short.wav'), 'message': message})
+        assert response.status_code == 400
+        assert 'too short' in response.get_json()['error']
+
+        response = client.post('/api/encode', data={'audio_file': (wav_upload(), 'input.wav'), 'message': 'Hello'})
+        assert response.status_code == 400
+
+        response = client.post('/api/decode', data={'audio_file': (io.BytesIO(b'not audio'), 'input.wav')})
+        assert response.status_code == 400
+
+        assert client.get('/api/jobs/missing').status_code == 404
+
+    def test_updates_are_pushed(self, api):
+        client = api.app.test_client()
+        socket = api.socketio.test_client(api.app)
+        response = client.post('/api/encode', data={
+            'audio_file': (wav_upload(), 'input.wav'),
+            'message': json.dumps({'format': 'numeric', 'value': [1, 2, 3, 4, 5]}),
+        })
+        job_id = response.get_json()['job_id']
+        socket.emit('subscribe_job', {'job_id': job_id})
+        wait_for(api.jobs, job_id)
+        time.sleep(0.05)
+
+        updates = [event['args'][0] for event in socket.get_received() if event['name'] == 'job_update']
+        assert updates[0]['id'] == job_id
+        assert updates[-1]['status'] == 'succeeded'
+        socket.disconnect()
+
+    def test_registry(self, api, tmp_path, monkeypatch):
+        from services.watermark_registry import WatermarkRegistry
+        registry = WatermarkRegistry(str(tmp_path / 'watermarks.db'))
+        monkeypatch.setattr(api.silentcipher_service, 'registry', registry)
+        # The fake service does not record payloads, issue one as encode_audio would
+        registry.register([1, 2, 3, 4, 5], asset='input.wav', recipient='alice')
+
+        client = api.app.test_client()
+        message = json.dumps({'format': 'numeric', 'value': [1, 2, 3, 4, 5]})
+        response = client.post('/api/encode', data={'audio_file': (wav_upload(), 'input.wav'), 'message': message,
+                                                    'recipient': 'bob'})
+        assert response.status_code == 409
+
+        api.silentcipher_service.message = [1, 2, 3, 4, 5]
+        response = client.post('/api/decode', data={'audio_file': (wav_upload(), 'leaked.wav')})
+        job = wait_for(api.jobs, response.get_json()['job_id'])
+        assert [record['recipient'] for record in job['result']['issued']] == ['alice']
+        registry.close()
+
+    def test_metrics(self, api):
+        metrics = api.app.test_client().get('/metrics/jobs').get_json()
+        assert {'queue_depth', 'running', 'workers', 'submitted', 'timed_out'} <= set(metrics)
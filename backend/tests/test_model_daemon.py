@@ -0,0 +1,197 @@
+"""
+Tests for the model daemon and its CLI client
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+
+import numpy as np
+import pytest
+import soundfile as sf
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import standalone_demo
+from services.audio_processor import AudioProcessor
+from services.model_daemon import DaemonClient, DaemonError, WatermarkDaemon, default_socket_path
+
+
+class FakeService:
+    """Stands in for SilentCipherService, the daemon plumbing does not depend on the model"""
+
+    def __init__(self, message_bytes=5):
+        self.loaded = []
+        self.encoded = []
+        self.message_bytes = message_bytes
+
+    def is_available(self):
+        return True
+
+    def get_model(self, sample_rate):
+        self.loaded.append(sample_rate)
+
+    def encode_audio(self, audio_data, sample_rate, message):
+        self.encoded.append(message)
+        return audio_data * 0.5, np.float32(42.5)
+
+    def decode_audio(self, audio_data, sample_rate, phase_shift_decoding=False):
+        return {'detected': True, 'message': [np.int64(v) for v in self.encoded[-1]], 'confidence': 0.9}
+
+
+@pytest.fixture
+def socket_dir():
+    # Unix socket paths are limited to about 100 characters, pytest's tmp_path can be longer
+    path = tempfile.mkdtemp(prefix='wm-daemon-')
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
+
+
+@pytest.fixture
+def daemon(socket_dir):
+    """WatermarkDaemon serving a FakeService from a background thread"""
+    daemon = WatermarkDaemon(os.path.join(socket_dir, 'daemon.sock'), service=FakeService(), audio_processor=AudioProcessor())
+    daemon.start()
+    thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+    thread.start()
+    yield daemon
+    client = DaemonClient.connect(daemon.socket_path)
+    if client is not None:
+        client.shutdown()
+    thread.join(timeout=5)
+
+
+@pytest.fixture
+def audio_file(socket_dir):
+    path = os.path.join(socket_dir, 'input.wav')
+    t = np.arange(4 * 16000) / 16000
+    sf.write(path, 0.3 * np.sin(2 * np.pi * 440 * t), 16000)
+    return path
+
+
+class TestDaemon:
+    """Tests for the request handling of WatermarkDaemon"""
+
+    def test_models_are_preloaded(self, daemon):
+        assert daemon.service.loaded == [44100]
+        assert DaemonClient.connect(daemon.socket_path).ping()['pid'] == os.getpid()
+
+    def test_no_daemon(self, socket_dir):
+        assert DaemonClient.connect(os.path.join(socket_dir, 'missing.sock')) is None
+
+    def test_encode_and_decode(self, daemon, audio_file, socket_dir):
+        client = DaemonClient.connect(daemon.socket_path)
+        output = os.path.join(socket_dir, 'output.wav')
+
+        result = client.encode(audio_file, output, [1, 2, 3, 4, 5])
+        assert result['sdr'] == pytest.approx(42.5)
+        assert result['metadata']['sample_rate'] == 16000
+        assert result['metadata']['duration'] == pytest.approx(4.0)
+        assert os.path.exists(output)
+
+        result = client.decode(output)
+        assert result['detected'] is True
+        assert result['message'] == [1, 2, 3, 4, 5]
+        assert client.ping()['requests_served'] == 2
+
+        # Decoding part of the file only loads that part
+        result = client.decode(output, offset=1.0, duration=2.0)
+        assert result['metadata']['duration'] == pytest.approx(2.0)
+
+    def test_errors_are_reported(self, daemon, socket_dir):
+        client = DaemonClient.connect(daemon.socket_path)
+        short = os.path.join(socket_dir, 'short.wav')
+        sf.write(short, np.zeros(16000), 16000)
+        with pytest.raises(DaemonError, match="too short"):
+            client.encode(short, os.path.join(socket_dir, 'out.wav'), [1, 2, 3, 4, 5])
+        with pytest.raises(DaemonError, match="Unknown operation"):
+            client.request('train')
+        # The daemon keeps serving after a failed request
+        assert client.ping()['requests_served'] == 0
+
+    def test_single_instance_and_stale_socket(self, daemon, socket_dir):
+        with pytest.raises(RuntimeError, match="already running"):
+            WatermarkDaemon(daemon.socket_path, service=FakeService(), audio_processor=AudioProcessor()).start()
+
+        stale = os.path.join(socket_dir, 'stale.sock')
+        open(stale, 'w').close()
+        other = WatermarkDaemon(stale, service=FakeService(), audio_processor=AudioProcessor())
+        other.start()
+        other._server.server_close()
+
+    def test_socket_is_private(self, daemon, monkeypatch, socket_dir):
+        assert os.stat(daemon.socket_path).st_mode & 0o777 == 0o600
+        # Clients do not talk to a socket of another user
+        monkeypatch.setattr(os, 'getuid', lambda: os.stat(daemon.socket_path).st_uid + 1)
+        assert DaemonClient.connect(daemon.socket_path) is None
+
+    def test_default_socket_directory(self, monkeypatch, socket_dir):
+        monkeypatch.delenv('WATERMARK_DAEMON_SOCKET', raising=False)
+        monkeypatch.setenv('XDG_RUNTIME_DIR', socket_dir)
+        path = default_socket_path()
+        daemon = WatermarkDaemon(path, service=FakeService(), audio_processor=AudioProcessor())
+        daemon.start()
+        daemon._server.server_close()
+        assert os.stat(os.path.dirname(path)).st_mode & 0o777 == 0o700
+
+        # A directory others can enter is refused
+        os.unlink(path)
+        os.chmod(os.path.dirname(path), 0o755)
+        with pytest.raises(RuntimeError, match="private"):
+            WatermarkDaemon(path, service=FakeService(), audio_processor=AudioProcessor()).start()
+
+    def test_shutdown_removes_socket(self, daemon):
+        DaemonClient.connect(daemon.socket_path).shutdown()
+        for _ in range(50):
+            if not os.path.exists(daemon.socket_path):
+                break
+            threading.Event().wait(0.05)
+        assert not os.path.exists(daemon.socket_path)
+
+
+class TestCliClient:
+    """Tests for standalone_demo using a running daemon"""
+
+    def test_encode_decode_through_daemon(self, daemon, audio_file, socket_dir, capsys):
+        output = os.path.join(socket_dir, 'output.wav')
+        argv = ['standalone_demo.py', 'encode', '--input', audio_file, '--output', output,
+                '--message', '1,2,3,4,5', '--format', 'numeric', '--socket', daemon.socket_path]
+        with patch.object(sys, 'argv', argv):
+            standalone_demo.main()
+        assert os.path.exists(output)
+        assert daemon.service.encoded == [[1, 2, 3, 4, 5]]
+        assert 'SDR value: 42.50 dB' in capsys.readouterr().out
+
+        with patch.object(sys, 'argv', ['standalone_demo.py', 'decode', '--input', output, '--socket', daemon.socket_path]):
+            standalone_demo.main()
+        assert 'Numeric:  [1, 2, 3, 4, 5]' in capsys.readouterr().out
+
+    def test_text_message_uses_daemon_message_size(self, socket_dir, audio_file):
+        # A daemon whose service protects payloads with a codec embeds fewer message bytes
+        daemon = WatermarkDaemon(os.path.join(socket_dir, 'codec.sock'), service=FakeService(message_bytes=3),
+                                 audio_processor=AudioProcessor())
+        daemon.start()
+        thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+        thread.start()
+        try:
+            assert DaemonClient.connect(daemon.socket_path).message_bytes() == 3
+            argv = ['standalone_demo.py', 'encode', '--input', audio_file, '--output', os.path.join(socket_dir, 'out.wav'),
+                    '--message', 'Hi!', '--format', 'text', '--socket', daemon.socket_path]
+            with patch.object(sys, 'argv', argv):
+                standalone_demo.main()
+            assert daemon.service.encoded == [[72, 105, 33]]
+        finally:
+            DaemonClient.connect(daemon.socket_path).shutdown()
+            thread.join(timeout=5)
+
+    def test_daemon_status(self, daemon, socket_dir, capsys):
+        with patch.object(sys, 'argv', ['standalone_demo.py', 'daemon', '--status', '--socket', daemon.socket_path]):
+            standalone_demo.main()
+        assert 'Daemon running' in capsys.readouterr().out
+
+        with patch.object(sys, 'argv', ['standalone_demo.py', 'daemon', '--status', '--socket', os.path.join(socket_dir, 'none.sock')]):
+            standalone_demo.main()
+        assert 'No daemon running' in capsys.readouterr().out
@@ -0,0 +1,154 @@
+"""
+Tests for single-flight model loading, background preload and the /health readiness probe
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services import silentcipher_service as service_module
+from services.silentcipher_service import SilentCipherService
+
+
+class SlowLoader:
+    """Replaces silentcipher.get_model with a loader that takes a while and counts its calls"""
+
+    def __init__(self, delay=0.2, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+
+    def get_model(self, model_type, device, **kwargs):
+        self.calls.append(model_type)
+        time.sleep(self.delay)
+        if self.fail:
+            raise OSError('checkpoint not found')
+        return object()
+
+
+@pytest.fixture
+def loader(monkeypatch):
+    loader = SlowLoader()
+    monkeypatch.setattr(service_module, 'silentcipher', loader)
+    monkeypatch.setattr(service_module, 'SILENTCIPHER_AVAILABLE', True)
+    return loader
+
+
+class TestSingleFlightLoading:
+    """Concurrent first requests share one model load"""
+
+    def test_concurrent_requests_load_once(self, loader):
+        service = SilentCipherService(decode_cache_entries=0)
+        models = []
+        threads = [threading.Thread(target=lambda: models.append(service.get_model(44100))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert loader.calls == ['44.1k']
+        assert len(models) == 8 and all(model is models[0] for model in models)
+
+    def test_models_load_independently(self, loader):
+        service = SilentCipherService(decode_cache_entries=0)
+        assert service.get_model(16000) is not service.get_model(44100)
+        assert sorted(loader.calls) == ['16k', '44.1k']
+
+    def test_failed_load_is_retried(self, loader):
+        loader.fail = True
+        service = SilentCipherService(decode_cache_entries=0)
+        with pytest.raises(RuntimeError, match='checkpoint not found'):
+            service.get_model(44100)
+        assert service.readiness()['models'] == {'44.1k': 'failed'}
+
+        loader.fail = False
+        service.get_model(44100)
+        assert service.readiness() == {'ready': True, 'models': {'44.1k': 'loaded'}}
+        assert loader.calls == ['44.1k', '44.1k']
+
+
+class TestPreload:
+    """Background preload and readiness reporting"""
+
+    def test_preload_then_ready(self, loader):
+        service = SilentCipherService(decode_cache_entries=0, preload=True)
+        while not loader.calls:
+            time.sleep(0.01)
+        assert service.readiness() == {'ready': False, 'models': {'44.1k': 'loading'}}
+
+        # A request during the preload waits for it instead of loading again
+        model = service.get_model(44100)
+        assert service.readiness() == {'ready': True, 'models': {'44.1k': 'loaded'}}
+        assert model is service.get_model(44100)
+        assert loader.calls == ['44.1k']
+
+    def test_preload_several_rates(self, loader):
+        service = SilentCipherService(decode_cache_entries=0, preload=[16000, 44100])
+        service._preload_thread.join()
+        assert service.readiness() == {'ready': True, 'models': {'16k': 'loaded', '44.1k': 'loaded'}}
+
+    def test_not_preloaded_by_default(self, loader):
+        service = SilentCipherService(decode_cache_entries=0)
+        assert service.readiness() == {'ready': False, 'models': {'44.1k': 'not_loaded'}}
+        assert loader.calls == []
+
+    def test_on_demand(self, loader):
+        service = SilentCipherService(decode_cache_entries=0)
+        assert service.readiness(on_demand=True) == {'ready': True, 'models': {'44.1k': 'not_loaded'}}
+        loader.fail = True
+        with pytest.raises(RuntimeError):
+            service.get_model(44100)
+        assert service.readiness(on_demand=True)['ready'] is False
+
+    def test_without_silentcipher(self, monkeypatch):
+        monkeypatch.setattr(service_module, 'SILENTCIPHER_AVAILABLE', False)
+        service = SilentCipherService(decode_cache_entries=0, preload=True)
+        assert service.readiness() == {'ready': False, 'models': {'44.1k': 'unavailable'}}
+
+
+class TestHealthEndpoint:
+    """/health reports readiness, /health/live only liveness"""
+
+    @pytest.fixture
+    def client(self, monkeypatch, loader):
+        monkeypatch.setenv('PRELOAD_MODELS', 'false')
+        import app as app_module
+        service = SilentCipherService(decode_cache_entries=0)
+        monkeypatch.setattr(app_module, 'silentcipher_service', service)
+        monkeypatch.setattr(app_module, 'PRELOAD_MODELS', True)
+        return app_module.app.test_client(), service
+
+    def test_not_ready_until_loaded(self, client):
+        client, service = client
+        response = client.get('/health')
+        assert response.status_code == 503
+        assert response.get_json()['status'] == 'starting'
+        assert client.get('/health/live').status_code == 200
+
+        service.get_model(44100)
+        response = client.get('/health')
+        assert response.status_code == 200
+        assert response.get_json() == {'status': 'ok', 'ready': True, 'models': {'44.1k': 'loaded'}}
+
+    def test_ready_without_preload(self, client, monkeypatch):
+        client, service = client
+        import app as app_module
+        monkeypatch.setattr(app_module, 'PRELOAD_MODELS', False)
+        response = client.get('/health')
+        assert response.status_code == 200
+        assert response.get_json() == {'status': 'ok', 'ready': True, 'models': {'44.1k': 'not_loaded'}}
+
+    def test_failed_load(self, client, loader):
+        client, service = client
+        loader.fail = True
+        with pytest.raises(RuntimeError):
+            service.get_model(44100)
+        response = client.get('/health')
+        assert response.status_code == 503
+        assert response.get_json()['status'] == 'unavailable'
+        assert 'checkpoint not found' in response.get_json()['errors']['44.1k']
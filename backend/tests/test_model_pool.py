@@ -0,0 +1,241 @@
+"""
+Tests for the memory-budgeted model pool and its use by SilentCipherService
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services import silentcipher_service as service_module
+from services.model_pool import ModelPool, estimate_model_bytes
+from services.silentcipher_service import SilentCipherService
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Loader:
+    """Builds a stand-in model and counts how often it was called"""
+
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise OSError('checkpoint not found')
+        return object()
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_pool(clock, names=('a', 'b', 'c'), size=100, **kwargs):
+    pool = ModelPool(clock=clock, **kwargs)
+    loaders = {}
+    for name in names:
+        loaders[name] = Loader()
+        pool.register(name, loaders[name], size_bytes=size)
+    return pool, loaders
+
+
+class TestModelPool:
+    """Tests for loading, eviction and metrics"""
+
+    def test_loads_once_and_reuses(self, clock):
+        pool, loaders = make_pool(clock)
+        assert pool.state('a') == 'not_loaded'
+        model = pool.get('a')
+        assert pool.get('a') is model
+        assert loaders['a'].calls == 1
+        assert pool.state('a') == 'loaded'
+        assert pool.peek('b') is None
+
+    def test_register_twice_and_unknown_model(self, clock):
+        pool, _ = make_pool(clock)
+        with pytest.raises(ValueError, match="already registered"):
+            pool.register('a', Loader())
+        with pytest.raises(KeyError, match="not registered"):
+            pool.get('missing')
+
+    def test_budget_evicts_least_recently_used(self, clock):
+        pool, loaders = make_pool(clock, memory_budget_bytes=250)
+        pool.get('a')
+        clock.now = 1
+        pool.get('b')
+        clock.now = 2
+        pool.get('a')
+        clock.now = 3
+        pool.get('c')
+        # 'b' was used longest ago
+        assert pool.peek('b') is None
+        assert pool.peek('a') is not None and pool.peek('c') is not None
+        assert pool.resident_bytes() == 200
+        assert pool.state('b') == 'evicted'
+
+        # Reloaded on demand
+        pool.get('b')
+        assert loaders['b'].calls == 2
+
+    def test_models_in_use_are_not_evicted(self, clock):
+        pool, _ = make_pool(clock, memory_budget_bytes=150)
+        with pool.use('a') as a:
+            pool.get('b')
+            # 'a' stays resident while in use, the budget evicts 'b' instead
+            assert pool.peek('a') is a
+            assert pool.peek('b') is None
+            assert pool.evict('a') is False
+        assert pool.evict('a') is True
+        assert pool.peek('a') is None
+
+    def test_idle_ttl(self, clock):
+        pool, loaders = make_pool(clock, idle_ttl=60)
+        pool.register('pinned', Loader(), size_bytes=100, idle_ttl=3600)
+        pool.get('a')
+        pool.get('pinned')
+        clock.now = 30
+        assert pool.evict_expired() == 0
+        clock.now = 61
+        assert pool.evict_expired() == 1
+        assert pool.peek('a') is None
+        assert pool.peek('pinned') is not None
+
+        pool.get('a')
+        assert loaders['a'].calls == 2
+
+    def test_reaper_evicts_in_background(self):
+        pool = ModelPool(idle_ttl=0.05, reaper_interval=0.02)
+        pool.register('a', Loader(), size_bytes=1)
+        pool.get('a')
+        try:
+            for _ in range(100):
+                if pool.peek('a') is None:
+                    break
+                time.sleep(0.02)
+            assert pool.peek('a') is None
+        finally:
+            pool.close()
+
+    def test_single_flight_and_failed_load(self, clock):
+        pool = ModelPool(clock=clock)
+        slow = Loader(delay=0.2)
+        pool.register('slow', slow)
+        models = []
+        threads = [threading.Thread(target=lambda: models.append(pool.get('slow'))) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert slow.calls == 1
+        assert all(model is models[0] for model in models)
+
+        broken = Loader(fail=True)
+        pool.register('broken', broken)
+        with pytest.raises(OSError):
+            pool.get('broken')
+        assert pool.state('broken') == 'failed'
+        assert pool.error('broken') == 'checkpoint not found'
+        broken.fail = False
+        pool.get('broken')
+        assert pool.error('broken') is None
+
+    def test_metrics(self, clock):
+        pool, _ = make_pool(clock, memory_budget_bytes=150, idle_ttl=60)
+        pool.get('a')
+        pool.get('a')
+        clock.now = 10
+        pool.get('b')
+        metrics = pool.metrics()
+        assert metrics['memory_budget_bytes'] == 150
+        assert metrics['resident_bytes'] == 100
+        assert metrics['resident_models'] == 1
+        assert metrics['loads'] == 2
+        assert metrics['evictions'] == 1
+        assert metrics['models']['a']['hits'] == 1
+        assert metrics['models']['a']['state'] == 'evicted'
+        assert metrics['models']['b']['bytes'] == 100
+
+    def test_estimate_model_bytes(self):
+        class Model:
+            def __init__(self):
+                self.encoder = torch.nn.Linear(10, 10)
+                self.decoder = torch.nn.BatchNorm1d(4)
+                self.sr = 44100
+
+        # Linear: 110 float32 parameters, BatchNorm: 8 parameters and 8 float32 + 1 int64 buffers
+        assert estimate_model_bytes(Model()) == (110 + 8 + 8) * 4 + 8
+        assert estimate_model_bytes(torch.nn.Linear(10, 10)) == 110 * 4
+        assert estimate_model_bytes(object()) == 0
+
+
+@pytest.fixture
+def loader(monkeypatch):
+    class SilentCipherLoader:
+        def __init__(self):
+            self.calls = []
+
+        def get_model(self, model_type, device, **kwargs):
+            self.calls.append(model_type)
+            return object()
+
+    loader = SilentCipherLoader()
+    monkeypatch.setattr(service_module, 'silentcipher', loader)
+    monkeypatch.setattr(service_module, 'SILENTCIPHER_AVAILABLE', True)
+    return loader
+
+
+class TestServiceWithPool:
+    """SilentCipherService registers its models with a shared pool"""
+
+    def test_shared_pool(self, loader, clock):
+        pool = ModelPool(clock=clock, memory_budget_bytes=0)
+        pool.register('other-provider', Loader(), size_bytes=1)
+        service = SilentCipherService(model_pool=pool)
+        assert pool.is_registered('silentcipher-44.1k')
+        assert pool.is_registered('silentcipher-16k')
+        # A second service on the same pool shares the models
+        SilentCipherService(model_pool=pool)
+
+        with service._use_model(44100) as model:
+            pool.get('other-provider')
+            # The budget evicted the other provider, not the model being used
+            assert service._model_44k is model
+        assert loader.calls == ['44.1k']
+        assert service.get_model_pool_metrics()['models']['other-provider']['evictions'] == 1
+
+    def test_evicted_model_is_reloaded_and_stays_ready(self, loader, clock):
+        service = SilentCipherService(model_pool=ModelPool(clock=clock, idle_ttl=60))
+        service.get_model(44100)
+        clock.now = 120
+        service.model_pool.evict_expired()
+        assert service._model_44k is None
+
+        readiness = service.readiness()
+        assert readiness == {'ready': True, 'models': {'44.1k': 'evicted'}}
+
+        service.get_model(44100)
+        assert loader.calls == ['44.1k', '44.1k']
+        assert service.readiness()['models'] == {'44.1k': 'loaded'}
+
+    def test_dtype_models_are_pooled_separately(self, loader):
+        pool = ModelPool()
+        SilentCipherService(model_pool=pool)
+        SilentCipherService(model_pool=pool, dtype='bfloat16')
+        assert pool.is_registered('silentcipher-44.1k')
+        assert pool.is_registered('silentcipher-44.1k-bfloat16')
@@ -0,0 +1,136 @@
+"""
+Tests for the error-correcting payload codec and its use by SilentCipherService
+"""
+
+import os
+import random
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services import silentcipher_service as service_module
+from services.silentcipher_service import SilentCipherService
+from utils.message_converter import MessageConverter
+from utils.payload_codec import PayloadCodec
+
+
+def corrupt(payload, count, rng):
+    """Change count random nibbles of a payload."""
+    nibbles = [nibble for value in payload for nibble in (value >> 4, value & 0x0F)]
+    for position in rng.sample(range(10), count):
+        nibbles[position] ^= rng.randrange(1, 16)
+    return [(nibbles[i] << 4) | nibbles[i + 1] for i in range(0, 10, 2)]
+
+
+class TestPayloadCodec:
+    """Tests for PayloadCodec"""
+
+    def test_round_trip(self):
+        codec = PayloadCodec()
+        assert codec.message_bytes == 3 and codec.max_corrections == 1
+        payload = codec.encode([72, 105, 33])
+        # Systematic, the message is the start of the payload
+        assert payload[:3] == [72, 105, 33]
+        assert codec.decode(payload) == {'message': [72, 105, 33], 'payload': payload, 'corrected': 0}
+
+    @pytest.mark.parametrize('parity', [2, 4, 6])
+    def test_corrects_and_detects(self, parity):
+        rng = random.Random(parity)
+        for corrections in range(parity // 2 + 1):
+            codec = PayloadCodec(parity, corrections)
+            for _ in range(50):
+                message = [rng.randrange(256) for _ in range(codec.message_bytes)]
+                payload = codec.encode(message)
+                for count in range(1, corrections + 1):
+                    assert codec.decode(corrupt(payload, count, rng)) == {
+                        'message': message, 'payload': payload, 'corrected': count}
+                # Up to parity - corrections errors are never taken for another message
+                for count in range(corrections + 1, parity - corrections + 1):
+                    assert codec.decode(corrupt(payload, count, rng)) is None
+
+    def test_invalid_arguments(self):
+        with pytest.raises(ValueError, match="parity"):
+            PayloadCodec(3)
+        with pytest.raises(ValueError, match="max_corrections"):
+            PayloadCodec(4, 3)
+        with pytest.raises(ValueError, match="exactly 3"):
+            PayloadCodec().encode([1, 2, 3, 4, 5])
+        with pytest.raises(ValueError, match="between 0 and 255"):
+            PayloadCodec().encode([1, 2, 256])
+
+    def test_message_converter_sizes(self):
+        assert MessageConverter.text_to_numeric('Hi!!!', size=3) == [72, 105, 33]
+        assert MessageConverter.numeric_to_text([72, 105, 0], size=3) == 'Hi'
+        assert MessageConverter.binary_to_numeric('00000001' * 3, size=3) == [1, 1, 1]
+        assert MessageConverter.numeric_to_binary([1, 1, 1], size=3) == '00000001' * 3
+        assert MessageConverter.validate_message([1, 2, 3], 'numeric', size=3) == (True, "")
+        assert not MessageConverter.validate_message('0' * 40, 'binary', size=3)[0]
+
+
+class FakeModel:
+    """Embeds nothing, decodes the last payload with the nibbles listed in errors changed"""
+
+    def __init__(self):
+        self.payload = None
+        self.errors = []
+
+    def encode_wav(self, audio, sample_rate, message, **kwargs):
+        self.payload = list(message)
+        return audio, 40.0
+
+    def decode_wav(self, audio, sample_rate, phase_shift_decoding=False):
+        decoded = list(self.payload)
+        for position in self.errors:
+            decoded[position // 2] ^= 0x10 if position % 2 == 0 else 0x01
+        return {'messages': [decoded], 'confidences': [0.8], 'status': True}
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = FakeModel()
+
+    class Loader:
+        def get_model(self, model_type, device, **kwargs):
+            return model
+
+    monkeypatch.setattr(service_module, 'silentcipher', Loader())
+    monkeypatch.setattr(service_module, 'SILENTCIPHER_AVAILABLE', True)
+    return model
+
+
+class TestServiceCodec:
+    """SilentCipherService protects payloads with a codec"""
+
+    def test_encode_and_decode(self, model):
+        codec = PayloadCodec()
+        service = SilentCipherService(codec=codec)
+        audio = np.random.default_rng(0).uniform(-0.5, 0.5, 4 * 16000).astype(np.float32)
+        assert service.message_bytes == 3
+        with pytest.raises(ValueError, match="3 integers"):
+            service.encode_audio(audio, 16000, [1, 2, 3, 4, 5])
+
+        service.encode_audio(audio, 16000, [1, 2, 3])
+        assert model.payload == codec.encode([1, 2, 3])
+
+        model.errors = [7]
+        result = service.decode_audio(audio, 16000)
+        assert result == {'detected': True, 'message': [1, 2, 3], 'confidence': 0.8,
+                          'payload': model.payload, 'corrected': 1}
+
+        # Too many errors for the codec, the decode cache keeps the raw payload
+        model.errors = [0, 7]
+        other = audio * 0.5
+        assert service.decode_audio(other, 16000) == {'detected': False, 'message': None, 'confidence': None,
+                                                      'payload': None, 'corrected': None}
+        assert service.decode_audio(other, 16000)['detected'] is False
+        assert [r['corrected'] for r in service.decode_audio_batch([audio, other], 16000)] == [None, None]
+
+    def test_no_codec_by_default(self, monkeypatch):
+        # Only the web app reads PAYLOAD_PARITY, benchmarks and tools embed raw payloads
+        monkeypatch.setenv('PAYLOAD_PARITY', '6')
+        service = SilentCipherService()
+        assert service.codec is None and service.message_bytes == 5
+        assert service.embedded_payload([1, 2, 3, 4, 5]) == [1, 2, 3, 4, 5]
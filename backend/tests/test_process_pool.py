@@ -0,0 +1,35 @@
+"""
+Tests for the process pool of the batch tools
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.process_pool import run_in_processes
+
+# State of each worker process
+_worker = {}
+
+
+def _init_worker(options):
+    _worker.update(options, pid=os.getpid())
+
+
+def _scale(value):
+    return value * _worker['factor'], _worker['pid']
+
+
+class TestRunInProcesses:
+    """Tests for run_in_processes"""
+
+    def test_in_process(self):
+        results = list(run_in_processes(_scale, [1, 2, 3], _init_worker, {'factor': 2}, workers=0))
+        assert results == [(2, os.getpid()), (4, os.getpid()), (6, os.getpid())]
+
+    def test_worker_processes(self):
+        results = list(run_in_processes(_scale, range(6), _init_worker, {'factor': 3}, workers=2))
+        assert sorted(value for value, _ in results) == [0, 3, 6, 9, 12, 15]
+        # Every worker process was initialized once, in its own process
+        assert os.getpid() not in {pid for _, pid in results}
@@ -0,0 +1,134 @@
+"""
+Tests for the robustness matrix benchmark
+"""
+
+import json
+import os
+import sys
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import robustness_benchmark
+from robustness_benchmark import bit_error_rate, build_grid, evaluate_file, summarize
+from services.audio_processor import AudioProcessor
+
+
+class FakeService:
+    """Detects the last encoded message while the variant keeps most of its energy, one bit flipped when it is quieter"""
+
+    def __init__(self):
+        self.message = None
+        self.batches = []
+
+    def encode_audio(self, audio_data, sample_rate, message):
+        self.message = message
+        self.energy = np.mean(audio_data ** 2)
+        return audio_data, 40.0
+
+    def decode_audio_batch(self, audio_list, sample_rate, phase_shift_decoding=False):
+        self.batches.append(len(audio_list))
+        results = []
+        for audio in audio_list:
+            ratio = np.mean(audio ** 2) / self.energy
+            if ratio < 0.1:
+                results.append({'detected': False, 'message': None, 'confidence': None})
+            else:
+                message = list(self.message) if ratio > 0.9 else [self.message[0] ^ 1] + list(self.message[1:])
+                results.append({'detected': True, 'message': message, 'confidence': min(ratio, 1.0)})
+        return results
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    t = np.arange(4 * 16000) / 16000
+    for i, frequency in enumerate([440, 660]):
+        sf.write(str(tmp_path / f'clip{i}.wav'), 0.3 * np.sin(2 * np.pi * frequency * t), 16000)
+    sf.write(str(tmp_path / 'short.wav'), np.zeros(8000), 16000)
+    return tmp_path
+
+
+class TestGrid:
+    """Tests for the grid and the metrics"""
+
+    def test_build_grid(self):
+        grid = build_grid(['none', 'noise'])
+        assert [(attack, strength) for attack, strength, _ in grid] == [
+            ('none', None), ('noise', -40.0), ('noise', -30.0), ('noise', -20.0)]
+        assert grid[1][2] == [{'type': 'noise', 'level_db': -40.0}]
+        with pytest.raises(ValueError, match="Unknown attacks"):
+            build_grid(['reverb'])
+
+    def test_bit_error_rate(self):
+        assert bit_error_rate([1, 2, 3, 4, 5], [1, 2, 3, 4, 5]) == 0.0
+        assert bit_error_rate([0, 0, 0, 0, 0], [255, 0, 0, 0, 1]) == 9 / 40
+
+
+class TestEvaluation:
+    """Tests for evaluating files and aggregating the matrix"""
+
+    def test_evaluate_file(self, corpus):
+        service = FakeService()
+        grid = build_grid(['none', 'amplitude', 'resample'])
+        result = evaluate_file(str(corpus / 'clip0.wav'), grid, service, AudioProcessor(), batch_size=4)
+
+        assert result['duration'] == pytest.approx(4.0)
+        assert [r['attack'] for r in result['results']] == [attack for attack, _, _ in grid]
+        # One encode, every variant decoded in batches of at most 4
+        assert sum(service.batches) == len(grid)
+        assert max(service.batches) <= 4
+        none, quieter, much_quieter = result['results'][0], result['results'][2], result['results'][1]
+        assert none['ber'] == 0.0 and none['detected']
+        assert quieter['ber'] == 1 / 40
+        assert much_quieter['detected'] is False
+
+    def test_same_seed_same_message(self, corpus):
+        service = FakeService()
+        grid = build_grid(['none'])
+        evaluate_file(str(corpus / 'clip0.wav'), grid, service, AudioProcessor(), seed=3)
+        first = service.message
+        evaluate_file(str(corpus / 'clip0.wav'), grid, service, AudioProcessor(), seed=3)
+        assert service.message == first
+
+    def test_summarize(self, corpus):
+        grid = build_grid(['none', 'amplitude'])
+        results = [evaluate_file(str(corpus / name), grid, FakeService(), AudioProcessor())
+                   for name in ('clip0.wav', 'clip1.wav', 'short.wav')]
+        summary = summarize(results)
+
+        assert summary['files'] == 2
+        assert summary['variants'] == 2 * len(grid)
+        assert 'too short' in summary['failed_files'][0]['error']
+        rows = {(row['attack'], row['strength']): row for row in summary['matrix']}
+        assert rows[('none', None)]['detection_rate'] == 1.0
+        assert rows[('none', None)]['exact_rate'] == 1.0
+        assert rows[('amplitude', -12.0)]['detection_rate'] == 0.0
+        assert rows[('amplitude', -12.0)]['ber'] is None
+        assert rows[('amplitude', -6.0)]['ber'] == pytest.approx(1 / 40)
+
+
+class TestCommand:
+    """Tests for the command line run"""
+
+    def test_run_and_resume(self, corpus, monkeypatch, capsys):
+        def init_worker(options):
+            robustness_benchmark._worker.update(options, service=FakeService(), audio_processor=AudioProcessor())
+        monkeypatch.setattr(robustness_benchmark, '_init_worker', init_worker)
+        results, report = str(corpus / 'run.jsonl'), str(corpus / 'report.json')
+        argv = ['--corpus', str(corpus), '--attacks', 'none', 'noise', '--workers', '0', '--results', results, '--report', report]
+
+        robustness_benchmark.main(argv)
+        assert '3 to evaluate' in capsys.readouterr().out
+        with open(report) as f:
+            summary = json.load(f)
+        assert summary['files'] == 2
+        assert summary['throughput']['variants_per_second'] > 0
+
+        # Finished files are not evaluated again
+        robustness_benchmark.main(argv)
+        assert '0 to evaluate' in capsys.readouterr().out
+        with open(results) as f:
+            assert len(f.readlines()) == 3
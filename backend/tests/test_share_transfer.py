@@ -0,0 +1,164 @@
+"""
+Tests for chunked share transfers and their SocketIO events
+"""
+
+import hashlib
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services.share_transfer import ShareClient, ShareStore
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ShareStore(str(tmp_path / 'shares'), chunk_size=1000, window=3)
+
+
+class TestShareStore:
+    """Tests for ShareStore"""
+
+    def test_upload_and_read(self, store):
+        data = os.urandom(2500)
+        share = store.start(len(data), sha256(data), 'clip.wav')
+        assert share['missing'] == [0, 1, 2]
+        assert share['window'] == 3
+
+        share_id = share['share_id']
+        # Chunks may arrive in any order
+        for index in (2, 0, 1):
+            store.write_chunk(share_id, index, data[index * 1000:(index + 1) * 1000])
+        assert store.complete(share_id) == 'complete'
+        assert b''.join(store.read_chunk(share_id, index) for index in range(3)) == data
+        assert store.info(share_id)['received_chunks'] == 3
+
+    def test_resume(self, store):
+        data = os.urandom(2500)
+        share_id = store.start(len(data), sha256(data))['share_id']
+        store.write_chunk(share_id, 1, data[1000:2000])
+        assert store.complete(share_id) == 'uploading'
+        assert store.start(len(data), sha256(data), share_id=share_id)['missing'] == [0, 2]
+        with pytest.raises(ValueError, match="different file"):
+            store.start(len(data), sha256(b'other'), share_id=share_id)
+
+    def test_invalid_chunks(self, store):
+        data = os.urandom(2500)
+        share_id = store.start(len(data), sha256(data))['share_id']
+        with pytest.raises(ValueError, match="expected 500"):
+            store.write_chunk(share_id, 2, data[:1000])
+        with pytest.raises(ValueError, match="out of range"):
+            store.write_chunk(share_id, 3, b'')
+        with pytest.raises(ValueError, match="still uploading"):
+            store.read_chunk(share_id, 0)
+        with pytest.raises(KeyError):
+            store.write_chunk('missing', 0, data[:1000])
+        with pytest.raises(ValueError, match="Invalid share id"):
+            store.start(len(data), sha256(data), share_id='../escape')
+
+    def test_hash_mismatch_restarts_upload(self, store):
+        data = os.urandom(1500)
+        share_id = store.start(len(data), sha256(data))['share_id']
+        store.write_chunk(share_id, 0, bytes(1000))
+        store.write_chunk(share_id, 1, data[1000:])
+        with pytest.raises(ValueError, match="does not match"):
+            store.complete(share_id)
+        assert store.start(len(data), sha256(data), share_id=share_id)['missing'] == [0, 1]
+
+    def test_size_limit_and_expiry(self, tmp_path):
+        store = ShareStore(str(tmp_path), chunk_size=1000, max_bytes=5000, ttl=0.0)
+        with pytest.raises(ValueError, match="Invalid share size"):
+            store.start(5001, sha256(b''))
+        share = store.add_file(__file__)
+        assert share['status'] == 'complete'
+        assert store.expire() == 1
+        assert os.listdir(tmp_path) == []
+
+
+class SocketAdapter:
+    """Gives the Flask-SocketIO test client the call/emit interface of socketio.Client"""
+
+    def __init__(self, client):
+        self.client = client
+        self.emitted = []
+
+    def call(self, event, data, timeout=None):
+        return self.client.emit(event, data, callback=True)
+
+    def emit(self, event, data, callback=None):
+        self.emitted.append((event, data.get('index')))
+        callback(self.client.emit(event, data, callback=True))
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, 'share_store', ShareStore(str(tmp_path / 'shares'), chunk_size=1000, window=2))
+    return app_module
+
+
+class TestShareEvents:
+    """Tests for the share events of the SocketIO server"""
+
+    def test_transfer_between_clients(self, api, tmp_path):
+        source = tmp_path / 'source.wav'
+        source.write_bytes(os.urandom(4500))
+        sender = api.socketio.test_client(api.app)
+        receiver = api.socketio.test_client(api.app)
+
+        progress = []
+        share_id = ShareClient(SocketAdapter(sender)).upload(str(source),
+                                                             on_progress=lambda done, total: progress.append(done))
+        assert progress == [1, 2, 3, 4, 5]
+
+        output = tmp_path / 'received.wav'
+        info = ShareClient(SocketAdapter(receiver)).download(share_id, str(output))
+        assert output.read_bytes() == source.read_bytes()
+        assert info['filename'] == 'source.wav'
+        sender.disconnect()
+        receiver.disconnect()
+
+    def test_resumed_upload_only_sends_missing_chunks(self, api, tmp_path):
+        data = os.urandom(2500)
+        source = tmp_path / 'source.wav'
+        source.write_bytes(data)
+        share_id = api.share_store.start(len(data), sha256(data))['share_id']
+        api.share_store.write_chunk(share_id, 0, data[:1000])
+
+        client = SocketAdapter(api.socketio.test_client(api.app))
+        assert ShareClient(client).upload(str(source), share_id=share_id) == share_id
+        assert client.emitted == [('share_chunk', 1), ('share_chunk', 2)]
+        client.client.disconnect()
+
+    def test_errors_are_acknowledged(self, api):
+        client = api.socketio.test_client(api.app)
+        assert 'error' in client.emit('share_chunk', {'share_id': 'missing', 'index': 0, 'data': b'x'}, callback=True)
+        assert 'error' in client.emit('share_fetch', {'share_id': 'missing', 'index': 'x'}, callback=True)
+        assert 'error' in client.emit('share_start', {'size': -1}, callback=True)
+        assert 'error' in client.emit('share_job', {'job_id': 'missing'}, callback=True)
+        with pytest.raises(RuntimeError, match="Unknown or expired share"):
+            ShareClient(SocketAdapter(client)).download('missing', os.devnull)
+        client.disconnect()
+
+    def test_receiver_is_told_when_share_completes(self, api):
+        data = os.urandom(1500)
+        share_id = api.share_store.start(len(data), sha256(data))['share_id']
+        receiver = api.socketio.test_client(api.app)
+        assert receiver.emit('share_info', {'share_id': share_id}, callback=True)['status'] == 'uploading'
+
+        sender = SocketAdapter(api.socketio.test_client(api.app))
+        for index in range(2):
+            chunk = data[index * 1000:(index + 1) * 1000]
+            sender.call('share_chunk', {'share_id': share_id, 'index': index, 'data': chunk})
+        assert sender.call('share_complete', {'share_id': share_id}) == {'status': 'complete'}
+
+        updates = [event['args'][0] for event in receiver.get_received() if event['name'] == 'share_update']
+        assert updates[-1]['status'] == 'complete'
+        receiver.disconnect()
+        sender.client.disconnect()
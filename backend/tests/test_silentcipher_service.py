@@ -7,6 +7,7 @@ import numpy as np
 import os
 import tempfile
 import soundfile as sf
+from services import silentcipher_service as service_module
 from services.silentcipher_service import SilentCipherService, SILENTCIPHER_AVAILABLE
 
 
@@ -248,6 +249,21 @@ class TestDecoding:
         
         with pytest.raises(ValueError, match="Audio data is empty"):
             silentcipher_service.decode_audio(empty_audio, 16000)
+    
+    def test_decode_batch_matches_single(self, silentcipher_service, sample_audio_44k, sample_message):
+        """Test batched decoding gives the decode_audio results"""
+        audio, sample_rate = sample_audio_44k
+        watermarked, _ = silentcipher_service.encode_audio(audio, sample_rate, sample_message)
+        clips = [watermarked, audio, watermarked[: len(watermarked) // 2 + 44100]]
+        
+        results = silentcipher_service.decode_audio_batch(clips, sample_rate)
+        
+        assert len(results) == 3
+        for clip, result in zip(clips, results):
+            single = silentcipher_service.decode_audio(clip, sample_rate)
+            assert result['detected'] == single['detected']
+            assert result['message'] == single['message']
+            assert result['confidence'] == pytest.approx(single['confidence'], abs=1e-4)
 
 
 class TestEndToEndWorkflow:
@@ -303,6 +319,77 @@ class TestEndToEndWorkflow:
             assert result['message'] == message
 
 
+class TestResultCaching:
+    """Tests for the encode cache and decode memoization"""
+    
+    def test_repeated_encode_is_cached(self, tmp_path, sample_audio_44k, sample_message):
+        """Test that the second identical encode is served from the cache"""
+        service = SilentCipherService(cache_dir=str(tmp_path))
+        audio, sample_rate = sample_audio_44k
+        
+        watermarked, sdr = service.encode_audio(audio, sample_rate, sample_message)
+        cached, cached_sdr = service.encode_audio(audio, sample_rate, sample_message)
+        
+        np.testing.assert_array_equal(watermarked, cached)
+        assert cached_sdr == pytest.approx(sdr)
+        metrics = service.get_cache_metrics()['encode']
+        assert metrics['hits'] == 1
+        assert metrics['misses'] == 1
+    
+    def test_models_use_the_service_caches(self, tmp_path, monkeypatch):
+        """Test that every loaded model gets the same library caches"""
+        calls = []
+        
+        class Loader:
+            def get_model(self, model_type, device, **kwargs):
+                calls.append(kwargs)
+                return object()
+        
+        monkeypatch.setattr(service_module, 'silentcipher', Loader())
+        service = SilentCipherService(cache_dir=str(tmp_path), decode_cache_entries=8)
+        service.get_model(44100)
+        service.get_model(16000)
+        
+        assert [type(kwargs['encode_cache']).__name__ for kwargs in calls] == ['EncodeCache', 'EncodeCache']
+        assert calls[0]['encode_cache'] is calls[1]['encode_cache']
+        assert calls[0]['decode_cache'] is calls[1]['decode_cache']
+        assert calls[0]['decode_cache'].max_entries == 8
+        assert service.get_cache_metrics()['decode']['enabled'] is True
+    
+    def test_cache_disabled_by_default(self, silentcipher_service, monkeypatch):
+        """Test that no encode cache is used without a cache directory"""
+        monkeypatch.delenv('WATERMARK_CACHE_DIR', raising=False)
+        assert SilentCipherService().get_cache_metrics()['encode'] == {'enabled': False}
+    
+    def test_repeated_decode_is_memoized(self, silentcipher_service, sample_audio_44k, sample_message):
+        """Test that decoding the same audio twice runs the model once"""
+        audio, sample_rate = sample_audio_44k
+        watermarked, _ = silentcipher_service.encode_audio(audio, sample_rate, sample_message)
+        
+        first = silentcipher_service.decode_audio(watermarked, sample_rate)
+        second = silentcipher_service.decode_audio(watermarked.copy(), sample_rate)
+        assert first == second
+        
+        metrics = silentcipher_service.get_cache_metrics()['decode']
+        assert metrics['memory_hits'] == 1
+        assert metrics['misses'] == 1
+    
+    def test_decode_options_are_part_of_key(self, silentcipher_service, sample_audio_44k):
+        """Test that phase shift decoding is not served from a plain decode"""
+        audio, sample_rate = sample_audio_44k
+        silentcipher_service.decode_audio(audio, sample_rate)
+        silentcipher_service.decode_audio(audio, sample_rate, phase_shift_decoding=True)
+        assert silentcipher_service.get_cache_metrics()['decode']['misses'] == 2
+
+    def test_dtype_is_part_of_key(self, monkeypatch):
+        """Test that bfloat16 results are not shared with float32 ones"""
+        monkeypatch.delenv('SILENTCIPHER_DTYPE', raising=False)
+        float32 = SilentCipherService()
+        bfloat16 = SilentCipherService(dtype='bfloat16')
+        assert float32._model_id(float32.get_model(44100)) != bfloat16._model_id(bfloat16.get_model(44100))
+        assert str(bfloat16.get_model(44100).dtype) == 'torch.bfloat16'
+
+
 class TestSDRCalculation:
     """Tests for SDR calculation"""
     
@@ -315,6 +315,7 @@ class TestEncodeWorkflow:
         args.format = 'text'
         args.model = '44.1k'
         args.play = False
+        args.no_daemon = True
         
         # Run encode
         standalone_demo.run_encode(args)
@@ -336,6 +337,7 @@ class TestEncodeWorkflow:
         args.format = 'numeric'
         args.model = '44.1k'
         args.play = False
+        args.no_daemon = True
         
         # Run encode
         standalone_demo.run_encode(args)
@@ -352,6 +354,7 @@ class TestEncodeWorkflow:
         args.format = 'binary'
         args.model = '44.1k'
         args.play = False
+        args.no_daemon = True
         
         # Run encode
         standalone_demo.run_encode(args)
@@ -373,6 +376,7 @@ class TestDecodeWorkflow:
         encode_args.format = 'text'
         encode_args.model = '44.1k'
         encode_args.play = False
+        encode_args.no_daemon = True
         
         standalone_demo.run_encode(encode_args)
         
@@ -381,6 +385,9 @@ class TestDecodeWorkflow:
         decode_args.input = output_audio_file
         decode_args.model = '44.1k'
         decode_args.phase_shift = False
+        decode_args.no_daemon = True
+        decode_args.offset = 0.0
+        decode_args.duration = None
         
         # Should not raise any exception
         standalone_demo.run_decode(decode_args)
@@ -391,6 +398,9 @@ class TestDecodeWorkflow:
         args.input = sample_audio_file
         args.model = '44.1k'
         args.phase_shift = False
+        args.no_daemon = True
+        args.offset = 0.0
+        args.duration = None
         
         # Should not raise exception, but should report no watermark
         standalone_demo.run_decode(args)
@@ -411,6 +421,7 @@ class TestEndToEndWorkflows:
         encode_args.format = 'text'
         encode_args.model = '44.1k'
         encode_args.play = False
+        encode_args.no_daemon = True
         
         standalone_demo.run_encode(encode_args)
         assert os.path.exists(output_audio_file)
@@ -420,6 +431,9 @@ class TestEndToEndWorkflows:
         decode_args.input = output_audio_file
         decode_args.model = '44.1k'
         decode_args.phase_shift = False
+        decode_args.no_daemon = True
+        decode_args.offset = 0.0
+        decode_args.duration = None
         
         standalone_demo.run_decode(decode_args)
     
@@ -435,6 +449,7 @@ class TestEndToEndWorkflows:
         encode_args.format = 'numeric'
         encode_args.model = '44.1k'
         encode_args.play = False
+        encode_args.no_daemon = True
         
         standalone_demo.run_encode(encode_args)
         assert os.path.exists(output_audio_file)
@@ -444,6 +459,9 @@ class TestEndToEndWorkflows:
         decode_args.input = output_audio_file
         decode_args.model = '44.1k'
         decode_args.phase_shift = False
+        decode_args.no_daemon = True
+        decode_args.offset = 0.0
+        decode_args.duration = None
         
         standalone_demo.run_decode(decode_args)
     
@@ -459,6 +477,7 @@ class TestEndToEndWorkflows:
         encode_args.format = 'binary'
         encode_args.model = '44.1k'
         encode_args.play = False
+        encode_args.no_daemon = True
         
         standalone_demo.run_encode(encode_args)
         assert os.path.exists(output_audio_file)
@@ -468,6 +487,9 @@ class TestEndToEndWorkflows:
         decode_args.input = output_audio_file
         decode_args.model = '44.1k'
         decode_args.phase_shift = False
+        decode_args.no_daemon = True
+        decode_args.offset = 0.0
+        decode_args.duration = None
         
         standalone_demo.run_decode(decode_args)
 
@@ -518,6 +540,7 @@ class TestErrorHandling:
             args.format = 'text'
             args.model = '44.1k'
             args.play = False
+            args.no_daemon = True
             
             with pytest.raises(RuntimeError):
                 standalone_demo.run_encode(args)
@@ -537,6 +560,9 @@ class TestErrorHandling:
             args.input = invalid_file
             args.model = '44.1k'
             args.phase_shift = False
+            args.no_daemon = True
+            args.offset = 0.0
+            args.duration = None
             
             with pytest.raises(RuntimeError):
                 standalone_demo.run_decode(args)
@@ -0,0 +1,143 @@
+"""
+Tests for the issued-watermark registry and its use by SilentCipherService
+"""
+
+import os
+import random
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from services import silentcipher_service as service_module
+from services.silentcipher_service import SilentCipherService
+from services.watermark_registry import PayloadCollisionError, WatermarkRegistry, pack_payload, unpack_payload
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = WatermarkRegistry(str(tmp_path / 'registry' / 'watermarks.db'))
+    yield registry
+    registry.close()
+
+
+class TestWatermarkRegistry:
+    """Tests for WatermarkRegistry"""
+
+    def test_payload_packing(self):
+        assert pack_payload([0, 0, 0, 1, 2]) == 258
+        assert pack_payload('0000000102') == 258
+        assert unpack_payload(258) == [0, 0, 0, 1, 2]
+        with pytest.raises(ValueError):
+            pack_payload([1, 2, 3, 4, 256])
+        with pytest.raises(ValueError):
+            pack_payload('0102')
+
+    def test_register_and_lookup(self, registry):
+        registry.register([72, 101, 108, 108, 111], asset='song.wav', recipient='alice', content_hash='ab' * 16,
+                          sdr=41.5, model='silentcipher-1.0-44.1k', issued_at=100.0)
+        registry.register([1, 2, 3, 4, 5], asset='song.wav', recipient='bob', issued_at=200.0)
+
+        [record] = registry.lookup([72, 101, 108, 108, 111])
+        assert record == {'payload': [72, 101, 108, 108, 111], 'asset': 'song.wav', 'recipient': 'alice',
+                          'content_hash': 'ab' * 16, 'issued_at': 100.0, 'sdr': 41.5,
+                          'model': 'silentcipher-1.0-44.1k'}
+        assert registry.lookup([9, 9, 9, 9, 9]) == []
+        assert registry.lookup_content('ab' * 16)[0]['recipient'] == 'alice'
+        assert [r['payload'] for r in registry.issued_to('bob')] == [[1, 2, 3, 4, 5]]
+        assert registry.issued_to('bob', since=300.0) == []
+        assert registry.count() == 2
+
+    def test_collisions(self, registry):
+        registry.register([1, 2, 3, 4, 5], asset='song.wav', recipient='alice')
+        # Issuing it again to the same recipient is not a collision
+        registry.register([1, 2, 3, 4, 5], asset='song.wav', recipient='alice')
+        with pytest.raises(PayloadCollisionError, match="alice"):
+            registry.register([1, 2, 3, 4, 5], asset='song.wav', recipient='bob')
+        with pytest.raises(PayloadCollisionError):
+            registry.check_available([1, 2, 3, 4, 5], asset='other.wav', recipient='alice')
+        registry.register([1, 2, 3, 4, 5], asset='song.wav', recipient='bob', allow_reuse=True)
+        assert len(registry.lookup([1, 2, 3, 4, 5])) == 3
+
+        taken = registry.new_payload(rng=random.Random(0))
+        registry.register(taken, recipient='carol')
+        assert registry.new_payload(rng=random.Random(0)) != taken
+
+    def test_concurrent_issues_of_one_payload(self, registry):
+        outcomes = []
+
+        def issue(recipient):
+            try:
+                registry.register([7, 7, 7, 7, 7], recipient=recipient)
+                outcomes.append('issued')
+            except PayloadCollisionError:
+                outcomes.append('collision')
+
+        threads = [threading.Thread(target=issue, args=(f'user-{i}',)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert sorted(outcomes) == ['collision'] * 7 + ['issued']
+
+    @pytest.mark.parametrize('extension', ['csv', 'jsonl'])
+    def test_export_and_import(self, registry, tmp_path, extension):
+        for i in range(25):
+            registry.register([0, 0, 0, 0, i], asset=f'asset-{i % 3}', recipient=f'user-{i}',
+                              content_hash=f'{i:032x}', sdr=30.0 + i, issued_at=1000.0 + i)
+        path = str(tmp_path / f'export.{extension}')
+        assert registry.export(path) == 25
+
+        copy = WatermarkRegistry(str(tmp_path / 'copy.db'))
+        assert copy.import_file(path, batch_size=10) == 25
+        assert list(copy.iter_rows(batch_size=7)) == list(registry.iter_rows())
+        # The indexes dropped for the import are back
+        plan = copy._connection().execute(
+            'EXPLAIN QUERY PLAN SELECT * FROM watermarks WHERE payload = ?', (1,)).fetchall()
+        assert 'watermarks_payload' in str(plan)
+        copy.close()
+
+
+class FakeModel:
+    model_version = 'test-weights'
+
+    def encode_wav(self, audio, sample_rate, message, **kwargs):
+        return audio * 0.5, 40.0
+
+
+@pytest.fixture
+def service(monkeypatch, registry):
+    class Loader:
+        def get_model(self, model_type, device, **kwargs):
+            return FakeModel()
+
+    monkeypatch.setattr(service_module, 'silentcipher', Loader())
+    monkeypatch.setattr(service_module, 'SILENTCIPHER_AVAILABLE', True)
+    return SilentCipherService(decode_cache_entries=0, registry=registry)
+
+
+class TestServiceRegistry:
+    """SilentCipherService records every issued payload"""
+
+    @pytest.mark.skipif(service_module.audio_fingerprint is None, reason="SilentCipher library not installed")
+    def test_encode_registers_payload(self, service, registry):
+        audio = np.random.default_rng(0).uniform(-0.5, 0.5, 4 * 16000).astype(np.float32)
+        service.encode_audio(audio, 16000, [1, 2, 3, 4, 5], asset='song.wav', recipient='alice')
+
+        [record] = registry.lookup([1, 2, 3, 4, 5])
+        assert record['recipient'] == 'alice'
+        assert record['sdr'] == 40.0 and record['model'] == 'test-weights'
+        assert record['content_hash'] == service_module.audio_fingerprint(audio, 16000)
+
+        with pytest.raises(PayloadCollisionError):
+            service.encode_audio(audio, 16000, [1, 2, 3, 4, 5], asset='song.wav', recipient='bob')
+        assert registry.count() == 1
+
+    def test_no_registry_by_default(self, monkeypatch, tmp_path):
+        # Only the web app reads WATERMARK_REGISTRY, benchmark workers do not record their payloads
+        monkeypatch.setenv('WATERMARK_REGISTRY', str(tmp_path / 'env.db'))
+        assert SilentCipherService().registry is None
+        assert not (tmp_path / 'env.db').exists()
@@ -5,6 +5,9 @@ Converts between different message formats for audio watermarking:
 - Numeric: 5 integers (0-255)
 - Text: String representation
 - Binary: 40-bit binary string
+
+With a PayloadCodec (utils/payload_codec.py) part of the payload holds parity,
+pass size=codec.message_bytes to work with the shorter messages.
 """
 
 from typing import List, Union, Tuple
@@ -13,8 +16,11 @@ from typing import List, Union, Tuple
 class MessageConverter:
     """Handles conversion between message formats for audio watermarking."""
     
+    # Bytes of the payload SilentCipher embeds
+    PAYLOAD_BYTES = 5
+    
     @staticmethod
-    def text_to_numeric(text: str) -> List[int]:
+    def text_to_numeric(text: str, size: int = PAYLOAD_BYTES) -> List[int]:
         """
         Convert text string to 5-integer array (0-255).
         
@@ -23,6 +29,7 @@ class MessageConverter:
         
         Args:
             text: Input text string
+            size: Number of integers, codec.message_bytes with a PayloadCodec
             
         Returns:
             List of 5 integers (0-255)
@@ -30,17 +37,17 @@ class MessageConverter:
         # Encode text to bytes (UTF-8)
         text_bytes = text.encode('utf-8')
         
-        # Pad or truncate to 5 bytes
-        if len(text_bytes) < 5:
-            text_bytes = text_bytes + b'\x00' * (5 - len(text_bytes))
+        # Pad or truncate to size bytes
+        if len(text_bytes) < size:
+            text_bytes = text_bytes + b'\x00' * (size - len(text_bytes))
         else:
-            text_bytes = text_bytes[:5]
+            text_bytes = text_bytes[:size]
         
         # Convert bytes to list of integers
         return list(text_bytes)
     
     @staticmethod
-    def binary_to_numeric(binary_str: str) -> List[int]:
+    def binary_to_numeric(binary_str: str, size: int = PAYLOAD_BYTES) -> List[int]:
         """
         Convert 40-bit binary string to 5-integer array (0-255).
         
@@ -48,6 +55,7 @@ class MessageConverter:
         
         Args:
             binary_str: 40-bit binary string (e.g., "0101010101010101...")
+            size: Number of integers, codec.message_bytes with a PayloadCodec
             
         Returns:
             List of 5 integers (0-255)
@@ -59,8 +67,8 @@ class MessageConverter:
         binary_str = binary_str.replace(' ', '').replace('_', '')
         
         # Validate length
-        if len(binary_str) != 40:
-            raise ValueError(f"Binary string must be exactly 40 bits, got {len(binary_str)}")
+        if len(binary_str) != size * 8:
+            raise ValueError(f"Binary string must be exactly {size * 8} bits, got {len(binary_str)}")
         
         # Validate characters
         if not all(c in '01' for c in binary_str):
@@ -68,19 +76,20 @@ class MessageConverter:
         
         # Convert each 8-bit chunk to integer
         result = []
-        for i in range(0, 40, 8):
+        for i in range(0, len(binary_str), 8):
             byte_str = binary_str[i:i+8]
             result.append(int(byte_str, 2))
         
         return result
     
     @staticmethod
-    def numeric_to_text(numeric_array: List[int]) -> str:
+    def numeric_to_text(numeric_array: List[int], size: int = PAYLOAD_BYTES) -> str:
         """
         Convert 5-integer array to text string.
         
         Args:
             numeric_array: List of 5 integers (0-255)
+            size: Number of integers, codec.message_bytes with a PayloadCodec
             
         Returns:
             Decoded text string (strips null bytes)
@@ -89,8 +98,8 @@ class MessageConverter:
             ValueError: If array is not valid
         """
         # Validate input
-        if len(numeric_array) != 5:
-            raise ValueError(f"Numeric array must have exactly 5 integers, got {len(numeric_array)}")
+        if len(numeric_array) != size:
+            raise ValueError(f"Numeric array must have exactly {size} integers, got {len(numeric_array)}")
         
         if not all(isinstance(x, int) and 0 <= x <= 255 for x in numeric_array):
             raise ValueError("All values must be integers between 0 and 255")
@@ -108,12 +117,13 @@ class MessageConverter:
             raise ValueError(f"Failed to decode numeric array to text: {e}")
     
     @staticmethod
-    def numeric_to_binary(numeric_array: List[int]) -> str:
+    def numeric_to_binary(numeric_array: List[int], size: int = PAYLOAD_BYTES) -> str:
         """
         Convert 5-integer array to 40-bit binary string.
         
         Args:
             numeric_array: List of 5 integers (0-255)
+            size: Number of integers, codec.message_bytes with a PayloadCodec
             
         Returns:
             40-bit binary string
@@ -122,8 +132,8 @@ class MessageConverter:
             ValueError: If array is not valid
         """
         # Validate input
-        if len(numeric_array) != 5:
-            raise ValueError(f"Numeric array must have exactly 5 integers, got {len(numeric_array)}")
+        if len(numeric_array) != size:
+            raise ValueError(f"Numeric array must have exactly {size} integers, got {len(numeric_array)}")
         
         if not all(isinstance(x, int) and 0 <= x <= 255 for x in numeric_array):
             raise ValueError("All values must be integers between 0 and 255")
@@ -136,13 +146,15 @@ class MessageConverter:
         return ''.join(binary_parts)
     
     @staticmethod
-    def validate_message(message: Union[str, List[int]], format_type: str) -> Tuple[bool, str]:
+    def validate_message(message: Union[str, List[int]], format_type: str,
+                         size: int = PAYLOAD_BYTES) -> Tuple[bool, str]:
         """
         Validate message format.
         
         Args:
             message: Message to validate
             format_type: One of 'numeric', 'text', 'binary'
+            size: Number of integers, codec.message_bytes with a PayloadCodec
             
         Returns:
             Tuple of (is_valid, error_message)
@@ -151,8 +163,8 @@ class MessageConverter:
             if not isinstance(message, list):
                 return False, "Numeric message must be a list"
             
-            if len(message) != 5:
-                return False, f"Numeric message must have exactly 5 integers, got {len(message)}"
+            if len(message) != size:
+                return False, f"Numeric message must have exactly {size} integers, got {len(message)}"
             
             for i, val in enumerate(message):
                 if not isinstance(val, int):
@@ -185,8 +197,8 @@ class MessageConverter:
             # Remove whitespace for validation
             clean_binary = message.replace(' ', '').replace('_', '')
             
-            if len(clean_binary) != 40:
-                return False, f"Binary message must be exactly 40 bits, got {len(clean_binary)}"
+            if len(clean_binary) != size * 8:
+                return False, f"Binary message must be exactly {size * 8} bits, got {len(clean_binary)}"
             
             if not all(c in '01' for c in clean_binary):
                 return False, "Binary message must contain only '0' and '1' characters"
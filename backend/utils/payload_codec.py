@@ -0,0 +1,201 @@
+"""
+Payload Codec
+
+Optional error-correcting layer over the 5 byte payload SilentCipher embeds.
+The decoder votes every 2 bit symbol of the payload over the frames it sees,
+with little audio some votes go wrong and the whole message is lost. Here the
+payload is a Reed-Solomon codeword over GF(16): its 10 nibbles hold the message
+followed by parity nibbles. A wrong 2 bit symbol corrupts exactly one nibble,
+and up to max_corrections corrupted nibbles are corrected. The remaining
+parity verifies the result, a payload with more errors is rejected instead of
+returning a wrong message.
+
+    codec = PayloadCodec(parity=4)       # 3 message bytes, corrects 1 nibble
+    payload = codec.encode([72, 105, 33])
+    codec.decode(payload)                # {'message': [72, 105, 33], 'payload': [...], 'corrected': 0}
+"""
+
+from typing import Any, Dict, List, Optional
+
+# Nibbles of the embedded 5 byte payload
+PAYLOAD_NIBBLES = 10
+
+# GF(16) with the primitive polynomial x^4 + x + 1
+_EXP = [0] * 30
+_LOG = [0] * 16
+_value = 1
+for _power in range(15):
+    _EXP[_power] = _EXP[_power + 15] = _value
+    _LOG[_value] = _power
+    _value <<= 1
+    if _value & 0x10:
+        _value ^= 0x13
+
+
+def _mul(a: int, b: int) -> int:
+    return 0 if a == 0 or b == 0 else _EXP[_LOG[a] + _LOG[b]]
+
+
+def _div(a: int, b: int) -> int:
+    return 0 if a == 0 else _EXP[(_LOG[a] - _LOG[b]) % 15]
+
+
+def _evaluate(poly: List[int], x: int) -> int:
+    """Value of a polynomial given highest degree first."""
+    value = 0
+    for coefficient in poly:
+        value = _mul(value, x) ^ coefficient
+    return value
+
+
+class PayloadCodec:
+    """Shortened Reed-Solomon code RS(10, 10 - parity) over the nibbles of the payload."""
+
+    def __init__(self, parity: int = 4, max_corrections: Optional[int] = None):
+        """
+        Args:
+            parity: Parity nibbles, 2, 4 or 6, the message keeps 5 - parity / 2 bytes
+            max_corrections: Corrupted nibbles corrected at most, up to parity / 2.
+                             Defaults to (parity - 1) // 2, which leaves parity
+                             to detect at least one more error than it corrects.
+
+        Raises:
+            ValueError: If parity or max_corrections is out of range
+
+        Note:
+            Every correction allowed makes a random payload more likely to pass,
+            e.g. with 4 parity nibbles 0.002% of random payloads are accepted
+            without corrections, 0.23% with 1 and 15.7% with 2.
+        """
+        if parity not in (2, 4, 6):
+            raise ValueError(f"parity must be 2, 4 or 6 nibbles, got {parity}")
+        if max_corrections is None:
+            max_corrections = (parity - 1) // 2
+        if not 0 <= max_corrections <= parity // 2:
+            raise ValueError(f"max_corrections must be between 0 and {parity // 2}, got {max_corrections}")
+        self.parity = parity
+        self.max_corrections = max_corrections
+        self.message_bytes = (PAYLOAD_NIBBLES - parity) // 2
+        # Generator polynomial (x + a^0)(x + a^1)...(x + a^(parity - 1)), highest degree first
+        self._generator = [1]
+        for power in range(parity):
+            shifted = self._generator + [0]
+            for i, coefficient in enumerate(self._generator):
+                shifted[i + 1] ^= _mul(coefficient, _EXP[power])
+            self._generator = shifted
+
+    def encode(self, message: List[int]) -> List[int]:
+        """
+        Protect a message.
+
+        Args:
+            message: message_bytes integers (0-255)
+
+        Returns:
+            Payload of 5 integers (0-255): the message followed by the parity
+
+        Raises:
+            ValueError: If the message is not valid
+        """
+        if len(message) != self.message_bytes:
+            raise ValueError(f"Message must have exactly {self.message_bytes} integers, got {len(message)}")
+        if not all(isinstance(x, int) and 0 <= x <= 255 for x in message):
+            raise ValueError("All values must be integers between 0 and 255")
+
+        # Systematic encoding, the parity is the remainder of message * x^parity by the generator
+        nibbles = _to_nibbles(message) + [0] * self.parity
+        remainder = list(nibbles)
+        for i in range(len(nibbles) - self.parity):
+            coefficient = remainder[i]
+            if coefficient:
+                for j in range(1, len(self._generator)):
+                    remainder[i + j] ^= _mul(self._generator[j], coefficient)
+        return _to_bytes(nibbles[:-self.parity] + remainder[-self.parity:])
+
+    def decode(self, payload: List[int]) -> Optional[Dict[str, Any]]:
+        """
+        Correct and verify a decoded payload.
+
+        Args:
+            payload: 5 integers (0-255) as decoded from the audio
+
+        Returns:
+            Dictionary with the 'message', the corrected 'payload' and the
+            number of nibbles 'corrected', or None if the payload has more
+            errors than can be corrected
+        """
+        if len(payload) != 5:
+            raise ValueError(f"Payload must have exactly 5 integers, got {len(payload)}")
+        nibbles = _to_nibbles(payload)
+        syndromes = [_evaluate(nibbles, _EXP[power]) for power in range(self.parity)]
+        corrected = 0
+        if any(syndromes):
+            errors = self._locate(syndromes)
+            if errors is None:
+                return None
+            for position, magnitude in errors:
+                nibbles[position] ^= magnitude
+            corrected = len(errors)
+        message = _to_bytes(nibbles[:-self.parity])
+        return {'message': message, 'payload': _to_bytes(nibbles), 'corrected': corrected}
+
+    def _locate(self, syndromes: List[int]) -> Optional[List[tuple]]:
+        """
+        Find the errors explaining the syndromes, with Berlekamp-Massey, a Chien
+        search and Forney's formula.
+
+        Returns:
+            (nibble index, error value) pairs, None if more than max_corrections
+            errors or no consistent error pattern is found
+        """
+        # Error locator, lowest degree first
+        locator, previous = [1], [1]
+        degree, shift, previous_discrepancy = 0, 1, 1
+        for n in range(self.parity):
+            discrepancy = syndromes[n]
+            for i in range(1, degree + 1):
+                discrepancy ^= _mul(locator[i], syndromes[n - i])
+            if discrepancy == 0:
+                shift += 1
+                continue
+            scale = _div(discrepancy, previous_discrepancy)
+            updated = locator + [0] * max(0, len(previous) + shift - len(locator))
+            for i, coefficient in enumerate(previous):
+                updated[i + shift] ^= _mul(scale, coefficient)
+            if 2 * degree <= n:
+                degree, previous, previous_discrepancy, shift = n + 1 - degree, locator, discrepancy, 1
+            else:
+                shift += 1
+            locator = updated
+        if degree > self.max_corrections:
+            return None
+
+        # Nibble i is the coefficient of x^(9 - i), its error locator is a^(9 - i)
+        positions = [i for i in range(PAYLOAD_NIBBLES)
+                     if _evaluate(locator[::-1], _EXP[(15 - (PAYLOAD_NIBBLES - 1 - i)) % 15]) == 0]
+        if len(positions) != degree:
+            return None
+
+        # Error evaluator S(x) * locator(x) mod x^parity, and the formal derivative of the locator
+        evaluator = [0] * self.parity
+        for i, syndrome in enumerate(syndromes):
+            for j, coefficient in enumerate(locator[:self.parity - i]):
+                evaluator[i + j] ^= _mul(syndrome, coefficient)
+        derivative = [coefficient if i % 2 else 0 for i, coefficient in enumerate(locator)][1:]
+        errors = []
+        for position in positions:
+            x = _EXP[PAYLOAD_NIBBLES - 1 - position]
+            x_inverse = _EXP[(15 - (PAYLOAD_NIBBLES - 1 - position)) % 15]
+            denominator = _evaluate(derivative[::-1], x_inverse)
+            if denominator == 0:
+                return None
+            errors.append((position, _mul(x, _div(_evaluate(evaluator[::-1], x_inverse), denominator))))
+        return errors
+
+
+def _to_nibbles(values: List[int]) -> List[int]:
+    return [nibble for value in values for nibble in (value >> 4, value & 0x0F)]
+
+
+def _to_bytes(nibbles: List[int]) -> List[int]:
+    return [(nibbles[i] << 4) | nibbles[i + 1] for i in range(0, len(nibbles), 2)]
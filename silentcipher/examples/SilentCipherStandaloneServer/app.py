@@ -1,8 +1,14 @@
-from email import message
-from flask import Flask, request
+from flask import Flask, request, Response
+import io
 import json
+import shutil
+import tempfile
+import time
+import numpy as np
+import soundfile as sf
 import torch
 import silentcipher
+from silentcipher import MicroBatcher, EncodeCache, DecodeCache
 import yaml
 
 config = yaml.safe_load(open('config.yaml'))
@@ -14,60 +20,225 @@ else:
 
 models = {}
 
+cache_config = config.get('encode_cache') or {}
+def make_encode_cache(model_type):
+    if not cache_config.get('dir'):
+        return None
+    return EncodeCache(f"{cache_config['dir']}/{model_type}", max_bytes=cache_config.get('max_bytes', 1 << 30))
+
+decode_cache_config = config.get('decode_cache') or {}
+def make_decode_cache(model_type):
+    if not decode_cache_config.get('max_entries'):
+        return None
+    cache_dir = f"{decode_cache_config['dir']}/{model_type}" if decode_cache_config.get('dir') else None
+    return DecodeCache(max_entries=decode_cache_config['max_entries'], cache_dir=cache_dir)
+
 if config['enable_44k']:
     models['44k'] = silentcipher.get_model(
-        model_type='44.1k', 
-        ckpt_path='../../Models/44_1_khz/73999_iteration', 
+        model_type='44.1k',
+        ckpt_path='../../Models/44_1_khz/73999_iteration',
         config_path='../../Models/44_1_khz/73999_iteration/hparams.yaml',
-        device=device
+        device=device,
+        encode_cache=make_encode_cache('44k'),
+        decode_cache=make_decode_cache('44k')
     )
 if config['enable_16k']:
     models['16k'] = silentcipher.get_model(
         model_type='16k',
-        ckpt_path='../../Models/16_khz/97561_iteration', 
+        ckpt_path='../../Models/16_khz/97561_iteration',
         config_path='../../Models/16_khz/97561_iteration/hparams.yaml',
-        device=device
+        device=device,
+        encode_cache=make_encode_cache('16k'),
+        decode_cache=make_decode_cache('16k')
     )
 
+# Concurrent requests are gathered into batches and each batch runs as one forward pass.
+# Only requests for the same model (and message SDR / phase shift setting) share a batch.
+# The batcher runs every batch on one thread, on CPU a batch is no faster than its items
+# (examples/benchmarks/batching_benchmark.py), so with enabled: auto the request threads
+# call the model directly unless it runs on CUDA.
+batching = config.get('batching', {})
+batching_enabled = batching.get('enabled', 'auto')
+if batching_enabled == 'auto':
+    batching_enabled = device == 'cuda'
+batching_enabled = bool(batching_enabled) and batching.get('max_batch_size', 8) > 1
+
+def encode_batch(key, items):
+    model_type, message_sdr = key
+    return models[model_type].encode_wav_batch([y for y, _, _ in items], [sr for _, sr, _ in items], [message for _, _, message in items], message_sdr=message_sdr)
+
+def decode_batch(key, items):
+    model_type, phase_shift_decoding = key
+    return models[model_type].decode_wav_batch([y for y, _ in items], [sr for _, sr in items], phase_shift_decoding)
+
+encode_batcher = decode_batcher = None
+if batching_enabled:
+    encode_batcher = MicroBatcher(encode_batch, max_batch_size=batching.get('max_batch_size', 8), max_wait_ms=batching.get('max_wait_ms', 5), name='encode-batcher')
+    decode_batcher = MicroBatcher(decode_batch, max_batch_size=batching.get('max_batch_size', 8), max_wait_ms=batching.get('max_wait_ms', 5), name='decode-batcher')
+
+def run_batched(batcher, fn, key, items):
+    # Without a batcher the channels of the request still run as one batch, in the request thread
+    if batcher is None:
+        return fn(key, items)
+    futures = [batcher.submit(key, item) for item in items]
+    return [future.result() for future in futures]
+
 
 app = Flask(__name__)
 
-@app.route('/encode', methods=['POST'])
-def encode():
-    if request.json['model_type'] == '44k': # type: ignore
+def check_model_type(model_type):
+    if model_type == '44k':
         if not config['enable_44k']:
-            return json.dumps({'status': False, 'message': 'Please enable the 44k model in the config file to be able to encode using the 44k model'})
-        model = models['44k']
-    elif request.json['model_type'] == '16k': # type: ignore
+            return 'Please enable the 44k model in the config file to be able to encode using the 44k model'
+    elif model_type == '16k':
         if not config['enable_16k']:
-            return json.dumps({'status': False, 'message': 'Please enable the 16k model in the config file to be able to encode using the 16k model'})
-        model = models['16k']
+            return 'Please enable the 16k model in the config file to be able to encode using the 16k model'
     else:
-        return json.dumps({'status': False, 'message': f'{request.json["model_type"]} Model type not implemented'}) # type: ignore
-    
+        return f'{model_type} Model type not implemented'
+    return None
+
+def split_channels(y):
+    if y.ndim == 1:
+        return [y]
+    return [y[:, i] for i in range(y.shape[1])]
+
+def run_encode(model_type, y, orig_sr, message, message_sdr):
+    start = time.time()
+    model = models[model_type]
+    # The requests run through the batcher, the cache is shared with Model.encode_wav under the same keys
+    cache_key = model.encode_cache_key(y, orig_sr, message, message_sdr=message_sdr)
+    if cache_key is not None:
+        cached = model.encode_cache.get(cache_key)
+        if cached is not None:
+            encoded_y, sdr = cached
+            return encoded_y, format_encode_result(y, orig_sr, sdr, time.time() - start)
+
+    channels = split_channels(y)
+    messages = [message]*len(channels) if type(message[0]) == int else message
+    encoded = run_batched(encode_batcher, encode_batch, (model_type, message_sdr), [(channel, orig_sr, message_i) for channel, message_i in zip(channels, messages)])
+    time_taken = time.time() - start
+
+    if y.ndim == 1:
+        encoded_y, sdr = encoded[0]
+    else:
+        encoded_y = np.stack([y_i for y_i, _ in encoded], axis=1)
+        sdr = [sdr_i for _, sdr_i in encoded]
+
+    if cache_key is not None:
+        model.encode_cache.put(cache_key, encoded_y, sdr)
+    return encoded_y, format_encode_result(y, orig_sr, sdr, time_taken)
+
+def format_encode_result(y, orig_sr, sdr, time_taken):
+    sdr = [f'{sdr_i:.2f}' for sdr_i in sdr] if type(sdr) == list else f'{sdr:.2f}'
+    return {'status': True, 'sdr': sdr, 'time_taken': time_taken, 'time_taken_per_second': time_taken / (y.shape[0] / orig_sr)}
+
+def run_decode(model_type, y, orig_sr, phase_shift_decoding):
+    phase_shift_decoding = bool(phase_shift_decoding) and phase_shift_decoding != 'false'
+    model = models[model_type]
+    cache_key = model.decode_cache_key(y, orig_sr, phase_shift_decoding)
+    if cache_key is not None:
+        cached = model.decode_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    results = run_batched(decode_batcher, decode_batch, (model_type, phase_shift_decoding), [(channel, orig_sr) for channel in split_channels(y)])
+    results = results[0] if y.ndim == 1 else results
+
+    if cache_key is not None:
+        model.decode_cache.put(cache_key, results)
+    return results
+
+@app.route('/encode', methods=['POST'])
+def encode():
+    model_type = request.json['model_type'] # type: ignore
+    error = check_model_type(model_type)
+    if error is not None:
+        return json.dumps({'status': False, 'message': error})
+    model = models[model_type]
+
     if request.json['message_sdr'] is not None: # type: ignore
         message_sdr = float(request.json['message_sdr']) # type: ignore
     else:
         message_sdr = None
-    
-    response = json.dumps(model.encode(request.json['in_path'], request.json['out_path'], request.json['message'], message_sdr)) # type: ignore
-    return response
+
+    y, orig_sr = model.load_audio(request.json['in_path']) # type: ignore
+    encoded_y, result = run_encode(model_type, y, orig_sr, request.json['message'], message_sdr) # type: ignore
+    sf.write(request.json['out_path'], encoded_y, orig_sr) # type: ignore
+
+    return json.dumps(result)
 
 @app.route('/decode', methods=['POST'])
 def decode():
-    if request.json['model_type'] == '44k': # type: ignore
-        if not config['enable_44k']:
-            return json.dumps({'status': False, 'message': 'Please enable the 44k model in the config file to be able to encode using the 44k model'})
-        model = models['44k']
-    elif request.json['model_type'] == '16k': # type: ignore
-        if not config['enable_16k']:
-            return json.dumps({'status': False, 'message': 'Please enable the 16k model in the config file to be able to encode using the 16k model'})
-        model = models['16k']
-    else:
-        return json.dumps({'status': False, 'message': f'{request.json["model_type"]} Model type not implemented'}) # type: ignore
-    
-    response = json.dumps(model.decode(request.json['path'], request.json['phase_shift_decoding'])) # type: ignore
+    model_type = request.json['model_type'] # type: ignore
+    error = check_model_type(model_type)
+    if error is not None:
+        return json.dumps({'status': False, 'message': error})
+    model = models[model_type]
+
+    y, orig_sr = model.load_audio(request.json['path']) # type: ignore
+    response = json.dumps(run_decode(model_type, y, orig_sr, request.json['phase_shift_decoding'])) # type: ignore
     return response
 
+# Byte-stream API: the audio is sent as the request body (or as the 'file' field of a multipart form)
+# and never touches the disk of the model server. Parameters go in the query string or the form fields.
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def read_request_audio():
+    # Uploads are not read into memory whole: multipart files are already spooled
+    # to disk by werkzeug, raw bodies are copied in chunks to a spooled file
+    if request.files:
+        return request.files['file'].stream, request.form
+    audio = tempfile.SpooledTemporaryFile(max_size=16 * STREAM_CHUNK_SIZE)
+    shutil.copyfileobj(request.stream, audio, STREAM_CHUNK_SIZE)
+    audio.seek(0)
+    return audio, request.args
+
+@app.route('/encode_stream', methods=['POST'])
+def encode_stream():
+    audio, params = read_request_audio()
+    model_type = params.get('model_type', '44k')
+    error = check_model_type(model_type)
+    if error is not None:
+        return json.dumps({'status': False, 'message': error}), 400
+
+    message = [int(m) for m in params['message'].split(',')]
+    message_sdr = float(params['message_sdr']) if params.get('message_sdr') not in (None, '', 'null') else None
+    output_format = params.get('format', 'wav').upper()
+
+    y, orig_sr = models[model_type].load_audio(audio)
+    encoded_y, result = run_encode(model_type, y, orig_sr, message, message_sdr)
+
+    encoded = io.BytesIO()
+    sf.write(encoded, encoded_y, orig_sr, format=output_format)
+    encoded = encoded.getbuffer()
+
+    def generate():
+        for start in range(0, len(encoded), STREAM_CHUNK_SIZE):
+            yield bytes(encoded[start:start + STREAM_CHUNK_SIZE])
+
+    sdr = result['sdr'] if type(result['sdr']) == str else ','.join(result['sdr'])
+    headers = {'X-Status': 'true', 'X-SDR': sdr, 'X-Time-Taken': f"{result['time_taken']:.4f}", 'Content-Length': str(len(encoded))}
+    return Response(generate(), mimetype=f'audio/{output_format.lower()}', headers=headers)
+
+@app.route('/decode_stream', methods=['POST'])
+def decode_stream():
+    audio, params = read_request_audio()
+    model_type = params.get('model_type', '44k')
+    error = check_model_type(model_type)
+    if error is not None:
+        return json.dumps({'status': False, 'message': error}), 400
+
+    y, orig_sr = models[model_type].load_audio(audio)
+    return json.dumps(run_decode(model_type, y, orig_sr, params.get('phase_shift_decoding', 'false')))
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    encode_cache = {model_type: model.encode_cache.metrics() for model_type, model in models.items() if model.encode_cache is not None}
+    decode_cache = {model_type: model.decode_cache.metrics() for model_type, model in models.items() if model.decode_cache is not None}
+    batchers = {'encode': encode_batcher.metrics() if encode_batcher is not None else None,
+                'decode': decode_batcher.metrics() if decode_batcher is not None else None}
+    return json.dumps({**batchers, 'encode_cache': encode_cache, 'decode_cache': decode_cache})
+
 if __name__ == "__main__":
-    app.run(host='127.0.0.1', port=8001)
+    app.run(host='127.0.0.1', port=8001, threaded=True)
@@ -38,8 +38,13 @@ ALLOWED_EXTENSIONS = [
     'wav', 'mp3', 'aac', 'ogg', 'flac', 'alac', 'aiff', 'dsd', 'pcm',
     'MP4', 'MOV', 'WMV', 'AVI', 'AVCHD', 'FLV', 'F4V', 'SWF', 'MKV', 'WEBM'
 ]
+# Uploads are streamed to disk in chunks of UPLOAD_CHUNK_SIZE, larger files are refused
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 ENCODE_URL = 'http://127.0.0.1:8001/encode'
 DECODE_URL = 'http://127.0.0.1:8001/decode'
+ENCODE_STREAM_URL = 'http://127.0.0.1:8001/encode_stream'
+DECODE_STREAM_URL = 'http://127.0.0.1:8001/decode_stream'
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -6,6 +6,7 @@ import requests
 import datetime
 from pathlib import Path
 
+import hashlib
 import json
 import os
 
@@ -25,6 +26,29 @@ def sanitize_data(data):
     return data
 
 
+def save_upload(upload, path):
+    """
+    Write an uploaded file to path chunk by chunk, hashing it on the way, so it is
+    never held in memory whole. Returns the sha256 hex digest, or None (and no file)
+    if the upload is larger than MAX_UPLOAD_SIZE.
+    """
+    if upload.size > settings.MAX_UPLOAD_SIZE:
+        return None
+    digest = hashlib.sha256()
+    written = 0
+    with open(path, 'wb') as f:
+        for chunk in upload.chunks(settings.UPLOAD_CHUNK_SIZE):
+            written += len(chunk)
+            if written > settings.MAX_UPLOAD_SIZE:
+                break
+            digest.update(chunk)
+            f.write(chunk)
+    if written > settings.MAX_UPLOAD_SIZE:
+        os.remove(path)
+        return None
+    return digest.hexdigest()
+
+
 def create_user(request):
 
     if request.method == 'POST':
@@ -70,7 +94,7 @@ def new_project(request, **kwargs):
         
         extension = request.FILES['file'].name.split('.')[-1]
 
-        if extension not in settings.ALLOWED_EXTENSIONS:
+        if extension not in settings.ALLOWED_EXTENSIONS or request.FILES['file'].size > settings.MAX_UPLOAD_SIZE:
             return JsonResponse({'status': False})
         
         _id = settings.PROJECT.insert_one(
@@ -88,9 +112,8 @@ def new_project(request, **kwargs):
         print(str(_id.inserted_id))
         _id = str(_id.inserted_id)
         
-        with open(settings.FILE_UPLOAD_DIR + '/' + str(_id) + '.' + extension, 'wb') as f:
-            f.write(request.FILES['file'].read())
-
+        sha256 = save_upload(request.FILES['file'], settings.FILE_UPLOAD_DIR + '/' + str(_id) + '.' + extension)
+        settings.PROJECT.update_one({'_id': ObjectId(_id)}, {'$set': {'sha256': sha256}})
 
         projects = user['projects']
         projects.append({'name': request.POST.get('projectName'), '_id': str(_id)})
@@ -133,22 +156,27 @@ def encode_project(request, **kwargs):
         project_id = ObjectId(data['project']['_id'])
         data['project']['message'] = [int(_) for _ in data['project']['message']]
         del data['project']['_id']
-        # try:
-        result = json.loads(requests.post(settings.ENCODE_URL, json={
-            'model_type': data['model_type'],
-            'in_path': settings.FILE_UPLOAD_DIR_REL_MODEL_SERVER + '/' + str(project_id) + '.' + data['project']['extension'],
-            'out_path': settings.FILE_UPLOAD_DIR_REL_MODEL_SERVER + '/' + str(project_id) + '_encoded.' + data['project']['extension'],
-            'message': data['project']['message'],
-            'message_sdr': data['message_sdr']
-        }).text)
-        # except:
-        #     return JsonResponse({'status': False})
-        
-        print(result)
-        data['project']['encoded'] = result['status']
-        data['project']['sdr'] = result['sdr']
-        if not result['status']:
+        extension = data['project']['extension']
+        # The upload is streamed to the model server and the encoded audio streamed back,
+        # the model server does not need access to the upload directory
+        with open(settings.FILE_UPLOAD_DIR + '/' + str(project_id) + '.' + extension, 'rb') as audio:
+            response = requests.post(settings.ENCODE_STREAM_URL, data=audio, stream=True, params={
+                'model_type': data['model_type'],
+                'message': ','.join(str(m) for m in data['project']['message']),
+                'message_sdr': data['message_sdr'],
+                'format': extension,
+            })
+        if response.headers.get('X-Status') != 'true':
+            print(response.text)
             return JsonResponse({'status': False})
+        with open(settings.FILE_UPLOAD_DIR + '/' + str(project_id) + '_encoded.' + extension, 'wb') as f:
+            for chunk in response.iter_content(settings.UPLOAD_CHUNK_SIZE):
+                f.write(chunk)
+
+        # One SDR per channel for multi-channel audio, as the path based ENCODE_URL returns it
+        sdr = response.headers['X-SDR']
+        data['project']['encoded'] = True
+        data['project']['sdr'] = sdr.split(',') if ',' in sdr else sdr
 
         settings.PROJECT.update_one({'_id': project_id}, {'$set': data['project']})
         data['project']['_id'] = str(project_id)
@@ -162,20 +190,22 @@ def decode(request, **kwargs):
         extension = request.FILES['file'].name.split('.')[-1]
         timestamp = datetime.datetime.now()
 
-        if extension not in settings.ALLOWED_EXTENSIONS:
+        if extension not in settings.ALLOWED_EXTENSIONS or request.FILES['file'].size > settings.MAX_UPLOAD_SIZE:
             return JsonResponse({'status': False})
 
         _id = settings.DECODE.insert_one({'time': timestamp, 'extension': extension, 'email': kwargs['email']}).inserted_id
 
-        with open(settings.DECODE_UPLOAD_DIR + '/' + str(_id) + '.' + extension, 'wb') as f:
-            f.write(request.FILES['file'].read())
+        path = settings.DECODE_UPLOAD_DIR + '/' + str(_id) + '.' + extension
+        sha256 = save_upload(request.FILES['file'], path)
+        settings.DECODE.update_one({'_id': ObjectId(_id)}, {'$set': {'sha256': sha256}})
 
         try:
-            result = json.loads(requests.post(settings.DECODE_URL, json={
-                'model_type': request.POST.get('model_type'),
-                'path': settings.DECODE_UPLOAD_DIR_REL_MODEL_SERVER + '/' + str(_id) + '.' + extension,
-                'phase_shift_decoding': request.POST.get('phase_shift_decoding'),
-            }).text)
+            # The saved upload is streamed to the model server, which does not read it back from disk
+            with open(path, 'rb') as audio:
+                result = json.loads(requests.post(settings.DECODE_STREAM_URL, data=audio, params={
+                    'model_type': request.POST.get('model_type'),
+                    'phase_shift_decoding': request.POST.get('phase_shift_decoding'),
+                }).text)
         except:
             print('Some error in model server')
             return JsonResponse({'status': False})
@@ -225,7 +255,7 @@ def apply_distortion(request, **kwargs):
         
         extension = request.FILES['file'].name.split('.')[-1]
 
-        if extension not in settings.ALLOWED_EXTENSIONS:
+        if extension not in settings.ALLOWED_EXTENSIONS or request.FILES['file'].size > settings.MAX_UPLOAD_SIZE:
             return JsonResponse({'status': False})
         
         if request.POST.get('distorted_path') == 'null':
@@ -245,8 +275,8 @@ def apply_distortion(request, **kwargs):
                 return JsonResponse({'status': False})
             _id = str(data['_id'])
         
-        with open(settings.FILE_UPLOAD_DIR + '/' + str(_id) + '.' + extension, 'wb') as f:
-            f.write(request.FILES['file'].read())
+        sha256 = save_upload(request.FILES['file'], settings.FILE_UPLOAD_DIR + '/' + str(_id) + '.' + extension)
+        settings.MANIPULATE.update_one({'_id': ObjectId(_id)}, {'$set': {'sha256': sha256}})
 
         distorted_path = str(_id) + '_distorted.wav'
         
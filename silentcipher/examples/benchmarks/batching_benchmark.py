@@ -0,0 +1,100 @@
+"""
+Throughput of concurrent requests with and without the MicroBatcher.
+
+--clients threads each send --requests encode (or decode) requests of --seconds of audio, as the standalone
+server's request threads would, and every mode is timed over the same requests:
+  - direct: every thread calls encode_wav_batch / decode_wav_batch with its own item,
+  - batched: every thread submits its item to a MicroBatcher, which runs up to --max_batch_size items per call
+    on its single worker thread.
+
+Reports requests per second, mean and p95 latency, and the mean batch size of the batched mode. Batching only
+pays off when a batched forward is cheaper than the separate ones (typically on a GPU), otherwise the server
+should call the model directly (batching.enabled in the standalone server's config.yaml).
+
+    python batching_benchmark.py --clients 8 --seconds 5
+    python batching_benchmark.py --random_weights --operation decode --max_batch_size 4 8
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+import torch
+
+from silentcipher import MicroBatcher
+from common import add_model_arguments, load_model, describe_model
+
+
+MESSAGE = [123, 234, 111, 222, 11]
+
+
+def synthetic_audio(seconds, sr, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    tones = sum(0.1 * np.sin(2 * np.pi * f * t) for f in (220, 440, 880, 1760))
+    return (tones + 0.02 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def batch_fn(model, operation):
+    if operation == 'encode':
+        return lambda key, items: model.encode_wav_batch(items, model.sr, MESSAGE, message_sdr=key)
+    return lambda key, items: model.decode_wav_batch(items, model.sr, key)
+
+
+def run_clients(call, inputs, clients, requests):
+    """Runs requests calls per client thread, returns the wall time and the latency of every call."""
+    latencies = []
+    lock = threading.Lock()
+
+    def client(index):
+        for i in range(requests):
+            start = time.perf_counter()
+            call(inputs[(index + i) % len(inputs)])
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, np.array(latencies)
+
+
+def report(name, wall, latencies, extra=''):
+    print(f'{name:>12} {len(latencies) / wall:>8.2f} {latencies.mean() * 1000:>10.0f} '
+          f'{np.percentile(latencies, 95) * 1000:>10.0f} {extra}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_model_arguments(parser)
+    parser.add_argument('--operation', choices=['encode', 'decode'], default='encode')
+    parser.add_argument('--seconds', type=float, default=5, help='Duration of the audio of each request')
+    parser.add_argument('--clients', type=int, default=8, help='Concurrent client threads')
+    parser.add_argument('--requests', type=int, default=4, help='Requests per client')
+    parser.add_argument('--max_batch_size', type=int, nargs='+', default=[8], help='Batcher sizes to compare')
+    parser.add_argument('--max_wait_ms', type=float, default=5)
+    parser.add_argument('--threads', type=int, default=None, help='Torch intra-op threads (default: torch default)')
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    model = load_model(args)
+    fn = batch_fn(model, args.operation)
+    key = None if args.operation == 'encode' else False
+    inputs = [synthetic_audio(args.seconds, model.sr, seed) for seed in range(args.clients)]
+    fn(key, inputs[:1])  # warm up
+
+    print(f'{describe_model(args, model)}, {torch.get_num_threads()} thread(s), {args.operation} of {args.seconds:g} s, '
+          f'{args.clients} clients x {args.requests} requests')
+    print(f"{'mode':>12} {'req/s':>8} {'mean ms':>10} {'p95 ms':>10}")
+    wall, latencies = run_clients(lambda y: fn(key, [y])[0], inputs, args.clients, args.requests)
+    report('direct', wall, latencies)
+    for size in args.max_batch_size:
+        batcher = MicroBatcher(fn, max_batch_size=size, max_wait_ms=args.max_wait_ms)
+        wall, latencies = run_clients(lambda y: batcher.submit(key, y).result(), inputs, args.clients, args.requests)
+        batcher.close()
+        report(f'batched {size}', wall, latencies, f"(mean batch {batcher.metrics()['mean_batch_size']:.1f})")
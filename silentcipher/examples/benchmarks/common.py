@@ -0,0 +1,67 @@
+"""
+Model loading shared by the benchmark scripts.
+
+The released checkpoints are used by default (downloaded from the Hugging Face Hub if needed).
+With --random_weights a model with the same architecture and random weights is built instead,
+which is enough for timing and memory measurements on machines without access to the checkpoints.
+"""
+
+import argparse
+import os
+import tempfile
+
+import torch
+
+import silentcipher
+from silentcipher.model import Encoder, CarrierDecoder, MsgDecoder
+from silentcipher.server import Model
+
+
+def add_model_arguments(parser):
+    parser.add_argument('--model_type', type=str, choices=['44.1k', '16k'], default='44.1k', help='Released model to benchmark')
+    parser.add_argument('--ckpt_path', type=str, default=None, help='Checkpoint directory, downloaded if not given')
+    parser.add_argument('--config_path', type=str, default=None, help='hparams.yaml of the checkpoint')
+    parser.add_argument('--random_weights', action='store_true', help='Use random weights with the dimensions below instead of a checkpoint')
+    parser.add_argument('--sr', type=int, default=44100, help='Sampling rate of the random-weight model')
+    parser.add_argument('--n_fft', type=int, default=2048, help='STFT size of the random-weight model')
+    parser.add_argument('--hop_length', type=int, default=512, help='STFT hop of the random-weight model')
+    parser.add_argument('--message_band_size', type=int, default=1024, help='Frequency bins carrying the message in the random-weight model')
+    parser.add_argument('--device', type=str, default='cpu')
+
+
+def random_weight_model(args, device='cpu', **kwargs):
+    ckpt_dir = tempfile.mkdtemp(prefix='silentcipher-random-')
+    config = argparse.Namespace(
+        n_messages=1, model_type='random', message_dim=5, message_len=21,
+        enc_n_layers=3, dec_c_n_layers=4, message_band_size=args.message_band_size,
+        N_FFT=args.n_fft, HOP_LENGTH=args.hop_length, SR=args.sr, message_sdr=47,
+        frame_level_normalization=True, utterance_level_normalization=False,
+        ensure_negative_message=True, ensure_constrained_message=False, no_normalization=False,
+        load_ckpt=ckpt_dir
+    )
+    torch.manual_seed(0)
+    enc_c = Encoder(n_layers=config.enc_n_layers, message_dim=config.message_dim, out_dim=32,
+                    message_band_size=config.message_band_size, n_fft=config.N_FFT)
+    dec_c = CarrierDecoder(config=config, conv_dim=96, n_layers=config.dec_c_n_layers,
+                           message_band_size=config.message_band_size)
+    dec_m = MsgDecoder(message_dim=config.message_dim, message_band_size=config.message_band_size)
+    torch.save(enc_c.state_dict(), os.path.join(ckpt_dir, 'enc_c.ckpt'))
+    torch.save(dec_c.state_dict(), os.path.join(ckpt_dir, 'dec_c.ckpt'))
+    torch.save(dec_m.state_dict(), os.path.join(ckpt_dir, 'dec_m_0.ckpt'))
+    return Model(config, device, **kwargs)
+
+
+def load_model(args, **kwargs):
+    """Loads the model selected by the arguments of add_model_arguments, kwargs go to get_model (or Model)."""
+    if args.random_weights:
+        return random_weight_model(args, args.device, **kwargs)
+    paths = {}
+    if args.ckpt_path is not None:
+        paths = {'ckpt_path': args.ckpt_path, 'config_path': args.config_path}
+    return silentcipher.get_model(model_type=args.model_type, device=args.device, **paths, **kwargs)
+
+
+def describe_model(args, model):
+    config = model.config
+    source = 'random weights' if args.random_weights else f'{args.model_type} checkpoint'
+    return f'{source}, SR={config.SR}, N_FFT={config.N_FFT}, HOP_LENGTH={config.HOP_LENGTH}, message_band_size={config.message_band_size}'
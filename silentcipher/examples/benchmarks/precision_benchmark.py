@@ -0,0 +1,107 @@
+"""
+bfloat16 against float32 inference: SDR, decoded symbols and speed.
+
+Encodes the same clips with a float32 and a bfloat16 model (dtype='bfloat16', the STFT and normalizations
+stay in float32) and reports, per clip:
+  - the SDR of both encodes and their difference,
+  - the energy of the difference between the two watermarks relative to the float32 watermark (dB),
+  - the fraction of frames where the bfloat16 message decoder predicts the same symbol as the float32 one,
+    on the float32 encode, and whether the bfloat16 encode decodes to the same message,
+  - encode and decode time of both (best of --repeats) and the speedup.
+
+The speedup depends on the CPU: without bf16 matrix instructions (AVX512-BF16 or AMX) bfloat16 is
+emulated and usually slower than float32.
+
+    python precision_benchmark.py --seconds 10 30
+    python precision_benchmark.py --random_weights --files speech.wav music.wav
+"""
+
+import argparse
+import time
+
+import numpy as np
+import soundfile as sf
+import torch
+
+from common import add_model_arguments, load_model, describe_model
+
+
+MESSAGE = [123, 234, 111, 222, 11]
+
+
+def synthetic_audio(seconds, sr, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    tones = sum(0.1 * np.sin(2 * np.pi * f * t) for f in (220, 440, 880, 1760))
+    return (tones + 0.02 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+def best_time(fn, repeats):
+    best, out = np.inf, None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def symbols(model, y):
+    """Per frame symbol predictions of every message decoder"""
+    carrier, _ = model.stft.transform(torch.FloatTensor(y * np.sqrt(model.average_energy_VCTK / np.mean(y**2)))[None].to(model.device))
+    with torch.no_grad(), model.autocast():
+        return [torch.argmax(decoder(carrier[:, None]).float()[0, 0], dim=0).cpu().numpy() for decoder in model.dec_m]
+
+
+def compare(fp32, bf16, y, sr, repeats):
+    encode_fp32, (y_fp32, sdr_fp32) = best_time(lambda: fp32.encode_wav(y, sr, MESSAGE), repeats)
+    encode_bf16, (y_bf16, sdr_bf16) = best_time(lambda: bf16.encode_wav(y, sr, MESSAGE), repeats)
+    decode_fp32, result_fp32 = best_time(lambda: fp32.decode_wav(y_fp32, sr, False), repeats)
+    decode_bf16, result_bf16 = best_time(lambda: bf16.decode_wav(y_bf16, sr, False), repeats)
+
+    watermark_fp32, watermark_bf16 = y_fp32 - y, y_bf16 - y
+    watermark_error = 10 * np.log10(np.sum((watermark_bf16 - watermark_fp32)**2) / np.sum(watermark_fp32**2))
+    if sr != fp32.sr:
+        y_fp32 = fp32.encode_wav(y, sr, MESSAGE)[0]
+    agreement = np.mean([np.mean(a == b) for a, b in zip(symbols(fp32, y_fp32), symbols(bf16, y_fp32))])
+    return {
+        'sdr_fp32': float(sdr_fp32), 'sdr_bf16': float(sdr_bf16), 'sdr_delta': float(sdr_bf16 - sdr_fp32),
+        'watermark_error_db': watermark_error, 'symbol_agreement': agreement,
+        'same_message': result_fp32.get('messages') == result_bf16.get('messages'),
+        'encode_speedup': encode_fp32 / encode_bf16, 'decode_speedup': decode_fp32 / decode_bf16,
+        'encode_ms': (encode_fp32 * 1000, encode_bf16 * 1000), 'decode_ms': (decode_fp32 * 1000, decode_bf16 * 1000),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_model_arguments(parser)
+    parser.add_argument('--seconds', type=float, nargs='+', default=[10, 30], help='Durations of the synthetic clips')
+    parser.add_argument('--files', nargs='*', default=[], help='Audio files to use instead of synthetic clips (first channel)')
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--threads', type=int, default=None, help='Torch intra-op threads, all cores by default')
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    fp32 = load_model(args)
+    bf16 = load_model(args, dtype='bfloat16')
+    print(f'{describe_model(args, fp32)}, {torch.get_num_threads()} thread(s), CPU capability {torch.backends.cpu.get_cpu_capability()}')
+
+    clips = []
+    for path in args.files:
+        y, sr = sf.read(path, dtype='float32', always_2d=True)
+        clips.append((path, y[:, 0], sr))
+    if not clips:
+        clips = [(f'synthetic {seconds:g} s', synthetic_audio(seconds, fp32.sr), fp32.sr) for seconds in args.seconds]
+
+    # Warm-up, the first call of each precision pays for the kernel selection
+    fp32.encode_wav(clips[0][1][:fp32.sr], clips[0][2], MESSAGE)
+    bf16.encode_wav(clips[0][1][:fp32.sr], clips[0][2], MESSAGE)
+
+    print(f'{"clip":>20} {"SDR fp32":>9} {"SDR bf16":>9} {"delta":>6} {"wm err dB":>9} {"symbols":>8} {"message":>8} {"enc ms fp32/bf16":>17} {"x":>5} {"dec ms fp32/bf16":>17} {"x":>5}')
+    for name, y, sr in clips:
+        r = compare(fp32, bf16, y, sr, args.repeats)
+        print(f'{name[-20:]:>20} {r["sdr_fp32"]:9.2f} {r["sdr_bf16"]:9.2f} {r["sdr_delta"]:+6.2f} {r["watermark_error_db"]:9.1f} '
+              f'{r["symbol_agreement"]:8.1%} {"same" if r["same_message"] else "differs":>8} '
+              f'{r["encode_ms"][0]:8.0f}/{r["encode_ms"][1]:<8.0f} {r["encode_speedup"]:5.2f} '
+              f'{r["decode_ms"][0]:8.0f}/{r["decode_ms"][1]:<8.0f} {r["decode_speedup"]:5.2f}')
@@ -0,0 +1,83 @@
+"""
+Speed and accuracy of the silentcipher polyphase resampler against the librosa and resampy defaults.
+
+For every rate pair, resamples a multi-channel signal made of tones below 80% of the lower Nyquist frequency
+and compares the output with the same tones synthesized at the target rate (SNR in dB, higher is better).
+When downsampling, a tone just above the target Nyquist frequency measures the alias rejection (dB of the
+input level that leaks into the output, lower is better). Speed is reported as seconds of audio per second
+of compute (best of --repeats), filters are designed before timing.
+
+    python resample_benchmark.py
+    python resample_benchmark.py --seconds 60 --channels 2 --pairs 44100:16000 48000:44100
+"""
+
+import argparse
+import time
+
+import numpy as np
+import librosa
+from scipy import signal
+
+from silentcipher.resample import QUALITY_PRESETS, resample
+
+
+def tones(sr, n_samples, freqs, channels):
+    t = np.arange(n_samples) / sr
+    y = np.stack([sum(np.sin(2 * np.pi * f * t + c) for f in freqs) / len(freqs) for c in range(channels)])
+    return y.astype(np.float32)
+
+
+def methods():
+    found = {f'silentcipher {quality}': (lambda quality: lambda y, a, b: resample(y, a, b, quality))(quality) for quality in QUALITY_PRESETS}
+    found['librosa default (soxr_hq)'] = lambda y, a, b: librosa.resample(y, orig_sr=a, target_sr=b)
+    found['scipy resample_poly'] = lambda y, a, b: signal.resample_poly(y, b, a, axis=-1).astype(y.dtype)
+    try:
+        import resampy
+        found['resampy kaiser_best'] = lambda y, a, b: resampy.resample(y, a, b, axis=-1)
+    except ImportError:
+        print('resampy is not installed, skipping it')
+    return found
+
+
+def measure(method, orig_sr, target_sr, seconds, channels, repeats):
+    low_nyquist = min(orig_sr, target_sr) / 2
+    freqs = [110, 440, 1234.5, 0.5 * low_nyquist, 0.8 * low_nyquist]
+    y = tones(orig_sr, int(seconds * orig_sr), freqs, channels)
+
+    method(y[:, :orig_sr // 10], orig_sr, target_sr)  # filter design and warm-up
+    best = np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = method(y, orig_sr, target_sr)
+        best = min(best, time.perf_counter() - start)
+
+    ideal = tones(target_sr, out.shape[1], freqs, channels).astype(np.float64)
+    inner = slice(target_sr // 10, -target_sr // 10)  # edges depend on the padding convention
+    snr = 10 * np.log10(np.sum(ideal[:, inner] ** 2) / np.sum((out[:, inner] - ideal[:, inner]) ** 2))
+
+    alias = None
+    if target_sr < orig_sr:
+        above = tones(orig_sr, orig_sr, [min(1.1 * target_sr / 2, 0.95 * orig_sr / 2)], 1)
+        leaked = method(above, orig_sr, target_sr)[:, inner]
+        alias = 10 * np.log10(np.mean(leaked.astype(np.float64) ** 2) / np.mean(above.astype(np.float64) ** 2))
+    return {'speed': seconds / best, 'snr': snr, 'alias': alias}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=30, help='Duration of the resampled signal')
+    parser.add_argument('--channels', type=int, default=2)
+    parser.add_argument('--pairs', nargs='+', default=['44100:16000', '16000:44100', '48000:44100', '22050:44100'], help='orig_sr:target_sr pairs')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    candidates = methods()
+    print(f'{args.seconds:g} s, {args.channels} channel(s), speed in x real time (best of {args.repeats})')
+    for pair in args.pairs:
+        orig_sr, target_sr = (int(rate) for rate in pair.split(':'))
+        print(f'\n{orig_sr} -> {target_sr}')
+        print(f'{"method":>28} {"speed":>9} {"SNR dB":>8} {"alias dB":>9}')
+        for name, method in candidates.items():
+            result = measure(method, orig_sr, target_sr, args.seconds, args.channels, args.repeats)
+            alias = f'{result["alias"]:9.1f}' if result['alias'] is not None else f'{"-":>9}'
+            print(f'{name:>28} {result["speed"]:9.0f} {result["snr"]:8.1f} {alias}')
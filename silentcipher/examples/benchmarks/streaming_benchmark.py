@@ -0,0 +1,76 @@
+"""
+Sustained real-time factor and per-block latency of the StreamingEncoder.
+
+Streams synthetic audio through the encoder in fixed-size blocks, as a live source would deliver it,
+and reports the compute time per block and the real-time factor (compute time / audio duration,
+below 1 means the encoder keeps up). Runs on a single CPU thread by default.
+
+    python streaming_benchmark.py --seconds 60 --block_samples 1024
+    python streaming_benchmark.py --random_weights --block_frames 16 32 64
+"""
+
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from silentcipher import StreamingEncoder
+from common import add_model_arguments, load_model, describe_model
+
+
+def synthetic_audio(seconds, sr, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    tones = sum(0.1 * np.sin(2 * np.pi * f * t) for f in (220, 440, 880, 1760))
+    envelope = 0.6 + 0.4 * np.sin(2 * np.pi * 0.25 * t)  # slow level changes exercise the running power
+    return (envelope * (tones + 0.02 * rng.standard_normal(len(t)))).astype(np.float32)
+
+
+def run(model, y, block_samples, block_frames, context_frames, message):
+    encoder = StreamingEncoder(model, message, block_frames=block_frames, context_frames=context_frames)
+    block_ms = []
+    start = time.perf_counter()
+    for i in range(0, len(y), block_samples):
+        block_start = time.perf_counter()
+        encoder.push(y[i:i + block_samples])
+        block_ms.append((time.perf_counter() - block_start) * 1000)
+    encoder.flush()
+    total = time.perf_counter() - start
+
+    block_ms = np.array(block_ms)
+    return {
+        'block_frames': block_frames,
+        'algorithmic_latency_ms': encoder.latency_samples / model.sr * 1000,
+        'rtf': total / (len(y) / model.sr),
+        'p50_ms': np.percentile(block_ms, 50),
+        'p95_ms': np.percentile(block_ms, 95),
+        'p99_ms': np.percentile(block_ms, 99),
+        'max_ms': block_ms.max(),
+        'block_duration_ms': block_samples / model.sr * 1000,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_model_arguments(parser)
+    parser.add_argument('--seconds', type=float, default=30, help='Duration of the streamed audio')
+    parser.add_argument('--block_samples', type=int, default=1024, help='Samples per pushed block')
+    parser.add_argument('--block_frames', type=int, nargs='+', default=[16, 32, 64], help='StreamingEncoder block sizes to compare')
+    parser.add_argument('--context_frames', type=int, default=128)
+    parser.add_argument('--threads', type=int, default=1, help='Torch intra-op threads')
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    model = load_model(args)
+    y = synthetic_audio(args.seconds, model.sr)
+    message = [123, 234, 111, 222, 11]
+
+    print(f'{describe_model(args, model)}, {args.threads} thread(s), {args.seconds:.0f} s of audio in blocks of {args.block_samples} samples')
+    print(f"{'block_frames':>12} {'latency ms':>10} {'RTF':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for block_frames in args.block_frames:
+        with torch.no_grad():
+            result = run(model, y, args.block_samples, block_frames, args.context_frames, message)
+        print(f"{result['block_frames']:>12} {result['algorithmic_latency_ms']:>10.1f} {result['rtf']:>6.2f} "
+              f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['max_ms']:>8.1f}")
+    print(f"(one block of input = {y[:args.block_samples].shape[0] / model.sr * 1000:.1f} ms of audio)")
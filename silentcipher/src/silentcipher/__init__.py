@@ -1,3 +1,10 @@
 from .server import get_model
+from .profiling import StageProfiler, JsonLinesSink
+from .inference import InferenceExecutor
+from .batching import MicroBatcher
+from .cache import EncodeCache, DecodeCache
+from .streaming import StreamingEncoder
+from .chunked import ChunkedDecoder
+from .resample import Resampler, get_resampler
 
 __version__ = '1.0.4'
\ No newline at end of file
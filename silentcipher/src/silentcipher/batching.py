@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class MicroBatcher():
+    """
+    Gathers concurrent requests into batches and runs each batch with a single call.
+
+    Requests are submitted with a key, only requests with the same key are batched together
+    (e.g. the model type and message SDR). A batch is dispatched once it holds max_batch_size
+    requests or max_wait_ms after its oldest request arrived, whichever comes first. A request
+    that arrives while the worker is idle therefore waits at most max_wait_ms, and under load
+    the batches fill up while the previous batch is running.
+
+    Every batch runs on the single worker thread, so requests are serialized. This only pays off
+    when a batched forward is cheaper than the separate ones, typically on a GPU. On CPU, check
+    with examples/benchmarks/batching_benchmark.py before putting a batcher in front of a model.
+
+    Example:
+        batcher = MicroBatcher(lambda key, items: model.decode_wav_batch([y for y, sr in items], [sr for y, sr in items], key))
+        result = batcher.submit(False, (y, sr)).result()  # key: phase_shift_decoding
+    """
+
+    def __init__(self, fn, max_batch_size=8, max_wait_ms=5.0, name='silentcipher-batcher'):
+        """
+        Args:
+            fn (callable): Called as fn(key, items) from the worker thread, must return one result per item.
+                           Items left without a result fail with a RuntimeError.
+            max_batch_size (int, optional): Maximum number of requests per batch. Defaults to 8.
+            max_wait_ms (float, optional): Maximum time a request waits for others to join its batch. Defaults to 5.0.
+            name (str, optional): Name of the worker thread. Defaults to 'silentcipher-batcher'.
+        """
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._stats = {'batches': 0, 'items': 0, 'total_wait_ms': 0.0, 'max_wait_ms': 0.0, 'batch_sizes': {}}
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, key, item):
+        """
+        Queues an item.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the result of the item, or raises the error of its batch.
+        """
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('MicroBatcher is closed')
+            self._queue.append((key, item, future, time.perf_counter()))
+            self._cond.notify()
+        return future
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if not self._queue:
+                return None
+
+            key = self._queue[0][0]
+            deadline = self._queue[0][3] + self.max_wait
+            while True:
+                batch = [entry for entry in self._queue if entry[0] == key][:self.max_batch_size]
+                remaining = deadline - time.perf_counter()
+                if len(batch) >= self.max_batch_size or remaining <= 0 or self._closed:
+                    break
+                self._cond.wait(remaining)
+
+            taken = {id(entry) for entry in batch}
+            self._queue = deque(entry for entry in self._queue if id(entry) not in taken)
+            return key, [entry for entry in batch if entry[2].set_running_or_notify_cancel()]
+
+    def _loop(self):
+        while True:
+            taken = self._take_batch()
+            if taken is None:
+                return
+            key, batch = taken
+            if not batch:
+                continue
+
+            now = time.perf_counter()
+            with self._cond:
+                waits = [(now - entry[3]) * 1000 for entry in batch]
+                self._stats['batches'] += 1
+                self._stats['items'] += len(batch)
+                self._stats['total_wait_ms'] += sum(waits)
+                self._stats['max_wait_ms'] = max(self._stats['max_wait_ms'], max(waits))
+                self._stats['batch_sizes'][len(batch)] = self._stats['batch_sizes'].get(len(batch), 0) + 1
+
+            try:
+                results = list(self.fn(key, [entry[1] for entry in batch]))
+            except Exception as e:
+                for entry in batch:
+                    entry[2].set_exception(e)
+                continue
+            for entry, result in zip(batch, results):
+                entry[2].set_result(result)
+            # A short result list must not leave the remaining requests waiting forever
+            for entry in batch[len(results):]:
+                entry[2].set_exception(RuntimeError(f'Batch function returned {len(results)} results for {len(batch)} items'))
+
+    def metrics(self):
+        """
+        Returns:
+            dict: Current queue depth, number of batches and items processed, batch size histogram
+                  and the mean and max time requests waited before their batch started.
+        """
+        with self._cond:
+            stats = self._stats
+            return {
+                'queue_depth': len(self._queue),
+                'batches': stats['batches'],
+                'items': stats['items'],
+                'mean_batch_size': stats['items'] / stats['batches'] if stats['batches'] else 0.0,
+                'batch_size_histogram': dict(sorted(stats['batch_sizes'].items())),
+                'mean_wait_ms': stats['total_wait_ms'] / stats['items'] if stats['items'] else 0.0,
+                'max_wait_ms': stats['max_wait_ms'],
+            }
+
+    def close(self, wait=True):
+        """Stops accepting requests, the queued ones are still processed."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait:
+            self._thread.join()
@@ -0,0 +1,326 @@
+import copy
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import torch
+
+
+def audio_fingerprint(y, sr):
+    """
+    Content hash of a waveform, the same samples at the same rate always give the same fingerprint.
+
+    Args:
+        y (numpy.ndarray): The waveform, single or multi-channel.
+        sr (int): Its sampling rate.
+
+    Returns:
+        str: Hex digest of the samples, their shape, dtype and the sampling rate.
+    """
+    y = np.ascontiguousarray(y)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'{sr}|{y.dtype.str}|{y.shape}|'.encode())
+    digest.update(memoryview(y).cast('B'))
+    return digest.hexdigest()
+
+
+def model_fingerprint(model):
+    """
+    Hash of the weights and the audio configuration of a Model, it changes whenever a different checkpoint is loaded.
+
+    Returns:
+        str: Hex digest identifying the model version.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    config = model.config
+    digest.update(f'{config.model_type}|{config.SR}|{config.N_FFT}|{config.HOP_LENGTH}|{config.message_sdr}|'.encode())
+    if getattr(model, 'dtype', torch.float32) != torch.float32:
+        # Reduced precision inference gives slightly different results from the same weights
+        digest.update(f'{model.dtype}|'.encode())
+    for module in [model.enc_c, model.dec_c, model.dec_m]:
+        for name, tensor in module.state_dict().items():
+            digest.update(name.encode())
+            digest.update(tensor.detach().cpu().contiguous().numpy().tobytes())
+    return digest.hexdigest()
+
+
+def _json_default(value):
+    # numpy scalars and arrays found in results (e.g. symbols, confidences, sdr)
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def cache_key(*parts):
+    return hashlib.blake2b(json.dumps(parts, sort_keys=True, default=str).encode(), digest_size=20).hexdigest()
+
+
+class DiskLRUCache():
+    """
+    Size-bounded store of numpy arrays plus JSON metadata on the local disk.
+
+    Every entry is one .npz file named after its key. Hits refresh the file modification time and the least
+    recently used files are deleted once the directory grows past max_bytes. Files are written to a temporary
+    name and renamed into place, so several processes can share the directory.
+    """
+
+    def __init__(self, cache_dir, max_bytes=1 << 30):
+        """
+        Args:
+            cache_dir (str): Directory holding the entries, created if needed.
+            max_bytes (int, optional): Size the directory is trimmed to. Defaults to 1 GiB.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Index of key -> size from the least to the most recently used, rebuilt from the directory so a restart keeps the entries
+        entries = []
+        for name in os.listdir(cache_dir):
+            if name.endswith('.npz'):
+                stat = os.stat(os.path.join(cache_dir, name))
+                entries.append((stat.st_mtime, name[:-len('.npz')], stat.st_size))
+        self._index = OrderedDict((key, size) for _, key, size in sorted(entries))
+        self._size = sum(self._index.values())
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.npz')
+
+    def get(self, key):
+        """
+        Returns:
+            tuple or None: The (arrays dict, metadata) stored under key, None on a miss.
+        """
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files if name != '__meta__'}
+                meta = json.loads(str(data['__meta__']))
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            # Missing, evicted by another process, or partially written by a crashed one
+            with self._lock:
+                self._stats['misses'] += 1
+                self._forget(key)
+            return None
+
+        with self._lock:
+            self._stats['hits'] += 1
+            if key in self._index:
+                self._index.move_to_end(key)
+        return arrays, meta
+
+    def put(self, key, arrays, meta):
+        """
+        Stores arrays (dict of numpy.ndarray) and meta (JSON serializable) under key, then evicts down to max_bytes.
+        """
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, __meta__=np.array(json.dumps(meta, default=_json_default)), **arrays)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._forget(key)
+            size = os.path.getsize(path)
+            self._index[key] = size
+            self._size += size
+            self._evict()
+
+    def _forget(self, key):
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._size -= size
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._index:
+            key = next(iter(self._index))
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            self._forget(key)
+            self._stats['evictions'] += 1
+
+    def metrics(self):
+        """
+        Returns:
+            dict: Number of hits, misses and evictions, the hit ratio and the current number of entries and bytes.
+        """
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return dict(self._stats, hit_ratio=self._stats['hits'] / lookups if lookups else 0.0,
+                        entries=len(self._index), size_bytes=self._size)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._index):
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+                self._forget(key)
+
+
+class EncodeCache():
+    """
+    Content-addressed cache of watermarked audio.
+
+    Entries are keyed by the input samples, the message, the encode options and the model version, so re-encoding
+    the same master with the same message returns the stored output without running the model.
+
+    Example:
+        model = silentcipher.get_model('44.1k', encode_cache='/var/cache/silentcipher')
+        encoded, sdr = model.encode_wav(y, sr, [123, 234, 111, 222, 11])  # runs the model
+        encoded, sdr = model.encode_wav(y, sr, [123, 234, 111, 222, 11])  # read from the cache
+        print(model.encode_cache.metrics())
+    """
+
+    def __init__(self, cache_dir, max_bytes=1 << 30):
+        """
+        Args:
+            cache_dir (str): Directory holding the watermarked audio.
+            max_bytes (int, optional): Maximum size of the directory, least recently used entries are evicted. Defaults to 1 GiB.
+        """
+        self.store = DiskLRUCache(cache_dir, max_bytes)
+        self._lock = threading.Lock()
+        self._bytes_saved = 0
+
+    def key(self, y, sr, message_list, model_version, **options):
+        """
+        Args:
+            y (numpy.ndarray): The input waveform.
+            sr (int): Its sampling rate.
+            message_list (list): The message(s) to embed.
+            model_version (str): Identifies the weights, see model_fingerprint.
+            **options: Any other argument changing the output (e.g. message_sdr).
+
+        Returns:
+            str: The cache key.
+        """
+        return cache_key(audio_fingerprint(y, sr), message_list, model_version, options)
+
+    def get(self, key):
+        """
+        Returns:
+            tuple or None: The (encoded waveform, sdr) stored under key, None on a miss.
+        """
+        entry = self.store.get(key)
+        if entry is None:
+            return None
+        arrays, meta = entry
+        with self._lock:
+            self._bytes_saved += arrays['audio'].nbytes
+        return arrays['audio'], meta['sdr']
+
+    def put(self, key, y, sdr):
+        self.store.put(key, {'audio': np.asarray(y)}, {'sdr': sdr})
+
+    def metrics(self):
+        """
+        Returns:
+            dict: The store metrics plus bytes_saved, the size of the audio returned without running the model.
+        """
+        with self._lock:
+            return dict(self.store.metrics(), bytes_saved=self._bytes_saved)
+
+
+class DecodeCache():
+    """
+    Memoizes decode results keyed by the input samples, the decode options and the model version.
+
+    Results are kept in an in-process LRU of max_entries and, when cache_dir is given, in a disk tier that
+    several workers can share. Disk hits are promoted to memory. The memory tier is dropped when a key is
+    built for a different model version, disk entries of older versions are never matched again and age out.
+
+    Example:
+        model = silentcipher.get_model('44.1k', decode_cache=silentcipher.DecodeCache(cache_dir='/var/cache/silentcipher-decode'))
+        result = model.decode_wav(y, sr, phase_shift_decoding=True)  # runs the model
+        result = model.decode_wav(y, sr, phase_shift_decoding=True)  # memoized
+    """
+
+    def __init__(self, max_entries=1024, cache_dir=None, max_bytes=64 << 20):
+        """
+        Args:
+            max_entries (int, optional): Number of results kept in memory. Defaults to 1024.
+            cache_dir (str, optional): Directory of the shared disk tier. Defaults to None (memory only).
+            max_bytes (int, optional): Maximum size of the disk tier. Defaults to 64 MiB.
+        """
+        self.max_entries = max_entries
+        self.store = DiskLRUCache(cache_dir, max_bytes) if cache_dir else None
+        self._memory = OrderedDict()
+        self._model_version = None
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def key(self, y, sr, model_version, **options):
+        """
+        Args:
+            y (numpy.ndarray): The waveform to decode.
+            sr (int): Its sampling rate.
+            model_version (str): Identifies the weights, see model_fingerprint.
+            **options: The decode options (e.g. phase_shift_decoding).
+
+        Returns:
+            str: The cache key.
+        """
+        with self._lock:
+            if model_version != self._model_version:
+                if self._model_version is not None:
+                    self._memory.clear()
+                    self._stats['invalidations'] += 1
+                self._model_version = model_version
+        return cache_key('decode', audio_fingerprint(y, sr), model_version, options)
+
+    def get(self, key):
+        """
+        Returns:
+            dict or list or None: A copy of the stored decode result, None on a miss.
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return copy.deepcopy(self._memory[key])
+
+        entry = self.store.get(key) if self.store is not None else None
+        with self._lock:
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['disk_hits'] += 1
+            self._remember(key, entry[1]['result'])
+            return copy.deepcopy(entry[1]['result'])
+
+    def put(self, key, result):
+        result = json.loads(json.dumps(result, default=_json_default))
+        with self._lock:
+            self._remember(key, result)
+        if self.store is not None:
+            self.store.put(key, {}, {'result': result})
+
+    def _remember(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def metrics(self):
+        """
+        Returns:
+            dict: Memory and disk hits, misses, hit ratio, memory evictions, model version invalidations,
+                  the number of entries in memory and the metrics of the disk tier (if any).
+        """
+        with self._lock:
+            hits = self._stats['memory_hits'] + self._stats['disk_hits']
+            lookups = hits + self._stats['misses']
+            metrics = dict(self._stats, hits=hits, hit_ratio=hits / lookups if lookups else 0.0, entries=len(self._memory))
+        if self.store is not None:
+            metrics['disk'] = self.store.metrics()
+        return metrics
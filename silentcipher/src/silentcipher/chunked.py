@@ -0,0 +1,295 @@
+import math
+import os
+
+import numpy as np
+import soundfile as sf
+import torch
+
+from .model import Layer
+from .stft import STFT
+from .resample import get_resampler, DEFAULT_QUALITY
+
+
+class ArraySamples():
+    """One channel of an array (numpy.ndarray or numpy.memmap), read lazily."""
+
+    def __init__(self, y, channel=None):
+        self.y = y
+        self.channel = channel
+
+    def __len__(self):
+        return self.y.shape[0]
+
+    def read(self, start, stop):
+        block = self.y[start:stop] if self.channel is None else self.y[start:stop, self.channel]
+        return np.asarray(block, dtype=np.float64)
+
+
+class FileSamples():
+    """One channel of an audio file, read with soundfile seeks so the file is never loaded as a whole."""
+
+    def __init__(self, path, channel=0):
+        self.file = sf.SoundFile(path)
+        self.channel = channel
+
+    def __len__(self):
+        return self.file.frames
+
+    def read(self, start, stop):
+        self.file.seek(start)
+        return self.file.read(stop - start, dtype='float64', always_2d=True)[:, self.channel]
+
+
+class ResampledSamples():
+    """Samples resampled on the fly, each read only resamples the input samples the requested range depends on."""
+
+    def __init__(self, samples, resampler):
+        self.samples = samples
+        self.resampler = resampler
+
+    def __len__(self):
+        return self.resampler.output_length(len(self.samples))
+
+    def read(self, start, stop):
+        return self.resampler.resample_range(self.samples.read, len(self.samples), start, stop)
+
+
+class ChunkedDecoder():
+    """
+    Decodes arbitrarily long audio in blocks of STFT frames with a memory use independent of the file length.
+
+    decode_wav runs the message decoders on the whole file at once, which needs several GB for an hour of audio.
+    Here the decoders run on blocks of chunk_frames frames plus the frames their convolutions reach on either side,
+    and only the per position symbol counts of the vote are kept between blocks.
+
+    The batch norm layers of the decoders normalize with statistics over the whole file. Before decoding, the
+    statistics of every layer are accumulated block by block, one pass over the file per layer, so the result
+    matches decode_wav. Setting calibration_frames accumulates them over evenly spaced blocks covering about that
+    many frames instead, which makes the calibration cost independent of the file length at the price of an
+    approximate result.
+
+    Example:
+        decoder = ChunkedDecoder(model)
+        result = decoder.decode('three_hours.wav')
+        for result in decoder.iter_decode('three_hours.wav'):  # intermediate results after every block
+            print(result['progress'], result['messages'])
+    """
+
+    def __init__(self, model, chunk_frames=256, calibration_frames=None, phase_search_seconds=10.0):
+        """
+        Args:
+            model (Model): The loaded model.
+            chunk_frames (int, optional): Number of frames decoded per block, bounds the memory use. Defaults to 256.
+            calibration_frames (int, optional): Number of frames the batch norm statistics are estimated from. Defaults to None (all frames, exact).
+            phase_search_seconds (float, optional): Length of the excerpt the phase shift is searched on when phase_shift_decoding is set. Defaults to 10.0.
+        """
+        self.model = model
+        self.chunk_frames = chunk_frames
+        self.calibration_frames = calibration_frames
+        self.phase_search_seconds = phase_search_seconds
+        self.n_fft = model.config.N_FFT
+        self.hop = model.config.HOP_LENGTH
+
+    def decode(self, y, orig_sr=None, phase_shift_decoding=False):
+        """
+        Args:
+            y (numpy.ndarray or str): The waveform of shape [N] or [N, channels] (a numpy.memmap keeps it on disk), or the path of an audio file.
+            orig_sr (int, optional): The sampling rate of y, read from the file when y is a path.
+            phase_shift_decoding (bool, optional): Whether to search for the phase shift of cropped audio, on the first phase_search_seconds. Defaults to False.
+
+        Returns:
+            dict or list: The result of decode_wav, one per channel for multi-channel input.
+        """
+        results = []
+        for samples, sr in self._channels(y, orig_sr):
+            result = None
+            for result in self._iter_channel(samples, sr, phase_shift_decoding):
+                pass
+            del result['progress']
+            results.append(result)
+        return results[0] if len(results) == 1 and not self._multi_channel(y) else results
+
+    def iter_decode(self, y, orig_sr=None, phase_shift_decoding=False, channel=0):
+        """
+        Decodes one channel, yielding the result so far after every block.
+
+        Returns:
+            generator: Results in the format of decode_wav plus 'progress', the fraction of the frames decoded.
+                       The last one is the final result.
+        """
+        samples, sr = self._channels(y, orig_sr)[channel]
+        yield from self._iter_channel(samples, sr, phase_shift_decoding)
+
+    def _multi_channel(self, y):
+        if isinstance(y, (str, os.PathLike)):
+            return sf.info(y).channels > 1
+        return y.ndim > 1
+
+    def _channels(self, y, orig_sr):
+        if isinstance(y, (str, os.PathLike)):
+            info = sf.info(y)
+            return [(FileSamples(y, channel), info.samplerate) for channel in range(info.channels)]
+        if orig_sr is None:
+            raise ValueError('orig_sr is required when decoding an array')
+        if y.ndim == 1:
+            return [(ArraySamples(y), orig_sr)]
+        return [(ArraySamples(y, channel), orig_sr) for channel in range(y.shape[1])]
+
+    def _iter_channel(self, samples, sr, phase_shift_decoding):
+        if sr != self.model.sr:
+            # Only the polyphase resampler can evaluate any output block exactly from the input it depends on
+            samples = ResampledSamples(samples, get_resampler(sr, self.model.sr, self.model.resample_quality or DEFAULT_QUALITY))
+        try:
+            signal = self._prepare(samples, phase_shift_decoding)
+        except Exception:
+            yield self._failure(1.0)
+            return
+
+        with torch.no_grad():
+            stats = self._calibrate(signal)
+            counts = [np.zeros((self.model.config.message_len, self.model.message_dim), dtype=np.int64) for _ in self.model.dec_m]
+            # Like decode_wav, the frames after the last complete message are not counted
+            n_counted = signal.n_frames // self.model.config.message_len * self.model.config.message_len
+            for start in range(0, signal.n_frames, self.chunk_frames):
+                end = min(start + self.chunk_frames, signal.n_frames)
+                for m, decoder in enumerate(self.model.dec_m):
+                    h, core = self._run_layers(decoder, signal, start, end, stats[m])
+                    msg_reconst = decoder.linear(h[..., core].transpose(2, 3)).squeeze(3)
+                    pred_values = torch.argmax(msg_reconst[0], dim=0).cpu().numpy()[:max(0, n_counted - start)]
+                    counts[m] += self.model.symbol_counts(pred_values, first_frame=start)
+                yield self._result(counts, end / signal.n_frames)
+
+    def _prepare(self, samples, phase_shift_decoding):
+        power = 0.0
+        block = self.model.sr * 10
+        for start in range(0, len(samples), block):
+            power += np.sum(samples.read(start, min(start + block, len(samples))) ** 2)
+        power /= len(samples)
+        if not power > 0:
+            raise ValueError('Silent input')
+        scale = np.sqrt(self.model.average_energy_VCTK / power)
+
+        offset = 0
+        if phase_shift_decoding and phase_shift_decoding != 'false':
+            excerpt = samples.read(0, min(len(samples), int(self.phase_search_seconds * self.model.sr))) * scale
+            offset = self.model.get_best_ps(excerpt)
+        return PaddedSignal(samples, offset, scale, self.n_fft, self.hop, self.model.device)
+
+    def _calibration_blocks(self, n_frames):
+        starts = list(range(0, n_frames, self.chunk_frames))
+        if self.calibration_frames is not None:
+            n_blocks = max(1, math.ceil(self.calibration_frames / self.chunk_frames))
+            if n_blocks < len(starts):
+                starts = [starts[i] for i in np.linspace(0, len(starts) - 1, n_blocks).round().astype(int)]
+        return [(start, min(start + self.chunk_frames, n_frames)) for start in starts]
+
+    def _calibrate(self, signal):
+        """
+        Accumulates the batch norm statistics of every layer of every message decoder.
+
+        Returns:
+            list: For each decoder, the (mean, variance) of each of its layers.
+        """
+        stats = [[] for _ in self.model.dec_m]
+        blocks = self._calibration_blocks(signal.n_frames)
+        for m, decoder in enumerate(self.model.dec_m):
+            layers = [layer for layer in decoder.main if isinstance(layer, Layer)]
+            for k, layer in enumerate(layers):
+                if not layer.bn.training:
+                    stats[m].append(None)
+                    continue
+                total, total_sq, count = 0, 0, 0
+                for start, end in blocks:
+                    h, core = self._run_layers(decoder, signal, start, end, stats[m], n_layers=k, last=layer)
+                    h = h[..., core].double()
+                    total = total + h.sum(dim=(0, 2, 3))
+                    total_sq = total_sq + (h ** 2).sum(dim=(0, 2, 3))
+                    count += h.shape[2] * h.shape[3]
+                mean = total / count
+                stats[m].append((mean, torch.clamp(total_sq / count - mean ** 2, min=0)))
+        return stats
+
+    def _run_layers(self, decoder, signal, start, end, stats, n_layers=None, last=None):
+        """
+        Runs the first n_layers Layers of a message decoder on the frames [start, end) with the given statistics,
+        then the gated convolution of last (without its batch norm) if given.
+
+        Returns:
+            tuple: The output over the window of frames and the slice of the frames [start, end) in it.
+        """
+        layers = [layer for layer in decoder.main if isinstance(layer, Layer)]
+        layers = layers[:n_layers] if n_layers is not None else layers
+        # Every 3x3 layer reads one frame on each side
+        halo = len(layers) + (last is not None)
+        window_start, window_end = max(0, start - halo), min(signal.n_frames, end + halo)
+        x = signal.carrier(window_start, window_end)[:, :, :decoder.message_band_size]
+
+        for layer, layer_stats in zip(layers, stats):
+            h = layer.conv(x) * torch.sigmoid(layer.gate(x))
+            x = layer.bn(h) if layer_stats is None else normalize(layer.bn, h, *layer_stats)
+        if last is not None:
+            x = last.conv(x) * torch.sigmoid(last.gate(x))
+        return x, slice(start - window_start, end - window_start)
+
+    def _result(self, counts, progress):
+        try:
+            messages, confidences = [], []
+            for counts_m in counts:
+                message, confidence = self.model.message_from_counts(counts_m)
+                messages.append(message)
+                confidences.append(confidence)
+            return {'messages': self.model.convert_to_8_bit_segments(messages), 'confidences': confidences, 'status': True, 'progress': progress}
+        except Exception:
+            return self._failure(progress)
+
+    def _failure(self, progress):
+        return {'messages': [], 'confidences': [], 'error': 'Could not find message', 'status': False, 'progress': progress}
+
+
+def normalize(bn, h, mean, var):
+    """Batch norm of h with the given statistics, in the precision of h."""
+    scale = bn.weight.double() / torch.sqrt(var + bn.eps)
+    shift = bn.bias.double() - mean * scale
+    return h * scale.to(h.dtype)[None, :, None, None] + shift.to(h.dtype)[None, :, None, None]
+
+
+class PaddedSignal():
+    """
+    Random access to the STFT frames of a signal, as STFT.transform computes them on the whole signal.
+
+    The signal is zero padded to a multiple of N_FFT and reflected by N_FFT / 2 samples at both ends.
+    """
+
+    def __init__(self, samples, offset, scale, n_fft, hop, device):
+        self.samples = samples
+        self.offset = offset
+        self.scale = scale
+        self.n_fft = n_fft
+        self.hop = hop
+        self.device = device
+        self.n_samples = len(samples) - offset
+        self.padded_length = self.n_samples + n_fft - self.n_samples % n_fft
+        self.n_frames = self.padded_length // hop + 1
+        self.window = torch.hann_window(n_fft).to(device)
+
+    def read(self, start, stop):
+        """Samples [start, stop) of the padded and reflected signal, indices relative to the unpadded one."""
+        index = np.arange(start, stop)
+        index = np.where(index < 0, -index, index)
+        index = np.where(index >= self.padded_length, 2 * (self.padded_length - 1) - index, index)
+        valid = index < self.n_samples
+        out = np.zeros(len(index), dtype=np.float64)
+        if valid.any():
+            low, high = index[valid].min(), index[valid].max() + 1
+            block = self.samples.read(self.offset + low, self.offset + high)
+            out[valid] = block[index[valid] - low]
+        return out
+
+    def carrier(self, start, end):
+        """Magnitude of the frames [start, end), of shape [1, 1, F, end - start]."""
+        half = self.n_fft // 2
+        y = self.read(start * self.hop - half, (end - 1) * self.hop + half)
+        y = torch.FloatTensor(y * self.scale).to(self.device)
+        fft = torch.stft(y[None], self.n_fft, self.hop, self.n_fft, window=self.window, center=False, return_complex=True)
+        magnitude, _ = STFT.polar(fft)
+        return magnitude[:, None]
@@ -0,0 +1,137 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+
+def freeze_batch_norm_stats(model):
+    """
+    Stops the batch norm layers of a model from updating their running statistics.
+
+    The networks run in training mode, so the normalization always uses the statistics of the
+    current input and the running buffers are never read. Their in-place updates are the only
+    writes a forward pass makes to shared state, turning them off leaves the outputs unchanged
+    and makes the weights safe to share between threads.
+    """
+    for module in [model.enc_c, model.dec_c, *model.dec_m]:
+        for layer in module.modules():
+            if isinstance(layer, torch.nn.modules.batchnorm._BatchNorm):
+                layer.track_running_stats = False
+
+
+class InferenceExecutor():
+    """
+    Thread-safe facade that lets many request threads share one loaded Model.
+
+    Calls run on a bounded pool of worker threads. At most max_workers calls run at the same time and at most
+    max_pending calls are queued, further submissions block until a slot frees up.
+
+    torch.set_num_threads changes the intra-op thread count of the whole process (with OpenMP, threads that set
+    a count themselves keep theirs). Every call sets its count in its worker thread, and calls asking for different
+    counts never overlap: calls with the same count run together, the others wait for them to finish. Once a group
+    of calls is done the count the process had when the executor was created is restored, code outside the
+    executor running at the same time sees the group's count.
+
+    Example:
+        executor = InferenceExecutor(silentcipher.get_model('44.1k'), max_workers=4, threads_per_call=2)
+        encoded, sdr = executor.encode_wav(y, sr, [123, 234, 111, 222, 11])
+        future = executor.submit_decode(encoded, sr)
+        result = future.result()
+    """
+
+    def __init__(self, model, max_workers=4, threads_per_call=None, max_pending=None):
+        """
+        Args:
+            model (Model): The loaded model, shared by all workers.
+            max_workers (int, optional): Number of calls that run concurrently. Defaults to 4.
+            threads_per_call (int, optional): Torch intra-op threads used by each call. Defaults to None (the count
+                of the process when the executor is created).
+            max_pending (int, optional): Maximum number of submitted calls not yet finished. Defaults to 4 * max_workers.
+        """
+        self.model = model
+        self.threads_per_call = threads_per_call
+        freeze_batch_norm_stats(model)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='silentcipher')
+        self._slots = threading.BoundedSemaphore(max_pending or 4 * max_workers)
+        # Thread count restored after every group of calls, then the count of the calls running now and how many there are
+        self._default_threads = torch.get_num_threads()
+        self._threads_changed = threading.Condition()
+        self._group_threads = None
+        self._group_calls = 0
+        self._waiting = 0
+        self._generation = 0  # number of groups finished
+
+    def _enter_group(self, num_threads):
+        with self._threads_changed:
+            # Joining a running group of the same count is only allowed while nobody waits, so a steady stream of
+            # calls with one count cannot starve the others: a call that had to wait joins a group started after it
+            if self._group_calls and (self._group_threads != num_threads or self._waiting):
+                self._waiting += 1
+                generation = self._generation
+                while self._group_calls and (self._group_threads != num_threads or self._generation == generation):
+                    self._threads_changed.wait()
+                self._waiting -= 1
+            self._group_threads = num_threads
+            self._group_calls += 1
+            torch.set_num_threads(num_threads)
+
+    def _leave_group(self):
+        with self._threads_changed:
+            self._group_calls -= 1
+            if self._group_calls == 0:
+                torch.set_num_threads(self._default_threads)
+                self._group_threads = None
+                self._generation += 1
+                self._threads_changed.notify_all()
+
+    def _run(self, fn, num_threads, *args, **kwargs):
+        try:
+            self._enter_group(num_threads or self.threads_per_call or self._default_threads)
+            try:
+                with torch.no_grad():
+                    return fn(*args, **kwargs)
+            finally:
+                self._leave_group()
+        finally:
+            self._slots.release()
+
+    def _submit(self, fn, num_threads, *args, **kwargs):
+        self._slots.acquire()
+        try:
+            return self._pool.submit(self._run, fn, num_threads, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def submit_encode(self, y, sr, message_list, num_threads=None, **kwargs):
+        """
+        Schedules Model.encode_wav, see its documentation for the arguments.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the (encoded audio, sdr) tuple.
+        """
+        return self._submit(self.model.encode_wav, num_threads, y, sr, message_list, **kwargs)
+
+    def submit_decode(self, y, sr, phase_shift_decoding=False, num_threads=None, **kwargs):
+        """
+        Schedules Model.decode_wav, see its documentation for the arguments.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the decode result dict (list of dicts for multi-channel audio).
+        """
+        return self._submit(self.model.decode_wav, num_threads, y, sr, phase_shift_decoding, **kwargs)
+
+    def encode_wav(self, y, sr, message_list, num_threads=None, **kwargs):
+        return self.submit_encode(y, sr, message_list, num_threads=num_threads, **kwargs).result()
+
+    def decode_wav(self, y, sr, phase_shift_decoding=False, num_threads=None, **kwargs):
+        return self.submit_decode(y, sr, phase_shift_decoding, num_threads=num_threads, **kwargs).result()
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
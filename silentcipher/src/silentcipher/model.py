@@ -10,8 +10,53 @@ class Layer(nn.Module):
 		self.gate = nn.Conv2d(dim_in, dim_out, kernel_size=kernel_size, stride=stride, padding=padding, bias=True)
 		self.bn = nn.BatchNorm2d(dim_out)
 
-	def forward(self, x):
-		return self.bn(self.conv(x) * torch.sigmoid(self.gate(x)))
+	def forward(self, x, mask=None):
+		h = self.conv(x) * torch.sigmoid(self.gate(x))
+		# Under bfloat16 autocast only the convolutions run in reduced precision, the batch norm stays in float32
+		h = h.float() if h.dtype == torch.bfloat16 else h
+		if mask is None:
+			return self.bn(h)
+		return masked_batch_norm(self.bn, h, mask) * mask
+
+def masked_batch_norm(bn, x, mask):
+	"""
+	Batch norm whose statistics only cover the frames selected by ``mask``.
+
+	``mask`` has shape [B, 1, 1, T] and marks the valid (unpadded) frames of each item.
+	In training mode the statistics are computed per item, which is what a plain
+	``bn`` call does for a batch of one, so padded and batched inputs normalize
+	exactly as if each item had been run on its own.
+	"""
+	if not bn.training:
+		return bn(x)
+	count = mask.sum(dim=(2, 3), keepdim=True) * x.shape[2]
+	mean = (x * mask).sum(dim=(2, 3), keepdim=True) / count
+	var = (((x - mean) * mask) ** 2).sum(dim=(2, 3), keepdim=True) / count
+	x = (x - mean) / torch.sqrt(var + bn.eps)
+	return x * bn.weight[None, :, None, None] + bn.bias[None, :, None, None]
+
+def run_masked(layers, x, mask=None):
+	"""
+	Runs a stack of layers, zeroing the padded frames after every ``Layer`` so the
+	convolutions see the same borders as on the unpadded input.
+	"""
+	if mask is None:
+		return layers(x)
+	x = x * mask
+	for layer in layers:
+		x = layer(x, mask) if isinstance(layer, Layer) else layer(x)
+	return x
+
+def receptive_field_frames(model):
+	"""
+	Number of STFT frames on each side of a frame that the encoder and carrier decoder of a Model look at.
+	"""
+	frames = 0
+	for module in [model.enc_c, model.dec_c]:
+		for layer in module.modules():
+			if isinstance(layer, Layer):
+				frames += (layer.conv.kernel_size[1] - 1) // 2
+	return frames
 
 class Encoder(nn.Module):
 	def __init__(self, out_dim=32, n_layers=3, message_dim=0, message_band_size=None, n_fft=None):
@@ -29,8 +74,8 @@ class Encoder(nn.Module):
 		self.linear = nn.Linear(message_dim, message_band_size)
 		self.n_fft = n_fft
 
-	def forward(self, x):
-		h = self.main(x)
+	def forward(self, x, mask=None):
+		h = run_masked(self.main, x, mask)
 		return h
 	
 	def transform_message(self, msg):
@@ -53,9 +98,12 @@ class CarrierDecoder(nn.Module):
 
 		self.main = nn.Sequential(*layers)
 
-	def forward(self, x, message_sdr):
-		h = self.main(x)
-  
+	def forward(self, x, message_sdr, mask=None):
+		h = run_masked(self.main, x, mask)
+		return self.finalize(h, message_sdr)
+
+	def finalize(self, h, message_sdr):
+		"""Turns the output of the layers into the message spectrum, every frame is normalized on its own."""
 		if self.config.ensure_negative_message:
 			h = torch.abs(h)
   
@@ -88,8 +136,8 @@ class MsgDecoder(nn.Module):
 		self.main = nn.Sequential(*main)
 		self.linear = nn.Linear(self.message_band_size, 1)
 
-	def forward(self, x):
+	def forward(self, x, mask=None):
    
-		h = self.main(x[:, :, :self.message_band_size])
+		h = run_masked(self.main, x[:, :, :self.message_band_size], mask)
 		h = self.linear(h.transpose(2, 3)).squeeze(3).unsqueeze(1)
 		return h
@@ -0,0 +1,135 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+import torch
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def _peak_rss_mb():
+    """High-water mark of the process resident set size, 0 when unknown."""
+    if resource is None:
+        return 0.0
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _current_rss_mb():
+    """Current resident set size of the process, None where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+class StageProfiler():
+    """
+    Records wall time and peak memory for the stages of an encode or decode call.
+
+    A stage that runs several times (e.g. once per channel) is accumulated: its wall time is summed,
+    its peak memory is the maximum seen and `calls` counts the runs.
+    The peak memory of a stage is how far memory rose above its level when the stage started.
+    On CUDA it is the peak allocated by torch during the stage. On CPU it is the growth of the process
+    resident set size: up to the new high-water mark when the stage set one, otherwise up to the resident
+    set size at the end of the stage (memory allocated and freed within the stage below an earlier
+    high-water mark is not seen).
+    """
+
+    def __init__(self, device='cpu', sink=None, **context):
+        """
+        Args:
+            device (str, optional): The device the model runs on. Defaults to 'cpu'.
+            sink (callable or str, optional): Where to send the finished report, either a callable taking the
+                report dict or the path of a JSON-lines file to append to. Defaults to None.
+            **context: Extra fields (e.g. the input path) added to the report.
+        """
+        self.device = device
+        self.sink = JsonLinesSink(sink) if isinstance(sink, str) else sink
+        self.context = context
+        self.stages = {}
+        self.start = time.time()
+
+    @contextmanager
+    def stage(self, name):
+        cuda = str(self.device).startswith('cuda') and torch.cuda.is_available()
+        if cuda:
+            torch.cuda.synchronize()
+            torch.cuda.reset_peak_memory_stats()
+            start_mb = torch.cuda.memory_allocated() / (1024 * 1024)
+        else:
+            start_peak_mb = _peak_rss_mb()
+            start_mb = _current_rss_mb()
+            if start_mb is None:
+                start_mb = start_peak_mb
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if cuda:
+                torch.cuda.synchronize()
+                peak_mb = torch.cuda.max_memory_allocated() / (1024 * 1024)
+            else:
+                end_peak_mb = _peak_rss_mb()
+                peak_mb = _current_rss_mb() or 0.0
+                if end_peak_mb > start_peak_mb:
+                    peak_mb = max(peak_mb, end_peak_mb)
+            record = self.stages.setdefault(name, {'wall_ms': 0.0, 'peak_mem_mb': 0.0, 'calls': 0})
+            record['wall_ms'] += (time.perf_counter() - start) * 1000
+            record['peak_mem_mb'] = max(record['peak_mem_mb'], peak_mb - start_mb)
+            record['calls'] += 1
+
+    def annotate(self, name, value):
+        """Adds a field (e.g. per file statistics) to the report."""
+        self.context[name] = value
+
+    def report(self):
+        """
+        Builds the report and sends it to the sink, if any.
+
+        Returns:
+            dict: The context fields, the total wall time and the per stage breakdown.
+        """
+        report = dict(self.context)
+        report['total_ms'] = (time.time() - self.start) * 1000
+        report['stages'] = {name: dict(record, wall_ms=round(record['wall_ms'], 3), peak_mem_mb=round(record['peak_mem_mb'], 1))
+                            for name, record in self.stages.items()}
+        if self.sink is not None:
+            self.sink(report)
+        return report
+
+
+class NullProfiler():
+    """Stand-in used when profiling is disabled, its stages cost nothing."""
+
+    def stage(self, name):
+        return nullcontext()
+
+    def annotate(self, name, value):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+class JsonLinesSink():
+    """Appends every report as one JSON line to a file, safe to share between threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, report):
+        line = json.dumps(report)
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(line + '\n')
@@ -0,0 +1,172 @@
+import functools
+import math
+
+import numpy as np
+from scipy import signal
+
+
+# Kaiser windowed sinc filters. half_width is the number of zero crossings of the sinc on each side,
+# rolloff the cutoff relative to the Nyquist frequency of the lower rate and beta the Kaiser window shape.
+# The stopband attenuation is about 8 + 28.7 * (1 - rolloff) * half_width dB.
+QUALITY_PRESETS = {
+    'fast': dict(half_width=12, rolloff=0.85, beta=5.7),  # ~60 dB, flat up to ~70% of Nyquist
+    'hq': dict(half_width=32, rolloff=0.91, beta=9.0),    # ~90 dB, flat up to ~80% of Nyquist
+    'vhq': dict(half_width=64, rolloff=0.94, beta=12.0),  # ~120 dB, flat up to ~88% of Nyquist
+}
+DEFAULT_QUALITY = 'hq'
+
+
+class Resampler():
+    """
+    Rational polyphase resampler from orig_sr to target_sr.
+
+    The rate ratio is reduced to up / down and a single low-pass filter is designed for it, the inputs are
+    upsampled by up, filtered and downsampled by down in one polyphase pass (scipy.signal.upfirdn). Output
+    sample j is centred on input time j * orig_sr / target_sr, like librosa.resample, and has
+    ceil(n * target_sr / orig_sr) samples.
+
+    Use get_resampler to share the filters, they are designed once per (orig_sr, target_sr, quality).
+    """
+
+    def __init__(self, orig_sr, target_sr, quality=DEFAULT_QUALITY):
+        """
+        Args:
+            orig_sr (int): Sampling rate of the input.
+            target_sr (int): Sampling rate of the output.
+            quality (str, optional): One of QUALITY_PRESETS, trading speed for accuracy. Defaults to 'hq'.
+        """
+        if quality not in QUALITY_PRESETS:
+            raise ValueError(f'Unknown resampling quality {quality}, use one of {list(QUALITY_PRESETS)}')
+        preset = QUALITY_PRESETS[quality]
+        gcd = math.gcd(int(orig_sr), int(target_sr))
+        self.orig_sr = orig_sr
+        self.target_sr = target_sr
+        self.quality = quality
+        self.up = int(target_sr) // gcd
+        self.down = int(orig_sr) // gcd
+
+        max_rate = max(self.up, self.down)
+        self.half_len = preset['half_width'] * max_rate
+        self.filter = signal.firwin(2 * self.half_len + 1, preset['rolloff'] / max_rate, window=('kaiser', preset['beta'])) * self.up
+        # One copy of the filter per alignment of its first tap with the output grid, see resample_range
+        self._aligned = {}
+
+    def output_length(self, n_samples):
+        return -(-n_samples * self.up // self.down)
+
+    def __call__(self, y, axis=-1):
+        """
+        Resamples y along axis, all the other axes (channels, batch items) in the same pass.
+
+        Args:
+            y (numpy.ndarray): The input of any shape.
+            axis (int, optional): The time axis. Defaults to -1.
+
+        Returns:
+            numpy.ndarray: The resampled array, of the dtype of y.
+        """
+        if self.up == self.down:
+            return y
+        n_in = y.shape[axis]
+        return self.resample_range(lambda start, stop: _slice(y, start, stop, axis), n_in, 0, self.output_length(n_in), axis=axis).astype(y.dtype, copy=False)
+
+    def resample_range(self, read, n_samples, start, stop, axis=-1):
+        """
+        Computes the output samples [start, stop) of a signal of n_samples samples, reading only the input samples they depend on.
+
+        Args:
+            read (callable): read(first, last) returns the input samples [first, last) as a numpy.ndarray.
+            n_samples (int): Length of the input.
+            start (int): First output sample.
+            stop (int): End of the output samples (exclusive).
+            axis (int, optional): The time axis of the arrays returned by read. Defaults to -1.
+
+        Returns:
+            numpy.ndarray: The output samples (float64) along axis, identical to the same range of the full output.
+        """
+        # Output j = sum_i x[i] * filter[j * down + half_len - i * up]
+        centre = start * self.down + self.half_len
+        first = max(0, -(-(centre - len(self.filter) + 1) // self.up))
+        last = min(n_samples, ((stop - 1) * self.down + self.half_len) // self.up + 1)
+        if last <= first:
+            shape = list(np.shape(read(0, 0)))
+            shape[axis] = stop - start
+            return np.zeros(shape)
+
+        offset = centre - first * self.up
+        pad = -offset % self.down
+        if pad not in self._aligned:
+            self._aligned[pad] = np.concatenate([np.zeros(pad), self.filter])
+        out = signal.upfirdn(self._aligned[pad], read(first, last), self.up, self.down, axis=axis)
+
+        begin = (offset + pad) // self.down
+        out = _slice(out, begin, begin + stop - start, axis)
+        missing = stop - start - out.shape[axis]
+        if missing > 0:
+            # The last outputs only depend on the zeros after the end of the input
+            widths = [(0, 0)] * out.ndim
+            widths[axis] = (0, missing)
+            out = np.pad(out, widths)
+        return out
+
+
+def _slice(y, start, stop, axis):
+    index = [slice(None)] * y.ndim
+    index[axis] = slice(start, stop)
+    return y[tuple(index)]
+
+
+@functools.lru_cache(maxsize=32)
+def get_resampler(orig_sr, target_sr, quality=DEFAULT_QUALITY):
+    """
+    Returns:
+        Resampler: The resampler of this rate pair and quality, designed on the first call.
+    """
+    return Resampler(orig_sr, target_sr, quality)
+
+
+def resample(y, orig_sr, target_sr, quality=DEFAULT_QUALITY, axis=-1):
+    """
+    Resamples y from orig_sr to target_sr with a cached polyphase filter.
+
+    Args:
+        y (numpy.ndarray): The input, channels or batch items are resampled together.
+        orig_sr (int): Sampling rate of y.
+        target_sr (int): Sampling rate of the output.
+        quality (str, optional): One of QUALITY_PRESETS. Defaults to 'hq'.
+        axis (int, optional): The time axis. Defaults to -1.
+
+    Returns:
+        numpy.ndarray: The resampled array.
+    """
+    if orig_sr == target_sr:
+        return y
+    return get_resampler(orig_sr, target_sr, quality)(y, axis=axis)
+
+
+def resample_many(y_list, orig_sr, target_sr, quality=DEFAULT_QUALITY):
+    """
+    Resamples several 1-D waveforms, waveforms with the same length, rate and dtype are stacked and resampled in one pass.
+
+    Args:
+        y_list (list): The waveforms.
+        orig_sr (int or list): The sampling rate of all waveforms, or one per waveform.
+        target_sr (int or list): The target rate of all waveforms, or one per waveform.
+        quality (str, optional): One of QUALITY_PRESETS. Defaults to 'hq'.
+
+    Returns:
+        list: The resampled waveforms, in order (waveforms already at their target rate are returned as is).
+    """
+    orig_sr = orig_sr if isinstance(orig_sr, (list, tuple)) else [orig_sr]*len(y_list)
+    target_sr = target_sr if isinstance(target_sr, (list, tuple)) else [target_sr]*len(y_list)
+    groups = {}
+    results = list(y_list)
+    for i, (y, sr_i, target_i) in enumerate(zip(y_list, orig_sr, target_sr)):
+        if sr_i != target_i:
+            groups.setdefault((len(y), np.asarray(y).dtype.str, sr_i, target_i), []).append(i)
+
+    for (_, _, sr_i, target_i), indices in groups.items():
+        resampled = resample(np.stack([y_list[i] for i in indices]), sr_i, target_i, quality)
+        for i, y in zip(indices, resampled):
+            results[i] = y
+    return results
@@ -1,8 +1,10 @@
 from calendar import c
 import os
 import argparse
+import logging
 import re
 from tabnanny import check
+from contextlib import nullcontext
 import yaml
 import time
 import numpy as np
@@ -13,15 +15,62 @@ from pydub import AudioSegment
 import torch
 from torch import nn
 
-from .model import Encoder, CarrierDecoder, MsgDecoder
+from .model import Encoder, CarrierDecoder, MsgDecoder, receptive_field_frames
 from .stft import STFT
+from .profiling import StageProfiler, NULL_PROFILER
+from .cache import EncodeCache, DecodeCache, model_fingerprint
+from .resample import resample_many
+
+logger = logging.getLogger(__name__)
+
+# STFT frame counts that inputs are padded up to when length bucketing is enabled.
+# Inputs longer than the largest bucket are padded to a multiple of it.
+DEFAULT_FRAME_BUCKETS = (128, 256, 512, 1024, 2048)
+
+# Precisions the networks can run in, see Model.autocast
+DTYPES = {'float32': torch.float32, 'fp32': torch.float32, 'bfloat16': torch.bfloat16, 'bf16': torch.bfloat16}
+
+
+def resolve_dtype(dtype):
+    if dtype is None:
+        return torch.float32
+    if isinstance(dtype, str):
+        if dtype not in DTYPES:
+            raise ValueError(f'Unsupported dtype {dtype}, use one of {list(DTYPES)}')
+        return DTYPES[dtype]
+    if dtype not in DTYPES.values():
+        raise ValueError(f'Unsupported dtype {dtype}, use torch.float32 or torch.bfloat16')
+    return dtype
 
 class Model():
     
-    def __init__(self, config, device='cpu'):
+    def __init__(self, config, device='cpu', frame_buckets=None, encode_cache=None, decode_cache=None, resample_quality=None, dtype=None):
          
         self.config = config
         self.device = device
+        # Precision of the convolutions of enc_c, dec_c and dec_m, the STFT, batch norms and normalizations stay in float32
+        self.dtype = resolve_dtype(dtype)
+        # Inputs not at self.sr are resampled with soxr (librosa's default), which is faster and rejects aliasing better.
+        # A preset of resample.QUALITY_PRESETS switches whole-array resampling to the polyphase resampler instead,
+        # the one ChunkedDecoder always uses, so both vote on identical samples.
+        self.resample_quality = resample_quality
+        # Silence detection of encode_wav(skip_silence=True): frames this far below the mean frame energy of the file
+        # are silent, and silent stretches of at least min_silence_seconds are not run through the networks
+        self.silence_threshold_db = -50.0
+        self.min_silence_seconds = 1.0
+        # STFT frame counts carriers are padded up to. Only worth it where kernels are specialized per input shape
+        # (CUDA with torch.backends.cudnn.benchmark, or compiled networks): in CPU eager mode nothing is reused
+        # between calls of the same shape and the padded frames are extra work.
+        if frame_buckets is True:
+            frame_buckets = DEFAULT_FRAME_BUCKETS
+        self.frame_buckets = sorted(frame_buckets) if frame_buckets else None
+        # Callable or JSON-lines path receiving the stage breakdown of encode/decode calls made with profile=True
+        self.profile_sink = None
+        # EncodeCache (or its directory) consulted by encode_wav before running the model
+        self.encode_cache = EncodeCache(encode_cache) if isinstance(encode_cache, (str, os.PathLike)) else encode_cache
+        # DecodeCache memoizing decode_wav, True for an in-memory one
+        self.decode_cache = DecodeCache() if decode_cache is True else decode_cache
+        self._model_version = None
         
         self.n_messages = config.n_messages
         self.model_type = config.model_type
@@ -48,12 +97,12 @@ class Model():
                                     n_layers=self.config.dec_c_n_layers,
                                     message_band_size=self.config.message_band_size)
 
-        self.dec_m = [MsgDecoder(message_dim=self.message_dim,
-                                 message_band_size=self.config.message_band_size) for _ in range(self.n_messages)]
+        self.dec_m = nn.ModuleList([MsgDecoder(message_dim=self.message_dim,
+                                               message_band_size=self.config.message_band_size) for _ in range(self.n_messages)])
         # ------ make parallel ------
         self.enc_c = self.enc_c.to(self.device)
         self.dec_c = self.dec_c.to(self.device)
-        self.dec_m = [m.to(self.device) for m in self.dec_m]
+        self.dec_m = self.dec_m.to(self.device)
         
         self.average_energy_VCTK=0.002837200844477648
         self.stft = STFT(self.config.N_FFT, self.config.HOP_LENGTH)
@@ -61,6 +110,101 @@ class Model():
         self.load_models(config.load_ckpt)
         self.sr = self.config.SR
 
+    @property
+    def model_version(self):
+        """Fingerprint of the loaded weights and configuration, used to key cached results."""
+        if self._model_version is None:
+            self._model_version = model_fingerprint(self)
+        return self._model_version
+
+    def autocast(self):
+        """
+        Context in which the networks run, bfloat16 autocast when self.dtype is torch.bfloat16.
+
+        The weights stay in float32, autocast runs the convolutions and linear layers in bfloat16
+        (which uses the bf16 matrix instructions of recent CPUs) and Layer keeps the batch norms in float32.
+        """
+        if self.dtype == torch.float32:
+            return nullcontext()
+        return torch.autocast(device_type=torch.device(self.device).type, dtype=self.dtype)
+
+    def bucket_frames(self, n_frames):
+        """
+        Returns the number of STFT frames an input with n_frames frames is padded to.
+
+        Bucketing bounds the number of distinct input shapes, which only pays off when the kernels are
+        selected or compiled per shape (CUDA with cudnn.benchmark, torch.compile). In CPU eager mode it
+        only adds padded frames, so leave frame_buckets unset there.
+
+        Args:
+            n_frames (int): The number of frames in the carrier.
+
+        Returns:
+            int: The smallest bucket holding n_frames, or n_frames itself when bucketing is disabled.
+        """
+        if not self.frame_buckets:
+            return n_frames
+        for bucket in self.frame_buckets:
+            if bucket >= n_frames:
+                return bucket
+        largest = self.frame_buckets[-1]
+        return -(-n_frames // largest) * largest
+
+    def pad_to_bucket(self, carrier):
+        """
+        Pads the time axis of a carrier up to its frame bucket.
+
+        The returned mask marks the original frames, the networks use it to keep the padding
+        out of their normalization statistics so the result on the original frames is unchanged.
+
+        Args:
+            carrier (torch.Tensor): Carrier magnitude of shape [B, 1, F, T].
+
+        Returns:
+            tuple: The padded carrier and the frame mask (None when no padding was needed).
+        """
+        n_frames = carrier.shape[3]
+        n_padded = self.bucket_frames(n_frames)
+        if n_padded == n_frames:
+            return carrier, None
+        carrier = torch.nn.functional.pad(carrier, (0, n_padded - n_frames))
+        mask = torch.zeros(1, 1, 1, n_padded, device=carrier.device)
+        mask[..., :n_frames] = 1
+        return carrier, mask
+
+    def warmup(self, durations=None, decode=True):
+        """
+        Runs the encoder (and optionally the decoders) on synthetic audio so that the first real
+        request does not pay for allocator growth and kernel selection.
+
+        The batch entry points are called directly, so the synthetic clips never reach the encode and
+        decode caches.
+
+        Args:
+            durations (list, optional): Durations in seconds to warm up. By default one clip is run
+                per frame bucket, or a 1 and a 3 second clip when bucketing is disabled.
+            decode (bool, optional): Whether to warm up the decoders as well. Defaults to True.
+
+        Returns:
+            float: The time taken in seconds.
+        """
+        start = time.time()
+        if durations is None:
+            if self.frame_buckets:
+                # (bucket - 1) hops minus one window maps onto the bucket after the STFT padding
+                durations = [((b - 1) * self.config.HOP_LENGTH - self.config.N_FFT) / self.sr for b in self.frame_buckets]
+            else:
+                durations = [1.0, 3.0]
+
+        rng = np.random.default_rng(0)
+        message = [0] * ((self.config.message_len - 1) // 4)
+        for duration in durations:
+            y = 0.1 * rng.standard_normal(max(int(duration * self.sr), self.config.N_FFT)).astype(np.float32)
+            [(encoded, _)] = self.encode_wav_batch([y], self.sr, [message], message_sdr=self.config.message_sdr, calc_sdr=False)
+            if decode:
+                self.decode_wav_batch([encoded], self.sr, phase_shift_decoding=False)
+        return time.time() - start
+
     def letters_encoding(self, patch_len, message_lst):
 
         """
@@ -128,9 +272,12 @@ class Model():
 
             carrier, _ = self.stft.transform(y[0:1, 0:1, ps:].squeeze(1))
             carrier = carrier[:, None]
+            n_frames = carrier.shape[3]
+            carrier, mask = self.pad_to_bucket(carrier)
 
             for i in range(self.n_messages):  # decode each msg_i using decoder_m_i
-                msg_reconst = self.dec_m[i](carrier)
+                with self.autocast():
+                    msg_reconst = self.dec_m[i](carrier, mask)[..., :n_frames].float()
                 pred_values = torch.argmax(msg_reconst[0, 0], dim=0).data.cpu().numpy()
                 pred_values = pred_values[0:int(msg_reconst.shape[3]/self.config.message_len)*self.config.message_len]
                 pred_values = pred_values.reshape([-1, self.config.message_len])
@@ -177,17 +324,43 @@ class Model():
         sdr = 20 * np.log10(rms1 / rms2)
         return sdr
 
+    def resample_many(self, y_list, orig_sr, target_sr):
+        """
+        Resamples whole 1-D waveforms with soxr, or with the polyphase resampler when resample_quality is set.
+
+        Args:
+            y_list (list): The waveforms.
+            orig_sr (int or list): The sampling rate of all waveforms, or one per waveform.
+            target_sr (int or list): The target rate of all waveforms, or one per waveform.
+
+        Returns:
+            list: The resampled waveforms, in order (waveforms already at their target rate are returned as is).
+        """
+        if self.resample_quality is not None:
+            return resample_many(y_list, orig_sr, target_sr, self.resample_quality)
+        orig_sr = orig_sr if isinstance(orig_sr, (list, tuple)) else [orig_sr]*len(y_list)
+        target_sr = target_sr if isinstance(target_sr, (list, tuple)) else [target_sr]*len(y_list)
+        return [y if sr_i == target_i else librosa.resample(y, orig_sr=sr_i, target_sr=target_i)
+                for y, sr_i, target_i in zip(y_list, orig_sr, target_sr)]
+
     def load_audio(self, path):
         """
         Load an audio file from the given path and return the audio array and sample rate.
 
         Args:
-            path (str): The path to the audio file.
+            path (str or file-like): The path to the audio file, or a binary file object holding its bytes.
 
         Returns:
             tuple: A tuple containing the audio array and sample rate.
 
         """
+        if not isinstance(path, (str, os.PathLike)):
+            # In-memory audio, formats supported by libsndfile are decoded without ffmpeg
+            try:
+                audio_array, sr = sf.read(path, dtype='float32')
+                return audio_array, sr
+            except sf.LibsndfileError:
+                path.seek(0)
         audio = AudioSegment.from_file(path)
         audio_array, sr = (np.array(audio.get_array_of_samples(), dtype=np.float32).reshape((-1, audio.channels)) / (
             1 << (8 * audio.sample_width - 1))), audio.frame_rate
@@ -196,7 +369,7 @@ class Model():
 
         return audio_array, sr
 
-    def encode(self, in_path, out_path, message_list, message_sdr=None, calc_sdr=True, disable_checks=False):
+    def encode(self, in_path, out_path, message_list, message_sdr=None, calc_sdr=True, disable_checks=False, profile=False, skip_silence=False):
         """
         Encodes a message into an audio file.
 
@@ -207,39 +380,62 @@ class Model():
         - message_sdr (float, optional): The Signal-to-Distortion Ratio (SDR) of the message. Defaults to None.
         - calc_sdr (bool, optional): Whether to calculate the SDR of the encoded audio. Defaults to True.
         - disable_checks (bool, optional): Whether to disable input checks. Defaults to False.
+        - profile (bool, optional): Whether to record the time and peak memory of each stage. Defaults to False.
+        - skip_silence (bool, optional): Whether to pass long silent stretches through without running the model, see encode_wav. Defaults to False.
 
         Returns:
         - dict: A dictionary containing the status of the encoding process, the SDR value(s), the time taken for encoding, and the time taken per second of audio.
+                With profile=True it also contains the stage breakdown under 'profile', which is sent to self.profile_sink as well.
+                With skip_silence=True it also contains the skipped silence and the time saved per channel under 'silence'.
 
         """
-        y, orig_sr = self.load_audio(in_path)
+        if profile or skip_silence:
+            profiler = StageProfiler(self.device, sink=self.profile_sink if profile else None, op='encode', path=in_path)
+        else:
+            profiler = NULL_PROFILER
+        with profiler.stage('load'):
+            y, orig_sr = self.load_audio(in_path)
         start = time.time()
-        encoded_y, sdr = self.encode_wav(y, orig_sr, message_list=message_list, message_sdr=message_sdr, calc_sdr=calc_sdr, disable_checks=disable_checks)
+        encoded_y, sdr = self.encode_wav(y, orig_sr, message_list=message_list, message_sdr=message_sdr, calc_sdr=calc_sdr, disable_checks=disable_checks, profiler=profiler, skip_silence=skip_silence)
         time_taken = time.time() - start
         sf.write(out_path, encoded_y, orig_sr)
 
         if type(sdr) == list:
-            return {'status': True, 'sdr': [f'{sdr_i:.2f}' for sdr_i in sdr], 'time_taken': time_taken, 'time_taken_per_second': time_taken / (y.shape[0] / orig_sr)}
+            result = {'status': True, 'sdr': [f'{sdr_i:.2f}' for sdr_i in sdr], 'time_taken': time_taken, 'time_taken_per_second': time_taken / (y.shape[0] / orig_sr)}
         else:
-            return {'status': True, 'sdr': f'{sdr:.2f}', 'time_taken': time_taken, 'time_taken_per_second': time_taken / (y.shape[0] / orig_sr)}
+            result = {'status': True, 'sdr': f'{sdr:.2f}', 'time_taken': time_taken, 'time_taken_per_second': time_taken / (y.shape[0] / orig_sr)}
+        if profile:
+            result['profile'] = profiler.report()
+        if skip_silence:
+            result['silence'] = profiler.context.get('silence', [])
+        return result
     
-    def decode(self, path, phase_shift_decoding):
+    def decode(self, path, phase_shift_decoding, profile=False):
         """
         Decode the audio file at the given path using phase shift decoding.
 
         Parameters:
         path (str): The path to the audio file.
         phase_shift_decoding (bool): Flag indicating whether to use phase shift decoding.
+        profile (bool, optional): Whether to record the time and peak memory of each stage. Defaults to False.
 
         Returns:
         dictionary: A dictionary containing the decoded message status and value
+                    With profile=True it also contains the stage breakdown under 'profile', which is sent to self.profile_sink as well.
         """
         
-        y, orig_sr = self.load_audio(path)
-
-        return self.decode_wav(y, orig_sr, phase_shift_decoding)
+        profiler = StageProfiler(self.device, sink=self.profile_sink, op='decode', path=path) if profile else NULL_PROFILER
+        with profiler.stage('load'):
+            y, orig_sr = self.load_audio(path)
+
+        result = self.decode_wav(y, orig_sr, phase_shift_decoding, profiler=profiler)
+        if profile:
+            report = profiler.report()
+            for result_i in (result if type(result) is list else [result]):
+                result_i['profile'] = report
+        return result
     
-    def encode_wav(self, y_multi_channel, orig_sr, message_list, message_sdr=None, calc_sdr=True, disable_checks=False):
+    def encode_wav(self, y_multi_channel, orig_sr, message_list, message_sdr=None, calc_sdr=True, disable_checks=False, profiler=None, skip_silence=False):
 
         """
         Encodes a multi-channel audio waveform with a given message.
@@ -251,113 +447,339 @@ class Model():
             message_sdr (float, optional): The signal-to-distortion ratio (SDR) of the message. If not provided, the default SDR from the configuration is used.
             calc_sdr (bool, optional): Flag indicating whether to calculate the SDR of the encoded waveform. Defaults to True.
             disable_checks (bool, optional): Flag indicating whether to disable input audio checks. Defaults to False.
+            profiler (StageProfiler, optional): Records the time and peak memory of each stage. Defaults to None.
+            skip_silence (bool, optional): Whether to pass silent stretches of at least self.min_silence_seconds through unchanged
+                                           instead of running the model on them. The skipped time and the time saved per channel
+                                           are logged and added to the profiler report under 'silence'. Defaults to False.
 
         Returns:
             tuple: A tuple containing the encoded multi-channel audio waveform and the SDR (if calculated).
+                   When self.encode_cache is set a previously encoded identical request is returned from the cache.
 
         Raises:
             AssertionError: If the number of messages does not match the number of channels in the input audio waveform.
         """
+
+        cache_key = self.encode_cache_key(y_multi_channel, orig_sr, message_list, message_sdr=message_sdr, calc_sdr=calc_sdr,
+                                          disable_checks=disable_checks, skip_silence=skip_silence)
+        if cache_key is not None:
+            cached = self.encode_cache.get(cache_key)
+            if cached is not None:
+                return cached
         
         single_channel = False
         if len(y_multi_channel.shape) == 1:
             single_channel = True
             y_multi_channel = y_multi_channel[:, None]
 
+        if type(message_list[0]) == int:
+            message_list = [message_list]*y_multi_channel.shape[1]
+
+        assert len(message_list) == y_multi_channel.shape[1], f'{len(message_list)} | {y_multi_channel.shape[1]} Mismatch in the number of messages and channels in the input audio.'
+        
+        # The channels are encoded together as one batch
+        channels = [y_multi_channel[:, channel_i] for channel_i in range(y_multi_channel.shape[1])]
+        encoded = self.encode_wav_batch(channels, orig_sr, message_list, message_sdr=message_sdr, calc_sdr=calc_sdr, disable_checks=disable_checks, profiler=profiler, skip_silence=skip_silence)
+
+        y_watermarked_multi_channel = np.stack([y for y, _ in encoded], axis=1)
+        sdrs = [sdr for _, sdr in encoded]
+
+        if single_channel:
+            y_watermarked_multi_channel = y_watermarked_multi_channel[:, 0]
+            sdrs = sdrs[0]
+
+        if cache_key is not None:
+            self.encode_cache.put(cache_key, y_watermarked_multi_channel, sdrs)
+        
+        return y_watermarked_multi_channel, sdrs
+
+    def encode_cache_key(self, y_multi_channel, orig_sr, message_list, message_sdr=None, calc_sdr=True, disable_checks=False, skip_silence=False):
+        """
+        Returns the key encode_wav stores its result under in self.encode_cache, for callers that run the
+        encoding themselves (e.g. through a MicroBatcher) and share the cache with encode_wav.
+
+        Args:
+            y_multi_channel, orig_sr, message_list, message_sdr, calc_sdr, disable_checks, skip_silence: As in encode_wav.
+
+        Returns:
+            str or None: The cache key, None when the model has no encode cache.
+        """
+        if self.encode_cache is None:
+            return None
+        return self.encode_cache.key(y_multi_channel, orig_sr, message_list, self.model_version,
+                                     message_sdr=message_sdr, calc_sdr=calc_sdr, disable_checks=disable_checks,
+                                     resample_quality=self.resample_quality, skip_silence=skip_silence)
+
+    def encode_wav_batch(self, y_list, orig_sr, message_list, message_sdr=None, calc_sdr=True, disable_checks=False, profiler=None, skip_silence=False):
+        """
+        Encodes several single channel waveforms in one batched forward pass.
+
+        The waveforms may have different lengths and sampling rates. Each item is normalized as if it had been
+        encoded on its own, so the result matches calling encode_wav on every item separately.
+
+        Args:
+            y_list (list): The single channel waveforms (numpy.ndarray) to be encoded.
+            orig_sr (int or list): The sampling rate of all waveforms, or one per waveform.
+            message_list (list): A single message used for all waveforms, or one message per waveform.
+            message_sdr (float, optional): The signal-to-distortion ratio (SDR) of the message. If not provided, the default SDR from the configuration is used.
+            calc_sdr (bool, optional): Flag indicating whether to calculate the SDR of the encoded waveforms. Defaults to True.
+            disable_checks (bool, optional): Flag indicating whether to disable input audio checks. Defaults to False.
+            profiler (StageProfiler, optional): Records the time and peak memory of each stage. Defaults to None.
+            skip_silence (bool, optional): Whether to pass long silent stretches through unchanged, see encode_wav. Defaults to False.
+
+        Returns:
+            list: A (encoded waveform, sdr) tuple per input waveform.
+        """
+        profiler = profiler or NULL_PROFILER
+
         if message_sdr is None:
             message_sdr = self.config.message_sdr
-            print(f'Using the default SDR of {self.config.message_sdr} dB')
+            logger.info(f'Using the default SDR of {self.config.message_sdr} dB')
 
+        if type(orig_sr) == int:
+            orig_sr = [orig_sr]*len(y_list)
         if type(message_list[0]) == int:
-            message_list = [message_list]*y_multi_channel.shape[1]
+            message_list = [message_list]*len(y_list)
 
-        y_watermarked_multi_channel = []
-        sdrs = []
+        assert len(message_list) == len(y_list) == len(orig_sr), f'{len(message_list)} | {len(y_list)} | {len(orig_sr)} Mismatch in the number of messages, waveforms and sampling rates.'
 
-        assert len(message_list) == y_multi_channel.shape[1], f'{len(message_list)} | {y_multi_channel.shape[1]} Mismatch in the number of messages and channels in the input audio.'
-        
-        for channel_i in range(y_multi_channel.shape[1]):
-            y = y_multi_channel[:, channel_i]
-            message = message_list[channel_i]
+        results = [None]*len(y_list)
+        pending = []
+        silence = {}
+
+        with torch.no_grad():
 
-            with torch.no_grad():
+            if any(sr_i != self.sr for sr_i in orig_sr):
+                with profiler.stage('resample_in'):
+                    resampled = self.resample_many(y_list, orig_sr, self.sr)
 
+            for i, (y, sr_i) in enumerate(zip(y_list, orig_sr)):
                 orig_y = y.copy()
-                if orig_sr != self.sr:
-                    if orig_sr > self.sr:
-                        print(f'WARNING! Reducing the sampling rate of the original audio from {orig_sr} -> {self.sr}. High frequency components may be lost!')
-                    y = librosa.resample(y, orig_sr = orig_sr, target_sr = self.sr)
-                original_power = np.mean(y**2)
+                if sr_i != self.sr:
+                    if sr_i > self.sr:
+                        logger.warning(f'Reducing the sampling rate of the original audio from {sr_i} -> {self.sr}. High frequency components may be lost!')
+                    y = resampled[i]
+                with profiler.stage('power_normalize'):
+                    original_power = np.mean(y**2)
 
                 if not disable_checks:
                     if original_power == 0:
-                        print('WARNING! The input audio has a power of 0.This means the audio is likely just silence. Skipping encoding.')
-                        return orig_y, 0
-
-                y = y * np.sqrt(self.average_energy_VCTK / original_power)  # Noise has a power of 5% power of VCTK samples
-                y = torch.FloatTensor(y).unsqueeze(0).unsqueeze(0).to(self.device)
-                carrier, carrier_phase = self.stft.transform(y.squeeze(1))
-                carrier = carrier[:, None]
-                carrier_phase = carrier_phase[:, None]
-
-                def binary_encode(mes):
-                    binary_message = ''.join(['{0:08b}'.format(mes_i) for mes_i in mes])
-                    four_bit_msg = []
-                    for i in range(len(binary_message)//2):
-                        four_bit_msg.append(int(binary_message[i*2:i*2+2], 2))
-                    return four_bit_msg
-                
-                binary_encoded_message = binary_encode(message)
-
-                msgs, msgs_compact = self.letters_encoding(carrier.shape[3], [binary_encoded_message])
-                msg_enc = torch.from_numpy(msgs[None]).to(self.device).float()
-
-                carrier_enc = self.enc_c(carrier)  # encode the carrier
-                msg_enc = self.enc_c.transform_message(msg_enc)
-
-                merged_enc = torch.cat((carrier_enc, carrier.repeat(1, 32, 1, 1), msg_enc.repeat(1, 32, 1, 1)), dim=1)  # concat encodings on features axis
-                
-                message_info = self.dec_c(merged_enc, message_sdr)
-                if self.config.frame_level_normalization:
-                    message_info = message_info*(torch.mean((carrier**2), dim=2, keepdim=True)**0.5)  # *time_weighing
-                elif self.config.utterance_level_normalization:
-                    message_info = message_info*(torch.mean((carrier**2), dim=(2,3), keepdim=True)**0.5)  # *time_weighing
-                
-                if self.config.ensure_negative_message:
-                    message_info = -message_info
-                    carrier_reconst = torch.nn.functional.relu(message_info + carrier)  # decode carrier, output in stft domain
-                elif self.config.ensure_constrained_message:
-                    message_info[message_info > carrier] = carrier[message_info > carrier]
-                    message_info[-message_info > carrier] = -carrier[-message_info > carrier]
-                    carrier_reconst = message_info + carrier  # decode carrier, output in stft domain
-                    assert torch.all(carrier_reconst >= 0), 'negative values found in carrier_reconst'
-                else:
-                    carrier_reconst = torch.abs(message_info + carrier)  # decode carrier, output in stft domain
-
-                self.stft.num_samples = y.shape[2]
-
-                y = self.stft.inverse(carrier_reconst.squeeze(1), carrier_phase.squeeze(1)).data.cpu().numpy()[0, 0]
-                y = y * np.sqrt(original_power / (self.average_energy_VCTK))  # Noise has a power of 5% power of VCTK samples
-                if orig_sr != self.sr:
-                    y = librosa.resample(y, orig_sr = self.sr, target_sr = orig_sr)
+                        logger.warning('The input audio has a power of 0. This means the audio is likely just silence. Skipping encoding.')
+                        results[i] = (orig_y, 0)
+                        continue
 
+                with profiler.stage('power_normalize'):
+                    y = y * np.sqrt(self.average_energy_VCTK / original_power)  # Noise has a power of 5% power of VCTK samples
+                with profiler.stage('stft'):
+                    y = torch.FloatTensor(y).unsqueeze(0).unsqueeze(0).to(self.device)
+                    carrier, carrier_phase = self.stft.transform(y.squeeze(1))
+                    carrier = carrier[:, None]
+                    carrier_phase = carrier_phase[:, None]
+
+                skipped = None
+                if skip_silence:
+                    with profiler.stage('silence'):
+                        skipped = self.find_dead_air(carrier)
+                    silence[i] = {'index': i, 'frames': int(carrier.shape[3]), 'skipped_frames': int(skipped.sum()),
+                                  'skipped_seconds': float(skipped.sum()) * self.config.HOP_LENGTH / self.sr,
+                                  'embed_ms': 0.0, 'estimated_saved_ms': 0.0}
+                pending.append((i, orig_y, carrier, carrier_phase, y.shape[2], original_power, skipped))
+
+            if not pending:
+                return results
+
+            # The frames the watermarked frames depend on, long silent stretches are cut out of the carriers
+            run_frames = [None if skipped is None else self.frames_to_run(skipped) for (*_, skipped) in pending]
+            carriers_in = [carrier if frames is None else carrier[..., frames] for (_, _, carrier, *_), frames in zip(pending, run_frames)]
+            embed_start = time.perf_counter()
+            carriers_reconst = self.embed(carriers_in, [message_list[p[0]] for p in pending], message_sdr, profiler=profiler, frame_indices=run_frames)
+            embed_ms = (time.perf_counter() - embed_start) * 1000
+
+            if skip_silence:
+                n_run = sum(carrier.shape[3] for carrier in carriers_in)
+                for (i, _, carrier, *_, skipped), frames, carrier_reconst in zip(pending, run_frames, carriers_reconst):
+                    # enc_c and dec_c cost the same for every frame, the skipped frames would have taken their share of embed_ms
+                    silence[i]['embed_ms'] = embed_ms * len(frames) / n_run
+                    silence[i]['estimated_saved_ms'] = embed_ms * silence[i]['skipped_frames'] / n_run
+                carriers_reconst = [self.restore_skipped(carrier, carrier_reconst, frames, skipped)
+                                    for (_, _, carrier, *_, skipped), frames, carrier_reconst in zip(pending, run_frames, carriers_reconst)]
+                self.report_silence([silence[i] for i in sorted(silence)], profiler)
+
+            encoded = []
+            for (i, orig_y, _, carrier_phase, num_samples, original_power, _), carrier_reconst in zip(pending, carriers_reconst):
+                with profiler.stage('istft'):
+                    y = self.stft.inverse(carrier_reconst.squeeze(1), carrier_phase.squeeze(1), num_samples=num_samples).data.cpu().numpy()[0, 0]
+                    y = y * np.sqrt(original_power / (self.average_energy_VCTK))  # Noise has a power of 5% power of VCTK samples
+                encoded.append(y)
+
+            if any(orig_sr[p[0]] != self.sr for p in pending):
+                with profiler.stage('resample_out'):
+                    encoded = self.resample_many(encoded, self.sr, [orig_sr[p[0]] for p in pending])
+
+            for (i, orig_y, *_), y in zip(pending, encoded):
                 if calc_sdr:
-                    sdr = self.sdr(orig_y, y)
+                    with profiler.stage('sdr'):
+                        sdr = self.sdr(orig_y, y)
                 else:
                     sdr = 0
+                results[i] = (y, sdr)
 
-            y_watermarked_multi_channel.append(y[:, None])
-            sdrs.append(sdr)
-        
-        y_watermarked_multi_channel = np.concatenate(y_watermarked_multi_channel, axis=1)
+        return results
 
-        if single_channel:
-            y_watermarked_multi_channel = y_watermarked_multi_channel[:, 0]
-            sdrs = sdrs[0]
+    def binary_encode(self, message):
+        """
+        Splits a message of 8-bit values into the 2-bit symbols embedded by the model.
+        """
+        binary_message = ''.join(['{0:08b}'.format(mes_i) for mes_i in message])
+        four_bit_msg = []
+        for i in range(len(binary_message)//2):
+            four_bit_msg.append(int(binary_message[i*2:i*2+2], 2))
+        return four_bit_msg
+
+    def batch_carriers(self, carriers):
+        """
+        Pads a list of carriers to a common frame bucket and stacks them into one batch.
+
+        Args:
+            carriers (list): Carrier magnitudes of shape [1, 1, F, T_i].
+
+        Returns:
+            tuple: The batch of shape [B, 1, F, T] and the frame mask of shape [B, 1, 1, T]
+                   (None for a single carrier that needed no padding).
+        """
+        if len(carriers) == 1:
+            return self.pad_to_bucket(carriers[0])
+        n_frames = [carrier.shape[3] for carrier in carriers]
+        n_padded = self.bucket_frames(max(n_frames))
+        batch = torch.cat([torch.nn.functional.pad(carrier, (0, n_padded - carrier.shape[3])) for carrier in carriers], dim=0)
+        mask = torch.zeros(len(carriers), 1, 1, n_padded, device=batch.device)
+        for i, n in enumerate(n_frames):
+            mask[i, ..., :n] = 1
+        return batch, mask
+
+    def find_dead_air(self, carrier):
+        """
+        Finds the long silent stretches of a carrier, which encode_wav(skip_silence=True) passes through unchanged.
+
+        A frame is silent when its energy is self.silence_threshold_db or more below the mean frame energy of the carrier,
+        only runs of silent frames lasting at least self.min_silence_seconds count.
+
+        Args:
+            carrier (torch.Tensor): Carrier magnitude of shape [1, 1, F, T].
+
+        Returns:
+            numpy.ndarray: Boolean mask of shape [T], True for the frames to skip.
+        """
+        energy = torch.mean(carrier[0, 0].double()**2, dim=0).cpu().numpy()
+        silent = energy <= np.mean(energy) * 10**(self.silence_threshold_db / 10)
+        min_frames = max(1, int(np.ceil(self.min_silence_seconds * self.sr / self.config.HOP_LENGTH)))
+
+        skipped = np.zeros_like(silent)
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], silent.astype(np.int8), [0]])))
+        for start, end in zip(edges[::2], edges[1::2]):
+            if end - start >= min_frames:
+                skipped[start:end] = True
+        return skipped
+
+    def frames_to_run(self, skipped):
+        """
+        Returns:
+            numpy.ndarray: The indices of the frames that are watermarked plus the frames their receptive field reaches.
+        """
+        margin = receptive_field_frames(self)
+        keep = np.convolve(~skipped, np.ones(2*margin + 1), mode='same') > 0
+        return np.flatnonzero(keep)
+
+    def restore_skipped(self, carrier, carrier_reconst, run_frames, skipped):
+        """
+        Puts the watermarked frames back into the full carrier, the skipped frames keep their original magnitude.
+        """
+        watermarked = ~skipped[run_frames]
+        out = carrier.clone()
+        out[..., run_frames[watermarked]] = carrier_reconst[..., watermarked]
+        return out
+
+    def report_silence(self, silence, profiler):
+        for item in silence:
+            logger.info(f"Skipped {item['skipped_seconds']:.2f} s of silence in input {item['index']} "
+                        f"({item['skipped_frames']}/{item['frames']} frames), saving about {item['estimated_saved_ms']:.1f} ms")
+        profiler.annotate('silence', silence)
+
+    def embed(self, carriers, messages, message_sdr, profiler=None, frame_indices=None):
+        """
+        Runs the encoder and carrier decoder on a batch of carriers.
+
+        Args:
+            carriers (list): Normalized carrier magnitudes of shape [1, 1, F, T_i].
+            messages (list): The message (five 8-bit values) to embed in each carrier.
+            message_sdr (float): The signal-to-distortion ratio (SDR) of the message.
+            profiler (StageProfiler, optional): Records the time and peak memory of each stage. Defaults to None.
+            frame_indices (list, optional): For each carrier, None or the index of each of its frames in the original carrier
+                                            when frames were cut out. The message is tiled over the original frames. Defaults to None.
+
+        Returns:
+            list: The watermarked carrier magnitudes, with the same shapes as the inputs.
+        """
+        profiler = profiler or NULL_PROFILER
+        carrier_in, mask = self.batch_carriers(carriers)
+        frame_indices = frame_indices or [None]*len(carriers)
+
+        msgs = []
+        for message, indices in zip(messages, frame_indices):
+            if indices is None:
+                msgs_i, msgs_compact = self.letters_encoding(carrier_in.shape[3], [self.binary_encode(message)])
+            else:
+                # One period of the message, indexed by the original position of each frame (padding frames continue after the last one)
+                period, msgs_compact = self.letters_encoding(self.message_len, [self.binary_encode(message)])
+                positions = np.concatenate([indices, indices[-1] + 1 + np.arange(carrier_in.shape[3] - len(indices))])
+                msgs_i = period[..., positions % self.message_len]
+            msgs.append(msgs_i)
+        msg_enc = torch.from_numpy(np.stack(msgs)).to(self.device).float()
+
+        with profiler.stage('enc_c'), self.autocast():
+            carrier_enc = self.enc_c(carrier_in, mask)  # encode the carrier
+            msg_enc = self.enc_c.transform_message(msg_enc).float()
+
+        merged_enc = torch.cat((carrier_enc, carrier_in.repeat(1, 32, 1, 1), msg_enc.repeat(1, 32, 1, 1)), dim=1)  # concat encodings on features axis
+
+        carriers_reconst = []
+        with profiler.stage('dec_c'):
+            with self.autocast():
+                message_info_batch = self.dec_c(merged_enc, message_sdr, mask)
+            for i, carrier in enumerate(carriers):
+                carriers_reconst.append(self.apply_message(message_info_batch[i:i+1, ..., :carrier.shape[3]], carrier))
+
+        return carriers_reconst
+
+    def apply_message(self, message_info, carrier):
+        """
+        Adds the output of the carrier decoder to a carrier.
+
+        Args:
+            message_info (torch.Tensor): Carrier decoder output of shape [1, 1, F, T].
+            carrier (torch.Tensor): Normalized carrier magnitude of the same shape.
+
+        Returns:
+            torch.Tensor: The watermarked carrier magnitude.
+        """
+        if self.config.frame_level_normalization:
+            message_info = message_info*(torch.mean((carrier**2), dim=2, keepdim=True)**0.5)  # *time_weighing
+        elif self.config.utterance_level_normalization:
+            message_info = message_info*(torch.mean((carrier**2), dim=(2,3), keepdim=True)**0.5)  # *time_weighing
         
-        return y_watermarked_multi_channel, sdrs
+        if self.config.ensure_negative_message:
+            message_info = -message_info
+            carrier_reconst = torch.nn.functional.relu(message_info + carrier)  # decode carrier, output in stft domain
+        elif self.config.ensure_constrained_message:
+            message_info[message_info > carrier] = carrier[message_info > carrier]
+            message_info[-message_info > carrier] = -carrier[-message_info > carrier]
+            carrier_reconst = message_info + carrier  # decode carrier, output in stft domain
+            assert torch.all(carrier_reconst >= 0), 'negative values found in carrier_reconst'
+        else:
+            carrier_reconst = torch.abs(message_info + carrier)  # decode carrier, output in stft domain
+        return carrier_reconst
     
-    def decode_wav(self, y_multi_channel, orig_sr, phase_shift_decoding):
+    def decode_wav(self, y_multi_channel, orig_sr, phase_shift_decoding, profiler=None):
         """
         Decode the given audio waveform to extract hidden messages.
 
@@ -365,75 +787,187 @@ class Model():
             y_multi_channel (numpy.ndarray): The multi-channel audio waveform.
             orig_sr (int): The original sample rate of the audio waveform.
             phase_shift_decoding (str): Flag indicating whether to perform phase shift decoding.
+            profiler (StageProfiler, optional): Records the time and peak memory of each stage. Defaults to None.
 
         Returns:
             dict or list: A list of dictionary containing the decoded messages, confidences, and status for each channel if the input is multi-channel.
                           Otherwise, a dictionary containing the decoded messages, confidences, and status for a single channel.
+                          When self.decode_cache is set, a result memoized for the same samples and options is returned instead.
 
         Raises:
             Exception: If the decoding process fails.
 
         """
+        cache_key = self.decode_cache_key(y_multi_channel, orig_sr, phase_shift_decoding)
+        if cache_key is not None:
+            cached = self.decode_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         single_channel = False
         if len(y_multi_channel.shape) == 1:
             single_channel = True
             y_multi_channel = y_multi_channel[:, None]
         
-        results = []
+        channels = [y_multi_channel[:, channel_i] for channel_i in range(y_multi_channel.shape[1])]
+        results = self.decode_wav_batch(channels, orig_sr, phase_shift_decoding, profiler=profiler)
+
+        if single_channel:
+            results = results[0]
+
+        if cache_key is not None:
+            self.decode_cache.put(cache_key, results)
         
-        for channel_i in range(y_multi_channel.shape[1]):
-            y = y_multi_channel[:, channel_i]
-            try:
-                with torch.no_grad():
-                    if orig_sr != self.sr:
-                        y = librosa.resample(y, orig_sr = orig_sr, target_sr = self.sr)
-                    original_power = np.mean(y**2)
-                    y = y * np.sqrt(self.average_energy_VCTK / original_power)  # Noise has a power of 5% power of VCTK samples
+        return results
+
+    def decode_cache_key(self, y_multi_channel, orig_sr, phase_shift_decoding):
+        """
+        Returns the key decode_wav memoizes its result under in self.decode_cache, for callers that run the
+        decoding themselves (e.g. through a MicroBatcher) and share the cache with decode_wav.
+
+        Args:
+            y_multi_channel, orig_sr, phase_shift_decoding: As in decode_wav.
+
+        Returns:
+            str or None: The cache key, None when the model has no decode cache.
+        """
+        if self.decode_cache is None:
+            return None
+        return self.decode_cache.key(y_multi_channel, orig_sr, self.model_version,
+                                     phase_shift_decoding=bool(phase_shift_decoding) and phase_shift_decoding != 'false',
+                                     resample_quality=self.resample_quality)
+
+    def decode_wav_batch(self, y_list, orig_sr, phase_shift_decoding, profiler=None):
+        """
+        Decodes several single channel waveforms in one batched forward pass.
+
+        Args:
+            y_list (list): The single channel waveforms (numpy.ndarray) to be decoded.
+            orig_sr (int or list): The sampling rate of all waveforms, or one per waveform.
+            phase_shift_decoding (str): Flag indicating whether to perform phase shift decoding.
+            profiler (StageProfiler, optional): Records the time and peak memory of each stage. Defaults to None.
+
+        Returns:
+            list: A dictionary containing the decoded messages, confidences, and status for each waveform.
+        """
+        profiler = profiler or NULL_PROFILER
+        if type(orig_sr) == int:
+            orig_sr = [orig_sr]*len(y_list)
+
+        results = [None]*len(y_list)
+        pending = []
+
+        with torch.no_grad():
+            if any(sr_i != self.sr for sr_i in orig_sr):
+                with profiler.stage('resample_in'):
+                    y_list = self.resample_many(y_list, orig_sr, self.sr)
+
+            for i, y in enumerate(y_list):
+                try:
+                    with profiler.stage('power_normalize'):
+                        original_power = np.mean(y**2)
+                        y = y * np.sqrt(self.average_energy_VCTK / original_power)  # Noise has a power of 5% power of VCTK samples
                     if phase_shift_decoding and phase_shift_decoding != 'false':
-                        ps = self.get_best_ps(y)
+                        with profiler.stage('phase_search'):
+                            ps = self.get_best_ps(y)
                     else:
                         ps = 0
-                    y = torch.FloatTensor(y[ps:]).unsqueeze(0).unsqueeze(0).to(self.device)
-                    carrier, _ = self.stft.transform(y.squeeze(1))
-                    carrier = carrier[:, None]
-
+                    with profiler.stage('stft'):
+                        y = torch.FloatTensor(y[ps:]).unsqueeze(0).unsqueeze(0).to(self.device)
+                        carrier, _ = self.stft.transform(y.squeeze(1))
+                        carrier = carrier[:, None]
+                    pending.append((i, carrier))
+                except:
+                    results[i] = {'messages': [], 'confidences': [], 'error': 'Could not find message', 'status': False}
+
+            if pending:
+                carrier, mask = self.batch_carriers([carrier for _, carrier in pending])
+                msg_reconst_batches = []
+                for m in range(self.n_messages):  # decode each msg_i using decoder_m_i
+                    with profiler.stage('decoders'), self.autocast():
+                        msg_reconst_batches.append(self.dec_m[m](carrier, mask).float())
+
+            for j, (i, carrier_i) in enumerate(pending):
+                try:
                     msg_reconst_list = []
                     confidence = []
+                    for msg_reconst in msg_reconst_batches:
+                        message, confidence_m = self.read_message(msg_reconst[j:j+1, ..., :carrier_i.shape[3]])
+                        msg_reconst_list.append(message)
+                        confidence.append(confidence_m)
+                    results[i] = {'messages': self.convert_to_8_bit_segments(msg_reconst_list), 'confidences': confidence, 'status': True}
+                except:
+                    results[i] = {'messages': [], 'confidences': [], 'error': 'Could not find message', 'status': False}
 
-                    for i in range(self.n_messages):  # decode each msg_i using decoder_m_i
-                        msg_reconst = self.dec_m[i](carrier)
-                        pred_values = torch.argmax(msg_reconst[0, 0], dim=0).data.cpu().numpy()
-                        pred_values = pred_values[0:int(msg_reconst.shape[3]/self.config.message_len)*self.config.message_len]
-                        pred_values = pred_values.reshape([-1, self.config.message_len])
-
-                        ord_values = st.mode(pred_values, keepdims=False).mode
-                        end_char = np.min(np.nonzero(ord_values == 0)[0])
-                        confidence.append(self.get_confidence(pred_values, ord_values))
-                        if end_char == self.config.message_len:
-                            ord_values = ord_values[:self.config.message_len-1]
-                        else:
-                            ord_values = np.concatenate([ord_values[end_char+1:], ord_values[:end_char]], axis=0)
-
-                        # pred_values = ''.join([chr(v + 64) for v in ord_values])
-                        msg_reconst_list.append((ord_values - 1).tolist())
-                    
-                    def convert_to_8_bit_segments(msg_list):
-                        segment_message_list = []
-                        for msg_list_i in msg_list:
-                            binary_format = ''.join(['{0:02b}'.format(mes_i) for mes_i in msg_list_i])
-                            eight_bit_segments = [int(binary_format[i*8:i*8+8], 2) for i in range(len(binary_format)//8)]
-                            segment_message_list.append(eight_bit_segments)
-                        return segment_message_list
-                    msg_reconst_list = convert_to_8_bit_segments(msg_reconst_list)
-                
-                results.append({'messages': msg_reconst_list, 'confidences': confidence, 'status': True})
-            except:
-                results.append({'messages': [], 'confidences': [], 'error': 'Could not find message', 'status': False})
-
-        if single_channel:
-            results = results[0]
-        
         return results
+
+    def read_message(self, msg_reconst):
+        """
+        Votes the per frame symbol predictions of one message decoder into a message.
+
+        Args:
+            msg_reconst (torch.Tensor): Decoder output of shape [1, 1, message_dim, T].
+
+        Returns:
+            tuple: The decoded 2-bit symbols and the confidence.
+
+        Raises:
+            ValueError: If no end of message symbol is found.
+        """
+        pred_values = torch.argmax(msg_reconst[0, 0], dim=0).data.cpu().numpy()
+        pred_values = pred_values[0:int(msg_reconst.shape[3]/self.config.message_len)*self.config.message_len]
+        return self.message_from_counts(self.symbol_counts(pred_values))
+
+    def symbol_counts(self, pred_values, first_frame=0):
+        """
+        Counts the predicted symbols at every position of the message.
+
+        Args:
+            pred_values (numpy.ndarray): Predicted symbol of each frame.
+            first_frame (int, optional): Index of the first of these frames in the file. Defaults to 0.
+
+        Returns:
+            numpy.ndarray: Counts of shape [message_len, message_dim], counts from several blocks of frames can be summed.
+        """
+        counts = np.zeros((self.config.message_len, self.message_dim), dtype=np.int64)
+        positions = (first_frame + np.arange(len(pred_values))) % self.config.message_len
+        np.add.at(counts, (positions, pred_values), 1)
+        return counts
+
+    def message_from_counts(self, counts):
+        """
+        Votes the symbol counts of one message decoder into a message.
+
+        Args:
+            counts (numpy.ndarray): Counts of shape [message_len, message_dim], see symbol_counts.
+
+        Returns:
+            tuple: The decoded 2-bit symbols and the confidence (fraction of the frames agreeing with the vote).
+
+        Raises:
+            ValueError: If no frame was counted or no end of message symbol is found.
+        """
+        if counts.sum() == 0:
+            raise ValueError('No complete message in the input')
+        # argmax picks the smallest symbol on ties, like the mode of the per frame predictions
+        ord_values = np.argmax(counts, axis=1)
+        end_char = np.min(np.nonzero(ord_values == 0)[0])
+        confidence = (counts[np.arange(len(ord_values)), ord_values].sum() / counts.sum()).item()
+        if end_char == self.config.message_len:
+            ord_values = ord_values[:self.config.message_len-1]
+        else:
+            ord_values = np.concatenate([ord_values[end_char+1:], ord_values[:end_char]], axis=0)
+
+        # pred_values = ''.join([chr(v + 64) for v in ord_values])
+        return (ord_values - 1).tolist(), confidence
+
+    def convert_to_8_bit_segments(self, msg_list):
+        segment_message_list = []
+        for msg_list_i in msg_list:
+            binary_format = ''.join(['{0:02b}'.format(mes_i) for mes_i in msg_list_i])
+            eight_bit_segments = [int(binary_format[i*8:i*8+8], 2) for i in range(len(binary_format)//8)]
+            segment_message_list.append(eight_bit_segments)
+        return segment_message_list
     
     def convert_dataparallel_to_normal(self, checkpoint):
 
@@ -445,9 +979,11 @@ class Model():
         self.dec_c.load_state_dict(self.convert_dataparallel_to_normal(torch.load(os.path.join(ckpt_dir, "dec_c.ckpt"), map_location=self.device)))
         for i,m in enumerate(self.dec_m):
             m.load_state_dict(self.convert_dataparallel_to_normal(torch.load(os.path.join(ckpt_dir, f"dec_m_{i}.ckpt"), map_location=self.device)))
+        # New weights, results cached for the previous ones no longer apply
+        self._model_version = None
 
 
-def get_model(model_type='44.1k', ckpt_path='../Models/44_1_khz/73999_iteration', config_path='../Models/44_1_khz/73999_iteration/hparams.yaml', device='cpu'):
+def get_model(model_type='44.1k', ckpt_path='../Models/44_1_khz/73999_iteration', config_path='../Models/44_1_khz/73999_iteration/hparams.yaml', device='cpu', frame_buckets=None, warmup=False, encode_cache=None, decode_cache=None, resample_quality=None, dtype=None):
 
     if model_type == '44.1k':
         if not os.path.exists(ckpt_path) or not os.path.exists(config_path):
@@ -460,7 +996,7 @@ def get_model(model_type='44.1k', ckpt_path='../Models/44_1_khz/73999_iteration'
         config = yaml.safe_load(open(config_path))
         config = argparse.Namespace(**config)
         config.load_ckpt = ckpt_path
-        model = Model(config, device)
+        model = Model(config, device, frame_buckets=frame_buckets, encode_cache=encode_cache, decode_cache=decode_cache, resample_quality=resample_quality, dtype=dtype)
     elif model_type == '16k':
         if not os.path.exists(ckpt_path) or not os.path.exists(config_path):
             print('ckpt path or config path does not exist! Downloading the model from the Hugging Face Hub...')
@@ -473,8 +1009,11 @@ def get_model(model_type='44.1k', ckpt_path='../Models/44_1_khz/73999_iteration'
         config = argparse.Namespace(**config)
         config.load_ckpt = ckpt_path
 
-        model = Model(config, device)
+        model = Model(config, device, frame_buckets=frame_buckets, encode_cache=encode_cache, decode_cache=decode_cache, resample_quality=resample_quality, dtype=dtype)
     else:
         print('Please specify a valid model_type [44.1k, 16k]')
+
+    if warmup:
+        model.warmup()
     
     return model
\ No newline at end of file
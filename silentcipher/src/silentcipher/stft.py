@@ -20,7 +20,10 @@ class STFT(torch.nn.Module, metaclass=Singleton):
     def transform(self, x):
         x = torch.nn.functional.pad(x, (0, self.win_len - x.shape[1]%self.win_len))
         fft = torch.stft(x, self.filter_length, self.hop_len, self.win_len, window=self.window.to(x.device), return_complex=True)
-    
+        return self.polar(fft)
+
+    @staticmethod
+    def polar(fft):
         real_part, imag_part = fft.real, fft.imag
         
         squared = real_part**2 + imag_part**2
@@ -30,11 +33,13 @@ class STFT(torch.nn.Module, metaclass=Singleton):
         phase = torch.autograd.Variable(torch.atan2(imag_part.data, real_part.data)).float()
         return magnitude, phase
 
-    def inverse(self, magnitude, phase):
+    def inverse(self, magnitude, phase, num_samples=None):
         
+        if num_samples is None:
+            num_samples = self.num_samples
         recombine_magnitude_phase = magnitude*torch.cos(phase) + 1j*magnitude*torch.sin(phase)
         inverse_transform = torch.istft(recombine_magnitude_phase, self.filter_length, hop_length=self.hop_len, win_length=self.win_len, window=self.window.to(magnitude.device)).unsqueeze(1)  # , length=self.num_samples
-        padding = self.win_len - (self.num_samples % self.win_len)
+        padding = self.win_len - (num_samples % self.win_len)
         inverse_transform = inverse_transform[:, :, :-padding]
         return inverse_transform
 
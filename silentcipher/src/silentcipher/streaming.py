@@ -0,0 +1,273 @@
+import math
+
+import numpy as np
+import torch
+
+from .model import receptive_field_frames
+
+
+class StreamingEncoder():
+    """
+    Watermarks live audio block by block.
+
+    PCM blocks of any size are pushed in and the same number of watermarked samples comes out, delayed by
+    a fixed latency_samples. The STFT frames are embedded in steps of block_frames: every step runs the encoder
+    and carrier decoder on the new frames plus the frames on either side that their convolutions reach, and
+    overlap-adds the inverse STFT of the new frames into the output.
+
+    State carried across blocks:
+        - the STFT input and overlap-add buffers,
+        - the message phase, frame t carries symbol t % message_len as in encode_wav,
+        - the power normalization, an exponential running average of the input power instead of the power of the whole file,
+        - the batch norm statistics, accumulated per layer over the last context_frames frames instead of the whole file.
+    The output therefore approximates, but does not exactly reproduce, encode_wav on the same audio.
+
+    Algorithmic latency: N_FFT + (block_frames + lookahead - 1) * HOP_LENGTH samples, where the lookahead is the
+    receptive field of the networks in frames (receptive_field_frames).
+
+    Example:
+        encoder = StreamingEncoder(model, [123, 234, 111, 222, 11])
+        for block in blocks:                # e.g. 1024 samples at model.sr
+            play(encoder.push(block))       # same length as block, delayed by encoder.latency_samples
+        play(encoder.flush())               # the last latency_samples samples
+    """
+
+    def __init__(self, model, message, message_sdr=None, block_frames=32, context_frames=1024, power_time_constant=10.0):
+        """
+        Args:
+            model (Model): The loaded model, the input must be at its sampling rate (model.sr).
+            message (list): The message (five 8-bit values) to embed.
+            message_sdr (float, optional): The signal-to-distortion ratio (SDR) of the message. Defaults to the configuration SDR.
+            block_frames (int, optional): Number of new frames embedded per step, trades latency for throughput. Defaults to 32.
+            context_frames (int, optional): Number of past frames the batch norm statistics are accumulated over. Defaults to 1024.
+            power_time_constant (float, optional): Time constant in seconds of the running input power. Defaults to 10.0.
+        """
+        config = model.config
+        self.model = model
+        self.sr = model.sr
+        self.n_fft = config.N_FFT
+        self.hop = config.HOP_LENGTH
+        self.message_sdr = config.message_sdr if message_sdr is None else message_sdr
+        self.message_len = config.message_len
+        self.block_frames = block_frames
+        self.lookahead_frames = receptive_field_frames(model)
+        self.context_frames = context_frames
+        self.power_time_constant = power_time_constant
+        self.latency_samples = self.n_fft + (block_frames + self.lookahead_frames - 1) * self.hop
+
+        # One-hot symbols of the message, column t % message_len is embedded in frame t
+        symbols, _ = model.letters_encoding(self.message_len, [model.binary_encode(message)])
+        self._symbols = torch.from_numpy(symbols).float().to(model.device)
+
+        self.window = torch.hann_window(self.n_fft).to(model.device)
+        self._window = self.window.cpu().numpy()
+        self._power = None
+        self._finished = False
+
+        # Per layer batch norm sums (sum, sum of squares, count) of the last steps
+        self._bn_history = {}
+
+        # Input samples from absolute index _input_start on. Frame t covers the samples [t*hop - n_fft/2, t*hop + n_fft/2),
+        # the stream starts with n_fft/2 zeros instead of the reflection padding of the file STFT.
+        half = self.n_fft // 2
+        self._input = np.zeros(half, dtype=np.float32)
+        self._input_start = -half
+        self._received = 0
+
+        # STFT frames [_frames_start, _frames_start + magnitude.shape[1]) and the next frame to embed
+        self._magnitude = torch.zeros(self.n_fft // 2 + 1, 0, device=model.device)
+        self._phase = torch.zeros(self.n_fft // 2 + 1, 0, device=model.device)
+        self._frames_start = 0
+        self._next_frame = 0
+
+        # Overlap-add accumulators for the samples from absolute index _output_start on
+        self._output = np.zeros(0, dtype=np.float32)
+        self._window_sum = np.zeros(0, dtype=np.float32)
+        self._output_start = -half
+
+        # Finished samples not returned yet, starting with the latency
+        self._ready = [np.zeros(self.latency_samples, dtype=np.float32)]
+
+    def push(self, block):
+        """
+        Watermarks the next block of the stream.
+
+        Args:
+            block (numpy.ndarray): Mono PCM samples at model.sr, of any length.
+
+        Returns:
+            numpy.ndarray: The same number of watermarked samples, latency_samples behind the input.
+        """
+        if self._finished:
+            raise RuntimeError('The stream has been flushed')
+        block = np.asarray(block, dtype=np.float32)
+        if block.ndim != 1:
+            raise ValueError('StreamingEncoder expects mono blocks')
+        if len(block) == 0:
+            return block
+
+        self._update_power(block)
+        self._feed(block)
+        return self._take(len(block))
+
+    def flush(self):
+        """
+        Ends the stream.
+
+        Returns:
+            numpy.ndarray: The last latency_samples watermarked samples, so that the concatenated outputs
+                           without their first latency_samples samples line up with the input.
+        """
+        if self._finished:
+            raise RuntimeError('The stream has been flushed')
+        self._feed(np.zeros(self.latency_samples, dtype=np.float32))
+        self._finished = True
+        return self._take(self.latency_samples)
+
+    def _update_power(self, block):
+        block_power = float(np.mean(block.astype(np.float64) ** 2))
+        if self._power is None:
+            if block_power > 0:
+                self._power = block_power
+            return
+        alpha = 1 - math.exp(-len(block) / (self.power_time_constant * self.sr))
+        self._power = (1 - alpha) * self._power + alpha * block_power
+
+    def _feed(self, block):
+        self._input = np.concatenate([self._input, block])
+        self._received += len(block)
+
+        half = self.n_fft // 2
+        available = (self._received - half) // self.hop + 1 if self._received >= half else 0
+        while self._next_frame + self.block_frames + self.lookahead_frames <= available:
+            self._step()
+
+    def _compute_frames(self, end):
+        """Computes the STFT frames up to end (exclusive) from the buffered input."""
+        start = self._frames_start + self._magnitude.shape[1]
+        if end <= start:
+            return
+        half = self.n_fft // 2
+        first = start * self.hop - half - self._input_start
+        last = (end - 1) * self.hop + half - self._input_start
+        segment = torch.from_numpy(self._input[first:last]).to(self.model.device)
+        frames = segment.unfold(0, self.n_fft, self.hop) * self.window
+        spectrum = torch.fft.rfft(frames, dim=1).T
+        self._magnitude = torch.cat([self._magnitude, spectrum.abs()], dim=1)
+        self._phase = torch.cat([self._phase, spectrum.angle()], dim=1)
+
+        # Only the samples of frames not computed yet are needed again
+        keep_from = end * self.hop - half
+        self._input = self._input[keep_from - self._input_start:]
+        self._input_start = keep_from
+
+    def _step(self):
+        start, end = self._next_frame, self._next_frame + self.block_frames
+        halo = self.lookahead_frames
+        self._compute_frames(end + halo)
+
+        # The new frames and the frames their outputs depend on, frames before the start of the stream are padding
+        window_start = start - halo
+        magnitude = self._magnitude[:, max(window_start, 0) - self._frames_start:end + halo - self._frames_start]
+        padding = max(0, -window_start)
+        magnitude = torch.nn.functional.pad(magnitude, (padding, 0))
+        mask = torch.ones(1, 1, 1, magnitude.shape[1], device=magnitude.device)
+        mask[..., :padding] = 0
+        new = slice(halo, halo + self.block_frames)
+
+        if self._power and magnitude.max() > 0:
+            scale = math.sqrt(self.model.average_energy_VCTK / self._power)
+            with torch.no_grad():
+                carrier = magnitude[None, None] * scale
+                message_info = self._carrier_decoder(carrier, window_start, mask, new)
+                magnitude = self.model.apply_message(message_info[..., new], carrier[..., new])[0, 0] / scale
+        else:
+            # Silence, passed through like encode_wav does
+            magnitude = magnitude[:, new]
+
+        phase = self._phase[:, start - self._frames_start:end - self._frames_start]
+        spectrum = torch.polar(magnitude.contiguous(), phase.contiguous())
+        frames = (torch.fft.irfft(spectrum.T, n=self.n_fft, dim=1) * self.window).cpu().numpy()
+        self._overlap_add(start, frames)
+        self._next_frame = end
+
+        # The next window reaches back halo frames
+        keep = end - halo
+        if keep > self._frames_start:
+            self._magnitude = self._magnitude[:, keep - self._frames_start:]
+            self._phase = self._phase[:, keep - self._frames_start:]
+            self._frames_start = keep
+
+    def _carrier_decoder(self, carrier, window_start, mask, new):
+        """Runs the encoder and the carrier decoder on a window of frames, as Model.embed does for a whole file."""
+        model = self.model
+        columns = torch.arange(window_start, window_start + carrier.shape[3], device=carrier.device) % self.message_len
+        msg_enc = model.enc_c.transform_message(self._symbols[:, :, columns][None])
+
+        carrier_enc = self._run_layers(model.enc_c.main, carrier, mask, new)
+        merged_enc = torch.cat((carrier_enc, carrier.repeat(1, 32, 1, 1), msg_enc.repeat(1, 32, 1, 1)), dim=1)
+        h = self._run_layers(model.dec_c.main, merged_enc, mask, new)
+        return model.dec_c.finalize(h, self.message_sdr)
+
+    def _run_layers(self, layers, x, mask, new):
+        """
+        Runs a stack of Layers with batch norm statistics accumulated over the recent steps.
+
+        The statistics of each layer combine its output on the new frames with the sums kept from the previous
+        steps. Frames at the window edges see zero padding and are wrong, but the window is wide enough for the
+        errors not to reach the new frames.
+        """
+        x = x * mask
+        max_steps = max(1, math.ceil(self.context_frames / self.block_frames))
+        for layer in layers:
+            h = layer.conv(x) * torch.sigmoid(layer.gate(x))
+            bn = layer.bn
+            if not bn.training:
+                x = bn(h) * mask
+                continue
+
+            current = h[..., new].double()
+            sums = (current.sum(dim=(0, 2, 3)), (current ** 2).sum(dim=(0, 2, 3)), current.shape[2] * current.shape[3])
+            history = self._bn_history.setdefault(id(layer), [])
+            history.append(sums)
+            del history[:-max_steps]
+
+            count = sum(n for _, _, n in history)
+            mean = sum(s for s, _, _ in history) / count
+            var = torch.clamp(sum(s2 for _, s2, _ in history) / count - mean ** 2, min=0)
+            scale = (bn.weight.double() / torch.sqrt(var + bn.eps)).float()
+            shift = (bn.bias.double() - mean * bn.weight.double() / torch.sqrt(var + bn.eps)).float()
+            x = (h * scale[None, :, None, None] + shift[None, :, None, None]) * mask
+        return x
+
+    def _overlap_add(self, first_frame, frames):
+        half = self.n_fft // 2
+        end = (first_frame + len(frames) - 1) * self.hop + half - self._output_start
+        if end > len(self._output):
+            self._output = np.pad(self._output, (0, end - len(self._output)))
+            self._window_sum = np.pad(self._window_sum, (0, end - len(self._window_sum)))
+        window_sq = self._window ** 2
+        for i, frame in enumerate(frames):
+            position = (first_frame + i) * self.hop - half - self._output_start
+            self._output[position:position + self.n_fft] += frame
+            self._window_sum[position:position + self.n_fft] += window_sq
+
+        # Samples before the first sample of the next frame receive no more contributions,
+        # the ones before the start of the stream only belong to the padding
+        final = (first_frame + len(frames)) * self.hop - half
+        skip = max(0, -self._output_start)
+        count = final - self._output_start
+        if count <= skip:
+            return
+        window_sum = self._window_sum[skip:count]
+        done = self._output[skip:count] / np.where(window_sum > 1e-11, window_sum, 1.0)
+        self._ready.append(done.astype(np.float32))
+        self._output = self._output[count:]
+        self._window_sum = self._window_sum[count:]
+        self._output_start = final
+
+    def _take(self, n):
+        ready = np.concatenate(self._ready) if len(self._ready) > 1 else self._ready[0]
+        assert len(ready) >= n, 'latency_samples does not cover the processing delay'
+        self._ready = [ready[n:]]
+        return ready[:n]
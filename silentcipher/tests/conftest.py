@@ -0,0 +1,58 @@
+"""
+Shared fixtures for the silentcipher tests.
+
+The tests build a small model with random weights instead of downloading the released
+checkpoints, which is enough to check that the inference code paths agree with each other.
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pytest
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from silentcipher.model import Encoder, CarrierDecoder, MsgDecoder
+from silentcipher.server import Model
+
+
+def make_config(ckpt_dir):
+    return argparse.Namespace(
+        n_messages=1, model_type='test', message_dim=5, message_len=21,
+        enc_n_layers=3, dec_c_n_layers=4, message_band_size=96, N_FFT=256, HOP_LENGTH=64,
+        SR=8000, message_sdr=47, frame_level_normalization=True, utterance_level_normalization=False,
+        ensure_negative_message=True, ensure_constrained_message=False, no_normalization=False,
+        load_ckpt=str(ckpt_dir)
+    )
+
+
+@pytest.fixture(scope='session')
+def tiny_config(tmp_path_factory):
+    """Config of a small random-weight model, with its checkpoints written to a temp dir"""
+    ckpt_dir = tmp_path_factory.mktemp('ckpt')
+    config = make_config(ckpt_dir)
+    torch.manual_seed(0)
+    enc_c = Encoder(n_layers=config.enc_n_layers, message_dim=config.message_dim, out_dim=32,
+                    message_band_size=config.message_band_size, n_fft=config.N_FFT)
+    dec_c = CarrierDecoder(config=config, conv_dim=96, n_layers=config.dec_c_n_layers,
+                           message_band_size=config.message_band_size)
+    dec_m = MsgDecoder(message_dim=config.message_dim, message_band_size=config.message_band_size)
+    torch.save(enc_c.state_dict(), os.path.join(ckpt_dir, 'enc_c.ckpt'))
+    torch.save(dec_c.state_dict(), os.path.join(ckpt_dir, 'dec_c.ckpt'))
+    torch.save(dec_m.state_dict(), os.path.join(ckpt_dir, 'dec_m_0.ckpt'))
+    return config
+
+
+@pytest.fixture
+def tiny_model(tiny_config):
+    """Small random-weight Model"""
+    return Model(tiny_config)
+
+
+def make_audio(duration, sr=8000, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * sr)) / sr
+    return (0.3 * np.sin(2 * np.pi * 440 * t) + 0.05 * rng.standard_normal(len(t))).astype(np.float32)
@@ -0,0 +1,126 @@
+"""
+Tests for batched encode/decode and the MicroBatcher
+"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+import torch
+
+from silentcipher.batching import MicroBatcher
+from conftest import make_audio
+
+
+MESSAGES = [[123, 234, 111, 222, 11], [1, 2, 3, 4, 5], [255, 0, 255, 0, 128]]
+
+
+class TestBatchedModel:
+    """A batched forward must match running every item on its own"""
+
+    def test_encode_batch_matches_single(self, tiny_model):
+        inputs = [make_audio(d, seed=i) for i, d in enumerate([0.3, 0.45, 0.6])]
+        single = [tiny_model.encode_wav(y, 8000, m, message_sdr=47) for y, m in zip(inputs, MESSAGES)]
+        batched = tiny_model.encode_wav_batch(inputs, 8000, MESSAGES, message_sdr=47)
+
+        for (y_single, sdr_single), (y_batched, sdr_batched) in zip(single, batched):
+            assert y_single.shape == y_batched.shape
+            np.testing.assert_allclose(y_batched, y_single, atol=1e-6)
+            assert sdr_batched == pytest.approx(sdr_single, abs=1e-2)
+
+    def test_encode_batch_mixed_sample_rates(self, tiny_model):
+        inputs = [make_audio(0.4, sr=8000), make_audio(0.4, sr=16000)]
+        batched = tiny_model.encode_wav_batch(inputs, [8000, 16000], MESSAGES[0], message_sdr=47)
+        assert [y.shape for y, _ in batched] == [y.shape for y in inputs]
+
+    def test_encode_batch_skips_silence(self, tiny_model):
+        silence = np.zeros(4000, dtype=np.float32)
+        batched = tiny_model.encode_wav_batch([silence, make_audio(0.5)], 8000, MESSAGES[0], message_sdr=47)
+        np.testing.assert_array_equal(batched[0][0], silence)
+        assert batched[0][1] == 0
+        assert batched[1][0].shape == (4000,)
+
+    def test_decoder_batch_matches_single(self, tiny_model):
+        carriers = []
+        for i, d in enumerate([0.3, 0.5]):
+            carrier, _ = tiny_model.stft.transform(torch.FloatTensor(make_audio(d, seed=i))[None])
+            carriers.append(carrier[:, None])
+
+        with torch.no_grad():
+            single = [tiny_model.dec_m[0](c) for c in carriers]
+            batch, mask = tiny_model.batch_carriers(carriers)
+            batched = tiny_model.dec_m[0](batch, mask)
+
+        for i, (c, s) in enumerate(zip(carriers, single)):
+            np.testing.assert_allclose(batched[i:i+1, ..., :c.shape[3]].numpy(), s.numpy(), rtol=1e-4, atol=1e-4)
+
+    def test_decode_batch_matches_single(self, tiny_model):
+        inputs = [make_audio(d, seed=i) for i, d in enumerate([0.3, 0.5])]
+        single = [tiny_model.decode_wav(y, 8000, False) for y in inputs]
+        assert tiny_model.decode_wav_batch(inputs, 8000, False) == single
+
+
+class TestMicroBatcher:
+
+    def test_groups_concurrent_requests(self):
+        calls = []
+        release = threading.Event()
+
+        def fn(key, items):
+            release.wait()
+            calls.append((key, list(items)))
+            return [item * 10 for item in items]
+
+        batcher = MicroBatcher(fn, max_batch_size=4, max_wait_ms=50)
+        futures = [batcher.submit('a', i) for i in range(6)]
+        release.set()
+
+        assert [f.result(timeout=5) for f in futures] == [0, 10, 20, 30, 40, 50]
+        assert all(len(items) <= 4 for _, items in calls)
+        metrics = batcher.metrics()
+        assert metrics['items'] == 6
+        assert metrics['queue_depth'] == 0
+        assert metrics['batches'] == len(calls) < 6
+        batcher.close()
+
+    def test_keys_are_not_mixed(self):
+        calls = []
+
+        def fn(key, items):
+            calls.append((key, list(items)))
+            return items
+
+        batcher = MicroBatcher(fn, max_batch_size=8, max_wait_ms=20)
+        futures = [batcher.submit(i % 2, i) for i in range(6)]
+        assert [f.result(timeout=5) for f in futures] == list(range(6))
+        for key, items in calls:
+            assert all(item % 2 == key for item in items)
+        batcher.close()
+
+    def test_single_request_not_delayed_beyond_wait(self):
+        batcher = MicroBatcher(lambda key, items: items, max_batch_size=8, max_wait_ms=5)
+        start = time.perf_counter()
+        assert batcher.submit(None, 1).result(timeout=5) == 1
+        assert time.perf_counter() - start < 1.0
+        assert batcher.metrics()['max_wait_ms'] < 1000
+        batcher.close()
+
+    def test_errors_propagate_to_batch(self):
+        def fn(key, items):
+            raise ValueError('boom')
+
+        batcher = MicroBatcher(fn, max_wait_ms=1)
+        with pytest.raises(ValueError):
+            batcher.submit(None, 1).result(timeout=5)
+        batcher.close()
+        with pytest.raises(RuntimeError):
+            batcher.submit(None, 2)
+
+    def test_missing_results_fail(self):
+        batcher = MicroBatcher(lambda key, items: items[:1], max_batch_size=2, max_wait_ms=200)
+        first, second = batcher.submit(None, 1), batcher.submit(None, 2)
+        assert first.result(timeout=5) == 1
+        with pytest.raises(RuntimeError, match='1 results for 2 items'):
+            second.result(timeout=5)
+        batcher.close()
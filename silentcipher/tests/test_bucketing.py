@@ -0,0 +1,73 @@
+"""
+Tests for STFT frame-count bucketing and model warm-up
+"""
+
+import numpy as np
+import pytest
+import torch
+
+from silentcipher.server import Model
+from conftest import make_audio
+
+
+MESSAGE = [123, 234, 111, 222, 11]
+
+
+class TestBucketing:
+
+    def test_bucket_frames(self, tiny_config):
+        model = Model(tiny_config, frame_buckets=[512, 128, 256])
+        assert model.frame_buckets == [128, 256, 512]
+        assert [model.bucket_frames(n) for n in (1, 128, 129, 256, 300, 512)] == [128, 128, 256, 256, 512, 512]
+        # Longer inputs are padded to a multiple of the largest bucket
+        assert model.bucket_frames(513) == 1024
+        assert model.bucket_frames(1500) == 1536
+        assert Model(tiny_config).bucket_frames(300) == 300
+
+    def test_pad_to_bucket(self, tiny_config):
+        model = Model(tiny_config, frame_buckets=[64, 128])
+        carrier = torch.rand(1, 1, 129, 100)
+        padded, mask = model.pad_to_bucket(carrier)
+        assert padded.shape == (1, 1, 129, 128)
+        torch.testing.assert_close(padded[..., :100], carrier)
+        assert torch.all(padded[..., 100:] == 0)
+        assert mask.shape == (1, 1, 1, 128) and mask.sum() == 100 and torch.all(mask[..., :100] == 1)
+
+        exact = torch.rand(1, 1, 129, 64)
+        padded, mask = model.pad_to_bucket(exact)
+        assert padded is exact and mask is None
+
+    def test_same_result_as_without_buckets(self, tiny_config):
+        y = make_audio(0.7)
+        torch.manual_seed(0)
+        plain = Model(tiny_config)
+        bucketed = Model(tiny_config, frame_buckets=[64, 128, 256])
+        encoded, sdr = plain.encode_wav(y, 8000, MESSAGE, message_sdr=47)
+        encoded_bucketed, sdr_bucketed = bucketed.encode_wav(y, 8000, MESSAGE, message_sdr=47)
+
+        assert encoded_bucketed.shape == encoded.shape
+        np.testing.assert_allclose(encoded_bucketed, encoded, atol=1e-4)
+        assert sdr_bucketed == pytest.approx(sdr, abs=0.05)
+
+        result = plain.decode_wav(encoded, 8000, phase_shift_decoding=False)
+        result_bucketed = bucketed.decode_wav(encoded, 8000, phase_shift_decoding=False)
+        assert result_bucketed['messages'] == result['messages']
+        np.testing.assert_allclose(result_bucketed['confidences'], result['confidences'], atol=1e-4)
+
+
+class TestWarmup:
+
+    def test_runs_one_clip_per_bucket(self, tiny_config):
+        model = Model(tiny_config, frame_buckets=[64, 128])
+        shapes = []
+        forward = model.enc_c.forward
+        model.enc_c.forward = lambda carrier, *args: shapes.append(carrier.shape[-1]) or forward(carrier, *args)
+        model.warmup(decode=False)
+        assert shapes == [64, 128]
+
+    def test_bypasses_caches(self, tiny_config, tmp_path):
+        model = Model(tiny_config, encode_cache=str(tmp_path), decode_cache=True)
+        assert model.warmup(durations=[0.3]) > 0
+        assert model.encode_cache.metrics()['entries'] == 0
+        assert model.encode_cache.metrics()['misses'] == 0
+        assert model.decode_cache.metrics()['entries'] == 0
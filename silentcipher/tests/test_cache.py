@@ -0,0 +1,128 @@
+"""
+Tests for the encode and decode result caches
+"""
+
+import os
+import shutil
+
+import numpy as np
+import torch
+
+from silentcipher.cache import DiskLRUCache, EncodeCache, DecodeCache
+from silentcipher.server import Model
+from conftest import make_audio
+
+
+MESSAGE = [123, 234, 111, 222, 11]
+
+
+class TestDiskLRUCache:
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        store = DiskLRUCache(str(tmp_path), max_bytes=10**9)
+        for key in ['a', 'b', 'c']:
+            store.put(key, {'x': np.zeros(1000, dtype=np.float32)}, {'key': key})
+        entry_size = store.metrics()['size_bytes'] // 3
+
+        assert store.get('a') is not None  # 'b' is now the least recently used
+        store.max_bytes = 2 * entry_size
+        store.put('d', {'x': np.zeros(1000, dtype=np.float32)}, {'key': 'd'})
+
+        assert store.get('b') is None
+        assert store.get('a')[1] == {'key': 'a'}
+        metrics = store.metrics()
+        assert metrics['evictions'] == 2
+        assert metrics['entries'] == 2
+
+    def test_index_survives_restart(self, tmp_path):
+        DiskLRUCache(str(tmp_path)).put('a', {'x': np.arange(5)}, {})
+        arrays, _ = DiskLRUCache(str(tmp_path)).get('a')
+        np.testing.assert_array_equal(arrays['x'], np.arange(5))
+
+
+class TestEncodeCache:
+
+    def test_hit_skips_model_and_matches(self, tiny_config, tmp_path):
+        model = Model(tiny_config, encode_cache=str(tmp_path))
+        y = make_audio(0.5)
+        encoded, sdr = model.encode_wav(y, 8000, MESSAGE, message_sdr=47)
+
+        model.embed = None  # a hit must not run the networks
+        cached, cached_sdr = model.encode_wav(y, 8000, MESSAGE, message_sdr=47)
+
+        np.testing.assert_array_equal(encoded, cached)
+        assert cached_sdr == sdr
+        metrics = model.encode_cache.metrics()
+        assert metrics['hits'] == 1 and metrics['misses'] == 1
+        assert metrics['bytes_saved'] == encoded.nbytes
+
+    def test_key_covers_message_options_and_model(self, tiny_config, tmp_path):
+        cache = EncodeCache(str(tmp_path))
+        y = make_audio(0.5)
+        key = cache.key(y, 8000, MESSAGE, 'v1', message_sdr=47)
+        assert key == cache.key(y.copy(), 8000, list(MESSAGE), 'v1', message_sdr=47)
+        assert key != cache.key(y, 8000, [1, 2, 3, 4, 5], 'v1', message_sdr=47)
+        assert key != cache.key(y, 8000, MESSAGE, 'v1', message_sdr=40)
+        assert key != cache.key(y, 8000, MESSAGE, 'v2', message_sdr=47)
+        assert key != cache.key(y, 16000, MESSAGE, 'v1', message_sdr=47)
+
+    def test_model_key_matches_encode_wav(self, tiny_config, tmp_path):
+        y = make_audio(0.5)
+        assert Model(tiny_config).encode_cache_key(y, 8000, MESSAGE) is None
+        model = Model(tiny_config, encode_cache=str(tmp_path))
+        encoded, sdr = model.encode_wav(y, 8000, MESSAGE, message_sdr=47)
+
+        cached, cached_sdr = model.encode_cache.get(model.encode_cache_key(y, 8000, MESSAGE, message_sdr=47))
+        np.testing.assert_array_equal(cached, encoded)
+        assert cached_sdr == sdr
+        assert model.encode_cache.get(model.encode_cache_key(y, 8000, MESSAGE, message_sdr=40)) is None
+
+
+class TestDecodeCache:
+
+    def test_hit_skips_model(self, tiny_config):
+        model = Model(tiny_config, decode_cache=True)
+        y = make_audio(0.5)
+        result = model.decode_wav(y, 8000, False)
+
+        model.decode_wav_batch = None  # a hit must not run the decoders
+        assert model.decode_wav(y, 8000, False) == result
+        assert model.decode_wav(y.copy(), 8000, 'false') == result
+        assert model.decode_cache.metrics()['memory_hits'] == 2
+
+    def test_model_key_matches_decode_wav(self, tiny_config):
+        y = make_audio(0.5)
+        assert Model(tiny_config).decode_cache_key(y, 8000, False) is None
+        model = Model(tiny_config, decode_cache=True)
+        result = model.decode_wav(y, 8000, False)
+
+        assert model.decode_cache.get(model.decode_cache_key(y, 8000, 'false')) == result
+        assert model.decode_cache.get(model.decode_cache_key(y, 8000, True)) is None
+
+    def test_disk_tier_shared_between_instances(self, tmp_path):
+        first = DecodeCache(cache_dir=str(tmp_path))
+        key = first.key(make_audio(0.5), 8000, 'v1', phase_shift_decoding=True)
+        first.put(key, {'messages': [[np.int64(1), 2, 3, 4, 5]], 'confidences': [np.float32(0.5)], 'status': True})
+
+        second = DecodeCache(cache_dir=str(tmp_path))
+        assert second.get(second.key(make_audio(0.5), 8000, 'v1', phase_shift_decoding=True)) == {'messages': [[1, 2, 3, 4, 5]], 'confidences': [0.5], 'status': True}
+        assert second.metrics()['disk_hits'] == 1
+        assert second.get(second.key(make_audio(0.5), 8000, 'v1', phase_shift_decoding=False)) is None
+
+    def test_model_version_change_invalidates(self, tiny_config, tmp_path):
+        model = Model(tiny_config, decode_cache=True)
+        y = make_audio(0.5)
+        model.decode_wav(y, 8000, False)
+
+        # Load a checkpoint with different decoder weights
+        for name in ['enc_c.ckpt', 'dec_c.ckpt']:
+            shutil.copy(os.path.join(tiny_config.load_ckpt, name), tmp_path / name)
+        state = torch.load(os.path.join(tiny_config.load_ckpt, 'dec_m_0.ckpt'))
+        state = {name: tensor + 0.1 if tensor.is_floating_point() else tensor for name, tensor in state.items()}
+        torch.save(state, tmp_path / 'dec_m_0.ckpt')
+        model.load_models(str(tmp_path))
+        model.decode_wav(y, 8000, False)
+
+        metrics = model.decode_cache.metrics()
+        assert metrics['hits'] == 0
+        assert metrics['invalidations'] == 1
@@ -0,0 +1,86 @@
+"""
+Tests for the ChunkedDecoder, which has to vote the same symbols as decode_wav
+"""
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from silentcipher.chunked import ChunkedDecoder
+from conftest import make_audio
+
+
+MESSAGE = [123, 234, 111, 222, 11]
+
+
+@pytest.fixture
+def spied_model(tiny_model, monkeypatch):
+    """tiny_model recording the symbol counts every decode votes on (random weights rarely decode a message)"""
+    votes = []
+    message_from_counts = tiny_model.message_from_counts
+
+    def spy(counts):
+        votes.append(counts.copy())
+        return message_from_counts(counts)
+
+    monkeypatch.setattr(tiny_model, 'message_from_counts', spy)
+    tiny_model.votes = votes
+    return tiny_model
+
+
+def reference_counts(model, y, sr):
+    model.votes.clear()
+    expected = model.decode_wav(y, sr, False)
+    return expected, model.votes[-1]
+
+
+class TestChunkedDecoder:
+
+    @pytest.mark.parametrize('chunk_frames', [16, 1000])
+    def test_matches_decode_wav(self, spied_model, chunk_frames):
+        y, _ = spied_model.encode_wav(make_audio(1.0), 8000, MESSAGE)
+        expected, expected_counts = reference_counts(spied_model, y, 8000)
+
+        spied_model.votes.clear()
+        result = ChunkedDecoder(spied_model, chunk_frames=chunk_frames).decode(y, 8000)
+        assert result == expected
+        assert np.array_equal(spied_model.votes[-1], expected_counts)
+
+    def test_resampled_input(self, spied_model, monkeypatch):
+        # decode_wav resamples with soxr unless the model uses the polyphase resampler, as ChunkedDecoder does
+        monkeypatch.setattr(spied_model, 'resample_quality', 'hq')
+        y = make_audio(0.8, sr=11025)
+        expected, expected_counts = reference_counts(spied_model, y, 11025)
+
+        spied_model.votes.clear()
+        ChunkedDecoder(spied_model, chunk_frames=24).decode(y, 11025)
+        assert np.array_equal(spied_model.votes[-1], expected_counts)
+
+    def test_multi_channel_file(self, spied_model, tmp_path):
+        y = np.stack([make_audio(0.6, seed=0), make_audio(0.6, seed=1)], axis=1)
+        path = str(tmp_path / 'stereo.wav')
+        sf.write(path, y, 8000, subtype='FLOAT')
+        expected, _ = reference_counts(spied_model, y, 8000)
+        expected_counts = spied_model.votes[-2:]
+
+        decoder = ChunkedDecoder(spied_model, chunk_frames=32)
+        assert decoder.decode(path) == expected
+        for channel in range(2):
+            spied_model.votes.clear()
+            list(decoder.iter_decode(path, channel=channel))
+            assert np.array_equal(spied_model.votes[-1], expected_counts[channel])
+
+    def test_intermediate_results(self, spied_model):
+        y = make_audio(1.0)
+        results = list(ChunkedDecoder(spied_model, chunk_frames=20).iter_decode(y, 8000))
+        progress = [result['progress'] for result in results]
+        assert len(results) > 1
+        assert progress == sorted(progress) and progress[-1] == 1.0
+        # Counts only grow, the last vote covers every complete message
+        totals = [counts.sum() for counts in spied_model.votes]
+        assert totals == sorted(totals)
+        assert totals[-1] == (len(y) + 256 - len(y) % 256) // 64 // 21 * 21
+
+    def test_silence(self, tiny_model):
+        result = ChunkedDecoder(tiny_model).decode(np.zeros(8000, dtype=np.float32), 8000)
+        assert result['status'] is False
@@ -0,0 +1,103 @@
+"""
+Stress tests for the thread-safe InferenceExecutor
+"""
+
+import threading
+import time
+
+import numpy as np
+import torch
+
+from silentcipher.inference import InferenceExecutor
+from conftest import make_audio
+
+
+MESSAGE = [123, 234, 111, 222, 11]
+
+
+def raw_decode(model, y):
+    """Decoder logits, compared directly since random weights rarely decode to a valid message"""
+    with torch.no_grad():
+        carrier, _ = model.stft.transform(torch.FloatTensor(y)[None])
+        return model.dec_m[0](carrier[:, None]).numpy()
+
+
+class TestInferenceExecutor:
+    """Concurrent calls must give the same results as serial ones"""
+
+    def test_concurrent_encode_matches_serial(self, tiny_model):
+        # Different lengths so that concurrent calls need different STFT output sizes
+        inputs = [make_audio(0.3 + 0.05 * (i % 5), seed=i) for i in range(24)]
+        serial = [tiny_model.encode_wav(y, 8000, MESSAGE, message_sdr=47) for y in inputs]
+
+        with InferenceExecutor(tiny_model, max_workers=8, threads_per_call=1, max_pending=12) as executor:
+            futures = [executor.submit_encode(y, 8000, MESSAGE, message_sdr=47) for y in inputs]
+            concurrent = [f.result() for f in futures]
+
+        for (y_serial, sdr_serial), (y_concurrent, sdr_concurrent) in zip(serial, concurrent):
+            assert y_serial.shape == y_concurrent.shape
+            np.testing.assert_array_equal(y_serial, y_concurrent)
+            assert sdr_serial == sdr_concurrent
+
+    def test_concurrent_decode_matches_serial(self, tiny_model):
+        inputs = [make_audio(0.3 + 0.05 * (i % 3), seed=i) for i in range(12)]
+        serial = [tiny_model.decode_wav(y, 8000, False) for y in inputs]
+
+        with InferenceExecutor(tiny_model, max_workers=6, threads_per_call=1) as executor:
+            concurrent = [f.result() for f in [executor.submit_decode(y, 8000) for y in inputs]]
+
+        assert concurrent == serial
+
+    def test_shared_weights_unchanged(self, tiny_model):
+        y = make_audio(0.3)
+        before = raw_decode(tiny_model, y)
+        state = {k: v.clone() for k, v in tiny_model.dec_m.state_dict().items()}
+
+        with InferenceExecutor(tiny_model, max_workers=4) as executor:
+            for f in [executor.submit_decode(make_audio(0.3, seed=i), 8000) for i in range(8)]:
+                f.result()
+
+        for k, v in tiny_model.dec_m.state_dict().items():
+            assert torch.equal(v, state[k]), k
+        np.testing.assert_allclose(raw_decode(tiny_model, y), before, rtol=1e-5, atol=1e-5)
+
+    def test_blocking_helpers(self, tiny_model):
+        y = make_audio(0.3)
+        with InferenceExecutor(tiny_model, max_workers=2) as executor:
+            encoded, sdr = executor.encode_wav(y, 8000, MESSAGE, message_sdr=47)
+            result = executor.decode_wav(encoded, 8000)
+        assert encoded.shape == y.shape
+        assert 'status' in result
+
+    def test_thread_counts_do_not_mix(self, tiny_model):
+        before = torch.get_num_threads()
+        seen = []
+        running = []
+        lock = threading.Lock()
+        encode_wav = tiny_model.encode_wav
+
+        def recording_encode(y, sr, message_list, **kwargs):
+            with lock:
+                running.append(torch.get_num_threads())
+            time.sleep(0.01)
+            threads = torch.get_num_threads()
+            with lock:
+                running.remove(threads)
+                # No call with another count may have changed the process setting meanwhile
+                seen.append((kwargs.pop('requested'), threads, set(running) <= {threads}))
+            return encode_wav(y, sr, message_list, **kwargs)
+
+        tiny_model.encode_wav = recording_encode
+        try:
+            y = make_audio(0.3)
+            with InferenceExecutor(tiny_model, max_workers=6, threads_per_call=2) as executor:
+                futures = [executor.submit_encode(y, 8000, MESSAGE, num_threads=count, requested=count or 2, message_sdr=47)
+                           for count in [1, 3, None] * 6]
+                for future in futures:
+                    future.result()
+        finally:
+            del tiny_model.encode_wav
+
+        assert len(seen) == 18
+        assert [entry for entry in seen if not (entry[0] == entry[1] and entry[2])] == []
+        assert torch.get_num_threads() == before
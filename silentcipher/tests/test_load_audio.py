@@ -0,0 +1,35 @@
+"""
+Tests for loading audio from memory
+"""
+
+import io
+
+import numpy as np
+import soundfile as sf
+
+from conftest import make_audio
+
+
+class TestLoadAudio:
+    """Audio bytes must load the same as the file they came from"""
+
+    def test_bytes_match_path(self, tiny_model, tmp_path):
+        y = np.stack([make_audio(0.5, seed=0), make_audio(0.5, seed=1)], axis=1)
+        path = tmp_path / 'stereo.wav'
+        sf.write(path, y, 8000)
+
+        from_path, sr_path = tiny_model.load_audio(str(path))
+        from_bytes, sr_bytes = tiny_model.load_audio(io.BytesIO(path.read_bytes()))
+
+        assert sr_path == sr_bytes == 8000
+        assert from_path.shape == from_bytes.shape == (4000, 2)
+        np.testing.assert_allclose(from_path, from_bytes, atol=1e-6)
+
+    def test_bytes_encode_decode_round_trip(self, tiny_model):
+        buffer = io.BytesIO()
+        sf.write(buffer, make_audio(0.5), 8000, format='WAV')
+        buffer.seek(0)
+
+        y, sr = tiny_model.load_audio(buffer)
+        encoded, _ = tiny_model.encode_wav(y, sr, [123, 234, 111, 222, 11], message_sdr=47)
+        assert encoded.shape == y.shape
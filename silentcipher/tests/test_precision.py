@@ -0,0 +1,52 @@
+"""
+Tests for the bfloat16 inference mode, which has to stay close to the float32 results
+"""
+
+import numpy as np
+import pytest
+import torch
+
+from silentcipher.server import Model
+from conftest import make_audio
+
+
+MESSAGE = [123, 234, 111, 222, 11]
+
+
+@pytest.fixture
+def bf16_model(tiny_config):
+    return Model(tiny_config, dtype='bfloat16')
+
+
+def symbols(model, y):
+    carrier, _ = model.stft.transform(torch.FloatTensor(y)[None])
+    with torch.no_grad(), model.autocast():
+        msg_reconst = model.dec_m[0](carrier[:, None]).float()
+    return torch.argmax(msg_reconst[0, 0], dim=0).numpy()
+
+
+class TestBfloat16:
+
+    def test_encode_close_to_float32(self, tiny_model, bf16_model):
+        y = make_audio(1.0)
+        expected, expected_sdr = tiny_model.encode_wav(y, 8000, MESSAGE)
+        encoded, sdr = bf16_model.encode_wav(y, 8000, MESSAGE)
+        assert encoded.dtype == expected.dtype and encoded.shape == expected.shape
+        assert abs(sdr - expected_sdr) < 1.0
+        # The watermarks themselves agree to well above the precision of bfloat16
+        watermark, expected_watermark = encoded - y, expected - y
+        assert np.sum((watermark - expected_watermark)**2) < 0.05 * np.sum(expected_watermark**2)
+
+    def test_decoded_symbols_agree(self, tiny_model, bf16_model):
+        y, _ = tiny_model.encode_wav(make_audio(1.0), 8000, MESSAGE)
+        assert np.mean(symbols(tiny_model, y) == symbols(bf16_model, y)) > 0.9
+
+    def test_weights_stay_float32(self, bf16_model):
+        for module in [bf16_model.enc_c, bf16_model.dec_c, bf16_model.dec_m]:
+            assert all(p.dtype == torch.float32 for p in module.parameters())
+
+    def test_part_of_model_version(self, tiny_model, bf16_model, tiny_config):
+        assert bf16_model.model_version != tiny_model.model_version
+        assert Model(tiny_config, dtype=torch.float32).model_version == tiny_model.model_version
+        with pytest.raises(ValueError):
+            Model(tiny_config, dtype='float16')
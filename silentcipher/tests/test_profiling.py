@@ -0,0 +1,75 @@
+"""
+Tests for the per-stage profiler and its JSON-lines sink
+"""
+
+import json
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from silentcipher.profiling import StageProfiler, JsonLinesSink, _current_rss_mb
+
+
+class TestStageProfiler:
+
+    def test_report(self):
+        reports = []
+        profiler = StageProfiler(sink=reports.append, op='encode', path='in.wav')
+        for _ in range(3):
+            with profiler.stage('stft'):
+                pass
+        with profiler.stage('enc_c'):
+            pass
+        profiler.annotate('channels', 2)
+        report = profiler.report()
+
+        assert reports == [report]
+        assert report['op'] == 'encode' and report['path'] == 'in.wav' and report['channels'] == 2
+        assert set(report['stages']) == {'stft', 'enc_c'}
+        assert report['stages']['stft']['calls'] == 3 and report['stages']['enc_c']['calls'] == 1
+        assert report['total_ms'] >= report['stages']['stft']['wall_ms'] >= 0
+
+    @pytest.mark.skipif(not sys.platform.startswith('linux') or _current_rss_mb() is None, reason='needs /proc')
+    def test_peak_memory_is_per_stage(self):
+        profiler = StageProfiler()
+        with profiler.stage('allocate'):
+            block = np.ones(64 * 1024 * 1024 // 8)  # 64 MB, touched
+        del block
+        # The process high-water mark stays up, a stage allocating nothing must not report it
+        with profiler.stage('idle'):
+            pass
+        stages = profiler.report()['stages']
+        assert stages['allocate']['peak_mem_mb'] > 48
+        assert stages['idle']['peak_mem_mb'] < 8
+
+
+class TestJsonLinesSink:
+
+    def test_appends_one_line_per_report(self, tmp_path):
+        path = str(tmp_path / 'profile.jsonl')
+        sink = JsonLinesSink(path)
+        threads = [threading.Thread(target=lambda i=i: [sink({'op': 'decode', 'index': i, 'run': run}) for run in range(20)])
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with open(path) as f:
+            lines = [json.loads(line) for line in f]
+        assert len(lines) == 80
+        assert sorted((line['index'], line['run']) for line in lines) == [(i, run) for i in range(4) for run in range(20)]
+
+    def test_profiler_path_sink(self, tmp_path):
+        path = str(tmp_path / 'profile.jsonl')
+        for op in ['encode', 'decode']:
+            profiler = StageProfiler(sink=path, op=op)
+            with profiler.stage('load'):
+                pass
+            profiler.report()
+        with open(path) as f:
+            lines = [json.loads(line) for line in f]
+        assert [line['op'] for line in lines] == ['encode', 'decode']
+        assert lines[0]['stages']['load']['calls'] == 1
@@ -0,0 +1,67 @@
+"""
+Tests for the polyphase resampler
+"""
+
+import numpy as np
+import pytest
+from scipy import signal
+
+from silentcipher.resample import Resampler, get_resampler, resample, resample_many
+
+
+RATE_PAIRS = [(44100, 16000), (16000, 44100), (48000, 44100), (8000, 11025)]
+
+
+def sines(sr, n, freqs):
+    t = np.arange(n) / sr
+    return sum(np.sin(2 * np.pi * f * t) for f in freqs)
+
+
+class TestResampler:
+
+    @pytest.mark.parametrize('orig_sr, target_sr', RATE_PAIRS)
+    def test_matches_resample_poly(self, orig_sr, target_sr):
+        resampler = Resampler(orig_sr, target_sr)
+        y = np.random.default_rng(0).standard_normal(orig_sr // 2 + 37)
+        expected = signal.resample_poly(y, resampler.up, resampler.down, window=resampler.filter / resampler.up)
+        out = resampler(y)
+        assert len(out) == resampler.output_length(len(y)) == int(np.ceil(len(y) * target_sr / orig_sr))
+        assert np.allclose(out, expected, atol=1e-12)
+
+    @pytest.mark.parametrize('orig_sr, target_sr', RATE_PAIRS)
+    def test_resample_range(self, orig_sr, target_sr):
+        resampler = Resampler(orig_sr, target_sr)
+        y = np.random.default_rng(1).standard_normal(orig_sr // 3)
+        n_out = resampler.output_length(len(y))
+        blocks = [resampler.resample_range(lambda a, b: y[a:b], len(y), start, min(start + 333, n_out)) for start in range(0, n_out, 333)]
+        assert np.allclose(np.concatenate(blocks), resampler(y), atol=1e-12)
+
+    @pytest.mark.parametrize('quality, min_snr', [('fast', 55), ('hq', 85), ('vhq', 115)])
+    def test_accuracy(self, quality, min_snr):
+        freqs = [440, 1234.5, 5600]
+        y = resample(sines(44100, 44100, freqs), 44100, 16000, quality)
+        ideal = sines(16000, len(y), freqs)
+        inner = slice(1600, -1600)
+        snr = 10 * np.log10(np.sum(ideal[inner] ** 2) / np.sum((y - ideal)[inner] ** 2))
+        assert snr > min_snr
+
+    def test_channels_and_dtype(self):
+        y = np.random.default_rng(2).standard_normal((3, 4000)).astype(np.float32)
+        out = resample(y, 8000, 16000)
+        assert out.dtype == np.float32 and out.shape == (3, 8000)
+        assert np.allclose(out[1], resample(y[1], 8000, 16000), atol=1e-6)
+        assert np.allclose(resample(y.T, 8000, 16000, axis=0), out.T, atol=1e-6)
+
+    def test_resample_many(self):
+        rng = np.random.default_rng(3)
+        y_list = [rng.standard_normal(1000), rng.standard_normal(1500), rng.standard_normal(1000)]
+        out = resample_many(y_list, [8000, 8000, 16000], 16000)
+        assert np.allclose(out[0], resample(y_list[0], 8000, 16000))
+        assert np.allclose(out[1], resample(y_list[1], 8000, 16000))
+        assert out[2] is y_list[2]
+
+    def test_filters_are_cached(self):
+        assert get_resampler(44100, 16000, 'fast') is get_resampler(44100, 16000, 'fast')
+        assert get_resampler(44100, 16000, 'fast') is not get_resampler(44100, 16000, 'hq')
+        with pytest.raises(ValueError):
+            Resampler(44100, 16000, 'best')
@@ -0,0 +1,73 @@
+"""
+Tests for the silence aware encode, which passes long silent stretches through without running the model
+"""
+
+import numpy as np
+import torch
+
+from silentcipher.model import receptive_field_frames
+from silentcipher.profiling import StageProfiler
+from conftest import make_audio
+
+
+MESSAGE = [123, 234, 111, 222, 11]
+
+
+def with_gap(gap_seconds, sr=8000):
+    """Speech-like noise with a stretch of digital silence in the middle"""
+    return np.concatenate([make_audio(0.5, seed=0), np.zeros(int(gap_seconds * sr), dtype=np.float32), make_audio(0.5, seed=1)])
+
+
+class TestSilenceSkipping:
+
+    def test_silence_passes_through(self, tiny_model):
+        y = with_gap(2.0)
+        encoded, _ = tiny_model.encode_wav(y, 8000, MESSAGE, skip_silence=True)
+        assert encoded.shape == y.shape
+        # Away from the frames that overlap the watermarked audio, the silence is left as is
+        edge = (receptive_field_frames(tiny_model) + 4) * 64
+        gap = slice(4000 + edge, 20000 - edge)
+        assert np.allclose(encoded[gap], 0, atol=1e-6)
+        assert not np.allclose(encoded[:4000], y[:4000], atol=1e-6)
+
+    def test_dead_air(self, tiny_model):
+        carrier, _ = tiny_model.stft.transform(torch.FloatTensor(with_gap(2.0))[None])
+        skipped = tiny_model.find_dead_air(carrier[:, None])
+        assert skipped.shape == (carrier.shape[2],)
+        assert skipped[4000 // 64 + 4:20000 // 64 - 4].all()
+        assert not skipped[:4000 // 64 - 4].any() and not skipped[20000 // 64 + 4:].any()
+
+        # A pause shorter than min_silence_seconds is not skipped
+        carrier, _ = tiny_model.stft.transform(torch.FloatTensor(with_gap(0.5))[None])
+        assert not tiny_model.find_dead_air(carrier[:, None]).any()
+
+    def test_no_long_silence(self, tiny_model):
+        y = with_gap(0.5)
+        skipped, _ = tiny_model.encode_wav(y, 8000, MESSAGE, skip_silence=True)
+        expected, _ = tiny_model.encode_wav(y, 8000, MESSAGE)
+        assert np.allclose(skipped, expected, atol=1e-6)
+
+    def test_message_tiling(self, tiny_model):
+        carrier, _ = tiny_model.stft.transform(torch.FloatTensor(make_audio(0.5))[None])
+        carrier = carrier[:, None]
+        n_frames = carrier.shape[3]
+        message_len = tiny_model.config.message_len
+
+        expected = tiny_model.embed([carrier], [MESSAGE], 47)[0]
+        # The message position follows the original frame index, whole periods apart give the same input
+        for offset, same in [(0, True), (message_len, True), (3 * message_len, True), (1, False)]:
+            out = tiny_model.embed([carrier], [MESSAGE], 47, frame_indices=[np.arange(n_frames) + offset])[0]
+            assert torch.allclose(out, expected, atol=1e-6) == same
+
+    def test_report(self, tiny_model):
+        profiler = StageProfiler()
+        y = np.stack([with_gap(2.0), make_audio(3.0, seed=2)], axis=1)
+        tiny_model.encode_wav(y, 8000, [MESSAGE, MESSAGE], profiler=profiler, skip_silence=True)
+        report = profiler.report()
+        assert 'silence' in report['stages']
+        silent, busy = report['silence']
+        assert silent['index'] == 0 and busy['index'] == 1
+        assert silent['frames'] == busy['frames']
+        assert silent['skipped_seconds'] > 1.5 and silent['estimated_saved_ms'] > 0
+        assert busy['skipped_frames'] == 0 and busy['estimated_saved_ms'] == 0
+        assert silent['skipped_seconds'] == silent['skipped_frames'] * 64 / 8000
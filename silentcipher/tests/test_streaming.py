@@ -0,0 +1,62 @@
+"""
+Tests for the block-wise StreamingEncoder
+"""
+
+import numpy as np
+import pytest
+
+from silentcipher.streaming import StreamingEncoder, receptive_field_frames
+from conftest import make_audio
+
+
+MESSAGE = [123, 234, 111, 222, 11]
+
+
+def stream(encoder, y, block_size):
+    out = [encoder.push(y[i:i + block_size]) for i in range(0, len(y), block_size)]
+    for block, start in zip(out, range(0, len(y), block_size)):
+        assert len(block) == len(y[start:start + block_size])
+    out.append(encoder.flush())
+    return np.concatenate(out)
+
+
+class TestStreamingEncoder:
+
+    def test_fixed_latency(self, tiny_model):
+        encoder = StreamingEncoder(tiny_model, MESSAGE, block_frames=8)
+        lookahead = receptive_field_frames(tiny_model)
+        assert lookahead == tiny_model.config.enc_n_layers + tiny_model.config.dec_c_n_layers - 1
+        assert encoder.latency_samples == 256 + (8 + lookahead - 1) * 64
+
+        y = make_audio(1.0)
+        out = stream(encoder, y, 100)
+        assert len(out) == len(y) + encoder.latency_samples
+        assert np.all(out[:encoder.latency_samples] == 0)
+
+    def test_reconstruction_without_message(self, tiny_model):
+        # At a very high message SDR the watermark vanishes and the STFT/overlap-add round trip remains
+        encoder = StreamingEncoder(tiny_model, MESSAGE, message_sdr=200, block_frames=4)
+        y = make_audio(1.0)
+        out = stream(encoder, y, 77)
+        np.testing.assert_allclose(out[encoder.latency_samples:], y, atol=1e-5)
+
+    @pytest.mark.parametrize('block_frames, context_frames', [(16, 1000), (8, 64)])
+    def test_close_to_encode_wav(self, tiny_model, block_frames, context_frames):
+        y = make_audio(2.0)
+        encoded, _ = tiny_model.encode_wav(y, 8000, MESSAGE, message_sdr=47)
+        encoder = StreamingEncoder(tiny_model, MESSAGE, message_sdr=47, block_frames=block_frames, context_frames=context_frames)
+        streamed = stream(encoder, y, 512)[encoder.latency_samples:]
+
+        # Same watermark up to the windowed normalization statistics
+        assert np.corrcoef(streamed - y, encoded - y)[0, 1] > 0.9
+
+    def test_silence_passes_through(self, tiny_model):
+        encoder = StreamingEncoder(tiny_model, MESSAGE)
+        y = np.zeros(4000, dtype=np.float32)
+        assert np.all(stream(encoder, y, 500) == 0)
+
+    def test_push_after_flush(self, tiny_model):
+        encoder = StreamingEncoder(tiny_model, MESSAGE)
+        encoder.flush()
+        with pytest.raises(RuntimeError):
+            encoder.push(np.zeros(10, dtype=np.float32))